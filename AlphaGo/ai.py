@@ -1,8 +1,29 @@
 """Policy players"""
+import time
 import numpy as np
 from AlphaGo import go
 from AlphaGo import mcts
-from operator import itemgetter
+from AlphaGo.util import unflatten_idx
+
+
+class SamplingPlayerMixin(object):
+    """Move selection shared by ProbabilisticPolicyPlayer and RolloutPlayer; the player must
+       set greedy_start and provide apply_temperature
+    """
+
+    def _choose_index(self, state, indices, probabilities):
+        """Pick one of the flat move indices, greedy once the game reached greedy_start moves
+           or sampled from the probabilities
+        """
+        if self.greedy_start is not None and len(state.get_history()) >= self.greedy_start:
+            # greedy
+            return indices[np.argmax(probabilities)]
+        else:
+            # probabilistic
+
+            # apply 'temperature' to the distribution
+            probabilities = self.apply_temperature(probabilities)
+            return indices[np.random.choice(len(indices), p=probabilities)]
 
 
 class GreedyPolicyPlayer(object):
@@ -25,20 +46,20 @@ class GreedyPolicyPlayer(object):
             if len(state.get_history()) > 100 and state.get_history()[-1] == go.PASS:
                 return go.PASS
 
-        # list with sensible moves
-        sensible_moves = [move for move in state.get_legal_moves(include_eyes=False)]
+        # flat indices of all sensible moves
+        sensible_indices = state.get_legal_indices(include_eyes=False)
 
         # check if there are sensible moves left to do
-        if len(sensible_moves) > 0:
-            move_probs = self.policy.eval_state(state, sensible_moves)
-            max_prob = max(move_probs, key=itemgetter(1))
-            return max_prob[0]
+        if len(sensible_indices) > 0:
+            _, probabilities = self.policy.eval_state_indices(state, sensible_indices)
+            return unflatten_idx(int(sensible_indices[np.argmax(probabilities)]),
+                                 state.get_size())
 
         # No 'sensible' moves available, so do pass move
         return go.PASS
 
 
-class ProbabilisticPolicyPlayer(object):
+class ProbabilisticPolicyPlayer(SamplingPlayerMixin):
     """A player that samples a move in proportion to the probability given by the
        policy.
        By manipulating the 'temperature', moves can be pushed towards totally random
@@ -75,31 +96,14 @@ class ProbabilisticPolicyPlayer(object):
             if len(state.get_history()) > 100 and state.get_history()[-1] == go.PASS:
                 return go.PASS
 
-        # list with 'sensible' moves
-        sensible_moves = [move for move in state.get_legal_moves(include_eyes=False)]
+        # flat indices of all 'sensible' moves
+        sensible_indices = state.get_legal_indices(include_eyes=False)
 
         # check if there are 'sensible' moves left to do
-        if len(sensible_moves) > 0:
-
-            move_probs = self.policy.eval_state(state, sensible_moves)
-
-            if self.greedy_start is not None and len(state.get_history()) >= self.greedy_start:
-                # greedy
-
-                max_prob = max(move_probs, key=itemgetter(1))
-                return max_prob[0]
-            else:
-                # probabilistic
-
-                # zip(*list) is like the 'transpose' of zip;
-                # zip(*zip([1,2,3], [4,5,6])) is [(1,2,3), (4,5,6)]
-                moves, probabilities = zip(*move_probs)
-                # apply 'temperature' to the distribution
-                probabilities = self.apply_temperature(probabilities)
-                # numpy interprets a list of tuples as 2D, so we must choose an
-                # _index_ of moves then apply it in 2 steps
-                choice_idx = np.random.choice(len(moves), p=probabilities)
-                return moves[choice_idx]
+        if len(sensible_indices) > 0:
+            indices, probabilities = self.policy.eval_state_indices(state, sensible_indices)
+            choice = self._choose_index(state, indices, probabilities)
+            return unflatten_idx(int(choice), state.get_size())
 
         # No 'sensible' moves available, so do pass move
         return go.PASS
@@ -107,34 +111,19 @@ class ProbabilisticPolicyPlayer(object):
     def get_moves(self, states):
         """Batch version of get_move. A list of moves is returned (one per state)
         """
-        sensible_move_lists = [[move for move in st.get_legal_moves(include_eyes=False)]
-                               for st in states]
-        all_moves_distributions = self.policy.batch_eval_state(states, sensible_move_lists)
+        sensible_indices = [st.get_legal_indices(include_eyes=False) for st in states]
+        all_moves_distributions = self.policy.batch_eval_state_indices(states, sensible_indices)
         move_list = [None] * len(states)
-        for i, move_probs in enumerate(all_moves_distributions):
-            if len(move_probs) == 0 or len(states[i].get_history()) > self.move_limit:
+        for i, (indices, probabilities) in enumerate(all_moves_distributions):
+            if len(indices) == 0 or len(states[i].get_history()) > self.move_limit:
                 move_list[i] = go.PASS
             else:
-                if self.greedy_start is not None and \
-                   len(states[i].get_history()) >= self.greedy_start:
-                    # greedy
-
-                    max_prob = max(move_probs, key=itemgetter(1))
-                    move_list[i] = max_prob[0]
-                else:
-                    # probabilistic
-
-                    moves, probabilities = zip(*move_probs)
-                    # apply 'temperature' to the distribution
-                    probabilities = self.apply_temperature(probabilities)
-                    # numpy interprets a list of tuples as 2D, so we must choose an
-                    # _index_ of moves then apply it in 2 steps
-                    choice_idx = np.random.choice(len(moves), p=probabilities)
-                    move_list[i] = moves[choice_idx]
+                choice = self._choose_index(states[i], indices, probabilities)
+                move_list[i] = unflatten_idx(int(choice), states[i].get_size())
         return move_list
 
 
-class RolloutPlayer(object):
+class RolloutPlayer(SamplingPlayerMixin):
     """A player that samples a move in proportion to the probability given by the
        policy.
        By manipulating the 'temperature', moves can be pushed towards totally random
@@ -171,32 +160,14 @@ class RolloutPlayer(object):
             if len(state.get_history()) > 100 and state.get_history()[-1] == go.PASS:
                 return go.PASS
 
-        # list with 'sensible' moves
-        sensible_moves = [move for move in state.get_legal_moves(include_eyes=False)]
+        # flat indices of all 'sensible' moves
+        sensible_indices = state.get_legal_indices(include_eyes=False)
 
         # check if there are 'sensible' moves left to do
-        if len(sensible_moves) > 0:
-
-            move_probs = self.policy.eval_state(state, sensible_moves)
-
-            if self.greedy_start is not None and \
-               len(state.get_history()) >= self.greedy_start:
-                # greedy
-
-                max_prob = max(move_probs, key=itemgetter(1))
-                return max_prob[0]
-            else:
-                # probabilistic
-
-                # zip(*list) is like the 'transpose' of zip;
-                # zip(*zip([1,2,3], [4,5,6])) is [(1,2,3), (4,5,6)]
-                moves, probabilities = zip(*move_probs)
-                # apply 'temperature' to the distribution
-                probabilities = self.apply_temperature(probabilities)
-                # numpy interprets a list of tuples as 2D, so we must choose an
-                # _index_ of moves then apply it in 2 steps
-                choice_idx = np.random.choice(len(moves), p=probabilities)
-                return moves[choice_idx]
+        if len(sensible_indices) > 0:
+            indices, probabilities = self.policy.eval_state_indices(state, sensible_indices)
+            choice = self._choose_index(state, indices, probabilities)
+            return unflatten_idx(int(choice), state.get_size())
 
         # No 'sensible' moves available, so do pass move
         return go.PASS
@@ -204,30 +175,15 @@ class RolloutPlayer(object):
     def get_moves(self, states):
         """Batch version of get_move. A list of moves is returned (one per state)
         """
-        sensible_move_lists = [[move for move in st.get_legal_moves(include_eyes=False)]
-                               for st in states]
-        all_moves_distributions = self.policy.batch_eval_state(states, sensible_move_lists)
+        sensible_indices = [st.get_legal_indices(include_eyes=False) for st in states]
+        all_moves_distributions = self.policy.batch_eval_state_indices(states, sensible_indices)
         move_list = [None] * len(states)
-        for i, move_probs in enumerate(all_moves_distributions):
-            if len(move_probs) == 0 or len(states[i].get_history()) > self.move_limit:
+        for i, (indices, probabilities) in enumerate(all_moves_distributions):
+            if len(indices) == 0 or len(states[i].get_history()) > self.move_limit:
                 move_list[i] = go.PASS
             else:
-                if self.greedy_start is not None and \
-                   len(states[i].get_history()) >= self.greedy_start:
-                    # greedy
-
-                    max_prob = max(move_probs, key=itemgetter(1))
-                    move_list[i] = max_prob[0]
-                else:
-                    # probabilistic
-
-                    moves, probabilities = zip(*move_probs)
-                    # apply 'temperature' to the distribution
-                    probabilities = self.apply_temperature(probabilities)
-                    # numpy interprets a list of tuples as 2D, so we must choose an
-                    # _index_ of moves then apply it in 2 steps
-                    choice_idx = np.random.choice(len(moves), p=probabilities)
-                    move_list[i] = moves[choice_idx]
+                choice = self._choose_index(states[i], indices, probabilities)
+                move_list[i] = unflatten_idx(int(choice), states[i].get_size())
         return move_list
 
 
@@ -271,36 +227,29 @@ class ValuePlayer(object):
             if len(state.get_history()) > 100 and state.get_history()[-1] == go.PASS:
                 return go.PASS
 
-        # list with 'sensible' moves
-        sensible_moves = [move for move in state.get_legal_moves(include_eyes=False)]
-
         # check if there are 'sensible' moves left to do
-        if len(sensible_moves) > 0:
-            # list with legal moves
-            legal_moves = [move for move in state.get_legal_moves()]
+        if len(state.get_legal_indices(include_eyes=False)) > 0:
+            # all legal moves
+            size = state.get_size()
+            legal_moves = [unflatten_idx(int(idx), size) for idx in state.get_legal_indices()]
 
             # generate all possible next states
             state_list = [state.copy() for _ in legal_moves]
             for st, mv in zip(state_list, legal_moves):
                 st.do_move(mv)
 
-            # evaluate all possble states
-            probabilities = [self.value.eval_state(next_state) for next_state in state_list]
+            # evaluate all possible states at once
+            probabilities = self.value.batch_eval_state(state_list)
 
             if self.greedy_start is not None and len(state.get_history()) >= self.greedy_start:
                 # greedy play
-
-                move_probs = zip(legal_moves, probabilities)
-                max_prob = max(move_probs, key=itemgetter(1))
-                return max_prob[0]
+                return legal_moves[np.argmax(probabilities)]
             else:
                 # probabilistic play
 
                 # apply 'temperature' to the distribution
                 probabilities = self.apply_temperature(probabilities)
 
-                # numpy interprets a list of tuples as 2D, so we must choose an
-                # _index_ of moves then apply it in 2 steps
                 choice_idx = np.random.choice(len(legal_moves), p=probabilities)
                 return legal_moves[choice_idx]
 
@@ -309,16 +258,106 @@ class ValuePlayer(object):
 
 
 class MCTSPlayer(object):
+    """A player that chooses moves with Monte Carlo Tree Search. With n_workers > 1, playouts
+       run in parallel on that many threads, using a virtual loss of 'virtual_loss' visits to
+       spread the workers over the tree (see mcts.ParallelMCTS). With transposition_size > 0,
+       evaluations of up to that many positions are cached in a mcts.TranspositionTable.
+
+       The search tree is reused from move to move, following the moves of both players in the
+       state's history, and is pruned to at most max_nodes nodes if max_nodes is given.
+
+       Without a time control, every move runs n_playout playouts. After set_time_settings(), the
+       search of every move instead runs for a share of the remaining time, minus time_margin
+       seconds for communication, and the clock is updated with set_time_left().
+    """
+
     def __init__(self, value_function, policy_function, rollout_function, lmbda=.5, c_puct=5,
-                 rollout_limit=500, playout_depth=40, n_playout=100):
-        self.mcts = mcts.MCTS(value_function, policy_function, rollout_function, lmbda, c_puct,
-                              rollout_limit, playout_depth, n_playout)
+                 rollout_limit=500, playout_depth=40, n_playout=100, n_workers=1, virtual_loss=3,
+                 transposition_size=0, max_nodes=None, time_margin=0.5):
+        table = mcts.TranspositionTable(transposition_size) if transposition_size > 0 else None
+        if n_workers > 1:
+            self.mcts = mcts.ParallelMCTS(value_function, policy_function, rollout_function, lmbda,
+                                          c_puct, rollout_limit, playout_depth, n_playout,
+                                          n_workers, virtual_loss, transposition_table=table,
+                                          max_nodes=max_nodes)
+        else:
+            self.mcts = mcts.MCTS(value_function, policy_function, rollout_function, lmbda,
+                                  c_puct, rollout_limit, playout_depth, n_playout,
+                                  transposition_table=table, max_nodes=max_nodes)
+        self.time_margin = time_margin
+        # The time control, with main_time None if there is none, and the time left in the main
+        # time (stones_left == 0) or in the current byoyomi period for stones_left stones.
+        self.main_time = None
+        self.byoyomi_time = 0
+        self.byoyomi_stones = 0
+        self.time_left = 0
+        self.stones_left = 0
+
+    def set_time_settings(self, main_time, byoyomi_time, byoyomi_stones):
+        """Set the time control, in seconds, as in the GTP command time_settings. A byoyomi_time
+           without byoyomi_stones, or no time at all, means that there is no time limit.
+        """
+        if (byoyomi_time > 0 and byoyomi_stones == 0) or (main_time == 0 and byoyomi_time == 0):
+            self.main_time = None
+            return
+        self.main_time = main_time
+        self.byoyomi_time = byoyomi_time
+        self.byoyomi_stones = byoyomi_stones
+        if main_time > 0:
+            self.set_time_left(main_time, 0)
+        else:
+            self.set_time_left(byoyomi_time, byoyomi_stones)
+
+    def set_time_left(self, time_left, stones):
+        """Set the remaining time in seconds, as in the GTP command time_left: the main time if
+           stones is 0, otherwise the time to play 'stones' more moves in the current byoyomi
+           period.
+        """
+        self.time_left = time_left
+        self.stones_left = stones
+
+    def get_time_budget(self, state):
+        """Return the number of seconds to search for the next move, or None if there is no time
+           control.
+        """
+        if self.main_time is None:
+            return None
+        if self.stones_left > 0:
+            budget = self.time_left / float(self.stones_left)
+        else:
+            # Expect to play on at most half of the empty points, but keep a reserve for long
+            # games.
+            size = state.get_size()
+            moves_left = max(20, (size * size - len(state.get_history())) // 2)
+            budget = self.time_left / float(moves_left)
+            if self.byoyomi_stones > 0:
+                # Time that is not used in the main time carries over to byoyomi, where every
+                # move may take up to a byoyomi share anyway.
+                budget = max(budget, self.byoyomi_time / float(self.byoyomi_stones))
+        return max(budget - self.time_margin, 0.0)
+
+    def _update_clock(self, elapsed):
+        """Count 'elapsed' seconds for a move against the clock, until the next set_time_left().
+        """
+        if self.main_time is None:
+            return
+        self.time_left -= elapsed
+        if self.stones_left == 0:
+            if self.time_left > 0 or self.byoyomi_stones == 0:
+                return
+            # The main time ran out during this move, and the rest was taken from byoyomi.
+            self.set_time_left(self.time_left + self.byoyomi_time, self.byoyomi_stones)
+        self.stones_left -= 1
+        if self.stones_left == 0:
+            # All stones of the period were played, so a new period starts.
+            self.set_time_left(self.byoyomi_time, self.byoyomi_stones)
 
     def get_move(self, state):
-        sensible_moves = [move for move in state.get_legal_moves(include_eyes=False)]
-        if len(sensible_moves) > 0:
-            move = self.mcts.get_move(state)
+        if len(state.get_legal_indices(include_eyes=False)) > 0:
+            start = time.time()
+            move = self.mcts.get_move(state, self.get_time_budget(state))
             self.mcts.update_with_move(move)
+            self._update_clock(time.time() - start)
             return move
         # No 'sensible' moves available, so do pass move
         return go.PASS
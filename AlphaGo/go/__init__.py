@@ -1,4 +1,6 @@
 from .game_state import GameState, IllegalMove
+from .array_state import ArrayGameState
+from .game_state_batch import GameStateBatch
 
 # Expose constants to python (copied from AlphaGo/go/constants.pxd)
 PASS = None
@@ -6,4 +8,5 @@ EMPTY = 2
 WHITE = 3
 BLACK = 4
 
-__all__ = ['GameState', 'IllegalMove', 'PASS', 'BLACK', 'WHITE', 'EMPTY']
+__all__ = ['GameState', 'ArrayGameState', 'GameStateBatch', 'IllegalMove',
+           'PASS', 'BLACK', 'WHITE', 'EMPTY']
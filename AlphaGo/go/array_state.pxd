@@ -0,0 +1,302 @@
+from AlphaGo.go.constants cimport stone_t, action_t
+from AlphaGo.go.coordinates cimport calculate_board_location, calculate_tuple_location, \
+    get_neighbors, get_3x3_neighbors
+from AlphaGo.go.zobrist cimport get_zobrist_lookup, update_hash_by_location
+from libc.stdint cimport uint64_t
+from libcpp cimport bool
+from libcpp.vector cimport vector
+from libcpp.unordered_set cimport unordered_set as cpp_set
+import numpy as np
+cimport numpy as np
+
+
+############################################################################
+#   Typedefs                                                               #
+#                                                                          #
+############################################################################
+
+ctypedef short location_t
+ctypedef unsigned long long zobrist_hash_t
+ctypedef vector[location_t] pattern_t  # lookup of neighbor coordinates (or border)
+ctypedef uint64_t bitset_word_t  # one word of a liberty bitset
+
+
+# The array of an ArrayBoard that an ArrayUndoEntry belongs to
+cdef enum board_field_t:
+    PARENT = 0
+    NEXT_STONE = 1
+    GROUP_SIZE = 2
+    LIBERTIES = 3
+
+
+############################################################################
+#   Board definition                                                       #
+#                                                                          #
+############################################################################
+
+"""All position-dependent values of an ArrayGameState. Everything is stored in flat arrays of plain
+   values indexed by board location, so copying a board (for ArrayGameState.copy()) amounts to a
+   handful of memcpys.
+
+   Groups are stored as a union-find forest: parent[loc] points towards the root stone of the group
+   at loc, and a location is the root of its group if parent[loc] == loc. The stones of a group
+   form a circular linked list through next_stone. The size and the liberties of a group are only
+   valid at its root; liberties are a bitset of words_per_set words per location.
+"""
+cdef cppclass ArrayBoard:
+    # Color of each location. Length is board size + 1 to include border
+    vector[char] color
+
+    # Union-find parent, circular list of stones and group size
+    vector[location_t] parent
+    vector[location_t] next_stone
+    vector[short] group_size
+
+    # Liberty bitset of each group root
+    vector[bitset_word_t] liberties
+
+    # List with legal moves, sorted by location
+    vector[location_t] legal_moves
+
+    location_t ko
+    stone_t current_player, opponent_player
+    short capture_black, capture_white
+    short passes_black, passes_white
+    zobrist_hash_t zobrist_current
+
+
+"""The value of one entry of the parent, next_stone, group_size or liberties array of an
+   ArrayBoard before it was overwritten. For liberties, index is a word of the bitset array.
+"""
+cdef cppclass ArrayUndoEntry:
+    board_field_t field
+    int index
+    bitset_word_t value
+
+
+"""Everything needed to undo a single push_location(), i.e. the values of the state before the move.
+
+   The colors to restore are those of the new stone and of the captured stones. Every entry of the
+   group arrays that is overwritten while the record is on top of the undo stack, by the move itself
+   or by path compression in find_root(), is saved in entries; restoring them in reverse order
+   restores the union-find forest, stone lists, group sizes and liberties exactly.
+"""
+cdef cppclass ArrayUndoRecord:
+    location_t move
+    stone_t player
+    location_t ko
+    short capture_black, capture_white
+    short passes_black, passes_white
+    zobrist_hash_t zobrist_hash
+    bool new_hash
+    bool prepare_next
+    vector[location_t] captured
+    vector[ArrayUndoEntry] entries
+
+
+############################################################################
+#   Class definition                                                       #
+#                                                                          #
+############################################################################
+
+cdef class ArrayGameState:
+
+    # Dimensions of one side of the board and total number of squares, respectively
+    cdef short size, board_size
+
+    # Number of 64-bit words in the liberty bitset of one group
+    cdef short words_per_set
+
+    # Stones, groups and everything else that changes with each move
+    cdef ArrayBoard board
+
+    # List with move history
+    cdef vector[location_t] moves_history
+
+    # Number of handicap stones placed by BLACK at the start of the game
+    cdef short num_handicap
+
+    # Stack of undo records, one for each call to push_location() that has not been popped yet
+    cdef vector[ArrayUndoRecord] undo_stack
+
+    # Neighbors lookup tables. Pointers are to a single global instance of each variable shared by
+    # all instances of ArrayGameState.
+    cdef pattern_t* ptr_neighbor
+    cdef pattern_t* ptr_neighbor3x3
+
+    # Zobrist hashing
+    cdef vector[zobrist_hash_t]* ptr_zobrist_lookup
+
+    cdef bool enforce_superko
+    cdef cpp_set[zobrist_hash_t] previous_hashes
+
+    ############################################################################
+    #   init functions                                                         #
+    #                                                                          #
+    ############################################################################
+
+    cdef void initialize_new(self, short size, bool enforce_superko)
+    """Initialize this state as empty state
+    """
+
+    cdef void initialize_duplicate(self, ArrayGameState copy_state)
+    """Initialize all variables as a copy of copy_state
+    """
+
+    ############################################################################
+    #   private cdef functions for managing groups                             #
+    #                                                                          #
+    ############################################################################
+
+    cdef void record_entry(self, board_field_t field, int index, bitset_word_t value)
+    """Save the old value of a group array entry in the undo record on top of the undo stack (if
+       any), before the entry is overwritten
+    """
+
+    cdef location_t find_root(self, location_t location)
+    """Find the root stone of the group at location, compressing the path on the way
+    """
+
+    cdef short count_liberty(self, location_t root)
+    """Count liberties of the group with the given root
+    """
+
+    cdef void set_liberty(self, location_t root, location_t location)
+    """Add location to the liberties of the group with the given root
+    """
+
+    cdef void clear_liberty(self, location_t root, location_t location)
+    """Remove location from the liberties of the group with the given root
+    """
+
+    cdef location_t merge_groups(self, location_t root_a, location_t root_b)
+    """Merge the two (different) groups with the given roots. Returns the root of the result.
+    """
+
+    cdef void remove_group(self, location_t root)
+    """Remove the group with the given root from the board, adding its stones as liberties to the
+       neighboring groups.
+    """
+
+    ############################################################################
+    #   private cdef functions used for game-play                              #
+    #                                                                          #
+    ############################################################################
+
+    cdef bool is_positional_superko(self, location_t location)
+    """Check whether the current player playing at 'location' would repeat a previous position
+    """
+
+    cpdef bool is_legal_move(self, location_t location)
+    """Check if playing at location is a legal move
+    """
+
+    cdef bool has_liberty_after(self, location_t location, stone_t player)
+    """Check if a play at location by player results in an alive group
+    """
+
+    cdef void update_legal_moves(self)
+    """Re-check legality of all locations and update legal_moves list
+    """
+
+    cdef void swap_players(self)
+    """Switch current_player and opponent_player
+    """
+
+    cpdef void set_current_player(self, stone_t color)
+    """Set current player to the given color.
+    """
+
+    cdef bool is_eyeish(self, location_t location, stone_t owner)
+    """Check if a location is 'eyeish'; that is, check that all 4 neighbors are either border
+       or the same color.
+    """
+
+    cdef bool is_true_eye(self, location_t location, stone_t owner, vector[location_t] &stack)
+    """Check if location is a 'real' eye; this goes beyond checking if a location is 'eyeish' by
+       checking that corners have the same owner or (recursively) are themselves eyes.
+    """
+
+    cdef vector[location_t] get_sensible_moves(self)
+    """'Sensible' moves are all legal moves that are not eyes of the current player.
+    """
+
+    ############################################################################
+    #   public cdef functions used for game play                               #
+    #                                                                          #
+    ############################################################################
+
+    cdef location_t add_stone(self, location_t location)
+    """Play stone on location and update the state. MOVE MUST BE LEGAL. Returns new ko location,
+       or -1 if there is none.
+    """
+
+    cdef void push_location(self, location_t location, bool prepare_next=*)
+    """Play stone on location (or pass) for the current player and record an undo record on the
+       undo stack. MOVE MUST BE LEGAL. If prepare_next is False, only the stone is added; history,
+       current player and legal moves are not updated.
+    """
+
+    cdef void pop_location(self)
+    """Undo the most recent push_location(). The undo stack must not be empty.
+    """
+
+    cpdef ArrayTemporaryMove try_stone(self, location_t location, bool prepare_next=*)
+    """Analogous to add_stone() for use in a with-statement. Automatically undoes the given move
+       when the with-statement exits.
+    """
+
+    cpdef list get_legal_moves(self, bool include_eyes=*)
+    """Return a list with all legal moves (in/excluding eyes)
+    """
+
+    cpdef np.ndarray get_legal_mask(self, bool include_eyes=*)
+    """Return a uint8 array of length board_size that is 1 at all legal moves (in/excluding eyes)
+    """
+
+    cpdef np.ndarray get_legal_indices(self, bool include_eyes=*)
+    """Return an int16 array with the flat index of all legal moves (in/excluding eyes)
+    """
+
+    cpdef float get_score(self, float komi=*)
+    """Calculate score of board state. Uses 'Area scoring'.
+
+       negative value indicates black win
+       positive value indicates white win
+    """
+
+    cpdef stone_t get_winner_color(self, float komi=*)
+    """Calculate score of board state and return winning player (WHITE or BLACK). Uses 'Area
+       scoring'. Tie goes to WHITE.
+    """
+
+    cpdef void do_move(self, tuple action, stone_t color=*)
+    """Play stone at action=(x,y). Use action=_PASS (-1) to pass. Checks move legality first.
+    """
+
+    cpdef void place_handicap_stone(self, tuple action, stone_t color=*)
+    """Add handicap stones given by a list of tuples in list handicap
+    """
+
+    cpdef void place_handicaps(self, list handicap)
+    """Place list of handicap stones for BLACK (must be on empty board)
+    """
+
+    cpdef bool sanity_check_groups(self)
+    """Debugging helper: checks that the union-find forest, stone lists and liberty bitsets are
+       consistent with the stones on the board.
+    """
+
+
+cdef class ArrayTemporaryMove:
+    """Helper-class for ArrayGameState.try_stone(), see TemporaryMove
+    """
+
+    # Reference to the ArrayGameState being modified
+    cdef ArrayGameState state
+
+    # Where the stone is played
+    cdef location_t move
+
+    # Whether to update history and switch to the next player (see TemporaryMove)
+    cdef bool prepare_next
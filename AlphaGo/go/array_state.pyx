@@ -0,0 +1,1054 @@
+# cython: wraparound=False
+# cython: boundscheck=False
+# cython: initializedcheck=False
+# cython: nonecheck=False
+from cython.operator cimport dereference as d
+from AlphaGo.go.game_state import IllegalMove
+import numpy as np
+cimport numpy as np
+
+
+cdef extern from *:
+    int popcount "__builtin_popcountll" (unsigned long long x) nogil
+
+
+############################################################################
+#   Global variables shared by instances of ArrayGameState                 #
+#                                                                          #
+############################################################################
+
+# Global arrays (lookup tables) for neighbor indices
+cdef pattern_t neighbor
+cdef pattern_t neighbor3x3
+cdef short neighbor_size
+
+# Global array for zobrist lookup
+cdef vector[zobrist_hash_t] zobrist_lookup
+
+
+############################################################################
+#   Class definition                                                       #
+#                                                                          #
+############################################################################
+
+
+cdef class ArrayGameState:
+    """Alternative to GameState that stores groups in flat arrays instead of Group objects: a
+       union-find forest of stones, a circular list of the stones of each group and a liberty
+       bitset per group. Copying a state is a copy of these arrays; undoing a move restores only
+       the entries that the move changed.
+
+       The python interface is the same as that of GameState, but the features in preprocessing
+       require a GameState.
+    """
+
+    ############################################################################
+    #   init functions                                                         #
+    #                                                                          #
+    ############################################################################
+
+    cdef void initialize_new(self, short size, bool enforce_superko):
+        """Initialize as a new state.
+        """
+
+        cdef short i
+
+        # Initialize size and board_size
+        self.size = size
+        self.board_size = size * size
+        self.words_per_set = (self.board_size + 63) // 64
+
+        # Create empty history list
+        self.moves_history = vector[location_t]()
+
+        # Initialize player colors
+        self.board.current_player = stone_t.BLACK
+        self.board.opponent_player = stone_t.WHITE
+
+        self.board.ko = -1
+        self.board.capture_black, self.board.capture_white = 0, 0
+        self.board.passes_black, self.board.passes_white = 0, 0
+        self.num_handicap = 0
+
+        # Border location is included, therefore the color array size is board_size + 1
+        self.board.color = vector[char](self.board_size + 1, stone_t.EMPTY)
+        self.board.color[self.board_size] = stone_t.BORDER
+
+        self.board.parent = vector[location_t](self.board_size)
+        self.board.next_stone = vector[location_t](self.board_size)
+        self.board.group_size = vector[short](self.board_size, 0)
+        self.board.liberties = vector[bitset_word_t](self.board_size * self.words_per_set, 0)
+
+        # Create list of legal moves (initially everything is legal).
+        self.board.legal_moves = vector[location_t](self.board_size)
+        for i in range(self.board_size):
+            self.board.parent[i] = i
+            self.board.next_stone[i] = i
+            self.board.legal_moves[i] = i
+
+        # Initialize zobrist hashing things.
+        self.previous_hashes = cpp_set[zobrist_hash_t]()
+        self.board.zobrist_current = 0
+        self.enforce_superko = enforce_superko
+
+    cdef void initialize_duplicate(self, ArrayGameState copy_state):
+        """Initialize all variables as a copy of copy_state
+        """
+
+        self.size = copy_state.size
+        self.board_size = copy_state.board_size
+        self.words_per_set = copy_state.words_per_set
+        self.num_handicap = copy_state.num_handicap
+        self.enforce_superko = copy_state.enforce_superko
+
+        # All board arrays are plain values, so default C++ copying rules suffice.
+        self.board = copy_state.board
+        self.moves_history = copy_state.moves_history
+        self.previous_hashes = copy_state.previous_hashes
+
+    def __init__(self, char size=19, ArrayGameState copy=None, enforce_superko=True):
+        """Create new instance of ArrayGameState. If copy is supplied, creates a deep copy of
+           another state. Otherwise, creates an empty state.
+        """
+        global neighbor, neighbor3x3, zobrist_lookup, neighbor_size
+
+        if copy is not None:
+            size = copy.size
+
+        # Check if this is the first ArrayGameState object (of this size) and initialize globals.
+        if neighbor_size == 0 or neighbor_size != size:
+            neighbor = get_neighbors(size)
+            neighbor3x3 = get_3x3_neighbors(size)
+            zobrist_lookup = get_zobrist_lookup(size)
+            neighbor_size = size
+
+        # Regardless of 'new' or 'duplicate', set pointers to global lookup tables.
+        self.ptr_neighbor = &neighbor
+        self.ptr_neighbor3x3 = &neighbor3x3
+        self.ptr_zobrist_lookup = &zobrist_lookup
+
+        if copy is None:
+            self.initialize_new(size, enforce_superko)
+        else:
+            self.initialize_duplicate(copy)
+
+    ############################################################################
+    #   private cdef functions for managing groups                             #
+    #                                                                          #
+    ############################################################################
+
+    cdef void record_entry(self, board_field_t field, int index, bitset_word_t value):
+        """Save the old value of a group array entry in the undo record on top of the undo stack (if
+           any), before the entry is overwritten
+        """
+
+        cdef ArrayUndoEntry entry
+
+        if self.undo_stack.empty():
+            return
+
+        entry.field = field
+        entry.index = index
+        entry.value = value
+        self.undo_stack.back().entries.push_back(entry)
+
+    cdef location_t find_root(self, location_t location):
+        """Find the root stone of the group at location. Every visited stone is pointed to its
+           grandparent (path halving), which keeps trees shallow without recursion.
+        """
+
+        while self.board.parent[location] != location:
+            self.record_entry(board_field_t.PARENT, location, self.board.parent[location])
+            self.board.parent[location] = self.board.parent[self.board.parent[location]]
+            location = self.board.parent[location]
+        return location
+
+    cdef short count_liberty(self, location_t root):
+        """Count liberties of the group with the given root
+        """
+
+        cdef int i
+        cdef short count = 0
+        cdef bitset_word_t* words = &self.board.liberties[root * self.words_per_set]
+
+        for i in range(self.words_per_set):
+            count += popcount(words[i])
+        return count
+
+    cdef void set_liberty(self, location_t root, location_t location):
+        """Add location to the liberties of the group with the given root
+        """
+
+        cdef int index = root * self.words_per_set + (location >> 6)
+
+        self.record_entry(board_field_t.LIBERTIES, index, self.board.liberties[index])
+        self.board.liberties[index] |= \
+            (<bitset_word_t> 1) << (location & 63)
+
+    cdef void clear_liberty(self, location_t root, location_t location):
+        """Remove location from the liberties of the group with the given root
+        """
+
+        cdef int index = root * self.words_per_set + (location >> 6)
+
+        self.record_entry(board_field_t.LIBERTIES, index, self.board.liberties[index])
+        self.board.liberties[index] &= \
+            ~((<bitset_word_t> 1) << (location & 63))
+
+    cdef location_t merge_groups(self, location_t root_a, location_t root_b):
+        """Merge the two (different) groups with the given roots. The smaller group is attached
+           below the root of the larger one. Returns the root of the result.
+        """
+
+        cdef int i
+        cdef location_t swap
+
+        if self.board.group_size[root_a] < self.board.group_size[root_b]:
+            root_a, root_b = root_b, root_a
+
+        self.record_entry(board_field_t.PARENT, root_b, self.board.parent[root_b])
+        self.record_entry(board_field_t.GROUP_SIZE, root_a, self.board.group_size[root_a])
+        self.board.parent[root_b] = root_a
+        self.board.group_size[root_a] += self.board.group_size[root_b]
+
+        # Union of liberties.
+        for i in range(self.words_per_set):
+            self.record_entry(board_field_t.LIBERTIES, root_a * self.words_per_set + i,
+                              self.board.liberties[root_a * self.words_per_set + i])
+            self.board.liberties[root_a * self.words_per_set + i] |= \
+                self.board.liberties[root_b * self.words_per_set + i]
+
+        # Swapping the successors of two stones in different circular lists joins the lists.
+        self.record_entry(board_field_t.NEXT_STONE, root_a, self.board.next_stone[root_a])
+        self.record_entry(board_field_t.NEXT_STONE, root_b, self.board.next_stone[root_b])
+        swap = self.board.next_stone[root_a]
+        self.board.next_stone[root_a] = self.board.next_stone[root_b]
+        self.board.next_stone[root_b] = swap
+
+        return root_a
+
+    cdef void remove_group(self, location_t root):
+        """Remove the group with the given root from the board, adding its stones as liberties to
+           the neighboring groups.
+        """
+
+        cdef location_t loc = root, neighbor_loc
+        cdef stone_t color = <stone_t> self.board.color[root]
+        cdef int i
+
+        # First pass: clear stones and remove them from the hash. Stones are saved in the undo
+        # record (if any) to be put back by pop_location().
+        while True:
+            if not self.undo_stack.empty():
+                self.undo_stack.back().captured.push_back(loc)
+            self.board.color[loc] = stone_t.EMPTY
+            self.board.zobrist_current = update_hash_by_location(self.board.zobrist_current,
+                                                                 d(self.ptr_zobrist_lookup),
+                                                                 loc, color)
+            loc = self.board.next_stone[loc]
+            if loc == root:
+                break
+
+        # Second pass: add new liberties to neighboring groups now that stones have been cleared.
+        while True:
+            for i in range(4):
+                neighbor_loc = d(self.ptr_neighbor)[loc * 4 + i]
+                if self.board.color[neighbor_loc] > stone_t.EMPTY:
+                    self.set_liberty(self.find_root(neighbor_loc), loc)
+            loc = self.board.next_stone[loc]
+            if loc == root:
+                break
+
+    ############################################################################
+    #   private cdef functions used for game-play                              #
+    #                                                                          #
+    ############################################################################
+
+    cdef bool is_positional_superko(self, location_t location):
+        """Check whether the current player playing at 'location' would result in a state identical
+           to a previously seen state. Move must otherwise be legal.
+        """
+
+        cdef int i, j
+        cdef location_t neighbor_loc, root, loc
+        cdef location_t roots[4]
+        cdef stone_t opponent = self.board.opponent_player
+
+        # Add the new stone to the current hash.
+        cdef zobrist_hash_t hash_after = \
+            update_hash_by_location(self.board.zobrist_current, d(self.ptr_zobrist_lookup),
+                                    location, self.board.current_player)
+
+        # Remove each opponent group that would be captured.
+        for i in range(4):
+            roots[i] = -1
+            neighbor_loc = d(self.ptr_neighbor)[location * 4 + i]
+            if self.board.color[neighbor_loc] != opponent:
+                continue
+
+            root = self.find_root(neighbor_loc)
+            if self.count_liberty(root) != 1:
+                continue
+
+            # Skip groups that were already removed through another neighbor.
+            for j in range(i):
+                if roots[j] == root:
+                    break
+            else:
+                roots[i] = root
+                loc = root
+                while True:
+                    hash_after = update_hash_by_location(hash_after, d(self.ptr_zobrist_lookup),
+                                                         loc, opponent)
+                    loc = self.board.next_stone[loc]
+                    if loc == root:
+                        break
+
+        return self.previous_hashes.count(hash_after) > 0
+
+    cpdef bool is_legal_move(self, location_t location):
+        """Check if playing at location is a legal move
+        """
+
+        # Passing is always legal
+        if location == action_t.PASS:
+            return True
+
+        # Check that location is on the board
+        if location < 0 or location >= self.board_size:
+            return False
+
+        # Check if it is empty
+        if self.board.color[location] != stone_t.EMPTY:
+            return False
+
+        # Check ko (1 move back only)
+        if location == self.board.ko:
+            return False
+
+        # Check if move is suicide
+        if not self.has_liberty_after(location, self.board.current_player):
+            return False
+
+        # (Maybe) check superko state
+        if self.enforce_superko and self.is_positional_superko(location):
+            return False
+
+        return True
+
+    cdef bool has_liberty_after(self, location_t location, stone_t player):
+        """Check if a play at location by player results in an alive group. This is true if
+           - there is already a liberty next to this location, or
+           - connects to group with >= 2 liberties, or
+           - captures an enemy group
+        """
+
+        cdef int i
+        cdef stone_t board_value
+        cdef short count_liberty
+        cdef location_t neighbor_loc
+
+        for i in range(4):
+            neighbor_loc = d(self.ptr_neighbor)[location * 4 + i]
+            board_value = <stone_t> self.board.color[neighbor_loc]
+
+            if board_value == stone_t.EMPTY:
+                return True
+
+            if board_value > stone_t.EMPTY:
+                count_liberty = self.count_liberty(self.find_root(neighbor_loc))
+
+                if board_value == player and count_liberty >= 2:
+                    return True
+                elif board_value != player and count_liberty == 1:
+                    return True
+
+        return False
+
+    cdef void update_legal_moves(self):
+        """Re-check legality of all locations and update legal_moves list
+        """
+
+        cdef location_t loc
+
+        self.board.legal_moves.clear()
+        for loc in range(self.board_size):
+            if self.is_legal_move(loc):
+                self.board.legal_moves.push_back(loc)
+
+    cdef void swap_players(self):
+        """Switch current_player and opponent_player
+        """
+
+        cdef stone_t swap = self.board.current_player
+        self.board.current_player = self.board.opponent_player
+        self.board.opponent_player = swap
+
+    cpdef void set_current_player(self, stone_t color):
+        """Set current player to the given color.
+        """
+        if color <= stone_t.EMPTY:
+            raise ValueError("Player color must be BLACK or WHITE")
+        elif color != self.board.current_player:
+            self.swap_players()
+            self.board.ko = -1
+            self.update_legal_moves()
+
+    cdef bool is_eyeish(self, location_t location, stone_t owner):
+        """Check if a location is 'eyeish'; that is, check that all 4 neighbors are either border
+           or the same color.
+        """
+
+        cdef int i
+        cdef stone_t board_value
+
+        if self.board.color[location] != stone_t.EMPTY:
+            return False
+
+        for i in range(4):
+            board_value = <stone_t> self.board.color[d(self.ptr_neighbor)[4 * location + i]]
+            if not (board_value == stone_t.BORDER or board_value == owner):
+                return False
+        return True
+
+    cdef bool is_true_eye(self, location_t location, stone_t owner, vector[location_t] &stack):
+        """Check if location is a 'real' eye; this goes beyond checking if a location is 'eyeish' by
+           checking that corners have the same owner or are themselves eyes, recursively. 'stack'
+           holds the locations already being checked further up the recursion.
+        """
+
+        cdef int i
+        cdef stone_t board_value
+        cdef short max_bad_diagonal, count_bad_diagonal = 0
+        cdef location_t neighbor_loc, loc
+        cdef bool in_stack
+
+        if not self.is_eyeish(location, owner):
+            return False
+
+        # If there is any adjacent border, max 'bad' diagonals is 0, otherwise it is 1.
+        for i in range(4):
+            neighbor_loc = d(self.ptr_neighbor3x3)[location * 8 + i]
+            if self.board.color[neighbor_loc] == stone_t.BORDER:
+                max_bad_diagonal = 0
+                break
+        else:
+            max_bad_diagonal = 1
+
+        # Check diagonal neighbors; they are 'bad' if occupied by an opponent or if empty and not
+        # itself an eye (checked recursively)
+        for i in range(4, 8):
+            neighbor_loc = d(self.ptr_neighbor3x3)[location * 8 + i]
+            board_value = <stone_t> self.board.color[neighbor_loc]
+
+            if board_value > stone_t.EMPTY and board_value != owner:
+                count_bad_diagonal += 1
+
+            elif board_value == stone_t.EMPTY:
+                in_stack = False
+                for loc in stack:
+                    if loc == neighbor_loc:
+                        in_stack = True
+                        break
+
+                if not in_stack:
+                    stack.push_back(location)
+                    if not self.is_true_eye(neighbor_loc, owner, stack):
+                        count_bad_diagonal += 1
+                    stack.pop_back()
+
+            if count_bad_diagonal > max_bad_diagonal:
+                return False
+
+        return True
+
+    cdef vector[location_t] get_sensible_moves(self):
+        """'Sensible' moves are all legal moves that are not eyes of the current player.
+        """
+
+        cdef location_t loc
+        cdef vector[location_t] sensible_moves = vector[location_t]()
+        cdef vector[location_t] eyes = vector[location_t]()
+
+        for loc in self.board.legal_moves:
+            if self.is_true_eye(loc, self.board.current_player, eyes):
+                eyes.push_back(loc)
+            else:
+                sensible_moves.push_back(loc)
+
+        return sensible_moves
+
+    ############################################################################
+    #   public cdef functions used for game play                               #
+    #                                                                          #
+    ############################################################################
+
+    cdef location_t add_stone(self, location_t location):
+        """Play stone on location and update the state. MOVE MUST BE LEGAL. Returns new ko location,
+           or -1 if there is none.
+        """
+
+        cdef stone_t player = self.board.current_player
+        cdef stone_t opponent = self.board.opponent_player
+        cdef location_t root = location, neighbor_loc, neighbor_root, captured_loc = -1
+        cdef short count_captured = 0
+        cdef stone_t neighbor_value
+        cdef int i
+
+        # Start new group for this stone.
+        self.record_entry(board_field_t.PARENT, location, self.board.parent[location])
+        self.record_entry(board_field_t.NEXT_STONE, location, self.board.next_stone[location])
+        self.record_entry(board_field_t.GROUP_SIZE, location, self.board.group_size[location])
+        self.board.color[location] = player
+        self.board.parent[location] = location
+        self.board.next_stone[location] = location
+        self.board.group_size[location] = 1
+        for i in range(self.words_per_set):
+            self.record_entry(board_field_t.LIBERTIES, location * self.words_per_set + i,
+                              self.board.liberties[location * self.words_per_set + i])
+            self.board.liberties[location * self.words_per_set + i] = 0
+
+        self.board.zobrist_current = update_hash_by_location(self.board.zobrist_current,
+                                                             d(self.ptr_zobrist_lookup),
+                                                             location, player)
+
+        # Check neighbors: merge friendly groups and (maybe) capture opponents
+        for i in range(4):
+            neighbor_loc = d(self.ptr_neighbor)[location * 4 + i]
+            neighbor_value = <stone_t> self.board.color[neighbor_loc]
+
+            if neighbor_value == stone_t.EMPTY:
+                self.set_liberty(root, neighbor_loc)
+
+            elif neighbor_value == player:
+                neighbor_root = self.find_root(neighbor_loc)
+                if neighbor_root != root:
+                    self.clear_liberty(neighbor_root, location)
+                    root = self.merge_groups(root, neighbor_root)
+
+            elif neighbor_value == opponent:
+                neighbor_root = self.find_root(neighbor_loc)
+                self.clear_liberty(neighbor_root, location)
+
+                # Capture opponent if this stone covered opponent's last liberty.
+                if self.count_liberty(neighbor_root) == 0:
+                    count_captured += self.board.group_size[neighbor_root]
+                    captured_loc = neighbor_root
+                    self.remove_group(neighbor_root)
+
+        # Count captured stones
+        if player == stone_t.BLACK:
+            self.board.capture_white += count_captured
+        else:
+            self.board.capture_black += count_captured
+
+        self.previous_hashes.insert(self.board.zobrist_current)
+
+        # Ko occurs when both captured group and newly created group are size 1.
+        if count_captured == 1 and self.board.group_size[root] == 1:
+            return captured_loc
+        return -1
+
+    cdef void push_location(self, location_t location, bool prepare_next=True):
+        """Play stone on location (or pass) for the current player and record an undo record on the
+           undo stack. MOVE MUST BE LEGAL. If prepare_next is False, only the stone is added;
+           history, current player and legal moves are not updated.
+        """
+
+        cdef size_t count_hashes = self.previous_hashes.size()
+
+        # Record the values of the board before the move in a new (default-constructed) record on
+        # top of the undo stack. Captured stones and group array entries are added while playing.
+        self.undo_stack.resize(self.undo_stack.size() + 1)
+        cdef ArrayUndoRecord* record = &self.undo_stack.back()
+        record.move = location
+        record.player = self.board.current_player
+        record.ko = self.board.ko
+        record.capture_black = self.board.capture_black
+        record.capture_white = self.board.capture_white
+        record.passes_black = self.board.passes_black
+        record.passes_white = self.board.passes_white
+        record.zobrist_hash = self.board.zobrist_current
+        record.prepare_next = prepare_next
+
+        if location == action_t.PASS:
+            if self.board.current_player == stone_t.BLACK:
+                self.board.passes_black += 1
+            else:
+                self.board.passes_white += 1
+            self.board.ko = -1
+        elif prepare_next:
+            self.board.ko = self.add_stone(location)
+        else:
+            self.add_stone(location)
+
+        # Only remove the new hash when undoing if it was not seen before.
+        record.new_hash = self.previous_hashes.size() > count_hashes
+
+        if prepare_next:
+            self.moves_history.push_back(location)
+            self.swap_players()
+            self.update_legal_moves()
+
+    cdef void pop_location(self):
+        """Undo the most recent push_location(). The undo stack must not be empty.
+        """
+
+        cdef ArrayUndoRecord* record = &self.undo_stack.back()
+        cdef ArrayUndoEntry* entry
+        cdef stone_t opponent = stone_t.WHITE if record.player == stone_t.BLACK else stone_t.BLACK
+        cdef bool prepare_next = record.prepare_next
+        cdef location_t loc
+
+        if record.new_hash:
+            self.previous_hashes.erase(self.board.zobrist_current)
+
+        # Take the new stone off the board and put back the captured stones.
+        if record.move != action_t.PASS:
+            self.board.color[record.move] = stone_t.EMPTY
+        for loc in record.captured:
+            self.board.color[loc] = opponent
+
+        # Restore overwritten group array entries, most recent first.
+        while not record.entries.empty():
+            entry = &record.entries.back()
+            if entry.field == board_field_t.PARENT:
+                self.board.parent[entry.index] = <location_t> entry.value
+            elif entry.field == board_field_t.NEXT_STONE:
+                self.board.next_stone[entry.index] = <location_t> entry.value
+            elif entry.field == board_field_t.GROUP_SIZE:
+                self.board.group_size[entry.index] = <short> entry.value
+            else:
+                self.board.liberties[entry.index] = entry.value
+            record.entries.pop_back()
+
+        # Restore all simple values.
+        self.board.ko = record.ko
+        self.board.capture_black = record.capture_black
+        self.board.capture_white = record.capture_white
+        self.board.passes_black = record.passes_black
+        self.board.passes_white = record.passes_white
+        self.board.zobrist_current = record.zobrist_hash
+        self.undo_stack.pop_back()
+
+        if prepare_next:
+            # Remove move from history, switch back to the other player and re-check legal moves.
+            # Path compression while re-checking is saved in the next record on the undo stack.
+            self.moves_history.pop_back()
+            self.swap_players()
+            self.update_legal_moves()
+
+    cpdef ArrayTemporaryMove try_stone(self, location_t location, bool prepare_next=True):
+        """Analogous to add_stone() for use in a with-statement. Automatically undoes the given move
+           when the with-statement exits.
+        """
+
+        return ArrayTemporaryMove(self, location, prepare_next)
+
+    cpdef list get_legal_moves(self, bool include_eyes=True):
+        """Return a list with all legal moves as tuples (in/excluding eyes)
+        """
+
+        cdef list moves
+
+        if include_eyes:
+            moves = list(self.board.legal_moves)
+        else:
+            moves = list(self.get_sensible_moves())
+
+        return [calculate_tuple_location(m, self.size) for m in moves]
+
+    cpdef np.ndarray get_legal_mask(self, bool include_eyes=True):
+        """Return a uint8 array of length board_size that is 1 at all legal moves (in/excluding
+           eyes) and 0 elsewhere. Move (x, y) is at index x * size + y, as in flatten_idx.
+        """
+
+        cdef location_t location
+        cdef vector[location_t] moves
+        cdef np.ndarray[np.uint8_t, ndim=1] mask = np.zeros(self.board_size, dtype=np.uint8)
+
+        if include_eyes:
+            moves = self.board.legal_moves
+        else:
+            moves = self.get_sensible_moves()
+
+        for location in moves:
+            mask[location] = 1
+
+        return mask
+
+    cpdef np.ndarray get_legal_indices(self, bool include_eyes=True):
+        """Return an int16 array with the flat index (x * size + y, as in flatten_idx) of all legal
+           moves (in/excluding eyes), in increasing order.
+        """
+
+        cdef int i
+        cdef vector[location_t] moves
+        cdef np.ndarray[np.int16_t, ndim=1] indices
+
+        if include_eyes:
+            moves = self.board.legal_moves
+        else:
+            moves = self.get_sensible_moves()
+
+        indices = np.empty(moves.size(), dtype=np.int16)
+        for i in range(moves.size()):
+            indices[i] = moves[i]
+
+        return indices
+
+    cpdef float get_score(self, float komi=7.5):
+        """Calculate score of board state. Uses 'Area scoring'.
+
+           http://senseis.xmp.net/?Passing#1
+
+           Negative value indicates black win, positive value indicates white win.
+        """
+
+        cdef location_t location
+        cdef stone_t board_value
+        cdef float score = -komi
+
+        # Keep track of all eyes for both black and white to make search faster.
+        cdef vector[location_t] eyes_white = vector[location_t]()
+        cdef vector[location_t] eyes_black = vector[location_t]()
+
+        for location in range(self.board_size):
+            board_value = <stone_t> self.board.color[location]
+
+            if board_value == stone_t.WHITE:
+                score -= 1
+
+            elif board_value == stone_t.BLACK:
+                score += 1
+
+            # If empty, count as territory only if it is an eye
+            else:
+                if self.is_true_eye(location, stone_t.BLACK, eyes_black):
+                    eyes_black.push_back(location)
+                    score += 1
+
+                elif self.is_true_eye(location, stone_t.WHITE, eyes_white):
+                    eyes_white.push_back(location)
+                    score -= 1
+
+        # substract passes
+        score -= self.board.passes_black
+        score += self.board.passes_white
+
+        return score
+
+    cpdef stone_t get_winner_color(self, float komi=7.5):
+        """Calculate score of board state and return winning player (WHITE or BLACK). Uses 'Area
+           scoring'. Tie goes to WHITE.
+        """
+
+        if self.get_score(komi) > 0:
+            return stone_t.BLACK
+        else:
+            return stone_t.WHITE
+
+    cpdef void do_move(self, tuple action, stone_t color=stone_t.EMPTY):
+        """Play stone at action=(x,y). Use action=None for passing. Checks move legality first.
+
+           If it is a legal move, current_player switches to the opposite color. If not, an
+           IllegalMove exception is raised
+        """
+
+        cdef location_t x, y, location
+
+        if action is None:
+            location = action_t.PASS
+
+            if self.board.current_player == stone_t.BLACK:
+                self.board.passes_black += 1
+            else:
+                self.board.passes_white += 1
+
+            # Reset ko since players switched.
+            self.board.ko = -1
+
+        else:
+            if color != stone_t.EMPTY and color != self.board.current_player:
+                self.swap_players()
+
+            (x, y) = action
+            location = calculate_board_location(y, x, self.size)
+
+            if not self.is_legal_move(location):
+                raise IllegalMove(str(action))
+
+            self.board.ko = self.add_stone(location)
+
+        self.moves_history.push_back(location)
+        self.swap_players()
+        self.update_legal_moves()
+
+    cpdef void place_handicap_stone(self, tuple action, stone_t color=stone_t.BLACK):
+        """Add handicap stones given by a list of tuples in list handicap
+        """
+
+        if self.moves_history.size() > self.num_handicap:
+            raise IllegalMove("Cannot place handicap on a started game")
+
+        self.num_handicap += 1
+        self.do_move(action, color)
+
+    cpdef void place_handicaps(self, list handicap):
+        """Place list of handicap stones for BLACK (must be on empty board)
+        """
+
+        for action in handicap:
+            self.place_handicap_stone(action, stone_t.BLACK)
+
+    cpdef bool sanity_check_groups(self):
+        """Debugging helper: checks that the union-find forest, stone lists and liberty bitsets are
+           consistent with the stones on the board.
+        """
+
+        cdef location_t loc, root, neighbor_loc, stone
+        cdef int i, count_stones
+        cdef set liberties
+
+        for loc in range(self.board_size):
+            if self.board.color[loc] <= stone_t.EMPTY:
+                continue
+            root = self.find_root(loc)
+
+            # Check 1: all neighbors of the same color are in the same group.
+            for i in range(4):
+                neighbor_loc = d(self.ptr_neighbor)[4 * loc + i]
+                if self.board.color[neighbor_loc] == self.board.color[loc] and \
+                        self.find_root(neighbor_loc) != root:
+                    print("neighbors of same color not in the same group!")
+                    return False
+
+            if root != loc:
+                continue
+
+            # Check 2: the stone list of each group visits exactly the stones with this root, and
+            # the group's size and liberties match the board.
+            count_stones = 0
+            liberties = set()
+            stone = root
+            while True:
+                if self.board.color[stone] != self.board.color[root] or \
+                        self.find_root(stone) != root:
+                    print("stone list contains a stone of another group!")
+                    return False
+                count_stones += 1
+                for i in range(4):
+                    neighbor_loc = d(self.ptr_neighbor)[4 * stone + i]
+                    if self.board.color[neighbor_loc] == stone_t.EMPTY:
+                        liberties.add(neighbor_loc)
+                stone = self.board.next_stone[stone]
+                if stone == root or count_stones > self.board_size:
+                    break
+
+            if count_stones != self.board.group_size[root]:
+                print("mismatch in stones count!")
+                return False
+
+            for stone in range(self.board_size):
+                if self.board.color[stone] > stone_t.EMPTY and self.find_root(stone) == root:
+                    count_stones -= 1
+            if count_stones != 0:
+                print("stone list does not contain all stones of the group!")
+                return False
+
+            for i in range(self.board_size):
+                if self.board.liberties[root * self.words_per_set + (i >> 6)] >> (i & 63) & 1:
+                    if i not in liberties:
+                        print("group has LIBERTY but board is not empty there!")
+                        return False
+            if self.count_liberty(root) != len(liberties):
+                print("mismatch in liberties count!")
+                return False
+
+        return True
+
+    ############################################################################
+    #   Python convenience functions, same as GameState                        #
+    #                                                                          #
+    ############################################################################
+
+    def is_end_of_game(self):
+        if self.moves_history.size() > 1:
+            if self.moves_history[self.moves_history.size() - 1] == action_t.PASS and \
+                    self.moves_history[self.moves_history.size() - 2] == action_t.PASS and \
+                    self.board.current_player == stone_t.WHITE:
+                return True
+        return False
+
+    def is_legal(self, action):
+        """Determine if the given action (x,y tuple) is a legal move
+        """
+
+        cdef char x, y
+        (x, y) = action
+
+        if x < 0 or y < 0 or x >= self.size or y >= self.size:
+            return False
+
+        return self.is_legal_move(calculate_board_location(y, x, self.size))
+
+    def push(self, action):
+        """Play stone at action=(x,y) for the current player, or pass if action is None, such that
+           it can be undone with pop(). Checks move legality first.
+        """
+
+        cdef char x, y
+        cdef location_t location
+
+        if action is None:
+            location = action_t.PASS
+        else:
+            (x, y) = action
+            location = calculate_board_location(y, x, self.size)
+
+            if not self.is_legal_move(location):
+                raise IllegalMove(str(action))
+
+        self.push_location(location)
+
+    def pop(self):
+        """Undo the most recent push() and return its action
+        """
+
+        cdef location_t location
+
+        if self.undo_stack.empty():
+            raise IndexError("pop from empty move stack")
+
+        location = self.undo_stack.back().move
+        self.pop_location()
+
+        if location == action_t.PASS:
+            return None
+        return calculate_tuple_location(location, self.size)
+
+    def get_undo_depth(self):
+        """Return the number of moves that can be undone with pop()
+        """
+
+        return self.undo_stack.size()
+
+    def copy(self):
+        """Get a copy of this state. Moves pushed on this state cannot be popped from the copy.
+        """
+
+        return ArrayGameState(copy=self)
+
+    def get_current_player(self):
+        """Returns the color of the player who will make the next move.
+        """
+
+        return self.board.current_player
+
+    def get_history(self):
+        """Return history as a list of tuples
+        """
+
+        return [calculate_tuple_location(loc, self.size) for loc in self.moves_history]
+
+    def get_captures_black(self):
+        """Return amount of black stones captures
+        """
+
+        return self.board.capture_black
+
+    def get_captures_white(self):
+        """Return amount of white stones captured
+        """
+
+        return self.board.capture_white
+
+    def get_ko_location(self):
+        """Return ko location as a tuple, or None
+        """
+
+        if self.board.ko == -1:
+            return None
+
+        return calculate_tuple_location(self.board.ko, self.size)
+
+    def is_board_equal(self, ArrayGameState state):
+        """Verify that self and state board layout are the same
+        """
+
+        return self.board.color == state.board.color
+
+    def is_liberty_equal(self, ArrayGameState state):
+        """Verify that self and state liberty counts are the same
+        """
+
+        return np.array_equal(self.get_liberty(), state.get_liberty())
+
+    def is_eye(self, action, color):
+        """Check if location action is a eye for player color
+        """
+
+        cdef vector[location_t] stack = vector[location_t]()
+
+        (x, y) = action
+        return self.is_true_eye(calculate_board_location(y, x, self.size), color, stack)
+
+    def get_liberty(self):
+        """Get numpy array with all liberty counts for all stones.
+        """
+
+        liberty = np.zeros((self.size, self.size), dtype=np.int)
+
+        for x in range(self.size):
+            for y in range(self.size):
+                location = calculate_board_location(y, x, self.size)
+                if self.board.color[location] > stone_t.EMPTY:
+                    liberty[x, y] = self.count_liberty(self.find_root(location))
+
+        return liberty
+
+    def get_board(self):
+        """Get numpy array with board locations set to stone colors
+        """
+
+        board = np.zeros((self.size, self.size), dtype=np.int)
+
+        for x in range(self.size):
+            for y in range(self.size):
+                board[x, y] = self.board.color[calculate_board_location(y, x, self.size)]
+
+        return board
+
+    def get_hash(self):
+        return self.board.zobrist_current
+
+    def get_size(self):
+        """Return size
+        """
+
+        return self.size
+
+    def get_handicaps(self):
+        """Return list with handicap stones placed by BLACK at beginning of the game.
+        """
+
+        return self.moves_history[:self.num_handicap]
+
+
+cdef class ArrayTemporaryMove:
+    """Helper-class for ArrayGameState.try_stone(). Must be called with a legal move. See
+       TemporaryMove.
+    """
+
+    def __init__(self, ArrayGameState state, location_t move, bool prepare_next):
+        self.state = state
+        self.move = move
+        self.prepare_next = prepare_next
+
+    def __enter__(self):
+        self.state.push_location(self.move, self.prepare_next)
+
+        return self.state
+
+    def __exit__(self, type, value, traceback):
+        self.state.pop_location()
@@ -26,3 +26,9 @@ cdef enum group_t:
     FREE = 3
     LEGAL = 4
     EYE = 5
+
+
+# Cached true-eye status of a location for one owner, see GameState.is_true_eye().
+cdef enum eye_t:
+    NO_EYE = 0
+    TRUE_EYE = 1
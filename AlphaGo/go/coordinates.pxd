@@ -49,7 +49,7 @@ cdef tuple calculate_tuple_location(location_t index, location_t size)
 #                                                                          #
 ############################################################################
 
-cdef pattern_hash_t get_pattern_hash(board_group_t &board, location_t center, int pattern_size, pattern_t &pattern_lookup, int max_liberty=*)  # noqa:E501
+cdef pattern_hash_t get_pattern_hash(board_group_t &board, location_t center, int pattern_size, pattern_t &pattern_lookup, int max_liberty=*) nogil  # noqa:E501
 """Given a neighbor/pattern lookup table, computes a hash of the pattern around a location,
    treating each color + liberty combination as a unique value (up to max_liberty).
 """
@@ -50,22 +50,22 @@ cdef tuple calculate_tuple_location(location_t location, location_t size):
 #                                                                          #
 ############################################################################
 
-cdef pattern_hash_t get_pattern_hash(board_group_t &board, location_t center, int pattern_size, pattern_t &pattern_lookup, int max_liberty=3):  # noqa:E501
+cdef pattern_hash_t get_pattern_hash(board_group_t &board, location_t center, int pattern_size, pattern_t &pattern_lookup, int max_liberty=3) nogil:  # noqa:E501
     """Given a neighbor/pattern lookup table, computes a hash of the pattern around a location,
        treating each color + liberty combination as a unique value (up to max_liberty).
     """
 
     cdef int i
     cdef pattern_hash_t hsh = _HASHVALUE
-    cdef group_ptr_t group
+    cdef Group* group
 
     # Index into neighbor12d array is 12x index into board, for example.
     center *= pattern_size
 
     # Hash color and liberty count of all locations in pattern around the center.
     for i in range(pattern_size):
-        # Get group
-        group = board[pattern_lookup[center + i]]
+        # Get group (without copying the pointer, which would update its reference count)
+        group = board[pattern_lookup[center + i]].get()
 
         # Hash color
         hsh += d(group).color
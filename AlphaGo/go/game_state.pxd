@@ -1,8 +1,9 @@
-from AlphaGo.go.constants cimport stone_t, group_t, action_t
+from AlphaGo.go.constants cimport stone_t, group_t, action_t, eye_t
 from AlphaGo.go.coordinates cimport calculate_board_location, calculate_tuple_location, \
     get_pattern_hash, get_neighbors, get_3x3_neighbors, get_12d_neighbors
-from AlphaGo.go.group_logic cimport Group, group_new, group_duplicate, group_add_stone, \
-    group_merge, group_get_stone, group_remove_stone, group_add_liberty, group_remove_liberty
+from AlphaGo.go.group_logic cimport Group, BITBOARD_WORDS, group_new, group_duplicate, \
+    group_add_stone, group_merge, group_get_stone, group_get_stones, group_remove_stone, \
+    group_add_liberty, group_remove_liberty, group_get_liberties
 from AlphaGo.go.zobrist cimport get_zobrist_lookup, update_hash_by_location, update_hash_by_group
 from libcpp cimport bool
 from libcpp.vector cimport vector
@@ -26,6 +27,32 @@ ctypedef cpp_set[group_ptr_t] group_set_t  # type for unordered set of unique gr
 ctypedef vector[group_ptr_t] board_group_t  # type for group-lookup by board position
 
 
+############################################################################
+#   Undo record definition                                                 #
+#                                                                          #
+############################################################################
+
+"""Everything needed to undo a single push_location(), i.e. the values of the state before the move.
+
+   The friendly and opponent neighbor groups are the group objects adjacent to the new stone before
+   it was played. add_stone() copies friendly groups into a new group rather than modifying them,
+   and captured groups are only removed from the board, so restoring these pointers restores all
+   merged and captured groups.
+"""
+cdef cppclass UndoRecord:
+    location_t move
+    stone_t player
+    location_t ko
+    short capture_black, capture_white
+    short passes_black, passes_white
+    short stones_black, stones_white
+    zobrist_hash_t zobrist_hash
+    bool new_hash
+    bool prepare_next
+    group_set_t neighbors_friendly, neighbors_opponent
+    group_ptr_t captured, previous_captured
+
+
 ############################################################################
 #   Class definition                                                       #
 #                                                                          #
@@ -66,8 +93,40 @@ cdef class GameState:
     # List with legal moves
     cdef vector[location_t] legal_moves
 
+    # Unordered list of all empty locations and, for every board location, its index in that list
+    # (or -1 if the location is not empty). Allows O(1) insertion and removal.
+    cdef vector[location_t] empty_locations
+    cdef vector[short] empty_index
+
+    # Cached legality of every location for BLACK and WHITE, respectively, ignoring ko and superko.
+    # Only locations whose legality may have changed are re-checked after each move.
+    cdef vector[char] legal_black, legal_white
+
+    # True-eye status (eye_t) of every location with BLACK and WHITE as owner, respectively. Entries
+    # are recomputed around every changed location by update_eyes().
+    cdef vector[char] eye_black, eye_white
+
+    # Marks of the locations visited by update_eyes(); a location is visited in the current call if
+    # its mark equals eye_epoch.
+    cdef vector[int] eye_visited
+    cdef int eye_epoch
+
+    # Number of BLACK and WHITE stones on the board
+    cdef short stones_black, stones_white
+
+    # Number of empty locations that are a true eye of BLACK minus the number of empty locations
+    # that are a true eye of WHITE only. Together with the stone counts this is the area score.
+    cdef short eye_score
+
+    # All stones captured by the most recent call to add_stone(), or no stones after a pass. Used
+    # to restore the stones of undone captures, and by the nakade feature.
+    cdef group_ptr_t last_captured
+
+    # Stack of undo records, one for each call to push_location() that has not been popped yet
+    cdef vector[UndoRecord] undo_stack
+
     # Neighbors lookup tables. Pointers are to a single global instance of each variable shared by
-    # all instances of GameState.
+    # all instances of GameState with the same size.
     cdef pattern_t* ptr_neighbor
     cdef pattern_t* ptr_neighbor3x3
     cdef pattern_t* ptr_neighbor12d
@@ -79,7 +138,9 @@ cdef class GameState:
     cdef vector[zobrist_hash_t]* ptr_zobrist_lookup
 
     cdef bool enforce_superko
-    cdef set previous_hashes
+
+    # Hashes of all previous positions, used to check positional superko
+    cdef cpp_set[zobrist_hash_t] previous_hashes
 
     ############################################################################
     #   init functions                                                         #
@@ -99,19 +160,23 @@ cdef class GameState:
     #                                                                          #
     ############################################################################
 
-    cdef bool is_positional_superko(self, location_t location)
+    cdef bool is_positional_superko(self, location_t location) nogil
     """Find all actions that the current_player has done in the past.
 
        This takes into account the fact that history starts with BLACK when there are no handicaps
        or with WHITE when there are.
     """
 
-    cpdef bool is_legal_move(self, location_t location)
+    cdef bool is_legal_location(self, location_t location) nogil
     """Check if playing at location is a legal move
     """
 
-    cdef bool has_liberty_after(self, location_t location)
-    """Check if a play at location results in an alive group
+    cpdef bool is_legal_move(self, location_t location)
+    """Check if playing at location is a legal move; python-accessible is_legal_location()
+    """
+
+    cdef bool has_liberty_after(self, location_t location, stone_t player) nogil
+    """Check if a play at location by player results in an alive group
 
        True if any of the following is true:
        - has liberty
@@ -119,11 +184,33 @@ cdef class GameState:
        - captures enemy group
     """
 
-    cdef void update_legal_moves(self)
-    """Update legal_moves list
+    cdef void add_empty(self, location_t location) nogil
+    """Add location to the list of empty locations
+    """
+
+    cdef void remove_empty(self, location_t location) nogil
+    """Remove location from the list of empty locations
+    """
+
+    cdef void update_legal_cache(self, location_t location) nogil
+    """Re-check legality of location for both players (ignoring ko and superko)
+    """
+
+    cdef void update_legal_moves(self) nogil
+    """Re-check legality of all empty locations and update legal_moves list
     """
 
-    cdef void swap_players(self)
+    cdef void update_legal_moves_after(self, location_t location, group_ptr_t captured) nogil
+    """Update legal_moves list after a stone was added at (or removed from) location, capturing
+       (or restoring) the stones in 'captured'. Only locations whose legality may have changed are
+       re-checked.
+    """
+
+    cdef void rebuild_legal_moves(self) nogil
+    """Fill legal_moves from the cached legality of the current player, ko and (maybe) superko
+    """
+
+    cdef void swap_players(self) nogil
     """Switch current_player and opponent_player
     """
 
@@ -136,14 +223,28 @@ cdef class GameState:
     #                                                                          #
     ############################################################################
 
-    cdef bool is_eyeish(self, location_t location, stone_t owner)
+    cdef bool is_eyeish(self, location_t location, stone_t owner) nogil
     """Check if a location is 'eyeish'; that is, check that all 4 neighbors are either border
        or the same color.
     """
 
-    cdef bool is_true_eye(self, location_t location, stone_t owner, list stack=*)
+    cdef bool is_true_eye(self, location_t location, stone_t owner) nogil
     """Check if location is a 'real' eye; this goes beyond checking if a location is 'eyeish' by
-       checking that corners have the same owner or (recursively) are themselves eyes.
+       checking that corners have the same owner or (recursively) are themselves eyes. The result
+       is looked up in eye_black or eye_white.
+    """
+
+    cdef bool search_true_eye(self, location_t location, stone_t owner, vector[location_t]& stack) nogil  # noqa:E501
+    """Uncached recursive search for is_true_eye(). Diagonals in 'stack' are not searched again.
+    """
+
+    cdef void update_eye(self, location_t location) nogil
+    """Recompute the eye status of location for both owners and update eye_score
+    """
+
+    cdef void update_eyes(self, location_t location, group_ptr_t captured) nogil
+    """Recompute the eye status of all locations that may depend on 'location' or on the stones
+       of 'captured', after these changed color.
     """
 
     ############################################################################
@@ -151,19 +252,19 @@ cdef class GameState:
     #                                                                          #
     ############################################################################
 
-    cdef pattern_hash_t get_12d_hash(self, location_t center, bool include_player, int max_liberty=*)  # noqa:E501
+    cdef pattern_hash_t get_12d_hash(self, location_t center, bool include_player, int max_liberty=*) nogil  # noqa:E501
     """Get unique-ish hash of the 12-stone pattern centered at 'center'. Assumes 'center'
        itself is EMPTY. If 'include_player' is True, hash also takes into account who is the
        current player.
     """
 
-    cdef pattern_hash_t get_3x3_hash(self, short center, bool include_player, int max_liberty=*)
+    cdef pattern_hash_t get_3x3_hash(self, short center, bool include_player, int max_liberty=*) nogil  # noqa:E501
     """Get unique-ish hash of the 8-stone pattern centered at 'center'. Assumes 'center' itself
        is EMPTY. If 'include_player' is True, hash also takes into account who is the current
        player.
     """
 
-    cdef vector[location_t] get_sensible_moves(self)
+    cdef vector[location_t] get_sensible_moves(self) nogil
     """'Sensible' moves are all legal moves that are not eyes of the current player.
     """
 
@@ -172,14 +273,14 @@ cdef class GameState:
     #                                                                          #
     ############################################################################
 
-    cdef group_ptr_t combine_groups(self, group_ptr_t group_keep, group_ptr_t group_remove)
+    cdef group_ptr_t combine_groups(self, group_ptr_t group_keep, group_ptr_t group_remove) nogil
     """Combine group_keep and group_remove by copying all stones and liberties from
        group_remove into group_keep, and update pointers on the board.
 
        Returns group_keep
     """
 
-    cdef void remove_group(self, group_ptr_t group_remove)
+    cdef void remove_group(self, group_ptr_t group_remove) nogil
     """Remove group from everywhere in the state.
     """
 
@@ -197,11 +298,21 @@ cdef class GameState:
        self-consistent.
     """
 
-    cdef location_t add_stone(self, location_t location)
+    cdef location_t add_stone(self, location_t location) nogil
     """Play stone on location and update the state. MOVE MUST BE LEGAL. Returns new ko location,
        or -1 if there is none.
     """
 
+    cdef void push_location(self, location_t location, bool prepare_next=*) nogil
+    """Play stone on location (or pass) for the current player and record an undo record on the
+       undo stack. MOVE MUST BE LEGAL. If prepare_next is False, only the stone is added; history,
+       current player and legal moves are not updated.
+    """
+
+    cdef void pop_location(self) nogil
+    """Undo the most recent push_location(). The undo stack must not be empty.
+    """
+
     cpdef TemporaryMove try_stone(self, location_t location, bool prepare_next=*)
     """Analogous to add_stone() for use in a with-statement. Automatically undoes the given move
        when the with-statement exits.
@@ -219,6 +330,14 @@ cdef class GameState:
     """Return a list with all legal moves (in/excluding eyes)
     """
 
+    cpdef np.ndarray get_legal_mask(self, bool include_eyes=*)
+    """Return a uint8 array of length board_size that is 1 at all legal moves (in/excluding eyes)
+    """
+
+    cpdef np.ndarray get_legal_indices(self, bool include_eyes=*)
+    """Return an int16 array with the flat index of all legal moves (in/excluding eyes)
+    """
+
     cpdef float get_score(self, float komi=*)
     """Calculate score of board state. Uses 'Area scoring'.
 
@@ -242,6 +361,15 @@ cdef class GameState:
        IllegalMove exception is raised
     """
 
+    cdef void play_location(self, location_t location) nogil
+    """Play stone on location (or pass) for the current player, add it to the history, switch
+       players and update legal moves. MOVE MUST BE LEGAL.
+    """
+
+    cpdef bool is_end_of_game(self)
+    """Return True if the game ended with two consecutive passes
+    """
+
     cpdef void place_handicap_stone(self, tuple action, stone_t color=*)
     """Add handicap stones given by a list of tuples in list handicap
     """
@@ -255,7 +383,7 @@ cdef class GameState:
     #                                                                          #
     ############################################################################
 
-    cdef group_ptr_t combine_groups(self, group_ptr_t group_keep, group_ptr_t group_remove)
+    cdef group_ptr_t combine_groups(self, group_ptr_t group_keep, group_ptr_t group_remove) nogil
     """Combine group_keep and group_remove by copying all stones and liberties from
        group_remove into group_keep, and update pointers on the board.
 
@@ -276,19 +404,9 @@ cdef class TemporaryMove:
     # Reference to the GameState being modified
     cdef GameState state
 
-    # Current player / owner of the new stone
-    cdef stone_t player_color
-
     # Where the stone is played
     cdef location_t move
 
-    # If there was a ko location previously
-    cdef location_t previous_ko
-
-    # Reference to each of the up-to-4 opponent/friendly groups of the new stone before stone is
-    # played so they can be restored regardless of merges/captures.
-    cdef group_set_t neighbors_opponent, neighbors_friendly
-
     # Boolean flag indicating whether to prepare for another call to state.try_stone(). That is, if
     # this flag is True, it update history and switches to the next player. If it is False, it
     # simply adds the stone and makes no further updates.
@@ -3,6 +3,7 @@
 # cython: initializedcheck=False
 # cython: nonecheck=False
 from cython.operator cimport dereference as d
+from libcpp.unordered_map cimport unordered_map
 import numpy as np
 cimport numpy as np
 
@@ -12,19 +13,23 @@ cimport numpy as np
 #                                                                          #
 ############################################################################
 
-# Global arrays (lookup tables) for neighbor indices
-cdef pattern_t neighbor
-cdef pattern_t neighbor3x3
-cdef pattern_t neighbor12d
-cdef short neighbor_size
+# Global arrays (lookup tables) for neighbor indices, by board size. Tables are only added (with
+# the GIL held) and never changed, so states of any size can be played concurrently without the GIL.
+cdef unordered_map[short, pattern_t] neighbor
+cdef unordered_map[short, pattern_t] neighbor3x3
+cdef unordered_map[short, pattern_t] neighbor12d
 
-# Global array for zobrist lookup
-cdef vector[zobrist_hash_t] zobrist_lookup
+# Global arrays for zobrist lookup, by board size
+cdef unordered_map[short, vector[zobrist_hash_t]] zobrist_lookup
 
 
 # Constant value used to generate pattern hashes (TODO: move elsewhere)
 cdef int _HASHVALUE = 33
 
+# Version and number of int16 header fields of the format written by GameState.serialize()
+cdef int _SERIALIZE_VERSION = 1
+cdef int _SERIALIZE_HEADER = 11
+
 
 ############################################################################
 #   Class definition                                                       #
@@ -37,6 +42,10 @@ cdef class GameState:
 
        Note that the python interface passes moves as (x, y) tuples, while all cython code uses the
        slightly more streamlined 1D indexing.
+
+       All game play functions (add_stone, push_location, is_legal_location, ...) are nogil, and
+       do_move(), push() and pop() release the GIL, so different states can be played in parallel
+       threads. A single state must not be used by more than one thread at a time.
     """
 
     ############################################################################
@@ -75,6 +84,19 @@ cdef class GameState:
     # List with legal moves
     cdef vector[location_t] legal_moves
 
+    # Unordered list of all empty locations and the index of each location in that list
+    cdef vector[location_t] empty_locations
+    cdef vector[short] empty_index
+
+    # Cached legality of every location for BLACK and WHITE, ignoring ko and superko
+    cdef vector[char] legal_black, legal_white
+
+    # All stones captured by the most recent call to add_stone()
+    cdef group_ptr_t last_captured
+
+    # Stack of undo records, one for each call to push_location() that has not been popped yet
+    cdef vector[UndoRecord] undo_stack
+
     # Neighbors lookup tables
     cdef pattern_t* neighbor
     cdef pattern_t* neighbor3x3
@@ -85,7 +107,7 @@ cdef class GameState:
     cdef vector[zobrist_hash_t] ptr_zobrist_lookup
 
     cdef bool enforce_superko
-    cdef set previous_hashes
+    cdef cpp_set[zobrist_hash_t] previous_hashes
     """
 
     ############################################################################
@@ -106,6 +128,7 @@ cdef class GameState:
         # Create placeholder groups for empty spaces and border.
         self.group_empty = group_new(stone_t.EMPTY)
         self.group_border = group_new(stone_t.BORDER)
+        self.last_captured = self.group_empty
 
         # Create empty history list
         self.moves_history = vector[location_t]()
@@ -129,6 +152,21 @@ cdef class GameState:
         # move.
         self.legal_moves = vector[location_t](self.board_size)
 
+        # Create list of empty locations and cached legality for both players (initially
+        # everything is empty and legal).
+        self.empty_locations = vector[location_t]()
+        self.empty_index = vector[short](self.board_size, -1)
+        self.legal_black = vector[char](self.board_size, 1)
+        self.legal_white = vector[char](self.board_size, 1)
+
+        # Start without stones or eyes; eye status is computed below once the board is set up.
+        self.stones_black, self.stones_white = 0, 0
+        self.eye_black = vector[char](self.board_size, eye_t.NO_EYE)
+        self.eye_white = vector[char](self.board_size, eye_t.NO_EYE)
+        self.eye_visited = vector[int](self.board_size, 0)
+        self.eye_epoch = 0
+        self.eye_score = 0
+
         # Create empty list of all current groups.
         self.groups_set = group_set_t()
 
@@ -136,9 +174,14 @@ cdef class GameState:
         for i in range(self.board_size):
             self.board[i] = self.group_empty
             self.legal_moves[i] = i
+            self.add_empty(i)
+
+        # Compute eye status of all locations (only relevant for tiny boards).
+        for i in range(self.board_size):
+            self.update_eye(i)
 
         # Initialize zobrist hashing things.
-        self.previous_hashes = set()
+        self.previous_hashes = cpp_set[zobrist_hash_t]()
         self.zobrist_current = 0
         self.enforce_superko = enforce_superko
 
@@ -148,8 +191,8 @@ cdef class GameState:
 
         cdef int i
         cdef location_t loc
-        cdef group_t val
         cdef group_ptr_t ref_group, dup_group
+        cdef vector[location_t] stones
 
         # Copy each numeric instance variable's value.
         self.size = copy_state.size
@@ -165,19 +208,31 @@ cdef class GameState:
         self.zobrist_current = copy_state.zobrist_current
         self.enforce_superko = copy_state.enforce_superko
 
-        # Copy set of hashes using built in set.copy()
-        self.previous_hashes = copy_state.previous_hashes.copy()
-
         # Copy all 'simple' C++ objects (i.e. non-pointers / non-groups) using default C++ copying
         # rules, which automatically does a deep-copy of containers.
         self.moves_history = copy_state.moves_history
+        self.previous_hashes = copy_state.previous_hashes
         self.legal_moves = copy_state.legal_moves
+        self.empty_locations = copy_state.empty_locations
+        self.empty_index = copy_state.empty_index
+        self.legal_black = copy_state.legal_black
+        self.legal_white = copy_state.legal_white
+        self.eye_black = copy_state.eye_black
+        self.eye_white = copy_state.eye_white
+        self.eye_visited = vector[int](self.board_size, 0)
+        self.eye_epoch = 0
+        self.eye_score = copy_state.eye_score
+        self.stones_black = copy_state.stones_black
+        self.stones_white = copy_state.stones_white
 
         # Note: group_empty and group_border are constant, so duplicating the underlying object is
         # unnecessary.
         self.group_empty = copy_state.group_empty
         self.group_border = copy_state.group_border
 
+        # Groups of captured stones are never modified once created.
+        self.last_captured = copy_state.last_captured
+
         # Copy groups by duplicating the underlying groups objects.
         self.groups_set = group_set_t()
         self.board = board_group_t(self.board_size + 1)
@@ -193,37 +248,36 @@ cdef class GameState:
             self.groups_set.insert(dup_group)
 
             # Set self.board[loc] for each stone in this group.
-            for loc, val in d(dup_group).locations:
-                if val == group_t.STONE:
-                    self.board[loc] = dup_group
+            stones = group_get_stones(dup_group)
+            for loc in stones:
+                self.board[loc] = dup_group
 
     def __init__(self, char size=19, GameState copy=None, enforce_superko=True):
         """Create new instance of GameState. If copy is supplied, creates a deep copy of another
            state. Otherwise, creates an empty state.
         """
-        global neighbor, neighbor3x3, neighbor12d, zobrist_lookup, neighbor_size
+        global neighbor, neighbor3x3, neighbor12d, zobrist_lookup
 
         if copy is not None:
             size = copy.size
 
-        # Check if this is the first GameState object (of this size) and initialize globals.
-        if neighbor_size == 0 or neighbor_size != size:
-            # Initialize "neighbor" lookup tables
-            neighbor = get_neighbors(size)
-            neighbor3x3 = get_3x3_neighbors(size)
-            neighbor12d = get_12d_neighbors(size)
-            zobrist_lookup = get_zobrist_lookup(size)
+        # Stones and liberties of a group are stored in fixed-size bitboards.
+        if size * size > BITBOARD_WORDS * 64:
+            raise ValueError("Board size must be at most 19")
 
-            # Set global size to detect whether globals need to be reinitialized for other GameState
-            # instances with different sizes (which is unlikely).
-            # TODO - global map from size to lookup table
-            neighbor_size = size
+        # Check if this is the first GameState object of this size and initialize globals.
+        if neighbor.count(size) == 0:
+            # Initialize "neighbor" lookup tables
+            neighbor[size] = get_neighbors(size)
+            neighbor3x3[size] = get_3x3_neighbors(size)
+            neighbor12d[size] = get_12d_neighbors(size)
+            zobrist_lookup[size] = get_zobrist_lookup(size)
 
         # Regardless of 'new' or 'duplicate', set pointers to global lookup tables and set size.
-        self.ptr_neighbor = &neighbor
-        self.ptr_neighbor3x3 = &neighbor3x3
-        self.ptr_neighbor12d = &neighbor12d
-        self.ptr_zobrist_lookup = &zobrist_lookup
+        self.ptr_neighbor = &neighbor[size]
+        self.ptr_neighbor3x3 = &neighbor3x3[size]
+        self.ptr_neighbor12d = &neighbor12d[size]
+        self.ptr_zobrist_lookup = &zobrist_lookup[size]
 
         if copy is None:
             self.initialize_new(size, enforce_superko)
@@ -235,49 +289,43 @@ cdef class GameState:
     #                                                                          #
     ############################################################################
 
-    cdef bool is_positional_superko(self, location_t location):
+    cdef bool is_positional_superko(self, location_t location) nogil:
         """Check whether the current player playing at 'location' would result in a state identical
            to a previously seen state. Move must otherwise be legal.
-        """
-
-        cdef int i, first
-        cdef bool played
-
-        # Part 1: quickly check that the current player has ever played at this location; if not, no
-        # fancier check is needed.
-
-        # Check if 'location' is one of the handicap stones placed by BLACK
-        if self.current_player == stone_t.BLACK and self.num_handicap > 0:
-            played = location in self.moves_history[:self.num_handicap]
 
-        # Calculate which was the first non-handicap move made by the current player
-        first = self.num_handicap + (1 if self.current_player == stone_t.WHITE else 0)
-
-        # Check if 'location' matches any other move made by the current player.
-        played = played or location in self.moves_history[first::2]
-
-        # If player never played at 'location', superko is impossible and we're done.
-        if not played:
-            return False
+           The hash of the resulting state is computed directly from the current hash, the new stone
+           and the opponent groups it would capture, without playing the move.
+        """
 
-        # Part 2: try move on a duplicate board and check hash of the result.
+        cdef int i, j
+        cdef location_t neighbor_loc
+        cdef group_ptr_t neighbor_group
 
-        # TODO (?) faster hash check than duplicate full object
-        # Duplicate state and play move
-        cdef GameState copy_state = GameState(copy=self)
+        # Add the new stone to the current hash.
+        cdef zobrist_hash_t hash_after = \
+            update_hash_by_location(self.zobrist_current, d(self.ptr_zobrist_lookup), location,
+                                    self.current_player)
 
-        # Do move with superko check disabled (note: move must otherwise be legal).
-        copy_state.enforce_superko = False
-        copy_state.add_stone(location)
+        # Remove each opponent group that would be captured. A neighboring opponent group with only
+        # 1 liberty must have its liberty at 'location'.
+        for i in range(4):
+            neighbor_loc = d(self.ptr_neighbor)[location * 4 + i]
+            neighbor_group = self.board[neighbor_loc]
+            if d(neighbor_group).color == self.opponent_player and \
+                    d(neighbor_group).count_liberty == 1:
+                # Skip groups that were already removed through another neighbor.
+                for j in range(i):
+                    if self.board[d(self.ptr_neighbor)[location * 4 + j]] == neighbor_group:
+                        break
+                else:
+                    hash_after = update_hash_by_group(hash_after, d(self.ptr_zobrist_lookup),
+                                                      neighbor_group)
 
         # Check if hash already exists (hash collisions are very unlikely)
-        if copy_state.zobrist_current in self.previous_hashes:
-            return True
-
-        return False
+        return self.previous_hashes.count(hash_after) > 0
 
-    cdef bool has_liberty_after(self, location_t location):
-        """Check if a play at location results in an alive group. This is true if
+    cdef bool has_liberty_after(self, location_t location, stone_t player) nogil:
+        """Check if a play at location by player results in an alive group. This is true if
            - there is already a liberty next to this location, or
            - connects to group with >= 2 liberties, or
            - captures an enemy group
@@ -306,32 +354,128 @@ cdef class GameState:
             # Case (1): neighboring group is friendly. Since playing at location would remove one
             # liberty, this group would need >= 2 liberties to still have one left after playing
             # here.
-            if board_value == self.current_player and count_liberty >= 2:
+            if board_value == player and count_liberty >= 2:
                 return True
 
             # Case (2): neighboring group is opponent. If the opposing group has exactly 1 liberty,
             # it must be at 'location', hence playing here would capture the opposing group.
-            elif board_value == self.opponent_player and count_liberty == 1:
+            elif board_value > stone_t.EMPTY and board_value != player and count_liberty == 1:
                 return True
 
         return False
 
-    cdef void update_legal_moves(self):
-        """Update legal_moves list
+    cdef void add_empty(self, location_t location) nogil:
+        """Add location to the list of empty locations
+        """
+
+        self.empty_index[location] = self.empty_locations.size()
+        self.empty_locations.push_back(location)
+
+    cdef void remove_empty(self, location_t location) nogil:
+        """Remove location from the list of empty locations
+        """
+
+        cdef short index = self.empty_index[location]
+        cdef location_t last = self.empty_locations.back()
+
+        # Move the last element into the slot of the removed one and shrink the list by one.
+        self.empty_locations[index] = last
+        self.empty_index[last] = index
+        self.empty_locations.pop_back()
+        self.empty_index[location] = -1
+
+    cdef void update_legal_cache(self, location_t location) nogil:
+        """Re-check legality of location for both players (ignoring ko and superko)
+        """
+
+        # Ignore border
+        if location >= self.board_size:
+            return
+
+        if d(self.board[location]).color == stone_t.EMPTY:
+            self.legal_black[location] = self.has_liberty_after(location, stone_t.BLACK)
+            self.legal_white[location] = self.has_liberty_after(location, stone_t.WHITE)
+        else:
+            self.legal_black[location] = 0
+            self.legal_white[location] = 0
+
+    cdef void update_legal_moves(self) nogil:
+        """Re-check legality of all empty locations and update legal_moves list
         """
 
         cdef location_t loc
 
+        # Stones are never legal; only empty locations need to be checked.
+        for loc in range(self.board_size):
+            self.legal_black[loc] = 0
+            self.legal_white[loc] = 0
+
+        for loc in self.empty_locations:
+            self.update_legal_cache(loc)
+
+        self.rebuild_legal_moves()
+
+    cdef void update_legal_moves_after(self, location_t location, group_ptr_t captured) nogil:
+        """Update legal_moves list after a stone was added at (or removed from) location,
+           capturing (or restoring) the stones in 'captured'. Only locations whose legality may
+           have changed are re-checked: the location itself, its neighbors, the captured stones,
+           and all liberties of groups whose liberty count may have changed.
+        """
+
+        cdef group_set_t touched = group_set_t()
+        cdef group_ptr_t group
+        cdef location_t loc, neighbor_loc
+        cdef int i
+        cdef vector[location_t] stones, liberties
+
+        self.update_legal_cache(location)
+
+        # Neighbors of the location and the groups they belong to.
+        for i in range(4):
+            neighbor_loc = d(self.ptr_neighbor)[location * 4 + i]
+            self.update_legal_cache(neighbor_loc)
+            if d(self.board[neighbor_loc]).color > stone_t.EMPTY:
+                touched.insert(self.board[neighbor_loc])
+
+        if d(self.board[location]).color > stone_t.EMPTY:
+            touched.insert(self.board[location])
+
+        # Captured stones and the groups surrounding them. Note that the only empty neighbor of a
+        # captured group is 'location' itself, since it was the group's last liberty.
+        stones = group_get_stones(captured)
+        for loc in stones:
+            self.update_legal_cache(loc)
+            for i in range(4):
+                neighbor_loc = d(self.ptr_neighbor)[loc * 4 + i]
+                if d(self.board[neighbor_loc]).color > stone_t.EMPTY:
+                    touched.insert(self.board[neighbor_loc])
+
+        # Liberties of all touched groups.
+        for group in touched:
+            liberties = group_get_liberties(group)
+            for loc in liberties:
+                self.update_legal_cache(loc)
+
+        self.rebuild_legal_moves()
+
+    cdef void rebuild_legal_moves(self) nogil:
+        """Fill legal_moves from the cached legality of the current player, ko and (maybe) superko
+        """
+
+        cdef location_t loc
+        cdef vector[char]* legal_cache = \
+            &self.legal_black if self.current_player == stone_t.BLACK else &self.legal_white
+
         # Clear previous values in self.legal_moves
         self.legal_moves.clear()
 
-        # Loop over all board locations and check if a move is legal.
-        # TODO (?) store smaller list of empty locations and search only those
+        # Loop over cached legality in board order so that legal_moves stays sorted.
         for loc in range(self.board_size):
-            if self.is_legal_move(loc):
-                self.legal_moves.push_back(loc)
+            if d(legal_cache)[loc] and loc != self.ko:
+                if not (self.enforce_superko and self.is_positional_superko(loc)):
+                    self.legal_moves.push_back(loc)
 
-    cdef void swap_players(self):
+    cdef void swap_players(self) nogil:
         """Switch current_player and opponent_player
         """
 
@@ -347,14 +491,14 @@ cdef class GameState:
         elif color != self.current_player:
             self.swap_players()
             self.ko = -1
-            self.update_legal_moves()
+            self.rebuild_legal_moves()
 
     ############################################################################
     #   private cdef helper functions for feature generation                   #
     #                                                                          #
     ############################################################################
 
-    cdef bool is_eyeish(self, location_t location, stone_t owner):
+    cdef bool is_eyeish(self, location_t location, stone_t owner) nogil:
         """Check if a location is 'eyeish'; that is, check that all 4 neighbors are either border
            or the same color.
         """
@@ -373,13 +517,26 @@ cdef class GameState:
                 return False
         return True
 
-    cdef bool is_true_eye(self, location_t location, stone_t owner, list stack=[]):
+    cdef bool is_true_eye(self, location_t location, stone_t owner) nogil:
         """Check if location is a 'real' eye; this goes beyond checking if a location is 'eyeish' by
            checking that corners have the same owner or are themselves eyes, recursively. A group
            with two "true eyes" cannot be captured.
+
+           The status is looked up in eye_black or eye_white, which update_eyes() keeps up to date.
+        """
+
+        if owner == stone_t.BLACK:
+            return self.eye_black[location] == eye_t.TRUE_EYE
+        else:
+            return self.eye_white[location] == eye_t.TRUE_EYE
+
+    cdef bool search_true_eye(self, location_t location, stone_t owner, vector[location_t]& stack) nogil:  # noqa:E501
+        """Uncached recursive search for is_true_eye(). Diagonals in 'stack' are not searched again.
         """
 
         cdef int i
+        cdef size_t j
+        cdef bool in_stack
         cdef stone_t board_value
         cdef short max_bad_diagonal, count_bad_diagonal = 0
         cdef location_t neighbor_loc
@@ -412,11 +569,18 @@ cdef class GameState:
 
             # Check if diagonal is empty and is itself an eye. First check if neighbor is in the
             # search stack, in which case we don't recurse, since that would be an infinite loop.
-            elif board_value == stone_t.EMPTY and neighbor_loc not in stack:
-                stack.append(location)
-                if not self.is_true_eye(neighbor_loc, owner, stack):
-                    count_bad_diagonal += 1
-                stack.pop()
+            elif board_value == stone_t.EMPTY:
+                in_stack = False
+                for j in range(stack.size()):
+                    if stack[j] == neighbor_loc:
+                        in_stack = True
+                        break
+
+                if not in_stack:
+                    stack.push_back(location)
+                    if not self.search_true_eye(neighbor_loc, owner, stack):
+                        count_bad_diagonal += 1
+                    stack.pop_back()
 
             # Terminate search if at any point there are more "bad" diagonals than the max allowable
             # for this location.
@@ -426,12 +590,81 @@ cdef class GameState:
         # If made it to here, location must be a eye
         return True
 
+    cdef void update_eye(self, location_t location) nogil:
+        """Recompute the eye status of location for both owners and update eye_score
+        """
+
+        cdef vector[location_t] stack
+
+        # Remove old contribution to the score; an eye of both players counts for BLACK.
+        if self.eye_black[location] == eye_t.TRUE_EYE:
+            self.eye_score -= 1
+        elif self.eye_white[location] == eye_t.TRUE_EYE:
+            self.eye_score += 1
+
+        self.eye_black[location] = eye_t.NO_EYE
+        self.eye_white[location] = eye_t.NO_EYE
+
+        if self.search_true_eye(location, stone_t.BLACK, stack):
+            self.eye_black[location] = eye_t.TRUE_EYE
+            self.eye_score += 1
+
+        if self.search_true_eye(location, stone_t.WHITE, stack):
+            self.eye_white[location] = eye_t.TRUE_EYE
+            if self.eye_black[location] != eye_t.TRUE_EYE:
+                self.eye_score -= 1
+
+    cdef void update_eyes(self, location_t location, group_ptr_t captured) nogil:
+        """Recompute the eye status of all locations that may depend on 'location' or on the stones
+           of 'captured', after these changed color.
+
+           The eye status of a location depends on its 3x3 neighborhood and, recursively, on the
+           status of its empty diagonals if it is eyeish. So starting from the 3x3 neighborhood
+           of every changed location, all eyeish diagonals are visited as well.
+        """
+
+        cdef vector[location_t] changed = group_get_stones(captured)
+        cdef vector[location_t] stack, visited
+        cdef location_t loc, neighbor_loc
+        cdef int i
+
+        self.eye_epoch += 1
+        changed.push_back(location)
+
+        for loc in changed:
+            stack.push_back(loc)
+            for i in range(8):
+                stack.push_back(d(self.ptr_neighbor3x3)[loc * 8 + i])
+
+        while not stack.empty():
+            loc = stack.back()
+            stack.pop_back()
+
+            # Skip border and locations that were already visited.
+            if loc >= self.board_size or self.eye_visited[loc] == self.eye_epoch:
+                continue
+
+            self.eye_visited[loc] = self.eye_epoch
+            visited.push_back(loc)
+
+            # Continue with eyeish diagonals, whose status may depend on this location.
+            for i in range(4, 8):
+                neighbor_loc = d(self.ptr_neighbor3x3)[loc * 8 + i]
+                if neighbor_loc < self.board_size and \
+                        self.eye_visited[neighbor_loc] != self.eye_epoch and \
+                        (self.is_eyeish(neighbor_loc, stone_t.BLACK) or
+                         self.is_eyeish(neighbor_loc, stone_t.WHITE)):
+                    stack.push_back(neighbor_loc)
+
+        for loc in visited:
+            self.update_eye(loc)
+
     ############################################################################
     #   public cdef functions for feature generation (used by preprocessing)   #
     #   TODO: move all of these to preprocessing itself                        #
     ############################################################################
 
-    cdef pattern_hash_t get_12d_hash(self, location_t center, bool include_player, int max_liberty=3):  # noqa:E501
+    cdef pattern_hash_t get_12d_hash(self, location_t center, bool include_player, int max_liberty=3) nogil:  # noqa:E501
         """Get unique-ish hash of the 12-stone pattern centered at 'center'. Assumes 'center'
            itself is EMPTY. If 'include_player' is True, hash also takes into account who is the
            current player.
@@ -448,7 +681,7 @@ cdef class GameState:
 
         return hsh
 
-    cdef pattern_hash_t get_3x3_hash(self, short center, bool include_player, int max_liberty=3):
+    cdef pattern_hash_t get_3x3_hash(self, short center, bool include_player, int max_liberty=3) nogil:  # noqa:E501
         """Get unique-ish hash of the 8-stone pattern centered at 'center'. Assumes 'center' itself
            is EMPTY. If 'include_player' is True, hash also takes into account who is the current
            player.
@@ -463,18 +696,15 @@ cdef class GameState:
 
         return hsh
 
-    cdef vector[location_t] get_sensible_moves(self):
+    cdef vector[location_t] get_sensible_moves(self) nogil:
         """'Sensible' moves are all legal moves that are not eyes of the current player.
         """
 
         cdef location_t loc
         cdef vector[location_t] sensible_moves = vector[location_t]()
-        cdef list eyes = []  # Keep track of all eyes found so far to speed up search
 
         for loc in self.legal_moves:
-            if self.is_true_eye(loc, self.current_player, eyes):
-                eyes.append(loc)
-            else:
+            if not self.is_true_eye(loc, self.current_player):
                 sensible_moves.push_back(loc)
 
         return sensible_moves
@@ -484,7 +714,7 @@ cdef class GameState:
     #                                                                          #
     ############################################################################
 
-    cpdef bool is_legal_move(self, location_t location):
+    cdef bool is_legal_location(self, location_t location) nogil:
         """Check if playing at location is a legal move
         """
 
@@ -505,7 +735,7 @@ cdef class GameState:
             return False
 
         # Check if move is suicide
-        if not self.has_liberty_after(location):
+        if not self.has_liberty_after(location, self.current_player):
             return False
 
         # (Maybe) check superko state
@@ -515,7 +745,13 @@ cdef class GameState:
         # If all of the above checks pass, then this move is legal.
         return True
 
-    cdef location_t add_stone(self, location_t location):
+    cpdef bool is_legal_move(self, location_t location):
+        """Check if playing at location is a legal move; python-accessible is_legal_location()
+        """
+
+        return self.is_legal_location(location)
+
+    cdef location_t add_stone(self, location_t location) nogil:
         """Play stone on location and update the state. MOVE MUST BE LEGAL. Returns new ko location,
            or -1 if there is none.
         """
@@ -533,6 +769,7 @@ cdef class GameState:
         # Add new group to groups_set and ensure board location is updated.
         self.groups_set.insert(new_group)
         self.board[location] = new_group
+        self.remove_empty(location)
 
         # Check neighbors: merge friendly groups and (maybe) capture opponents
         for i in range(4):
@@ -563,11 +800,15 @@ cdef class GameState:
                     group_merge(captured_stones, neighbor_group)
                     self.remove_group(neighbor_group)
 
-        # Count captured stones
+        # Count captured stones and stones on the board
         if self.current_player == stone_t.BLACK:
             self.capture_white += d(captured_stones).count_stones
+            self.stones_black += 1
+            self.stones_white -= d(captured_stones).count_stones
         else:
             self.capture_black += d(captured_stones).count_stones
+            self.stones_white += 1
+            self.stones_black -= d(captured_stones).count_stones
 
         # Update ko: ko occurs when both captured group and newly created group are size 1.
         if d(captured_stones).count_stones == 1 and d(new_group).count_stones == 1:
@@ -582,10 +823,179 @@ cdef class GameState:
             self.zobrist_current = update_hash_by_group(self.zobrist_current,
                                                         d(self.ptr_zobrist_lookup),
                                                         captured_stones)
-        self.previous_hashes.add(self.zobrist_current)
+        self.previous_hashes.insert(self.zobrist_current)
+
+        self.last_captured = captured_stones
+        self.update_eyes(location, captured_stones)
 
         return new_ko
 
+    cdef void push_location(self, location_t location, bool prepare_next=True) nogil:
+        """Play stone on location (or pass) for the current player and record an undo record on the
+           undo stack. MOVE MUST BE LEGAL. If prepare_next is False, only the stone is added;
+           history, current player and legal moves are not updated.
+        """
+
+        cdef location_t neighbor_loc
+        cdef group_ptr_t neighbor_group
+        cdef size_t count_hashes
+        cdef int i
+
+        # Record all values that are (possibly) changed by this move in a new (default-constructed)
+        # record on top of the undo stack.
+        self.undo_stack.resize(self.undo_stack.size() + 1)
+        cdef UndoRecord* record = &self.undo_stack.back()
+        record.move = location
+        record.player = self.current_player
+        record.ko = self.ko
+        record.capture_black = self.capture_black
+        record.capture_white = self.capture_white
+        record.stones_black = self.stones_black
+        record.stones_white = self.stones_white
+        record.passes_black = self.passes_black
+        record.passes_white = self.passes_white
+        record.zobrist_hash = self.zobrist_current
+        record.new_hash = False
+        record.prepare_next = prepare_next
+        record.previous_captured = self.last_captured
+
+        if location == action_t.PASS:
+            if self.current_player == stone_t.BLACK:
+                self.passes_black += 1
+            else:
+                self.passes_white += 1
+            self.ko = -1
+            self.last_captured = self.group_empty
+        else:
+            # Get a reference to each of the up-to-4 neighbors of the stone about to be placed so
+            # they can be restored by pop_location().
+            for i in range(4):
+                neighbor_loc = d(self.ptr_neighbor)[location * 4 + i]
+                neighbor_group = self.board[neighbor_loc]
+                if d(neighbor_group).color == self.current_player:
+                    record.neighbors_friendly.insert(neighbor_group)
+                elif d(neighbor_group).color > stone_t.EMPTY:
+                    record.neighbors_opponent.insert(neighbor_group)
+
+            # Only remove the new hash when undoing if it was not seen before.
+            count_hashes = self.previous_hashes.size()
+            if prepare_next:
+                self.ko = self.add_stone(location)
+            else:
+                self.add_stone(location)
+            record.new_hash = self.previous_hashes.size() > count_hashes
+            record.captured = self.last_captured
+
+        if prepare_next:
+            # Call the same state-updating methods as do_move.
+            self.moves_history.push_back(location)
+            self.swap_players()
+            if location == action_t.PASS:
+                self.rebuild_legal_moves()
+            else:
+                self.update_legal_moves_after(location, record.captured)
+
+    cdef void pop_location(self) nogil:
+        """Undo the most recent push_location(). The undo stack must not be empty.
+        """
+
+        cdef UndoRecord* record = &self.undo_stack.back()
+        cdef group_ptr_t old_group, neighbor_group
+        cdef location_t loc, neighbor_loc, move = record.move
+        cdef int i
+        cdef vector[location_t] stones
+
+        if move != action_t.PASS:
+            # Take away current hash from set of hashes.
+            if record.new_hash:
+                self.previous_hashes.erase(self.zobrist_current)
+
+            # Remove group that the new stone belongs to and set its board location to empty.
+            self.groups_set.erase(self.board[move])
+            self.board[move] = self.group_empty
+            self.add_empty(move)
+
+            # Remove 'new' neighbor groups to prepare to restore 'old' neighbor groups. Update to
+            # board[loc] for neighbors happens below.
+            for i in range(4):
+                neighbor_loc = d(self.ptr_neighbor)[move * 4 + i]
+                neighbor_group = self.board[neighbor_loc]
+                if d(neighbor_group).color > stone_t.EMPTY:
+                    self.groups_set.erase(neighbor_group)
+
+            # Restore previous FRIENDLY neighbors. It is important that this happens before
+            # restoring opponent so that if a captured opponent group is restored, it updates
+            # liberties of the correct friendly group.
+            for old_group in record.neighbors_friendly:
+                # Ensure group is in 'groups_set'.
+                self.groups_set.insert(old_group)
+
+                # Point board[loc] to this group for each stone in the group.
+                stones = group_get_stones(old_group)
+                for loc in stones:
+                    self.board[loc] = old_group
+
+                # Restore liberty of old group.
+                group_add_liberty(old_group, move)
+
+            # Restore previous OPPONENT neighbors.
+            for old_group in record.neighbors_opponent:
+                # Ensure group is in 'groups_set'.
+                self.groups_set.insert(old_group)
+
+                # Point board[loc] to this group for each stone in the group.
+                stones = group_get_stones(old_group)
+                for loc in stones:
+                    self.board[loc] = old_group
+
+                # Restore liberty of old group.
+                group_add_liberty(old_group, move)
+
+                # Capture had occurred if old_group has 1 liberty after having 'restored' the
+                # liberty (in other words, if it had 0 liberties a moment ago). Undo 'remove_group'
+                # by replacing stones and removing liberties of other surrounding groups.
+                if d(old_group).count_liberty == 1:
+                    stones = group_get_stones(old_group)
+                    for loc in stones:
+                        self.remove_empty(loc)
+
+                        # 'loc' is being re-added to the board; must update neighbor liberties.
+                        for i in range(4):
+                            neighbor_loc = d(self.ptr_neighbor)[loc * 4 + i]
+                            neighbor_group = self.board[neighbor_loc]
+
+                            # Remove liberty of neighbor group if it has stones.
+                            if d(neighbor_group).color > stone_t.EMPTY:
+                                group_remove_liberty(neighbor_group, loc)
+
+            # Board is restored; update eyes around the removed stone and restored captures.
+            self.update_eyes(move, record.captured)
+
+        # Restore all simple values.
+        self.last_captured = record.previous_captured
+        self.zobrist_current = record.zobrist_hash
+        self.capture_black = record.capture_black
+        self.capture_white = record.capture_white
+        self.stones_black = record.stones_black
+        self.stones_white = record.stones_white
+        self.passes_black = record.passes_black
+        self.passes_white = record.passes_white
+
+        if record.prepare_next:
+            # Remove move from history, restore ko and switch back to the other player.
+            self.moves_history.pop_back()
+            self.ko = record.ko
+            self.swap_players()
+
+            # Restore set of legal moves; the same locations that changed when pushing must be
+            # re-checked.
+            if move == action_t.PASS:
+                self.rebuild_legal_moves()
+            else:
+                self.update_legal_moves_after(move, record.captured)
+
+        self.undo_stack.pop_back()
+
     cpdef TemporaryMove try_stone(self, location_t location, bool prepare_next=True):
         """Analogous to add_stone() for use in a with-statement. Automatically undoes the given move
            when the with-statement exits.
@@ -614,44 +1024,56 @@ cdef class GameState:
 
         return [calculate_tuple_location(m, self.size) for m in moves]
 
-    cpdef float get_score(self, float komi=7.5):
-        """Calculate score of board state. Uses 'Area scoring'.
+    cpdef np.ndarray get_legal_mask(self, bool include_eyes=True):
+        """Return a uint8 array of length board_size that is 1 at all legal moves (in/excluding
+           eyes) and 0 elsewhere. Move (x, y) is at index x * size + y, as in flatten_idx.
+        """
 
-           http://senseis.xmp.net/?Passing#1
+        cdef location_t location
+        cdef vector[location_t] moves
+        cdef np.ndarray[np.uint8_t, ndim=1] mask = np.zeros(self.board_size, dtype=np.uint8)
 
-           Negative value indicates black win, positive value indicates white win.
+        if include_eyes:
+            moves = self.legal_moves
+        else:
+            moves = self.get_sensible_moves()
+
+        for location in moves:
+            mask[location] = 1
+
+        return mask
+
+    cpdef np.ndarray get_legal_indices(self, bool include_eyes=True):
+        """Return an int16 array with the flat index (x * size + y, as in flatten_idx) of all legal
+           moves (in/excluding eyes), in increasing order.
         """
 
-        cdef location_t location
-        cdef stone_t board_value
+        cdef int i
+        cdef vector[location_t] moves
+        cdef np.ndarray[np.int16_t, ndim=1] indices
 
-        # Positive score is in favor of black, negative is in favor of white.
-        cdef float score = -komi
+        if include_eyes:
+            moves = self.legal_moves
+        else:
+            moves = self.get_sensible_moves()
 
-        # Keep track of all eyes for both black and white to make search faster.
-        cdef list eyes_white = [], eyes_black = []
+        indices = np.empty(moves.size(), dtype=np.int16)
+        for i in range(moves.size()):
+            indices[i] = moves[i]
 
-        # Loop over whole board
-        for location in range(self.board_size):
-            board_value = d(self.board[location]).color
+        return indices
 
-            # Decrement score difference for white
-            if board_value == stone_t.WHITE:
-                score -= 1
+    cpdef float get_score(self, float komi=7.5):
+        """Calculate score of board state. Uses 'Area scoring'.
 
-            # Increment score difference for black
-            elif board_value == stone_t.BLACK:
-                score += 1
+           http://senseis.xmp.net/?Passing#1
 
-            # If empty, count as territory only if it is an eye
-            else:
-                if self.is_true_eye(location, stone_t.BLACK, eyes_black):
-                    eyes_black.append(location)
-                    score += 1
+           Negative value indicates black win, positive value indicates white win.
+        """
 
-                elif self.is_true_eye(location, stone_t.WHITE, eyes_white):
-                    eyes_white.append(location)
-                    score -= 1
+        # Positive score is in favor of black, negative is in favor of white. Stones and eyes are
+        # counted incrementally, see add_stone() and update_eyes().
+        cdef float score = self.stones_black - self.stones_white + self.eye_score - komi
 
         # substract passes
         # http://senseis.xmp.net/?Passing#1
@@ -686,15 +1108,6 @@ cdef class GameState:
         # Note: as per the python interface, 'None' is considerd a pass
         if action is None:
             location = action_t.PASS
-
-            if self.current_player == stone_t.BLACK:
-                self.passes_black += 1
-            else:
-                self.passes_white += 1
-
-            # Reset ko since players switched.
-            self.ko = -1
-
         else:
             if color != stone_t.EMPTY and color != self.current_player:
                 self.swap_players()
@@ -707,6 +1120,24 @@ cdef class GameState:
             if not self.is_legal_move(location):
                 raise IllegalMove(str(action))
 
+        with nogil:
+            self.play_location(location)
+
+    cdef void play_location(self, location_t location) nogil:
+        """Play stone on location (or pass) for the current player, add it to the history, switch
+           players and update legal moves. MOVE MUST BE LEGAL.
+        """
+
+        if location == action_t.PASS:
+            if self.current_player == stone_t.BLACK:
+                self.passes_black += 1
+            else:
+                self.passes_white += 1
+
+            # Reset ko since players switched.
+            self.ko = -1
+            self.last_captured = self.group_empty
+        else:
             # Execute move.
             self.ko = self.add_stone(location)
 
@@ -717,8 +1148,11 @@ cdef class GameState:
         self.swap_players()
 
         # The set of legal moves must now be recomputed, since it is different for each player
-        # and with new ko location.
-        self.update_legal_moves()
+        # and with new ko location. Only locations around the new stone need to be re-checked.
+        if location == action_t.PASS:
+            self.rebuild_legal_moves()
+        else:
+            self.update_legal_moves_after(location, self.last_captured)
 
     cpdef void place_handicap_stone(self, tuple action, stone_t color=stone_t.BLACK):
         """Add handicap stones given by a list of tuples in list handicap
@@ -742,7 +1176,7 @@ cdef class GameState:
     #                                                                          #
     ############################################################################
 
-    cdef group_ptr_t combine_groups(self, group_ptr_t group_keep, group_ptr_t group_remove):
+    cdef group_ptr_t combine_groups(self, group_ptr_t group_keep, group_ptr_t group_remove) nogil:
         """Combine group_keep and group_remove by copying all stones and liberties from
            group_remove into group_keep, and update pointers on the board. Leaves group_remove
            unchanged, but does remove it from groups_set.
@@ -751,50 +1185,46 @@ cdef class GameState:
         """
 
         cdef location_t loc
-        cdef group_t val
-
-        # Loop over all location->stone pairs in group_remove.
-        for loc, val in d(group_remove).locations:
-            if val == group_t.STONE:
-                # group_remove has a stone at this location; add the stone to group_keep and set
-                # board location to group_keep.
-                group_add_stone(group_keep, loc)
-                self.board[loc] = group_keep
-            elif val == group_t.LIBERTY:
-                # group_remove has a liberty at this location; add the liberty to group_keep.
-                group_add_liberty(group_keep, loc)
+        cdef vector[location_t] stones
+
+        # Add all stones and liberties of group_remove to group_keep.
+        group_merge(group_keep, group_remove)
+
+        # Set board location of each stone of group_remove to group_keep.
+        stones = group_get_stones(group_remove)
+        for loc in stones:
+            self.board[loc] = group_keep
 
         # Clear group_remove from groups_set.
         self.groups_set.erase(group_remove)
 
         return group_keep
 
-    cdef void remove_group(self, group_ptr_t group_remove):
+    cdef void remove_group(self, group_ptr_t group_remove) nogil:
         """Remove group from everywhere in the state.
         """
 
         cdef location_t loc, neighbor_loc
         cdef group_ptr_t group
-        cdef group_t val, neighbor_value
+        cdef vector[location_t] stones = group_get_stones(group_remove)
         cdef int i
 
         # First pass: clear stones by setting board[loc] to EMPTY for each stone in this group.
-        for loc, val in d(group_remove).locations:
-            if val == group_t.STONE:
-                # Set board at this location to empty group
-                self.board[loc] = self.group_empty
+        for loc in stones:
+            # Set board at this location to empty group
+            self.board[loc] = self.group_empty
+            self.add_empty(loc)
 
         # Second pass: add new liberties to neighboring groups now that stones have been cleared.
-        for loc, val in d(group_remove).locations:
-            if val == group_t.STONE:
-                for i in range(4):
-                    # Get neighbor location
-                    neighbor_loc = d(self.ptr_neighbor)[loc * 4 + i]
-                    group = self.board[neighbor_loc]
+        for loc in stones:
+            for i in range(4):
+                # Get neighbor location
+                neighbor_loc = d(self.ptr_neighbor)[loc * 4 + i]
+                group = self.board[neighbor_loc]
 
-                    # If neighbor is a stone, add 'loc' as a liberty
-                    if d(group).color > stone_t.EMPTY:
-                        group_add_liberty(group, loc)
+                # If neighbor is a stone, add 'loc' as a liberty
+                if d(group).color > stone_t.EMPTY:
+                    group_add_liberty(group, loc)
 
         # Clear this group from groups_set
         self.groups_set.erase(group_remove)
@@ -804,7 +1234,10 @@ cdef class GameState:
     #                                                                          #
     ############################################################################
 
-    def is_end_of_game(self):
+    cpdef bool is_end_of_game(self):
+        """Return True if the game ended with two consecutive passes
+        """
+
         if self.moves_history.size() > 1:
             if self.moves_history[self.moves_history.size() - 1] == action_t.PASS and \
                     self.moves_history[self.moves_history.size() - 2] == action_t.PASS and \
@@ -829,12 +1262,159 @@ cdef class GameState:
 
         return self.is_legal_move(location)
 
+    def push(self, action):
+        """Play stone at action=(x,y) for the current player, or pass if action is None, such that
+           it can be undone with pop(). Checks move legality first.
+
+           Calls to push() and pop() may be nested to any depth, but do_move() should not be called
+           in between a push() and its pop().
+        """
+
+        cdef char x, y
+        cdef location_t location
+
+        if action is None:
+            location = action_t.PASS
+        else:
+            (x, y) = action
+            location = calculate_board_location(y, x, self.size)
+
+            # Check if move is legal.
+            if not self.is_legal_move(location):
+                raise IllegalMove(str(action))
+
+        with nogil:
+            self.push_location(location)
+
+    def pop(self):
+        """Undo the most recent push() and return its action
+        """
+
+        cdef location_t location
+
+        if self.undo_stack.empty():
+            raise IndexError("pop from empty move stack")
+
+        location = self.undo_stack.back().move
+        with nogil:
+            self.pop_location()
+
+        if location == action_t.PASS:
+            return None
+        return calculate_tuple_location(location, self.size)
+
+    def get_undo_depth(self):
+        """Return the number of moves that can be undone with pop()
+        """
+
+        return self.undo_stack.size()
+
     def copy(self):
-        """Get a copy of this Game state
+        """Get a copy of this Game state. Moves pushed on this state cannot be popped from the
+           copy.
         """
 
         return GameState(copy=self)
 
+    def serialize(self):
+        """Return a compact byte string with the position and move history of this state, from
+           which deserialize() recreates it: a header of int16 values, the history as int16
+           locations and one byte with the color of every location. Moves pushed on this state
+           cannot be popped from the recreated state.
+        """
+
+        cdef np.ndarray[np.int16_t, ndim=1] header
+        cdef np.ndarray[np.uint8_t, ndim=1] board = np.empty(self.board_size, dtype=np.uint8)
+        cdef location_t location
+
+        header = np.array([_SERIALIZE_VERSION, self.size, self.enforce_superko,
+                           self.current_player, self.ko, self.num_handicap, self.capture_black,
+                           self.capture_white, self.passes_black, self.passes_white,
+                           self.moves_history.size()], dtype=np.int16)
+
+        for location in range(self.board_size):
+            board[location] = d(self.board[location]).color
+
+        return header.tobytes() + \
+            np.array(self.moves_history, dtype=np.int16).tobytes() + board.tobytes()
+
+    @staticmethod
+    def deserialize(bytes data):
+        """Create a state from the output of serialize().
+
+           The history is replayed, so that superko and zobrist hashes are valid in this process.
+           If the replayed position differs from the serialized board, because stones were played
+           out of turn, the board is set up directly instead and superko only knows the current
+           position.
+        """
+
+        cdef np.ndarray[np.int16_t, ndim=1] header, history
+        cdef np.ndarray[np.uint8_t, ndim=1] board
+        cdef GameState state
+        cdef location_t location
+        cdef stone_t player
+        cdef int i, n_history
+        cdef bool same_board
+
+        header = np.frombuffer(data, dtype=np.int16, count=_SERIALIZE_HEADER)
+        if header[0] != _SERIALIZE_VERSION:
+            raise ValueError("Unknown serialization version %d" % header[0])
+        n_history = header[10]
+        history = np.frombuffer(data, dtype=np.int16, count=n_history,
+                                offset=2 * _SERIALIZE_HEADER)
+        board = np.frombuffer(data, dtype=np.uint8, offset=2 * (_SERIALIZE_HEADER + n_history))
+
+        player = <stone_t> header[3]
+
+        # Replay handicap stones for BLACK and then alternating moves.
+        state = GameState(size=header[1], enforce_superko=header[2])
+        for i in range(n_history):
+            location = history[i]
+            if i < header[5] and state.current_player != stone_t.BLACK:
+                state.swap_players()
+            if not state.is_legal_location(location):
+                break
+            state.play_location(location)
+        else:
+            state.num_handicap = header[5]
+            if state.current_player != player:
+                state.set_current_player(player)
+            same_board = state.ko == header[4] and state.capture_black == header[6] and \
+                state.capture_white == header[7]
+            for location in range(state.board_size):
+                same_board = same_board and d(state.board[location]).color == board[location]
+            if same_board:
+                return state
+
+        # Place all stones without captures; no group of a valid position is without liberties.
+        state = GameState(size=header[1], enforce_superko=header[2])
+        for location in range(state.board_size):
+            if board[location] > stone_t.EMPTY:
+                if state.current_player != <stone_t> board[location]:
+                    state.swap_players()
+                state.play_location(location)
+
+        state.moves_history.clear()
+        for i in range(n_history):
+            state.moves_history.push_back(history[i])
+        if state.current_player != player:
+            state.swap_players()
+        state.ko = header[4]
+        state.num_handicap = header[5]
+        state.capture_black, state.capture_white = header[6], header[7]
+        state.passes_black, state.passes_white = header[8], header[9]
+        state.previous_hashes.clear()
+        state.previous_hashes.insert(state.zobrist_current)
+        state.rebuild_legal_moves()
+        return state
+
+    def __reduce__(self):
+        """Pickle states in the compact format of serialize(), e.g. to send them to other
+           processes with multiprocessing.
+        """
+
+        return (_deserialize_state, (self.serialize(),))
+
     ############################################################################
     #   public def functions used for unittests                                #
     #                                                                          #
@@ -845,8 +1425,8 @@ cdef class GameState:
         """
 
         cdef location_t loc
-        cdef group_t val
         cdef group_ptr_t group
+        cdef vector[location_t] stones, liberties
 
         print("Empty: {0:x}".format(<unsigned long long> self.group_empty.get()))
         print("Border: {0:x}".format(<unsigned long long> self.group_border.get()))
@@ -858,8 +1438,12 @@ cdef class GameState:
         for group in self.groups_set:
             print("--- %x: %d / %d / %d ---" % (<unsigned long long> group.get(), d(group).color,
                                                 d(group).count_stones, d(group).count_liberty))
-            for loc, val in d(group).locations:
-                print "\t", calculate_tuple_location(loc, self.size), val
+            stones = group_get_stones(group)
+            for loc in stones:
+                print "\t", calculate_tuple_location(loc, self.size), group_t.STONE
+            liberties = group_get_liberties(group)
+            for loc in liberties:
+                print "\t", calculate_tuple_location(loc, self.size), group_t.LIBERTY
 
     cpdef bool sanity_check_groups(self):
         """Debugging helper: loops over every location and group on the board and checks that they are
@@ -868,9 +1452,9 @@ cdef class GameState:
 
         cdef location_t loc, neighbor_loc
         cdef group_ptr_t group1, group2, neighbor_group
-        cdef group_t val
         cdef int i, recount_liberty, recount_stones
         cdef set empty_adjacent
+        cdef vector[location_t] stones, liberties
 
         # Check 1: all groups in self.board are also in self.groups_set.
         for loc in range(self.board_size):
@@ -917,26 +1501,27 @@ cdef class GameState:
         for group1 in self.groups_set:
             recount_liberty, recount_stones = 0, 0
             empty_adjacent = set()
-            for loc, val in d(group1).locations:
+            stones = group_get_stones(group1)
+            for loc in stones:
                 # Check that group's STONE locations are correct in self.board
-                if val == group_t.STONE:
-                    if self.board[loc] != group1:
-                        print("group has STONE but board does not point to that group!")
-                        return False
-                    recount_stones += 1
-
-                    # Check for neighboring liberties on the board
-                    for i in range(4):
-                        neighbor_loc = d(self.ptr_neighbor)[4 * loc + i]
-                        if self.board[neighbor_loc] == self.group_empty:
-                            empty_adjacent.add(neighbor_loc)
-
-                # Check that group's LIBERTY locations are actually empty
-                elif val == group_t.LIBERTY:
-                    if self.board[loc] != self.group_empty:
-                        print("group has LIBERTY but board does not point to empty group!")
-                        return False
-                    recount_liberty += 1
+                if self.board[loc] != group1:
+                    print("group has STONE but board does not point to that group!")
+                    return False
+                recount_stones += 1
+
+                # Check for neighboring liberties on the board
+                for i in range(4):
+                    neighbor_loc = d(self.ptr_neighbor)[4 * loc + i]
+                    if self.board[neighbor_loc] == self.group_empty:
+                        empty_adjacent.add(neighbor_loc)
+
+            # Check that group's LIBERTY locations are actually empty
+            liberties = group_get_liberties(group1)
+            for loc in liberties:
+                if self.board[loc] != self.group_empty:
+                    print("group has LIBERTY but board does not point to empty group!")
+                    return False
+                recount_liberty += 1
 
             # Check that all counts make sense
             if recount_stones != d(group1).count_stones:
@@ -1087,6 +1672,13 @@ cdef class GameState:
         return self.get_print_board_layout()
 
 
+def _deserialize_state(data):
+    """Unpickle a GameState, see GameState.__reduce__()
+    """
+
+    return GameState.deserialize(data)
+
+
 cdef class TemporaryMove:
     """Helper-class for GameState.try_stone(). Must be called with a legal move.
 
@@ -1100,8 +1692,6 @@ cdef class TemporaryMove:
     def __init__(self, GameState state, location_t move, bool prepare_next):
         self.state = state
         self.move = move
-        self.neighbors_friendly = group_set_t()
-        self.neighbors_opponent = group_set_t()
         self.prepare_next = prepare_next
 
     def __enter__(self):
@@ -1109,33 +1699,7 @@ cdef class TemporaryMove:
            information about the state so that 'move' may be undone later.
         """
 
-        cdef location_t neighbor_loc
-        cdef group_ptr_t neighbor_group
-        cdef int i
-
-        # Record player color and ko.
-        self.player_color = self.state.current_player
-        self.previous_ko = self.state.ko
-
-        # Get a reference to each of the up-to-4 neighbors of the stone about to be placed so they
-        # can be restored in __exit__.
-        for i in range(4):
-            neighbor_loc = d(self.state.ptr_neighbor)[self.move * 4 + i]
-            neighbor_group = self.state.board[neighbor_loc]
-            if d(neighbor_group).color == self.player_color:
-                self.neighbors_friendly.insert(neighbor_group)
-            elif d(neighbor_group).color > stone_t.EMPTY:
-                self.neighbors_opponent.insert(neighbor_group)
-
-        if self.prepare_next:
-            # Call the same state-updating methods as do_move.
-            self.state.ko = self.state.add_stone(self.move)
-            self.state.moves_history.push_back(self.move)
-            self.state.swap_players()
-            self.state.update_legal_moves()
-        else:
-            # Only add the stone and don't perform further updates.
-            self.state.add_stone(self.move)
+        self.state.push_location(self.move, self.prepare_next)
 
         return self.state
 
@@ -1143,98 +1707,7 @@ cdef class TemporaryMove:
         """Called at end of 'with' statement. Undo move done in __enter__.
         """
 
-        cdef group_ptr_t old_group, neighbor_group
-        cdef location_t loc, neighbor_loc
-        cdef group_t val
-        cdef int i, c
-
-        # Take away current hash from set of hashes.
-        self.state.previous_hashes.discard(self.state.zobrist_current)
-
-        # Update hash: remove placed stone.
-        self.state.zobrist_current = update_hash_by_location(self.state.zobrist_current,
-                                                             d(self.state.ptr_zobrist_lookup),
-                                                             self.move, self.player_color)
-
-        # Remove group that the new stone belongs to and set its board location to empty.
-        self.state.groups_set.erase(self.state.board[self.move])
-        self.state.board[self.move] = self.state.group_empty
-
-        # Remove 'new' neighbor groups to prepare to restore 'old' neighbor groups. Update to
-        # state.board[loc] for neighbors happens below.
-        for i in range(4):
-            neighbor_loc = d(self.state.ptr_neighbor)[self.move * 4 + i]
-            neighbor_group = self.state.board[neighbor_loc]
-            if d(neighbor_group).color > stone_t.EMPTY:
-                self.state.groups_set.erase(neighbor_group)
-
-        # Restore previous FRIENDLY neighbors. It is important that this happens before restoring
-        # opponent so that if a captured opponent group is restored, it updates liberties of the
-        # correct friendly group.
-        for old_group in self.neighbors_friendly:
-            # Ensure group is in 'groups_set'.
-            self.state.groups_set.insert(old_group)
-
-            # Point board[loc] to this group for each stone in the group.
-            for loc, val in d(old_group).locations:
-                if val == group_t.STONE:
-                    self.state.board[loc] = old_group
-
-            # Restore liberty of old group.
-            group_add_liberty(old_group, self.move)
-
-        # Restore previous OPPONENT neighbors.
-        for old_group in self.neighbors_opponent:
-            # Ensure group is in 'groups_set'.
-            self.state.groups_set.insert(old_group)
-
-            # Point board[loc] to this group for each stone in the group.
-            for loc, val in d(old_group).locations:
-                if val == group_t.STONE:
-                    self.state.board[loc] = old_group
-
-            # Restore liberty of old group.
-            group_add_liberty(old_group, self.move)
-
-            # Capture had occurred if old_group has 1 liberty after having 'restored' the liberty
-            # (in other words, if it had 0 liberties a moment ago).
-            if d(old_group).count_liberty == 1:
-                # Restore hash for each captured stone.
-                self.state.zobrist_current = \
-                    update_hash_by_group(self.state.zobrist_current,
-                                         d(self.state.ptr_zobrist_lookup), old_group)
-
-                # Undo 'remove_group' by replacing stones and removing liberties of other
-                # surrounding groups.
-                for loc, val in d(old_group).locations:
-                    if val == group_t.STONE:
-                        # 'loc' is being re-added to the board; must update neighbor liberties.
-                        for i in range(4):
-                            neighbor_loc = d(self.state.ptr_neighbor)[loc * 4 + i]
-                            neighbor_group = self.state.board[neighbor_loc]
-
-                            # Remove liberty of neighbor group if it has stones.
-                            if d(neighbor_group).color > stone_t.EMPTY:
-                                group_remove_liberty(neighbor_group, loc)
-
-                # Decrement captured stones.
-                if self.player_color == stone_t.BLACK:
-                    self.state.capture_white -= d(old_group).count_stones
-                else:
-                    self.state.capture_black -= d(old_group).count_stones
-
-        if self.prepare_next:
-            # Remove stone from history.
-            self.state.moves_history.pop_back()
-
-            # Restore ko.
-            self.state.ko = self.previous_ko
-
-            # Switch back to other player.
-            self.state.swap_players()
-
-            # Restore set of legal moves
-            self.state.update_legal_moves()
+        self.state.pop_location()
 
 
 class IllegalMove(Exception):
@@ -0,0 +1,45 @@
+from AlphaGo.go.constants cimport stone_t, action_t
+from AlphaGo.go.game_state cimport GameState
+from libcpp cimport bool
+from libcpp.vector cimport vector
+import numpy as np
+cimport numpy as np
+
+
+############################################################################
+#   Typedefs                                                               #
+#                                                                          #
+############################################################################
+
+ctypedef short location_t
+
+
+############################################################################
+#   Class definition                                                       #
+#                                                                          #
+############################################################################
+
+cdef class GameStateBatch:
+    """A pool of N GameStates that are played in lockstep, e.g. for self-play. All loops over the
+       games run in C, so advancing, masking or scoring all games costs one python call instead
+       of N.
+
+       The games are regular GameState objects (see get_states()), so players and preprocessing
+       can be used on them unchanged.
+    """
+
+    # number of games, board size and number of locations on the board
+    cdef int count
+    cdef short size, board_size
+
+    # all games in the batch, every item is a GameState
+    cdef list states
+
+    ############################################################################
+    #   cdef helper functions                                                  #
+    #                                                                          #
+    ############################################################################
+
+    cdef GameState get_state(self, int index)
+    """Return game 'index' as GameState without type checks
+    """
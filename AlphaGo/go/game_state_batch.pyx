@@ -0,0 +1,173 @@
+# cython: wraparound=False
+# cython: boundscheck=False
+# cython: initializedcheck=False
+# cython: nonecheck=False
+from AlphaGo.go.game_state import IllegalMove
+import numpy as np
+cimport numpy as np
+
+
+cdef class GameStateBatch:
+
+    ############################################################################
+    #   cdef helper functions                                                  #
+    #                                                                          #
+    ############################################################################
+
+    cdef GameState get_state(self, int index):
+        """Return game 'index' as GameState without type checks
+        """
+
+        return <GameState> self.states[index]
+
+    ############################################################################
+    #   public def functions                                                   #
+    #                                                                          #
+    ############################################################################
+
+    def __init__(self, count=None, char size=19, enforce_superko=True, list states=None):
+        """Create a batch of 'count' new games of the given size, or a batch that wraps the (same
+           sized) GameStates in the list 'states'; these are not copied. Exactly one of 'count' and
+           'states' must be given.
+        """
+
+        cdef GameState state
+
+        if (count is None) == (states is None):
+            raise ValueError("Give either the number of games or a list of states")
+
+        if states is None:
+            states = [GameState(size=size, enforce_superko=enforce_superko)
+                      for _ in range(count)]
+
+        self.states = states
+        self.count = len(states)
+        self.size = size
+        self.board_size = size * size
+
+        for state in states:
+            if state.size != (<GameState> states[0]).size:
+                raise ValueError("All states in a GameStateBatch must have the same size")
+            self.size = state.size
+            self.board_size = state.board_size
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, int index):
+        return self.states[index]
+
+    def get_states(self):
+        """Return the list of GameStates in this batch
+        """
+
+        return self.states
+
+    def get_size(self):
+        """Return the board size of all games
+        """
+
+        return self.size
+
+    def do_moves(self, moves):
+        """Play one move in every game. moves[i] is the 1d location (x * size + y, as used by
+           flatten_idx) for game i, or -1 to pass. Moves for games that already ended are ignored.
+
+           All moves are checked before any is played; if one of them is illegal, an IllegalMove
+           exception is raised and no game is changed.
+        """
+
+        cdef np.int64_t[:] locations = np.asarray(moves, dtype=np.int64)
+        cdef vector[location_t] checked
+        cdef GameState state
+        cdef np.int64_t move
+        cdef int i
+
+        if locations.shape[0] != self.count:
+            raise ValueError("Expected %d moves, got %d" % (self.count, locations.shape[0]))
+
+        # Check the range before a move is stored in a (short) location_t.
+        for i in range(self.count):
+            state = self.get_state(i)
+            move = locations[i]
+            if move != action_t.PASS and not state.is_end_of_game() and \
+                    (move < 0 or move >= self.board_size or
+                     not state.is_legal_move(<location_t> move)):
+                raise IllegalMove("game %d: %d" % (i, move))
+            checked.push_back(<location_t> move)
+
+        for i in range(self.count):
+            state = self.get_state(i)
+            if not state.is_end_of_game():
+                state.play_location(checked[i])
+
+    def do_actions(self, actions):
+        """Play one move in every game like do_moves(), given as (x, y) tuples or None to pass,
+           e.g. as returned by the get_moves() function of the players
+        """
+
+        cdef int[:] locations = np.empty(len(actions), dtype=np.intc)
+        cdef int i
+
+        for i, action in enumerate(actions):
+            if action is None:
+                locations[i] = action_t.PASS
+            else:
+                locations[i] = action[0] * self.size + action[1]
+
+        self.do_moves(locations)
+
+    def legal_mask(self):
+        """Return a uint8 numpy array of shape (N, board_size) that is 1 where a move is legal for
+           the current player of that game and 0 elsewhere (passing is always legal)
+        """
+
+        cdef np.ndarray[np.uint8_t, ndim=2] mask = np.zeros((self.count, self.board_size),
+                                                            dtype=np.uint8)
+        cdef GameState state
+        cdef location_t location
+        cdef int i
+
+        for i in range(self.count):
+            state = self.get_state(i)
+            for location in state.legal_moves:
+                mask[i, location] = 1
+
+        return mask
+
+    def is_end_of_game(self):
+        """Return a bool numpy array of length N that is True for every game that has ended
+        """
+
+        cdef np.ndarray[np.uint8_t, ndim=1] ended = np.zeros(self.count, dtype=np.uint8)
+        cdef int i
+
+        for i in range(self.count):
+            ended[i] = self.get_state(i).is_end_of_game()
+
+        return ended.view(np.bool_)
+
+    def current_players(self):
+        """Return an int8 numpy array of length N with the color to play in each game
+        """
+
+        cdef np.ndarray[np.int8_t, ndim=1] players = np.zeros(self.count, dtype=np.int8)
+        cdef int i
+
+        for i in range(self.count):
+            players[i] = self.get_state(i).current_player
+
+        return players
+
+    def winners(self, float komi=7.5):
+        """Return an int8 numpy array of length N with the winner color (BLACK or WHITE) of each
+           game, by area scoring of the current position. Games that did not end are scored as well.
+        """
+
+        cdef np.ndarray[np.int8_t, ndim=1] winners = np.zeros(self.count, dtype=np.int8)
+        cdef int i
+
+        for i in range(self.count):
+            winners[i] = self.get_state(i).get_winner_color(komi)
+
+        return winners
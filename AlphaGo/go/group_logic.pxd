@@ -1,5 +1,6 @@
 from AlphaGo.go.constants cimport stone_t, group_t
-from libcpp.unordered_map cimport unordered_map
+from libc.stdint cimport uint64_t
+from libcpp cimport bool
 from libcpp.memory cimport shared_ptr
 from libcpp.vector cimport vector
 
@@ -10,11 +11,22 @@ from libcpp.vector cimport vector
 ############################################################################
 
 ctypedef short location_t
+ctypedef uint64_t bitboard_word_t
+
+# Number of 64-bit words in a bitboard; 6 words hold all 361 locations of a 19x19 board.
+cdef enum:
+    BITBOARD_WORDS = 6
+
+# Compiler builtins for counting set bits and finding the lowest set bit of a word.
+cdef extern from *:
+    int popcount "__builtin_popcountll" (unsigned long long x) nogil
+    int count_trailing_zeros "__builtin_ctzll" (unsigned long long x) nogil
 
 """Class to store stone and liberty locations of a single 'group'
 
-   'locations' is a map from 1d board location to a 'group_t' type. Most groups only store
-   STONE and LIBERTY data. Other enum values used by ladder checks.
+   'stones' and 'liberties' are bitboards: bit (location % 64) of word (location / 64) is set if
+   the group has a stone (or liberty) at that 1d board location. Merging groups is a bitwise OR
+   and counting is a popcount, independent of the size of the group.
 
    Both count_stones and count_liberty are tracked as stones are added and removed from the group.
 
@@ -29,54 +41,116 @@ ctypedef short location_t
 cdef cppclass Group:
     stone_t color
     short count_stones, count_liberty
-    unordered_map[location_t, group_t] locations
+    bitboard_word_t stones[BITBOARD_WORDS]
+    bitboard_word_t liberties[BITBOARD_WORDS]
 
 ctypedef shared_ptr[Group] group_ptr_t  # smart pointer with reference counting wrapping a 'Group'
 ctypedef vector[group_ptr_t] board_group_t  # type for group-lookup by board position
 
 
+############################################################################
+#   Bitboard helper functions                                              #
+#                                                                          #
+############################################################################
+
+cdef inline bool bitboard_get(bitboard_word_t* bits, location_t location) nogil:
+    """Check if location is set in the bitboard
+    """
+    return (bits[location >> 6] >> (location & 63)) & 1
+
+cdef inline void bitboard_set(bitboard_word_t* bits, location_t location) nogil:
+    """Set location in the bitboard
+    """
+    bits[location >> 6] |= (<bitboard_word_t> 1) << (location & 63)
+
+cdef inline void bitboard_clear(bitboard_word_t* bits, location_t location) nogil:
+    """Clear location in the bitboard
+    """
+    bits[location >> 6] &= ~((<bitboard_word_t> 1) << (location & 63))
+
+cdef inline short bitboard_count(bitboard_word_t* bits) nogil:
+    """Count locations set in the bitboard
+    """
+    cdef int i
+    cdef short count = 0
+    for i in range(BITBOARD_WORDS):
+        count += popcount(bits[i])
+    return count
+
+cdef inline location_t bitboard_first(bitboard_word_t* bits) nogil:
+    """Return the lowest location set in the bitboard or -1 if it is empty
+    """
+    cdef int i
+    for i in range(BITBOARD_WORDS):
+        if bits[i] != 0:
+            return i * 64 + count_trailing_zeros(bits[i])
+    return -1
+
+cdef inline vector[location_t] bitboard_locations(bitboard_word_t* bits) nogil:
+    """Return all locations set in the bitboard, in increasing order
+    """
+    cdef int i
+    cdef bitboard_word_t word
+    cdef vector[location_t] locations = vector[location_t]()
+    for i in range(BITBOARD_WORDS):
+        word = bits[i]
+        while word != 0:
+            locations.push_back(i * 64 + count_trailing_zeros(word))
+            # Clear lowest set bit.
+            word &= word - 1
+    return locations
+
+
 ############################################################################
 #   Simple & fast group functions                                          #
 #                                                                          #
 ############################################################################
 
-cdef group_ptr_t group_new(stone_t color)
+cdef group_ptr_t group_new(stone_t color) nogil
 """Create new Group with empty set of locations.
 """
 
-cdef group_ptr_t group_duplicate(group_ptr_t group)
+cdef group_ptr_t group_duplicate(group_ptr_t group) nogil
 """Create a (deep) copy of the given group-pointer.
 """
 
-cdef void group_add_stone(group_ptr_t group, location_t location)
+cdef void group_add_stone(group_ptr_t group, location_t location) nogil
 """Update location as STONE and update counts.
 """
 
-cdef void group_remove_stone(group_ptr_t group, location_t location)
+cdef void group_remove_stone(group_ptr_t group, location_t location) nogil
 """Update location as FREE and update counts.
 """
 
-cdef void group_merge(group_ptr_t group, group_ptr_t other)
+cdef void group_merge(group_ptr_t group, group_ptr_t other) nogil
 """Merge groups by copying stones from 'other' into 'group'. Ensures that liberties are
    appropriately updated. Leaves 'other' unchanged.
 """
 
-cdef location_t group_get_stone(group_ptr_t group)
+cdef location_t group_get_stone(group_ptr_t group) nogil
 """Return any one location where there is a STONE.
 """
 
-cdef void group_add_liberty(group_ptr_t group, location_t location)
+cdef vector[location_t] group_get_stones(group_ptr_t group) nogil
+"""Return all STONE locations of the group.
+"""
+
+cdef void group_add_liberty(group_ptr_t group, location_t location) nogil
 """Update location as LIBERTY and update counts.
 """
 
-cdef void group_remove_liberty(group_ptr_t group, location_t location)
+cdef void group_remove_liberty(group_ptr_t group, location_t location) nogil
 """Update location as FREE and update counts.
 """
 
-cdef location_t group_get_liberty(group_ptr_t group)
+cdef location_t group_get_liberty(group_ptr_t group) nogil
 """Return any one location that is flagged as LIBERTY.
 """
 
-cdef group_t group_lookup(group_ptr_t group, location_t location)
+cdef vector[location_t] group_get_liberties(group_ptr_t group) nogil
+"""Return all LIBERTY locations of the group.
+"""
+
+cdef group_t group_lookup(group_ptr_t group, location_t location) nogil
 """Return stone type at 'location' or FREE.
 """
@@ -3,6 +3,7 @@
 # cython: initializedcheck=False
 # cython: nonecheck=False
 from cython.operator cimport dereference as d
+from libc.string cimport memset
 
 
 ############################################################################
@@ -10,129 +11,125 @@ from cython.operator cimport dereference as d
 #                                                                          #
 ############################################################################
 
-cdef group_ptr_t group_new(stone_t color):
+cdef group_ptr_t group_new(stone_t color) nogil:
     """Create new struct Group with empty set of locations.
     """
 
-    # Initialize group and its members using C++ "new". Members are automatically initialized to
-    # defaults.
+    # Initialize group and its members using C++ "new".
     cdef group_ptr_t group = group_ptr_t(new Group())
     d(group).color = color
+    d(group).count_stones = 0
+    d(group).count_liberty = 0
+    memset(d(group).stones, 0, sizeof(d(group).stones))
+    memset(d(group).liberties, 0, sizeof(d(group).liberties))
 
     return group
 
-cdef group_ptr_t group_duplicate(group_ptr_t group):
+cdef group_ptr_t group_duplicate(group_ptr_t group) nogil:
     """Create a (deep) copy of the given group-pointer.
     """
 
-    # Create new Group object with same color.
-    cdef group_ptr_t new_group = group_new(d(group).color)
+    cdef group_ptr_t new_group = group_ptr_t(new Group())
 
-    # Copy each field individually; using C++ this amounts to a 'deep copy' of group.locations.
-    d(new_group).count_stones = d(group).count_stones
-    d(new_group).count_liberty = d(group).count_liberty
-    d(new_group).locations = d(group).locations
+    # C++ assignment copies all fields, including both bitboards.
+    new_group.get()[0] = group.get()[0]
 
     return new_group
 
-cdef void group_add_stone(group_ptr_t group, location_t location):
+cdef void group_add_stone(group_ptr_t group, location_t location) nogil:
     """Update location as STONE and update counts.
     """
 
-    cdef group_t current_type = group_lookup(group, location)
-
     # Update counts
-    if current_type != group_t.STONE:
+    if not bitboard_get(d(group).stones, location):
         # Note: '+=' does not work with the d() operator. cython bug!
         d(group).count_stones = d(group).count_stones + 1
-        if current_type == group_t.LIBERTY:
-            d(group).count_liberty = d(group).count_liberty - 1
+        bitboard_set(d(group).stones, location)
 
-    # Flag location as STONE
-    d(group).locations[location] = group_t.STONE
+        if bitboard_get(d(group).liberties, location):
+            d(group).count_liberty = d(group).count_liberty - 1
+            bitboard_clear(d(group).liberties, location)
 
-cdef void group_remove_stone(group_ptr_t group, location_t location):
+cdef void group_remove_stone(group_ptr_t group, location_t location) nogil:
     """Update location as FREE and update counts.
     """
 
-    cdef group_t current_type = group_lookup(group, location)
-
     # Check if a stone is present
-    if current_type == group_t.STONE:
+    if bitboard_get(d(group).stones, location):
         # Stone present, decrement stone count and clear location
         d(group).count_stones = d(group).count_stones - 1
-        d(group).locations.erase(location)
+        bitboard_clear(d(group).stones, location)
 
-cdef void group_merge(group_ptr_t group, group_ptr_t other):
+cdef void group_merge(group_ptr_t group, group_ptr_t other) nogil:
     """Merge groups by copying stones from 'other' into 'group'. Ensures that liberties are
        appropriately updated. Leaves 'other' unchanged.
     """
-    cdef location_t loc
-    cdef group_t val
-    for loc, val in d(other).locations:
-        # Add all stones from 'other' into 'group'
-        if val == group_t.STONE:
-            group_add_stone(group, loc)
-        # Only add liberties from 'other' into 'group' if it would not overwrite something else
-        elif val == group_t.LIBERTY and group_lookup(group, loc) == group_t.FREE:
-            group_add_liberty(group, loc)
-
-cdef location_t group_get_stone(group_ptr_t group):
+
+    cdef int i
+
+    # Union of stones and of liberties; locations that are now stones are no longer liberties.
+    # Note: '|=' does not work with the d() operator either.
+    for i in range(BITBOARD_WORDS):
+        d(group).stones[i] = d(group).stones[i] | d(other).stones[i]
+        d(group).liberties[i] = \
+            (d(group).liberties[i] | d(other).liberties[i]) & ~d(group).stones[i]
+
+    d(group).count_stones = bitboard_count(d(group).stones)
+    d(group).count_liberty = bitboard_count(d(group).liberties)
+
+cdef location_t group_get_stone(group_ptr_t group) nogil:
     """Return any one location where there is a group_t.STONE or -1 if not found.
     """
 
-    # Iterate until a STONE is found.
-    cdef location_t loc
-    cdef group_t val
-    for loc, val in d(group).locations:
-        if val == group_t.STONE:
-            return loc
-    return -1
+    return bitboard_first(d(group).stones)
 
-cdef void group_add_liberty(group_ptr_t group, location_t location):
-    """Update location as LIBERTY and update counts.
+cdef vector[location_t] group_get_stones(group_ptr_t group) nogil:
+    """Return all STONE locations of the group.
     """
 
-    cdef group_t current_type = group_lookup(group, location)
+    return bitboard_locations(d(group).stones)
+
+cdef void group_add_liberty(group_ptr_t group, location_t location) nogil:
+    """Update location as LIBERTY and update counts.
+    """
 
     # Update counts
-    if current_type != group_t.LIBERTY:
+    if not bitboard_get(d(group).liberties, location):
         d(group).count_liberty = d(group).count_liberty + 1
-        if current_type == group_t.STONE:
-            d(group).count_stones = d(group).count_stones - 1
+        bitboard_set(d(group).liberties, location)
 
-    # Set LIBERTY
-    d(group).locations[location] = group_t.LIBERTY
+        if bitboard_get(d(group).stones, location):
+            d(group).count_stones = d(group).count_stones - 1
+            bitboard_clear(d(group).stones, location)
 
-cdef void group_remove_liberty(group_ptr_t group, location_t location):
+cdef void group_remove_liberty(group_ptr_t group, location_t location) nogil:
     """Update location as FREE and update counts.
     """
 
-    cdef group_t current_type = group_lookup(group, location)
-
-    if current_type == group_t.LIBERTY:
+    if bitboard_get(d(group).liberties, location):
         # Decrement liberty count and clear location
         d(group).count_liberty = d(group).count_liberty - 1
-        d(group).locations.erase(location)
+        bitboard_clear(d(group).liberties, location)
 
-cdef location_t group_get_liberty(group_ptr_t group):
+cdef location_t group_get_liberty(group_ptr_t group) nogil:
     """Return any one location that is flagged as LIBERTY or -1 if not found.
     """
 
-    # Iterate until a LIBERTY is found.
-    cdef location_t loc
-    cdef group_t val
-    for loc, val in d(group).locations:
-        if val == group_t.LIBERTY:
-            return loc
-    return -1
+    return bitboard_first(d(group).liberties)
+
+cdef vector[location_t] group_get_liberties(group_ptr_t group) nogil:
+    """Return all LIBERTY locations of the group.
+    """
+
+    return bitboard_locations(d(group).liberties)
 
-cdef group_t group_lookup(group_ptr_t group, location_t location):
+cdef group_t group_lookup(group_ptr_t group, location_t location) nogil:
     """Return stone type at 'location' or FREE.
     """
 
-    # Look up location in map using C++ iterator comparison (i.e. 'location in group.locations')
-    if d(group).locations.find(location) != d(group).locations.end():
-        return d(group).locations[location]
+    if bitboard_get(d(group).stones, location):
+        return group_t.STONE
+    elif bitboard_get(d(group).liberties, location):
+        return group_t.LIBERTY
     else:
         return group_t.FREE
@@ -1,57 +1,135 @@
 from AlphaGo.go.constants cimport stone_t, group_t
-from AlphaGo.go.group_logic cimport Group, group_get_liberty, group_get_stone
+from AlphaGo.go.group_logic cimport Group, group_get_liberty, group_get_liberties, \
+    group_get_stone, group_get_stones
 from AlphaGo.go.game_state cimport GameState
+from AlphaGo.go.zobrist cimport update_hash_by_group
 from libcpp cimport bool
 from libcpp.memory cimport shared_ptr
 from libcpp.vector cimport vector
+from libcpp.unordered_set cimport unordered_set as cpp_set
+from libcpp.unordered_map cimport unordered_map
 
 
 ctypedef short location_t
 ctypedef shared_ptr[Group] group_ptr_t  # smart pointer with reference counting wrapping a 'Group'
 ctypedef vector[group_ptr_t] board_group_t  # type for group-lookup by board position
 ctypedef vector[location_t] pattern_t  # lookup of neighbor coordinates (or border)
+ctypedef cpp_set[location_t] location_set_t  # type for unordered set of unique locations
+ctypedef unsigned long long zobrist_hash_t
 
 
-cdef bool is_ladder_escape_move(GameState copy_state, group_ptr_t prey, location_t move, int depth=*)  # noqa:E501
+cdef enum:
+    # Default depth of ladder searches
+    LADDER_DEPTH = 50
+
+
+"""The result of one ladder search, valid as long as the board region it depends on is unchanged.
+   The region is every location the search looked at; region_hash is a hash of the color, liberty
+   count and eye status at these locations in the position where the search started.
+"""
+cdef cppclass LadderEntry:
+    zobrist_hash_t prey_hash
+    location_t move
+    bool capture
+    vector[location_t] region
+    zobrist_hash_t region_hash
+    bool result
+
+
+cdef bool is_ladder_escape_move(GameState state, group_ptr_t prey, location_t move, int depth=*, location_set_t* footprint=*) nogil  # noqa:E501
 """(Inefficiently) check whether the given move escapes ladder capture of the given group.
    Returns True when escape is possible, or recursion depth limit is reached (assuming that the
    opponent does not recognize ladders with greater depth as a 'capture' either)
 
    Preconditions:
-   - GameState 'copy_state' is safe to be altered
-   - prey group is in atari and owned by copy_state.current_player
+   - GameState 'state' is safe to be temporarily altered; it is restored before returning
+   - prey group is in atari and owned by state.current_player
    - given move is legal
    - depth >= 0
 
+   If footprint is not NULL, every location whose contents the search depends on is added to it.
+
    Note: while optimizations can be made, this version is easy to understand, and ladders are
    less likely to be used as features in a production computer-go system.
 """
 
-cdef bool is_ladder_capture_move(GameState copy_state, group_ptr_t prey, location_t move, int depth=*)  # noqa:E501
+cdef bool is_ladder_capture_move(GameState state, group_ptr_t prey, location_t move, int depth=*, location_set_t* footprint=*) nogil  # noqa:E501
 """(Inefficiently) check whether the given move captures the prey, or forces capture of the
    prey by a ladder within 'depth' moves.
 
    Preconditions:
-   - GameState 'copy_state' is safe to be altered
+   - GameState 'state' is safe to be temporarily altered; it is restored before returning
    - prey group has <= 2 liberties and is owned by the opponent
    - given move is legal
    - depth >= 0
 
+   If footprint is not NULL, every location whose contents the search depends on is added to it.
+
    Note: while optimizations can be made, this version is easy to understand, and ladders are
    less likely to be used as features in a production computer-go system.
 """
 
-cdef set get_plausible_escape_moves(GameState state, group_ptr_t prey)
+cdef location_set_t get_plausible_escape_moves(GameState state, group_ptr_t prey) nogil
 """Get set of moves that should be checked as possible escape moves for the given prey.
 """
 
-cdef set get_plausible_capture_moves(GameState state, group_ptr_t prey)
+cdef location_set_t get_plausible_capture_moves(GameState state, group_ptr_t prey) nogil
 """Get set of moves that should be checked as possible escape moves for the given prey.
 """
 
-cdef set get_adjacent_captures(group_ptr_t group, board_group_t &board, pattern_t &neighbor_lookup)
+cdef location_set_t get_adjacent_captures(group_ptr_t group, board_group_t &board, pattern_t &neighbor_lookup) nogil  # noqa:E501
 """Search for moves that the owner of 'group' could play that would kill opponent groups
    adjacent to it.
 
    Note: this would (probably) consitute an escape from a ladder if 'group' is in atari.
 """
+
+cdef void add_group_footprint(GameState state, group_ptr_t group, location_set_t* footprint) nogil  # noqa:E501
+"""Add the stones of group and their direct neighbors to footprint; if none of these change, the
+   group keeps the same stones and liberties.
+"""
+
+cdef void add_move_footprint(GameState state, location_t move, location_set_t* footprint) nogil
+"""Add everything that determines the legality and result of playing move to footprint: its 3x3
+   neighborhood, the groups next to it and, for groups it captures, the groups gaining liberties.
+"""
+
+cdef void add_prey_footprint(GameState state, group_ptr_t prey, location_set_t* footprint) nogil
+"""Add everything get_plausible_escape_moves() and get_plausible_capture_moves() look at for prey
+   to footprint.
+"""
+
+cdef zobrist_hash_t get_region_hash(GameState state, vector[location_t] &region) nogil
+"""Hash of the color, liberty count and eye status at every location of region
+"""
+
+
+############################################################################
+#   Class definition                                                       #
+#                                                                          #
+############################################################################
+
+cdef class LadderCache:
+
+    # Results of previous searches, by a hash of prey, move and search type
+    cdef unordered_map[zobrist_hash_t, LadderEntry] entries
+
+    # Entries are dropped when there are more than this many
+    cdef size_t max_entries
+
+    # Number of searches answered from the cache and number of searches that were run
+    cdef long hits, misses
+
+    cdef bool search(self, GameState state, group_ptr_t prey, location_t move, bool capture) nogil  # noqa:E501
+    """is_ladder_capture_move() if capture, else is_ladder_escape_move(), with the default depth.
+       The result is reused while prey, move and the board region the search depends on are
+       unchanged.
+    """
+
+    cdef bool is_ladder_capture_move(self, GameState state, group_ptr_t prey, location_t move) nogil  # noqa:E501
+    """Cached is_ladder_capture_move()
+    """
+
+    cdef bool is_ladder_escape_move(self, GameState state, group_ptr_t prey, location_t move) nogil  # noqa:E501
+    """Cached is_ladder_escape_move()
+    """
@@ -6,91 +6,121 @@ from AlphaGo.util import unflatten_idx
 from cython.operator cimport dereference as d
 
 
-cdef bool is_ladder_escape_move(GameState state, group_ptr_t prey, location_t move, int depth=50):  # noqa:E501
+cdef bool is_ladder_escape_move(GameState state, group_ptr_t prey, location_t move, int depth=LADDER_DEPTH, location_set_t* footprint=NULL) nogil:  # noqa:E501
     """(Inefficiently) check whether the given move escapes ladder capture of the given group.
        Returns True when escape is plausible, or recursion depth limit is reached (assuming that the
        opponent does not recognize ladders with greater depth as a 'capture' either)
 
        Preconditions:
-       - GameState 'state' is safe to be temporarily altered (not thread-safe!)
+       - GameState 'state' is safe to be temporarily altered (not shared with other threads)
        - prey group is in atari and owned by state.current_player
        - given move is legal
        - depth >= 0
 
-       Note: while optimizations can be made by avoiding copied states, this version is at least
-       easily comprehensible.
+       The move (and all moves of the recursive search) are played on 'state' itself using
+       push_location() and undone with pop_location() before returning. If footprint is not NULL,
+       every location whose contents the search depends on is added to it.
     """
 
     cdef location_t prey_loc = group_get_stone(prey)
+    cdef location_t plausible_capture
+    cdef location_set_t plausible_captures
+    cdef bool escaped
 
     # Base case: if search depth is exhausted, assume that the ladder is escable.
     if depth <= 0:
         return True
 
+    if footprint != NULL:
+        add_group_footprint(state, prey, footprint)
+        add_move_footprint(state, move, footprint)
+
     # Try move and check results.
-    with state.try_stone(move):
-        prey = state.board[prey_loc]
+    state.push_location(move)
+    prey = state.board[prey_loc]
 
-        # Case 1: prey has >= 3 liberties after move, in which case it escaped.
-        if d(prey).count_liberty >= 3:
-            return True
+    if footprint != NULL:
+        add_prey_footprint(state, prey, footprint)
 
-        # Case 2: prey is left in atari, in which case it did not escape.
-        elif d(prey).count_liberty == 1:
-            return False
+    # Case 1: prey has >= 3 liberties after move, in which case it escaped.
+    if d(prey).count_liberty >= 3:
+        escaped = True
 
-        # Case 3: prey has 2 liberties left, in which case it may still be captured in a ladder.
-        # Requires recursive search.
-        else:
-            # Opponent may attempt to capture at either of the prey's two liberties.
-            for plausible_capture in get_plausible_capture_moves(state, prey):
-                if is_ladder_capture_move(state.copy(), prey, plausible_capture, depth - 1):
-                    return False
+    # Case 2: prey is left in atari, in which case it did not escape.
+    elif d(prey).count_liberty == 1:
+        escaped = False
+
+    # Case 3: prey has 2 liberties left, in which case it may still be captured in a ladder.
+    # Requires recursive search.
+    else:
+        # If none of prey's liberties are ladder captures, it escaped.
+        escaped = True
 
-            # If reached here, none of prey's liberties are ladder captures, in which case it
-            # escaped.
-            return True
+        # Opponent may attempt to capture at either of the prey's two liberties.
+        plausible_captures = get_plausible_capture_moves(state, prey)
+        for plausible_capture in plausible_captures:
+            if is_ladder_capture_move(state, prey, plausible_capture, depth - 1, footprint):
+                escaped = False
+                break
 
-cdef bool is_ladder_capture_move(GameState state, group_ptr_t prey, location_t move, int depth=50):  # noqa:E501
+    state.pop_location()
+    return escaped
+
+cdef bool is_ladder_capture_move(GameState state, group_ptr_t prey, location_t move, int depth=LADDER_DEPTH, location_set_t* footprint=NULL) nogil:  # noqa:E501
     """(Inefficiently) check whether the given move captures the prey, or forces capture of the
        prey by a ladder within 'depth' moves.
 
        Preconditions:
-       - GameState 'state' is safe to be temporarily altered (not thread-safe!)
+       - GameState 'state' is safe to be temporarily altered (not shared with other threads)
        - prey group has <= 2 liberties and is owned by the opponent
        - given move is legal
        - depth >= 0
 
-       Note: while optimizations can be made by avoiding copied states, this version is at least
-       easily comprehensible.
+       The move (and all moves of the recursive search) are played on 'state' itself using
+       push_location() and undone with pop_location() before returning. If footprint is not NULL,
+       every location whose contents the search depends on is added to it.
     """
 
     cdef location_t prey_loc = group_get_stone(prey)
+    cdef location_t plausible_escape
+    cdef location_set_t plausible_escapes
+
+    # If prey is captured or no escape move is found, the ladder captures.
+    cdef bool captured = True
 
     # Base case: if search depth is exhausted, assume that ladder is not capturable.
     if depth <= 0:
         return False
 
-    # Try the move and check results
-    with state.try_stone(move):
-        prey = state.board[prey_loc]
-
-        # Case 1: prey has >= 2 liberties after move, in which case it escaped.
-        if d(prey).count_liberty >= 2:
-            return False
-
-        # Case 2: prey has 1 liberty after move, in which case it may still attempt to escape.
-        # Requires recursive search.
-        elif d(prey).count_liberty == 1:
-            # Try each potential escape move
-            for plausible_escape in get_plausible_escape_moves(state, prey):
-                if is_ladder_escape_move(state.copy(), prey, plausible_escape, depth - 1):
-                    return False
-
-        # If reached here, either prey was captured or no escape move was found
-        return True
+    if footprint != NULL:
+        add_group_footprint(state, prey, footprint)
+        add_move_footprint(state, move, footprint)
 
-cdef set get_plausible_escape_moves(GameState state, group_ptr_t prey):
+    # Try the move and check results
+    state.push_location(move)
+    prey = state.board[prey_loc]
+
+    if footprint != NULL:
+        add_prey_footprint(state, prey, footprint)
+
+    # Case 1: prey has >= 2 liberties after move, in which case it escaped.
+    if d(prey).count_liberty >= 2:
+        captured = False
+
+    # Case 2: prey has 1 liberty after move, in which case it may still attempt to escape.
+    # Requires recursive search.
+    elif d(prey).count_liberty == 1:
+        # Try each potential escape move
+        plausible_escapes = get_plausible_escape_moves(state, prey)
+        for plausible_escape in plausible_escapes:
+            if is_ladder_escape_move(state, prey, plausible_escape, depth - 1, footprint):
+                captured = False
+                break
+
+    state.pop_location()
+    return captured
+
+cdef location_set_t get_plausible_escape_moves(GameState state, group_ptr_t prey) nogil:
     """Get set of moves that should be checked as plausible escape moves for the given prey.
 
        Preconditions:
@@ -98,28 +128,25 @@ cdef set get_plausible_escape_moves(GameState state, group_ptr_t prey):
        - prey is in atari
     """
 
-    cdef set to_remove = set(), plausible_escapes = set()
+    cdef location_set_t candidates, plausible_escapes
     cdef location_t move
     cdef stone_t owner = d(prey).color
-    cdef bool is_sensible
-
-    # Plausible escapes 1: remaining liberty of the prey group
-    plausible_escapes.add(group_get_liberty(prey))
 
-    # Plausible escapes 2: any moves that capture a group adjacent to the prey (since this would
+    # Plausible escapes 1: any moves that capture a group adjacent to the prey (since this would
     # free up new liberties)
-    plausible_escapes.update(get_adjacent_captures(prey, state.board, d(state.ptr_neighbor)))
+    candidates = get_adjacent_captures(prey, state.board, d(state.ptr_neighbor))
+
+    # Plausible escapes 2: remaining liberty of the prey group
+    candidates.insert(group_get_liberty(prey))
 
     # Ensure that all moves are not only legal, but 'sensible'.
-    for move in plausible_escapes:
-        is_sensible = state.is_legal_move(move) and not state.is_true_eye(move, owner)
-        if not is_sensible:
-            to_remove.add(move)
-    plausible_escapes.difference_update(to_remove)
+    for move in candidates:
+        if state.is_legal_location(move) and not state.is_true_eye(move, owner):
+            plausible_escapes.insert(move)
 
     return plausible_escapes
 
-cdef set get_plausible_capture_moves(GameState state, group_ptr_t prey):
+cdef location_set_t get_plausible_capture_moves(GameState state, group_ptr_t prey) nogil:
     """Get set of moves that should be checked as plausible escape moves for the given prey.
 
        Preconditions:
@@ -127,47 +154,290 @@ cdef set get_plausible_capture_moves(GameState state, group_ptr_t prey):
        - prey has exactly 2 liberties
     """
 
-    cdef set to_remove = set(), plausible_captures = set()
-    cdef location_t loc
-    cdef group_t val
-
-    for loc, val in d(prey).locations:
-        if val == group_t.LIBERTY:
-            plausible_captures.add(loc)
+    cdef location_set_t plausible_captures
+    cdef location_t move
+    cdef vector[location_t] liberties = group_get_liberties(prey)
 
     # Ensure that all moves are legal (note that no 'sensibility' check is needed here since a move
     # cannot be both a liberty of the other player and an eye of the current player).
-    for move in plausible_captures:
-        if not state.is_legal_move(move):
-            to_remove.add(move)
-    plausible_captures.difference_update(to_remove)
+    for move in liberties:
+        if state.is_legal_location(move):
+            plausible_captures.insert(move)
 
     return plausible_captures
 
-cdef set get_adjacent_captures(group_ptr_t group, board_group_t &board, pattern_t &neighbor_lookup):
+cdef location_set_t get_adjacent_captures(group_ptr_t group, board_group_t &board, pattern_t &neighbor_lookup) nogil:  # noqa:E501
     """Search for moves that the owner of 'group' could play that would kill opponent groups
        adjacent to it. This would consitute an escape from a ladder if 'group' is in atari.
     """
 
     # 'atari_liberties' holds liberty locations of enemy groups that are adjacent to the given group
     # 'and are in atari (hence could be captured by playing at the given location)
-    cdef set atari_liberties = set()
+    cdef location_set_t atari_liberties
     cdef group_ptr_t neighbor_group
-    cdef location_t loc, opp_loc, neighbor_loc
-    cdef group_t val, opp_val
+    cdef location_t loc, neighbor_loc
     cdef stone_t owner = d(group).color
     cdef int i
-
-    for loc, val in d(group).locations:
-        if val == group_t.STONE:
-            for i in range(4):
-                neighbor_loc = neighbor_lookup[loc * 4 + i]
-                neighbor_group = board[neighbor_loc]
-
-                # Check if neighbor of this group stone is opponent group.
-                if d(neighbor_group).color > stone_t.EMPTY and d(neighbor_group).color != owner:
-                    # Further check if opponent group is in atari and can be captured.
-                    if d(neighbor_group).count_liberty == 1:
-                        # Find the one liberty of this group and mark it as an escape move.
-                        atari_liberties.add(group_get_liberty(neighbor_group))
+    cdef vector[location_t] stones
+
+    stones = group_get_stones(group)
+    for loc in stones:
+        for i in range(4):
+            neighbor_loc = neighbor_lookup[loc * 4 + i]
+            neighbor_group = board[neighbor_loc]
+
+            # Check if neighbor of this group stone is opponent group.
+            if d(neighbor_group).color > stone_t.EMPTY and d(neighbor_group).color != owner:
+                # Further check if opponent group is in atari and can be captured.
+                if d(neighbor_group).count_liberty == 1:
+                    # Find the one liberty of this group and mark it as an escape move.
+                    atari_liberties.insert(group_get_liberty(neighbor_group))
     return atari_liberties
+
+
+############################################################################
+#   Ladder search footprints                                               #
+#                                                                          #
+############################################################################
+
+cdef inline zobrist_hash_t mix_bits(zobrist_hash_t value) nogil:
+    """Finalizer of the splitmix64 generator, to combine small values into well-spread hashes
+    """
+
+    value ^= value >> 30
+    value *= 0xbf58476d1ce4e5b9ULL
+    value ^= value >> 27
+    value *= 0x94d049bb133111ebULL
+    value ^= value >> 31
+    return value
+
+cdef inline void add_3x3_footprint(GameState state, location_t location, location_set_t* footprint) nogil:  # noqa:E501
+    """Add location and its eight neighbors on the board to footprint
+    """
+
+    cdef location_t neighbor_loc
+    cdef int i
+
+    footprint.insert(location)
+    for i in range(8):
+        neighbor_loc = d(state.ptr_neighbor3x3)[location * 8 + i]
+        if neighbor_loc != state.board_size:
+            footprint.insert(neighbor_loc)
+
+cdef void add_group_footprint(GameState state, group_ptr_t group, location_set_t* footprint) nogil:  # noqa:E501
+    """Add the stones of group and their direct neighbors to footprint; if none of these change,
+       the group keeps the same stones and liberties.
+    """
+
+    cdef location_t loc, neighbor_loc
+    cdef vector[location_t] stones = group_get_stones(group)
+    cdef int i
+
+    for loc in stones:
+        footprint.insert(loc)
+        for i in range(4):
+            neighbor_loc = d(state.ptr_neighbor)[loc * 4 + i]
+            if neighbor_loc != state.board_size:
+                footprint.insert(neighbor_loc)
+
+cdef void add_move_footprint(GameState state, location_t move, location_set_t* footprint) nogil:
+    """Add everything that determines the legality and result of playing move to footprint: its
+       3x3 neighborhood, the groups next to it and, for groups it captures, the groups gaining
+       liberties.
+    """
+
+    cdef group_ptr_t neighbor_group, gaining_group
+    cdef location_t loc
+    cdef vector[location_t] stones
+    cdef int i, j
+
+    add_3x3_footprint(state, move, footprint)
+
+    for i in range(4):
+        neighbor_group = state.board[d(state.ptr_neighbor)[move * 4 + i]]
+        if d(neighbor_group).color <= stone_t.EMPTY:
+            continue
+        add_group_footprint(state, neighbor_group, footprint)
+
+        if d(neighbor_group).color != state.current_player and \
+                d(neighbor_group).count_liberty == 1:
+            stones = group_get_stones(neighbor_group)
+            for loc in stones:
+                for j in range(4):
+                    gaining_group = state.board[d(state.ptr_neighbor)[loc * 4 + j]]
+                    if d(gaining_group).color == state.current_player:
+                        add_group_footprint(state, gaining_group, footprint)
+
+cdef void add_prey_footprint(GameState state, group_ptr_t prey, location_set_t* footprint) nogil:
+    """Add everything get_plausible_escape_moves() and get_plausible_capture_moves() look at for
+       prey to footprint.
+    """
+
+    cdef group_ptr_t neighbor_group
+    cdef location_t loc
+    cdef vector[location_t] locations
+    cdef int i
+
+    add_group_footprint(state, prey, footprint)
+
+    # Liberties are checked for legality and eyes.
+    locations = group_get_liberties(prey)
+    for loc in locations:
+        add_3x3_footprint(state, loc, footprint)
+
+    # Adjacent groups in atari can be captured to escape.
+    locations = group_get_stones(prey)
+    for loc in locations:
+        for i in range(4):
+            neighbor_group = state.board[d(state.ptr_neighbor)[loc * 4 + i]]
+            if d(neighbor_group).color > stone_t.EMPTY and \
+                    d(neighbor_group).color != d(prey).color and \
+                    d(neighbor_group).count_liberty == 1:
+                add_group_footprint(state, neighbor_group, footprint)
+                add_3x3_footprint(state, group_get_liberty(neighbor_group), footprint)
+
+cdef zobrist_hash_t get_region_hash(GameState state, vector[location_t] &region) nogil:
+    """Hash of the color, liberty count and eye status at every location of region
+    """
+
+    cdef zobrist_hash_t region_hash = 0
+    cdef zobrist_hash_t cell
+    cdef Group* group
+    cdef location_t loc
+
+    for loc in region:
+        group = state.board[loc].get()
+        cell = group.color | group.count_liberty << 3 | state.eye_black[loc] << 12 | \
+            state.eye_white[loc] << 16
+        # Mix with the zobrist key of the location so that equal cells at different locations
+        # give different values.
+        region_hash ^= mix_bits(d(state.ptr_zobrist_lookup)[2 * loc] ^ cell)
+
+    return region_hash
+
+
+############################################################################
+#   Ladder result cache                                                    #
+#                                                                          #
+############################################################################
+
+cdef class LadderCache:
+
+    ############################################################################
+    #   Variables are declared in the .pxd file                                #
+    #                                                                          #
+    ############################################################################
+
+    """
+    # Results of previous searches, by a hash of prey, move and search type
+    cdef unordered_map[zobrist_hash_t, LadderEntry] entries
+
+    # Entries are dropped when there are more than this many
+    cdef size_t max_entries
+
+    # Number of searches answered from the cache and number of searches that were run
+    cdef long hits, misses
+    """
+
+    ############################################################################
+    #   init function                                                          #
+    #                                                                          #
+    ############################################################################
+
+    def __init__(self, max_entries=10000):
+        """Create an empty cache. It is meant to follow one game: a ladder search is reused in a
+           later position if the prey group and the move are the same and no location the search
+           looked at has changed color, liberty count or eye status. The cache is cleared when it
+           holds max_entries results.
+
+           Legality is treated as local to the region: with superko enforced, a reused result can
+           only differ from a new search if the ladder passes through a whole-board position that
+           repeats an earlier one.
+        """
+
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    ############################################################################
+    #   cdef functions                                                         #
+    #                                                                          #
+    ############################################################################
+
+    cdef bool search(self, GameState state, group_ptr_t prey, location_t move, bool capture) nogil:  # noqa:E501
+        """is_ladder_capture_move() if capture, else is_ladder_escape_move(), with the default
+           depth. The result is reused while prey, move and the board region the search depends
+           on are unchanged.
+        """
+
+        cdef zobrist_hash_t prey_hash, key
+        cdef unordered_map[zobrist_hash_t, LadderEntry].iterator it
+        cdef location_set_t footprint
+        cdef location_t loc
+        cdef LadderEntry entry
+
+        prey_hash = update_hash_by_group(0, d(state.ptr_zobrist_lookup), prey)
+        key = prey_hash ^ mix_bits(2 * move + capture)
+
+        it = self.entries.find(key)
+        if it != self.entries.end() and d(it).second.prey_hash == prey_hash and \
+                d(it).second.move == move and d(it).second.capture == capture and \
+                get_region_hash(state, d(it).second.region) == d(it).second.region_hash:
+            self.hits += 1
+            return d(it).second.result
+
+        self.misses += 1
+        if capture:
+            entry.result = is_ladder_capture_move(state, prey, move, LADDER_DEPTH, &footprint)
+        else:
+            entry.result = is_ladder_escape_move(state, prey, move, LADDER_DEPTH, &footprint)
+
+        entry.prey_hash = prey_hash
+        entry.move = move
+        entry.capture = capture
+        for loc in footprint:
+            entry.region.push_back(loc)
+        entry.region_hash = get_region_hash(state, entry.region)
+
+        if self.entries.size() >= self.max_entries:
+            self.entries.clear()
+        self.entries[key] = entry
+
+        return entry.result
+
+    cdef bool is_ladder_capture_move(self, GameState state, group_ptr_t prey, location_t move) nogil:  # noqa:E501
+        """Cached is_ladder_capture_move()
+        """
+
+        return self.search(state, prey, move, True)
+
+    cdef bool is_ladder_escape_move(self, GameState state, group_ptr_t prey, location_t move) nogil:  # noqa:E501
+        """Cached is_ladder_escape_move()
+        """
+
+        return self.search(state, prey, move, False)
+
+    ############################################################################
+    #   public def functions (Python)                                          #
+    #                                                                          #
+    ############################################################################
+
+    def __len__(self):
+        return self.entries.size()
+
+    def get_hits(self):
+        """Return the number of searches answered from the cache
+        """
+        return self.hits
+
+    def get_misses(self):
+        """Return the number of searches that were run and stored
+        """
+        return self.misses
+
+    def clear(self):
+        """Drop all results and reset the hit and miss counts
+        """
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
@@ -4,24 +4,40 @@ This is a "pure" implementation of the AlphaGo MCTS algorithm in that it is not
 game of Go; everything in this file is implemented generically with respect to some state, actions,
 policy function, and value function.
 """
+import multiprocessing
 import numpy as np
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+from math import sqrt
 from operator import itemgetter
 
+# Child statistics of all nodes that were not expanded yet. This array is never modified.
+_NO_CHILDREN = np.empty(0)
+
 
 class TreeNode(object):
-    """A node in the MCTS tree. Each node keeps track of its own value Q, prior probability P, and
-    its visit-count-adjusted prior score u.
+    """A node in the MCTS tree. Each node keeps track of its own value Q and visit count N. An
+    expanded node also keeps the prior probabilities P, visit counts and values of all its children
+    in arrays, so that selection is a single vectorized operation over all children.
     """
 
-    def __init__(self, parent, prior_p):
+    def __init__(self, parent, index=0):
+        """Arguments:
+        parent -- the parent TreeNode, or None for the root.
+        index -- position of this node among the children of its parent.
+        """
         self._parent = parent
+        self._index = index
         self._children = {}  # a map from action to TreeNode
         self._n_visits = 0
         self._Q = 0
-        # This value for u will be overwritten in the first call to update(), but is useful for
-        # choosing the first action from this node.
-        self._u = prior_p
-        self._P = prior_p
+        # Per-child statistics in the order of expansion. The visit counts and values are copies
+        # of the children's _n_visits and _Q, kept up to date by the children.
+        self._child_actions = []
+        self._child_nodes = []
+        self._priors = self._child_visits = self._child_values = _NO_CHILDREN
 
     def expand(self, action_priors):
         """Expand tree by creating new children.
@@ -31,27 +47,47 @@ class TreeNode(object):
             probability according to the policy function.
 
         Returns:
-        None
+        The number of new children
         """
-        for action, prob in action_priors:
-            if action not in self._children:
-                self._children[action] = TreeNode(self, prob)
+        # Actions that are already children keep their node and prior.
+        action_priors = [(action, prob) for action, prob in action_priors
+                         if action not in self._children]
+        n_children = len(self._child_nodes)
+        nodes = [TreeNode(self, n_children + i) for i in range(len(action_priors))]
+        self._children.update((action, node) for (action, _), node in zip(action_priors, nodes))
+        self._child_actions.extend(action for action, _ in action_priors)
+        self._child_nodes.extend(nodes)
+        self._priors = np.append(self._priors, [prob for _, prob in action_priors])
+        self._child_visits = np.append(self._child_visits, np.zeros(len(nodes)))
+        self._child_values = np.append(self._child_values, np.zeros(len(nodes)))
+        return len(nodes)
 
-    def select(self):
-        """Select action among children that gives maximum action value, Q plus bonus u(P).
+    def remove_children(self):
+        """Remove the subtree below this node, making it a leaf again that keeps its own
+        statistics.
+        """
+        self._children = {}
+        self._child_actions = []
+        self._child_nodes = []
+        self._priors = self._child_visits = self._child_values = _NO_CHILDREN
+
+    def select(self, c_puct):
+        """Select action among children that gives maximum action value, Q plus bonus
+        u = c_puct * P * sqrt(N_parent) / (1 + N). A node without visits is counted as one visit so
+        that the first selection follows the prior.
 
         Returns:
         A tuple of (action, next_node)
         """
-        return max(self._children.iteritems(), key=lambda act_node: act_node[1].get_value())
+        u = (c_puct * sqrt(max(self._n_visits, 1))) * self._priors / (1 + self._child_visits)
+        i = np.argmax(self._child_values + u)
+        return self._child_actions[i], self._child_nodes[i]
 
-    def update(self, leaf_value, c_puct):
+    def update(self, leaf_value):
         """Update node values from leaf evaluation.
 
         Arguments:
         leaf_value -- the value of subtree evaluation from the current player's perspective.
-        c_puct -- a number in (0, inf) controlling the relative impact of values, Q, and
-            prior probability, P, on this node's score.
 
         Returns:
         None
@@ -60,27 +96,55 @@ class TreeNode(object):
         self._n_visits += 1
         # Update Q, a running average of values for all visits.
         self._Q += (leaf_value - self._Q) / self._n_visits
-        # Update u, the prior weighted by an exploration hyperparameter c_puct and the number of
-        # visits. Note that u is not normalized to be a distribution.
-        if not self.is_root():
-            self._u = c_puct * self._P * np.sqrt(self._parent._n_visits) / (1 + self._n_visits)
+        self._update_parent()
 
-    def update_recursive(self, leaf_value, c_puct):
+    def update_recursive(self, leaf_value):
         """Like a call to update(), but applied recursively for all ancestors.
-
-        Note: it is important that this happens from the root downward so that 'parent' visit
-        counts are correct.
         """
-        # If it is not root, this node's parent should be updated first.
         if self._parent:
-            self._parent.update_recursive(leaf_value, c_puct)
-        self.update(leaf_value, c_puct)
+            self._parent.update_recursive(leaf_value)
+        self.update(leaf_value)
+
+    def add_virtual_loss(self, virtual_loss):
+        """Count 'virtual_loss' visits that all lost (value -1) so that other searches running in
+        parallel are discouraged from following the same path before its result is known. Must be
+        undone with revert_virtual_loss() before the real result is backed up with update().
+        """
+        # Note: Q is a running average, so 'Q * n' is the total value of all visits.
+        n_visits = self._n_visits + virtual_loss
+        self._Q = (self._Q * self._n_visits - virtual_loss) / float(n_visits)
+        self._n_visits = n_visits
+        self._update_parent()
+
+    def revert_virtual_loss(self, virtual_loss):
+        """Undo a previous call to add_virtual_loss() with the same 'virtual_loss'.
+        """
+        n_visits = self._n_visits - virtual_loss
+        self._Q = (self._Q * self._n_visits + virtual_loss) / float(n_visits) if n_visits > 0 else 0
+        self._n_visits = n_visits
+        self._update_parent()
 
-    def get_value(self):
+    def _update_parent(self):
+        """Copy the visit count and value of this node to the child arrays of its parent.
+        """
+        if not self.is_root():
+            self._parent._child_visits[self._index] = self._n_visits
+            self._parent._child_values[self._index] = self._Q
+
+    def get_prior(self):
+        """Return the prior probability of this node, or 1 for the root.
+        """
+        return 1.0 if self.is_root() else self._parent._priors[self._index]
+
+    def get_value(self, c_puct):
         """Calculate and return the value for this node: a combination of leaf evaluations, Q, and
-        this node's prior adjusted for its visit count, u
+        this node's prior adjusted for its visit count, u. This is the value used by select().
         """
-        return self._Q + self._u
+        if self.is_root():
+            return self._Q
+        u = c_puct * self.get_prior() * sqrt(max(self._parent._n_visits, 1)) / \
+            (1 + self._n_visits)
+        return self._Q + u
 
     def is_leaf(self):
         """Check if leaf node (i.e. no nodes below this have been expanded).
@@ -90,6 +154,347 @@ class TreeNode(object):
     def is_root(self):
         return self._parent is None
 
+    def count_nodes(self):
+        """Return the number of nodes in the subtree of this node, including itself.
+        """
+        count = 1
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            count += len(node._child_nodes)
+            stack.extend(node._child_nodes)
+        return count
+
+
+class ArrayTree(object):
+    """An MCTS tree that keeps the statistics of all nodes in preallocated numpy arrays instead of
+    one TreeNode object per node. Nodes are integer indices into these arrays, and the children of
+    an expanded node occupy one contiguous range of indices, so that selection is a single
+    vectorized operation over that range.
+
+    Per node, the arrays hold the visit count N, total value W, mean value Q = W / N, prior P, the
+    parent and the first child and number of children. Actions are stored as small integer ids;
+    each distinct action is stored only once for the whole tree. The arrays grow by doubling when
+    they are full.
+    """
+
+    def __init__(self, capacity=1 << 16):
+        self._actions = []  # a map from action id to action
+        self._action_ids = {}  # a map from action to action id
+        self._allocate(capacity)
+        self.clear()
+
+    def _allocate(self, capacity):
+        """Replace all arrays by new ones with room for 'capacity' nodes.
+        """
+        self._parent = np.empty(capacity, dtype=np.int32)
+        self._first_child = np.empty(capacity, dtype=np.int32)
+        self._n_children = np.empty(capacity, dtype=np.int32)
+        self._action = np.empty(capacity, dtype=np.int32)
+        self._N = np.empty(capacity, dtype=np.int32)
+        self._W = np.empty(capacity, dtype=np.float32)
+        self._Q = np.empty(capacity, dtype=np.float32)
+        self._P = np.empty(capacity, dtype=np.float32)
+
+    def _arrays(self):
+        return [self._parent, self._first_child, self._n_children, self._action, self._N, self._W,
+                self._Q, self._P]
+
+    def _reserve(self, count):
+        """Make sure there is room for 'count' more nodes.
+        """
+        capacity = len(self._N)
+        if self._size + count <= capacity:
+            return
+        old_arrays = self._arrays()
+        self._allocate(max(2 * capacity, self._size + count))
+        for new, old in zip(self._arrays(), old_arrays):
+            new[:self._size] = old[:self._size]
+
+    def _init_nodes(self, start, end, parent, prior):
+        self._parent[start:end] = parent
+        self._first_child[start:end] = -1
+        self._n_children[start:end] = 0
+        self._N[start:end] = 0
+        self._W[start:end] = 0
+        self._Q[start:end] = 0
+        self._P[start:end] = prior
+
+    def clear(self):
+        """Remove all nodes except for a new root, which has index 0.
+        """
+        self._size = 1
+        self.root = 0
+        self._init_nodes(0, 1, -1, 1.0)
+        self._action[0] = -1
+
+    def __len__(self):
+        """Return the number of nodes in the tree.
+        """
+        return self._size
+
+    def _get_action_id(self, action):
+        action_id = self._action_ids.get(action)
+        if action_id is None:
+            action_id = len(self._actions)
+            self._action_ids[action] = action_id
+            self._actions.append(action)
+        return action_id
+
+    def expand(self, node, action_priors):
+        """Expand a leaf node by creating one child per action.
+
+        Arguments:
+        node -- index of the node to expand; it must be a leaf.
+        action_priors -- output from policy function - a list of tuples of actions and their prior
+            probability according to the policy function.
+
+        Returns:
+        None
+        """
+        count = len(action_priors)
+        self._reserve(count)
+        start, end = self._size, self._size + count
+        self._init_nodes(start, end, node, [prob for _, prob in action_priors])
+        self._action[start:end] = [self._get_action_id(action) for action, _ in action_priors]
+        self._first_child[node] = start
+        self._n_children[node] = count
+        self._size = end
+
+    def is_leaf(self, node):
+        """Check if leaf node (i.e. no nodes below this have been expanded).
+        """
+        return self._first_child[node] < 0
+
+    def select(self, node, c_puct):
+        """Select the child with maximum action value, Q plus bonus u(P). Here
+        u = c_puct * P * sqrt(N_parent) / (1 + N), computed for all children at once. A parent
+        without visits is counted as one visit so that the first selection follows the prior.
+
+        Returns:
+        A tuple of (action, child)
+        """
+        start = int(self._first_child[node])
+        end = start + int(self._n_children[node])
+        u = (c_puct * sqrt(max(int(self._N[node]), 1))) * self._P[start:end] / \
+            (1 + self._N[start:end])
+        child = start + int(np.argmax(self._Q[start:end] + u))
+        return self._actions[self._action[child]], child
+
+    def update_recursive(self, node, leaf_value):
+        """Add one visit with value leaf_value to node and all of its ancestors.
+        """
+        path = []
+        while node >= 0:
+            path.append(node)
+            node = int(self._parent[node])
+        self._N[path] += 1
+        self._W[path] += leaf_value
+        self._Q[path] = self._W[path] / self._N[path]
+
+    def get_visits(self, node):
+        return int(self._N[node])
+
+    def get_value(self, node):
+        return float(self._Q[node])
+
+    def get_children(self, node):
+        """Return a dict from action to child index for all children of node.
+        """
+        start = self._first_child[node]
+        if start < 0:
+            return {}
+        return {self._actions[self._action[child]]: child
+                for child in range(start, start + self._n_children[node])}
+
+    def get_child_visits(self, node):
+        """Return the visit counts of all children of node.
+        """
+        start = self._first_child[node]
+        if start < 0:
+            return self._N[:0]
+        return self._N[start:start + self._n_children[node]]
+
+    def get_most_visited_action(self, node):
+        """Return the action of the child of node with the most visits.
+        """
+        start = self._first_child[node]
+        child = start + int(np.argmax(self._N[start:start + self._n_children[node]]))
+        return self._actions[self._action[child]]
+
+    def reroot(self, node):
+        """Make node the new root, and remove all nodes that are not in its subtree. The remaining
+        nodes are moved to the front of the arrays, so that the tree uses no more memory than its
+        number of nodes.
+        """
+        self._compact(node)
+
+    def prune(self, max_nodes):
+        """Remove the children of the least visited nodes, so that at most max_nodes nodes remain.
+        The nodes whose children are removed become leaves again, and keep their own statistics.
+        The children of the root are always kept.
+        """
+        if self._size <= max_nodes:
+            return
+        # Keep the children of the most visited expanded nodes. Nodes have no more visits than
+        # their parent, so these nodes form a tree below the root.
+        expanded = np.flatnonzero(self._first_child[:self._size] >= 0)
+        expanded = expanded[np.argsort(-self._N[expanded], kind='mergesort')]
+        n_kept = 1 + np.cumsum(self._n_children[expanded])
+        keep_children = np.zeros(self._size, dtype=bool)
+        keep_children[expanded[n_kept <= max_nodes]] = True
+        self._compact(self.root, keep_children)
+
+    def _compact(self, node, keep_children=None):
+        """Make node the new root and move its subtree to the front of the arrays. If keep_children
+        is given, the children of nodes other than the root are only kept where it is True.
+        """
+        old_arrays = self._arrays()
+        old_parent, old_first_child, old_n_children = old_arrays[:3]
+        self._allocate(len(self._N))
+
+        # Copy the subtree one range of siblings at a time. 'new_parent' is the new index of the
+        # parent of each range.
+        self._size = 1
+        for new, old in zip(self._arrays(), old_arrays):
+            new[0] = old[node]
+        self._parent[0] = -1
+        ranges = [(0, node)]
+        while ranges:
+            new_parent, old_node = ranges.pop()
+            start, count = old_first_child[old_node], old_n_children[old_node]
+            if start < 0:
+                continue
+            if keep_children is not None and not keep_children[old_node] and new_parent != 0:
+                self._first_child[new_parent] = -1
+                self._n_children[new_parent] = 0
+                continue
+            new_start = self._size
+            for new, old in zip(self._arrays(), old_arrays):
+                new[new_start:new_start + count] = old[start:start + count]
+            self._parent[new_start:new_start + count] = new_parent
+            self._first_child[new_parent] = new_start
+            self._size += count
+            ranges.extend((new_start + i, start + i) for i in range(count))
+
+        self.root = 0
+
+
+class TranspositionTable(object):
+    """A cache of policy and value evaluations of positions, so that a position that is reached
+    again, for example by a different move order, is not evaluated again. Positions are identified
+    by the Zobrist hash of the board, the player to move and the ko location. The situational
+    superko history is not part of the key, so in rare cases the cached priors of a position may
+    include a move that is illegal on another path; policy functions only return legal moves, so
+    callers should skip such moves.
+
+    The table holds at most max_size positions, and when it is full the least recently used
+    position is evicted. It may be shared by several threads, but the evaluation functions are
+    called without holding its lock, so two threads may evaluate the same new position at once.
+    """
+
+    def __init__(self, max_size=100000):
+        self._entries = OrderedDict()  # a map from position key to [priors, value]
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Reset the counts of hits, misses and evictions.
+        """
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_hit_rate(self):
+        """Return the fraction of lookups that were answered from the table.
+        """
+        lookups = self.hits + self.misses
+        return self.hits / float(lookups) if lookups > 0 else 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lookup(self, state, field, evaluate):
+        """Return entry[field] for the position of 'state', calling evaluate(state) and storing
+        its result if it is not in the table yet.
+        """
+        key = (state.get_hash(), state.get_current_player(), state.get_ko_location())
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                # Move the entry to the end, where the most recently used entries are.
+                self._entries[key] = entry
+                if entry[field] is not None:
+                    self.hits += 1
+                    return entry[field]
+            self.misses += 1
+
+        result = evaluate(state)
+
+        with self._lock:
+            entry = self._entries.pop(key, None) or [None, None]
+            entry[field] = result
+            self._entries[key] = entry
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return result
+
+    def get_priors(self, state, policy_fn):
+        """Return policy_fn(state), evaluated only if the position is not in the table.
+        """
+        return self._lookup(state, 0, policy_fn)
+
+    def get_value(self, state, value_fn):
+        """Return value_fn(state), evaluated only if the position is not in the table.
+        """
+        return self._lookup(state, 1, value_fn)
+
+
+class BatchRollout(object):
+    """Plays the rollouts of many states in lockstep, with one call to a batch rollout policy per
+    move for all games that are still running.
+
+    Like MCTS._evaluate_rollout(), every game is played greedily by the rollout policy until it
+    returns no moves or the move limit is reached. The states are modified in-place with
+    state.push().
+    """
+
+    def __init__(self, batch_policy_fn, rollout_limit=500):
+        """Arguments:
+        batch_policy_fn -- a function that takes a list of states and returns a parallel list of
+            (action, probability) lists, such as CNNRollout.batch_eval_state.
+        rollout_limit -- maximum number of moves played in each game.
+        """
+        self._batch_policy = batch_policy_fn
+        self._rollout_limit = rollout_limit
+        self.n_batches = 0
+
+    def run(self, states):
+        """Play out all states, returning a list with +1 for every state whose current player wins
+        and -1 otherwise.
+        """
+        players = [state.get_current_player() for state in states]
+        active = list(range(len(states)))
+        for i in range(self._rollout_limit):
+            if len(active) == 0:
+                break
+            all_action_probs = self._batch_policy([states[j] for j in active])
+            self.n_batches += 1
+            # Retire the games for which the policy has no more moves.
+            still_active = []
+            for j, action_probs in zip(active, all_action_probs):
+                if len(action_probs) > 0:
+                    states[j].push(max(action_probs, key=itemgetter(1))[0])
+                    still_active.append(j)
+            active = still_active
+        else:
+            if len(active) > 0:
+                print("WARNING: rollout reached move limit")
+        return [1 if state.get_winner_color() == player else -1
+                for state, player in zip(states, players)]
+
 
 class MCTS(object):
     """A simple (and slow) single-threaded implementation of Monte Carlo Tree Search.
@@ -104,37 +509,93 @@ class MCTS(object):
 
     The term "playout" refers to a single search from the root, whereas "rollout" refers to the
     fast evaluation from leaf nodes to the end of the game.
+
+    The tree is kept from one move to the next. get_move() first moves the root to the given
+    state by following the moves of both players that were played since the previous call, as
+    recorded in the state's history. This assumes that players alternate, as they do in Go.
+
+    With a batch rollout policy, playouts are run in groups: the leaves of rollout_batch_size
+    playouts are selected one after another, using a virtual loss to spread them over the tree,
+    and then played out together by a BatchRollout.
     """
 
     def __init__(self, value_fn, policy_fn, rollout_policy_fn, lmbda=0.5, c_puct=5,
-                 rollout_limit=500, playout_depth=20, n_playout=10000):
+                 rollout_limit=500, playout_depth=20, n_playout=10000, transposition_table=None,
+                 max_nodes=None, batch_rollout_policy_fn=None, rollout_batch_size=16):
         """Arguments:
         value_fn -- a function that takes in a state and ouputs a score in [-1, 1], i.e. the
             expected value of the end game score from the current player's perspective.
         policy_fn -- a function that takes in a state and outputs a list of (action, probability)
             tuples for the current player.
-        rollout_policy_fn -- a coarse, fast version of policy_fn used in the rollout phase.
+        rollout_policy_fn -- a coarse, fast version of policy_fn used in the rollout phase. This may
+            also be an object with a run_rollout(state, limit) method, such as a
+            LinearRolloutPolicy, which plays out the whole rollout itself.
         lmbda -- controls the relative weight of the value network and fast rollout policy result
             in determining the value of a leaf node. lmbda must be in [0, 1], where 0 means use only
             the value network and 1 means use only the result from the rollout.
         c_puct -- a number in (0, inf) that controls how quickly exploration converges to the
             maximum-value policy, where a higher value means relying on the prior more, and
             should be used only in conjunction with a large value for n_playout.
+        transposition_table -- an optional TranspositionTable. If given, policy and value
+            evaluations of positions that were seen before are taken from the table.
+        max_nodes -- an optional limit on the number of nodes in the tree. When the tree grows
+            larger, the subtrees of the least visited nodes are removed.
+        batch_rollout_policy_fn -- an optional batch version of rollout_policy_fn, which takes a
+            list of states and returns a parallel list of (action, probability) lists. If given,
+            rollouts are run in groups of rollout_batch_size with a BatchRollout.
+        rollout_batch_size -- number of playouts whose leaves are played out together.
         """
-        self._root = TreeNode(None, 1.0)
+        self._root = TreeNode(None)
         self._value = value_fn
         self._policy = policy_fn
         self._rollout = rollout_policy_fn
+        self._run_rollout = getattr(rollout_policy_fn, "run_rollout", None)
         self._lmbda = lmbda
         self._c_puct = c_puct
         self._rollout_limit = rollout_limit
         self._L = playout_depth
         self._n_playout = n_playout
+        self._table = transposition_table
+        self._max_nodes = max_nodes
+        self._n_nodes = 1
+        self._batch_rollout = None
+        if batch_rollout_policy_fn is not None:
+            self._batch_rollout = BatchRollout(batch_rollout_policy_fn, rollout_limit)
+        self._rollout_batch_size = rollout_batch_size
+        # Number of lost visits temporarily added to the nodes on the path of a pending playout.
+        self._virtual_loss = 1
+        # The moves leading to the position of the root, and the player to move after
+        # _sync_length of these moves, or None if the position of the root is not known.
+        self._history = None
+        self._sync_length = 0
+        self._sync_player = None
+        # Progress of the current or last search.
+        self._n_searched = 0
+        self._search_start = 0.0
+        self._search_time = 0.0
+        self._deadline = None
+
+    def _evaluate_policy(self, state):
+        """Return the output of policy_fn for state, from the transposition table if possible.
+        """
+        if self._table is None:
+            return self._policy(state)
+        # A cached evaluation from another path may include moves that are illegal here because
+        # of superko.
+        return [(action, prob) for action, prob in self._table.get_priors(state, self._policy)
+                if action is None or state.is_legal(action)]
+
+    def _evaluate_value(self, state):
+        """Return the output of value_fn for state, from the transposition table if possible.
+        """
+        if self._table is None:
+            return self._value(state)
+        return self._table.get_value(state, self._value)
 
     def _playout(self, state, leaf_depth):
         """Run a single playout from the root to the given depth, getting a value at the leaf and
-        propagating it back through its parents. State is modified in-place, so a copy must be
-        provided.
+        propagating it back through its parents. State is modified in-place with state.push(), so
+        either a copy must be provided or all moves must be undone with state.pop() afterwards.
 
         Arguments:
         state -- a copy of the state.
@@ -148,69 +609,758 @@ class MCTS(object):
             # Only expand node if it has not already been done. Existing nodes already know their
             # prior.
             if node.is_leaf():
-                action_probs = self._policy(state)
+                action_probs = self._evaluate_policy(state)
                 # Check for end of game.
                 if len(action_probs) == 0:
                     break
-                node.expand(action_probs)
+                self._n_nodes += node.expand(action_probs)
             # Greedily select next move.
-            action, node = node.select()
-            state.do_move(action)
+            action, node = node.select(self._c_puct)
+            state.push(action)
 
         # Evaluate the leaf using a weighted combination of the value network, v, and the game's
         # winner, z, according to the rollout policy. If lmbda is equal to 0 or 1, only one of
         # these contributes and the other may be skipped. Both v and z are from the perspective
         # of the current player (+1 is good, -1 is bad).
-        v = self._value(state) if self._lmbda < 1 else 0
+        v = self._evaluate_value(state) if self._lmbda < 1 else 0
         z = self._evaluate_rollout(state, self._rollout_limit) if self._lmbda > 0 else 0
         leaf_value = (1 - self._lmbda) * v + self._lmbda * z
 
         # Update value and visit count of nodes in this traversal.
-        node.update_recursive(leaf_value, self._c_puct)
+        node.update_recursive(leaf_value)
+
+    def _playout_batch(self, state, leaf_depth, n_leaves):
+        """Run n_leaves playouts whose leaves are played out together by the BatchRollout. Every
+        playout walks down its own copy of state.
+        """
+        leaves = []
+        for k in range(n_leaves):
+            leaf_state = state.copy()
+            node = self._root
+            path = [node]
+            node.add_virtual_loss(self._virtual_loss)
+            for i in range(leaf_depth):
+                if node.is_leaf():
+                    action_probs = self._evaluate_policy(leaf_state)
+                    # Check for end of game.
+                    if len(action_probs) == 0:
+                        break
+                    self._n_nodes += node.expand(action_probs)
+                action, node = node.select(self._c_puct)
+                node.add_virtual_loss(self._virtual_loss)
+                path.append(node)
+                leaf_state.push(action)
+            v = self._evaluate_value(leaf_state) if self._lmbda < 1 else 0
+            leaves.append((path, leaf_state, v))
+
+        outcomes = self._batch_rollout.run([leaf_state for path, leaf_state, v in leaves])
+
+        # Replace the virtual loss by the real results (see ParallelMCTS._playout()).
+        for (path, leaf_state, v), z in zip(leaves, outcomes):
+            for path_node in path:
+                path_node.revert_virtual_loss(self._virtual_loss)
+            path[-1].update_recursive((1 - self._lmbda) * v + self._lmbda * z)
 
     def _evaluate_rollout(self, state, limit):
         """Use the rollout policy to play until the end of the game, returning +1 if the current
         player wins, -1 if the opponent wins, and 0 if it is a tie.
         """
         player = state.get_current_player()
+        if self._run_rollout is not None:
+            n_moves = self._run_rollout(state, limit)
+            if n_moves >= limit:
+                print("WARNING: rollout reached move limit")
+            return 1 if state.get_winner_color() == player else -1
         for i in range(limit):
             action_probs = self._rollout(state)
             if len(action_probs) == 0:
                 break
             max_action = max(action_probs, key=itemgetter(1))[0]
-            state.do_move(max_action)
+            state.push(max_action)
         else:
             # If no break from the loop, issue a warning.
             print("WARNING: rollout reached move limit")
         return 1 if state.get_winner_color() == player else -1
 
-    def get_move(self, state):
+    def get_move(self, state, time_limit=None):
         """Runs all playouts sequentially and returns the most visited action.
 
         Arguments:
         state -- the current state, including both game state and the current player.
+        time_limit -- if given, search for at most this many seconds instead of running n_playout
+            playouts. The search stops earlier when the most visited action can no longer be
+            overtaken in the remaining time.
 
         Returns:
         the selected action
         """
-        for n in range(self._n_playout):
+        self.update_with_state(state)
+        self._start_search(time_limit)
+
+        if self._batch_rollout is not None and self._lmbda > 0:
+            while not self._is_search_finished():
+                n_leaves = self._rollout_batch_size
+                if self._deadline is None:
+                    n_leaves = min(n_leaves, self._n_playout - self._n_searched)
+                self._n_searched += n_leaves
+                self._playout_batch(state, self._L, n_leaves)
+                self._enforce_node_budget()
+        else:
+            # All playouts walk down and back up a single copy of the state.
             state_copy = state.copy()
-            self._playout(state_copy, self._L)
+            while not self._is_search_finished():
+                self._n_searched += 1
+                self._playout(state_copy, self._L)
+                while state_copy.get_undo_depth() > 0:
+                    state_copy.pop()
+                self._enforce_node_budget()
 
+        self._search_time = time.time() - self._search_start
         # chosen action is the *most visited child*, not the highest-value one
         # (they are the same as self._n_playout gets large).
-        return max(self._root._children.iteritems(), key=lambda act_node: act_node[1]._n_visits)[0]
+        return self._select_action(state)
+
+    def get_playouts_per_second(self):
+        """Return the number of playouts per second of the last call to get_move().
+        """
+        return self._n_searched / self._search_time if self._search_time > 0 else 0.0
+
+    def _start_search(self, time_limit):
+        self._n_searched = 0
+        self._search_start = time.time()
+        self._deadline = self._search_start + time_limit if time_limit is not None else None
+
+    def _is_search_finished(self):
+        """Return True if no more playouts should be started for the current move, given that
+        _n_searched playouts have been started so far.
+        """
+        if self._deadline is None:
+            return self._n_searched >= self._n_playout
+        # At least one playout is run, however little time there is.
+        if self._n_searched == 0:
+            return False
+        now = time.time()
+        if now >= self._deadline:
+            return True
+        # Stop early if the playouts that fit in the remaining time, at the rate so far, can not
+        # make another action the most visited one.
+        rate = self._n_searched / (now - self._search_start)
+        visits = self._get_root_visits()
+        if len(visits) < 2:
+            # There is at most one action to choose from.
+            return True
+        second, best = np.partition(visits, -2)[-2:]
+        return best - second > rate * (self._deadline - now)
+
+    def _get_root_visits(self):
+        """Return the visit counts of the children of the root.
+        """
+        return self._root._child_visits
+
+    def _get_most_visited_action(self):
+        return self._root._child_actions[np.argmax(self._root._child_visits)]
+
+    def _select_action(self, state):
+        """Return the most visited action of the root. If the root has no children, e.g. because
+        policy_fn has no moves for state, return the action with the highest prior, or None (pass)
+        if there is none.
+        """
+        if len(self._get_root_visits()) > 0:
+            return self._get_most_visited_action()
+        action_probs = self._evaluate_policy(state)
+        if len(action_probs) == 0:
+            return None
+        return max(action_probs, key=itemgetter(1))[0]
 
     def update_with_move(self, last_move):
         """Step forward in the tree, keeping everything we already know about the subtree, assuming
         that get_move() has been called already. Siblings of the new root will be garbage-collected.
         """
+        self._move_root(last_move)
+        if self._history is not None:
+            self._history.append(last_move)
+
+    def update_with_state(self, state):
+        """Move the root to the position of 'state', keeping the subtree of that position if the
+        state continues the game of the root with one or more moves. Otherwise the tree is
+        cleared.
+        """
+        history = state.get_history()
+        player = state.get_current_player()
+        n_known = len(self._history) if self._history is not None else 0
+        # With alternating players, the player to move is the same after an even number of moves.
+        same_player = (len(history) - self._sync_length) % 2 == 0
+        if self._history is None or history[:n_known] != self._history or \
+                (player == self._sync_player) != same_player:
+            self._clear_tree()
+        else:
+            for move in history[n_known:]:
+                self.update_with_move(move)
+        self._history = history
+        self._sync_length = len(history)
+        self._sync_player = player
+
+    def _move_root(self, last_move):
+        """Make the child for last_move the new root, or clear the tree if there is no such child.
+        """
         if last_move in self._root._children:
             self._root = self._root._children[last_move]
             self._root._parent = None
+            if self._max_nodes is not None:
+                self._n_nodes = self._root.count_nodes()
         else:
-            self._root = TreeNode(None, 1.0)
+            self._clear_tree()
+
+    def _clear_tree(self):
+        """Replace the tree by a single root node.
+        """
+        self._root = TreeNode(None)
+        self._n_nodes = 1
+
+    def _enforce_node_budget(self):
+        """If the tree has more than max_nodes nodes, prune it to 3/4 of max_nodes, so that pruning
+        is not needed again after every playout.
+        """
+        if self._max_nodes is not None and self._n_nodes > self._max_nodes:
+            self._prune(self._max_nodes * 3 // 4)
+
+    def _prune(self, max_nodes):
+        """Remove the children of the least visited nodes, so that at most max_nodes nodes remain.
+        The children of the root are always kept.
+        """
+        expanded = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if not node.is_leaf():
+                expanded.append(node)
+                stack.extend(node._child_nodes)
+        # Keep the children of the most visited nodes. Nodes have no more visits than their
+        # parent, so these nodes form a tree below the root.
+        expanded.sort(key=lambda node: node._n_visits, reverse=True)
+        n_kept = 1
+        for node in expanded:
+            n_children = len(node._child_nodes)
+            if node is self._root or n_kept + n_children <= max_nodes:
+                n_kept += n_children
+            else:
+                node.remove_children()
+        self._n_nodes = self._root.count_nodes()
 
 
 class ParallelMCTS(MCTS):
-    pass
+    """Monte Carlo Tree Search with several worker threads that run playouts on a shared tree.
+
+    Each worker walks down the tree on its own copy of the state. Nodes on the path are given a
+    'virtual loss' as soon as they are selected, which lowers their value until the real result is
+    backed up, so that concurrent workers are steered towards different paths. Only tree
+    operations are done while holding a lock; policy, value and rollout evaluations of different
+    workers run concurrently. GameState releases the GIL while playing moves, so game play itself
+    runs in parallel as well.
+
+    Note that value_fn, policy_fn and rollout_policy_fn are called from several threads at once and
+    must be thread-safe. Network evaluations can be wrapped in a BatchEvaluator, which evaluates the
+    leaves of concurrent playouts in batches on a single thread.
+    """
+
+    def __init__(self, value_fn, policy_fn, rollout_policy_fn, lmbda=0.5, c_puct=5,
+                 rollout_limit=500, playout_depth=20, n_playout=10000, n_workers=4,
+                 virtual_loss=3, transposition_table=None, max_nodes=None):
+        """Arguments are the same as for MCTS, plus:
+        n_workers -- number of worker threads running playouts in parallel.
+        virtual_loss -- number of lost visits temporarily added to each node on the path of a
+            running playout.
+
+        Since playouts are running on the tree during search, the tree is only pruned to
+        max_nodes after all playouts of a move have finished.
+        """
+        super(ParallelMCTS, self).__init__(value_fn, policy_fn, rollout_policy_fn, lmbda, c_puct,
+                                           rollout_limit, playout_depth, n_playout,
+                                           transposition_table, max_nodes)
+        self._n_workers = n_workers
+        self._virtual_loss = virtual_loss
+        self._lock = threading.Lock()
+
+    def _playout(self, state, leaf_depth):
+        """Run a single playout from the root to the given depth like MCTS._playout(), while other
+        workers may be running playouts on the same tree.
+        """
+        node = self._root
+        path = [node]
+        with self._lock:
+            node.add_virtual_loss(self._virtual_loss)
+
+        for i in range(leaf_depth):
+            with self._lock:
+                is_leaf = node.is_leaf()
+            # The policy is evaluated outside of the lock; if another worker expands the same node
+            # in the meantime, expand() keeps the existing children.
+            if is_leaf:
+                action_probs = self._evaluate_policy(state)
+                # Check for end of game.
+                if len(action_probs) == 0:
+                    break
+                with self._lock:
+                    self._n_nodes += node.expand(action_probs)
+            with self._lock:
+                action, node = node.select(self._c_puct)
+                node.add_virtual_loss(self._virtual_loss)
+            path.append(node)
+            state.push(action)
+
+        # Evaluate the leaf (see MCTS._playout()).
+        v = self._evaluate_value(state) if self._lmbda < 1 else 0
+        z = self._evaluate_rollout(state, self._rollout_limit) if self._lmbda > 0 else 0
+        leaf_value = (1 - self._lmbda) * v + self._lmbda * z
+
+        # Replace the virtual loss by the real result, from the root downward.
+        with self._lock:
+            for path_node in path:
+                path_node.revert_virtual_loss(self._virtual_loss)
+            node.update_recursive(leaf_value)
+
+    def _worker(self, state):
+        """Run playouts on 'state' until the search of this move is finished.
+        """
+        while True:
+            with self._lock:
+                if self._is_search_finished():
+                    return
+                self._n_searched += 1
+
+            self._playout(state, self._L)
+            while state.get_undo_depth() > 0:
+                state.pop()
+
+    def get_move(self, state, time_limit=None):
+        """Runs all playouts on n_workers threads and returns the most visited action. Arguments
+        are the same as for MCTS.get_move().
+        """
+        self.update_with_state(state)
+        self._start_search(time_limit)
+
+        # Every worker walks down and back up its own copy of the state.
+        pool = ThreadPool(self._n_workers)
+        try:
+            pool.map(self._worker, [state.copy() for _ in range(self._n_workers)])
+        finally:
+            pool.close()
+            pool.join()
+        self._search_time = time.time() - self._search_start
+        self._enforce_node_budget()
+
+        return self._select_action(state)
+
+
+class ArrayMCTS(MCTS):
+    """Single-threaded Monte Carlo Tree Search like MCTS, storing the tree in an ArrayTree instead
+    of TreeNode objects. This uses far less memory per node and spends less time in the
+    interpreter for expansion and selection, so much larger trees can be searched.
+    """
+
+    def __init__(self, value_fn, policy_fn, rollout_policy_fn, lmbda=0.5, c_puct=5,
+                 rollout_limit=500, playout_depth=20, n_playout=10000, capacity=1 << 16,
+                 transposition_table=None, max_nodes=None):
+        """Arguments are the same as for MCTS, plus:
+        capacity -- number of nodes for which memory is allocated initially.
+        """
+        super(ArrayMCTS, self).__init__(value_fn, policy_fn, rollout_policy_fn, lmbda, c_puct,
+                                        rollout_limit, playout_depth, n_playout,
+                                        transposition_table, max_nodes)
+        self._tree = ArrayTree(capacity)
+        self._root = None
+
+    def _playout(self, state, leaf_depth):
+        """Run a single playout from the root to the given depth, see MCTS._playout().
+        """
+        tree = self._tree
+        node = tree.root
+        for i in range(leaf_depth):
+            if tree.is_leaf(node):
+                action_probs = self._evaluate_policy(state)
+                # Check for end of game.
+                if len(action_probs) == 0:
+                    break
+                tree.expand(node, action_probs)
+            # Greedily select next move.
+            action, node = tree.select(node, self._c_puct)
+            state.push(action)
+
+        # Evaluate the leaf (see MCTS._playout()).
+        v = self._evaluate_value(state) if self._lmbda < 1 else 0
+        z = self._evaluate_rollout(state, self._rollout_limit) if self._lmbda > 0 else 0
+        leaf_value = (1 - self._lmbda) * v + self._lmbda * z
+
+        # Update value and visit count of nodes in this traversal.
+        tree.update_recursive(node, leaf_value)
+
+    def _get_root_visits(self):
+        return self._tree.get_child_visits(self._tree.root)
+
+    def _get_most_visited_action(self):
+        return self._tree.get_most_visited_action(self._tree.root)
+
+    def _move_root(self, last_move):
+        """Make the child for last_move the new root, removing all other nodes from the tree.
+        """
+        child = self._tree.get_children(self._tree.root).get(last_move)
+        if child is None:
+            self._tree.clear()
+        else:
+            self._tree.reroot(child)
+
+    def _clear_tree(self):
+        self._tree.clear()
+
+    def _enforce_node_budget(self):
+        if self._max_nodes is not None and len(self._tree) > self._max_nodes:
+            self._tree.prune(self._max_nodes * 3 // 4)
+
+
+class RootParallelMCTS(MCTS):
+    """Root-parallel Monte Carlo Tree Search: n_processes worker processes each run an independent
+    search from the same root, and the visit counts of the children of their roots are summed to
+    choose the action. Since the workers share no tree, no locks are needed and the GIL of the
+    parent process is not a bottleneck.
+
+    Each worker searches n_playout / n_processes playouts, or until the time limit, and keeps its
+    own tree from one move to the next. The workers only explore different paths if evaluations
+    are random; numpy and rollout policies with a seed(seed) method, such as LinearRolloutPolicy,
+    are reseeded in every worker.
+
+    States are sent to the workers with pickle, so they must be picklable (GameState pickles to
+    the compact format of GameState.serialize()). Worker processes are forked when the first move
+    is searched, and must be stopped with close().
+    """
+
+    def __init__(self, value_fn, policy_fn, rollout_policy_fn, lmbda=0.5, c_puct=5,
+                 rollout_limit=500, playout_depth=20, n_playout=10000, n_processes=4,
+                 transposition_table=None, max_nodes=None):
+        """Arguments are the same as for MCTS, plus:
+        n_processes -- number of worker processes.
+
+        The transposition table and node budget apply to every worker.
+        """
+        super(RootParallelMCTS, self).__init__(value_fn, policy_fn, rollout_policy_fn, lmbda,
+                                               c_puct, rollout_limit, playout_depth, n_playout,
+                                               transposition_table, max_nodes)
+        n_worker_playout = -(-n_playout // n_processes)
+        self._worker_args = (MCTS, (value_fn, policy_fn, rollout_policy_fn, lmbda, c_puct,
+                                    rollout_limit, playout_depth, n_worker_playout),
+                             {"transposition_table": transposition_table, "max_nodes": max_nodes})
+        self._n_processes = n_processes
+        self._processes = []
+        self._root_actions = []
+        self._root_visits = np.zeros(0)
+
+    def get_move(self, state, time_limit=None):
+        """Runs the searches of all workers and returns the action with most visits in total.
+        Arguments are the same as for MCTS.get_move().
+        """
+        self._start_search(time_limit)
+        if len(self._processes) == 0:
+            self._processes = _start_search_processes(self._n_processes, self._worker_args)
+
+        for process in self._processes:
+            process.send(_root_search_task, state, time_limit)
+
+        # Merge the visit counts of the children of all roots.
+        visits = {}
+        self._n_searched = 0
+        for process in self._processes:
+            child_visits, n_searched = process.receive()
+            for action, n_visits in child_visits:
+                visits[action] = visits.get(action, 0) + n_visits
+            self._n_searched += n_searched
+        self._root_actions = list(visits.keys())
+        self._root_visits = np.array(list(visits.values()))
+
+        self._search_time = time.time() - self._search_start
+        return self._select_action(state)
+
+    def close(self):
+        """Stop all worker processes.
+        """
+        for process in self._processes:
+            process.close()
+        self._processes = []
+
+    def _get_root_visits(self):
+        return self._root_visits
+
+    def _get_most_visited_action(self):
+        return self._root_actions[np.argmax(self._root_visits)]
+
+    def update_with_move(self, last_move):
+        """The workers follow the moves of the game through the history of the state passed to
+        get_move(), so there is nothing to do here.
+        """
+        pass
+
+
+class LeafParallelMCTS(MCTS):
+    """Leaf-parallel Monte Carlo Tree Search: the tree is searched in the parent process like
+    MCTS with a batch rollout policy, and the leaves of rollout_batch_size playouts are played out
+    together by n_processes worker processes.
+
+    Every worker uses rollout_policy_fn, so the rollouts do not need the GIL of the parent. States
+    must be picklable, and the worker processes must be stopped with close(), as for
+    RootParallelMCTS.
+    """
+
+    def __init__(self, value_fn, policy_fn, rollout_policy_fn, lmbda=0.5, c_puct=5,
+                 rollout_limit=500, playout_depth=20, n_playout=10000, n_processes=4,
+                 rollout_batch_size=None, transposition_table=None, max_nodes=None):
+        """Arguments are the same as for MCTS, plus:
+        n_processes -- number of worker processes.
+        rollout_batch_size -- number of leaves played out together, by default 2 * n_processes.
+        """
+        super(LeafParallelMCTS, self).__init__(value_fn, policy_fn, rollout_policy_fn, lmbda,
+                                               c_puct, rollout_limit, playout_depth, n_playout,
+                                               transposition_table, max_nodes)
+        self._batch_rollout = _ProcessRollout(
+            n_processes, (MCTS, (value_fn, policy_fn, rollout_policy_fn, lmbda, c_puct,
+                                 rollout_limit), {}))
+        self._rollout_batch_size = rollout_batch_size or 2 * n_processes
+
+    def close(self):
+        """Stop all worker processes.
+        """
+        self._batch_rollout.close()
+
+
+class BatchEvaluator(object):
+    """Collects single-state evaluations from many threads into batches for a batch function.
+
+    An instance is called like a policy or value function, evaluator(state), and blocks until the
+    result is known. A background thread collects pending states until there are max_batch_size of
+    them or the oldest one has waited max_wait seconds, and evaluates them with one call to
+    batch_fn. This makes it possible to give ParallelMCTS, for example,
+    BatchEvaluator(policy.batch_eval_state) and BatchEvaluator(value.batch_eval_state) so that
+    leaves of all in-flight playouts are evaluated together. Since only the background thread calls
+    batch_fn, it does not need to be thread-safe.
+
+    States must not be changed by other threads while they are being evaluated.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=16, max_wait=0.001):
+        """Arguments:
+        batch_fn -- a function that takes a list of states and returns a parallel list (or array)
+            of results, such as CNNPolicy.batch_eval_state or CNNValue.batch_eval_state.
+        max_batch_size -- maximum number of states passed to one call of batch_fn.
+        max_wait -- maximum time in seconds that a state waits for the batch to fill up.
+        """
+        self._batch_fn = batch_fn
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait
+        self._pending = []
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self.n_batches = 0
+        self.n_evaluations = 0
+
+    def __call__(self, state):
+        """Evaluate a single state, batched with the states of other callers.
+        """
+        request = _EvaluationRequest(state)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("BatchEvaluator is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+            self._pending.append(request)
+            self._condition.notify_all()
+        return request.get_result()
+
+    def get_average_batch_size(self):
+        """Return the average number of states per call to batch_fn so far
+        """
+        return self.n_evaluations / float(self.n_batches) if self.n_batches > 0 else 0.0
+
+    def close(self):
+        """Stop the background thread after evaluating all pending states.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _next_batch(self):
+        """Wait for the next batch of requests, or return an empty list once closed.
+        """
+        with self._condition:
+            while not self._pending and not self._closed:
+                self._condition.wait()
+
+            # Wait for more states until the batch is full or the first state waited long enough.
+            deadline = self._pending[0].time + self._max_wait if self._pending else 0
+            while len(self._pending) < self._max_batch_size and not self._closed:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            batch = self._pending[:self._max_batch_size]
+            del self._pending[:self._max_batch_size]
+            return batch
+
+    def _run(self):
+        """Main loop of the background thread.
+        """
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+
+            try:
+                results = self._batch_fn([request.state for request in batch])
+            except Exception as e:
+                for request in batch:
+                    request.set_error(e)
+            else:
+                for request, result in zip(batch, results):
+                    request.set_result(result)
+
+            self.n_batches += 1
+            self.n_evaluations += len(batch)
+
+
+class _EvaluationRequest(object):
+    """A single state waiting to be evaluated by a BatchEvaluator.
+    """
+
+    def __init__(self, state):
+        self.state = state
+        self.time = time.time()
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+
+    def set_result(self, result):
+        self._result = result
+        self._done.set()
+
+    def set_error(self, error):
+        self._error = error
+        self._done.set()
+
+    def get_result(self):
+        """Block until the result is set and return it, or raise the error of batch_fn.
+        """
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+class _ProcessRollout(object):
+    """Plays out a list of states on worker processes, with the same interface as BatchRollout.
+    """
+
+    def __init__(self, n_processes, worker_args):
+        self._n_processes = n_processes
+        self._worker_args = worker_args
+        self._processes = []
+
+    def run(self, states):
+        """Play out all states, returning a list with +1 for every state whose current player wins
+        and -1 otherwise. The states themselves are not changed.
+        """
+        if len(self._processes) == 0:
+            self._processes = _start_search_processes(self._n_processes, self._worker_args)
+
+        # Deal the states round-robin, so that every worker gets a similar share.
+        n = len(self._processes)
+        for i, process in enumerate(self._processes):
+            process.send(_rollout_task, states[i::n])
+        outcomes = [None] * len(states)
+        for i, process in enumerate(self._processes):
+            outcomes[i::n] = process.receive()
+        return outcomes
+
+    def close(self):
+        for process in self._processes:
+            process.close()
+        self._processes = []
+
+
+class _SearchProcess(object):
+    """A worker process with its own search object, on which it runs the tasks sent to it.
+
+    A task is a module-level function, which is called as task(search, *args). Only one task is
+    sent at a time, and its result must be received before sending the next one.
+    """
+
+    def __init__(self, worker_args, seed):
+        """Arguments:
+        worker_args -- a tuple (search_class, args, kwargs) to create the search of the worker.
+            These are inherited by forking the process, so they need not be picklable.
+        seed -- seed for the random number generators of the worker.
+        """
+        self._connection, child_connection = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_run_search_process,
+                                                args=(child_connection, worker_args, seed))
+        self._process.daemon = True
+        self._process.start()
+
+    def send(self, task, *args):
+        self._connection.send((task, args))
+
+    def receive(self):
+        """Wait for the result of the last task and return it, or raise its error.
+        """
+        error, result = self._connection.recv()
+        if error is not None:
+            raise error
+        return result
+
+    def close(self):
+        self._connection.send(None)
+        self._process.join()
+
+
+def _start_search_processes(n_processes, worker_args):
+    """Start n_processes worker processes with different seeds.
+    """
+    return [_SearchProcess(worker_args, np.random.randint(1, 2 ** 31))
+            for i in range(n_processes)]
+
+
+def _run_search_process(connection, worker_args, seed):
+    """Main loop of a worker process; runs tasks until it receives None.
+    """
+    search_class, args, kwargs = worker_args
+    search = search_class(*args, **kwargs)
+    # Forked workers start with the random state of the parent.
+    np.random.seed(seed)
+    if hasattr(search._rollout, "seed"):
+        search._rollout.seed(seed)
+
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        task, args = message
+        try:
+            connection.send((None, task(search, *args)))
+        except Exception as e:
+            connection.send((e, None))
+
+
+def _root_search_task(search, state, time_limit):
+    """Search state and return the visit counts of the children of the root, as a list of
+    (action, visits) tuples, and the number of playouts.
+    """
+    search.get_move(state, time_limit)
+    root = search._root
+    return zip(root._child_actions, root._child_visits), search._n_searched
+
+
+def _rollout_task(search, states):
+    """Return the rollout outcome of every state in a list.
+    """
+    return [search._evaluate_rollout(state, search._rollout_limit) for state in states]
@@ -2,6 +2,7 @@ from keras import backend as K
 from keras.models import model_from_json
 from keras.engine.topology import Layer
 from AlphaGo.preprocessing.preprocessing import Preprocess
+import numpy as np
 import json
 
 
@@ -61,6 +62,43 @@ class NeuralNetBase(object):
             forward_function = K.function([self.model.input], [self.model.output])
             return lambda inpt: forward_function([inpt])[0]
 
+    def _batch_forward(self, states):
+        """helper function to run a list of same-sized states through the network at once
+        """
+        state_size = states[0].get_size()
+        if not all([st.get_size() == state_size for st in states]):
+            raise ValueError("all states must have the same size")
+        # concatenate together all one-hot encoded states along the 'batch' dimension
+        nn_input = self.preprocessor.states_to_tensor(states)
+        # pass all input through the network at once (backend makes use of
+        # batches if len(states) is large)
+        return self.forward(nn_input)
+
+    @staticmethod
+    def _select_indices_and_normalize(nn_output, indices):
+        """helper function to normalize a distribution over the given array of flat move
+        indices and return the probabilities as an array parallel to indices
+        """
+        if len(indices) == 0:
+            return np.zeros(0, dtype=nn_output.dtype)
+        # get network activations at legal move locations
+        distribution = nn_output[indices]
+        return distribution / distribution.sum()
+
+    def _batch_select_indices(self, states, indices_lists=None):
+        """helper function for networks with one output per board location: evaluate a list of
+        same-sized states at once and return a parallel list of (indices, probabilities) pairs,
+        where indices defaults to the legal moves of each state (see GameState.get_legal_indices)
+        """
+        if len(states) == 0:
+            return []
+        network_output = self._batch_forward(states)
+        results = [None] * len(states)
+        for i, st in enumerate(states):
+            indices = st.get_legal_indices() if indices_lists is None else indices_lists[i]
+            results[i] = (indices, self._select_indices_and_normalize(network_output[i], indices))
+        return results
+
     @staticmethod
     def load_model(json_file):
         """create a new neural net object from the architecture specified in json_file
@@ -4,7 +4,6 @@ from keras.layers.merge import add
 from keras.layers.core import Activation, Flatten
 from AlphaGo.util import flatten_idx
 from AlphaGo.models.nn_util import Bias, NeuralNetBase, neuralnet
-import numpy as np
 
 
 @neuralnet
@@ -37,13 +36,7 @@ class CNNPolicy(NeuralNetBase):
         if n_states == 0:
             return []
         state_size = states[0].get_size()
-        if not all([st.get_size() == state_size for st in states]):
-            raise ValueError("all states must have the same size")
-        # concatenate together all one-hot encoded states along the 'batch' dimension
-        nn_input = np.concatenate([self.preprocessor.state_to_tensor(s) for s in states], axis=0)
-        # pass all input through the network at once (backend makes use of
-        # batches if len(states) is large)
-        network_output = self.forward(nn_input)
+        network_output = self._batch_forward(states)
         # default move lists to all legal moves
         moves_lists = moves_lists or [st.get_legal_moves() for st in states]
         results = [None] * n_states
@@ -52,6 +45,14 @@ class CNNPolicy(NeuralNetBase):
                                                           state_size)
         return results
 
+    def batch_eval_state_indices(self, states, indices_lists=None):
+        """Array version of batch_eval_state: moves are given by their flat index (see
+        GameState.get_legal_indices), so no list of move tuples is built.
+
+        Returns: a parallel list of (indices, probabilities) pairs as in eval_state_indices
+        """
+        return self._batch_select_indices(states, indices_lists)
+
     def eval_state(self, state, moves=None):
         """Given a GameState object, returns a list of (action, probability) pairs
         according to the network outputs
@@ -64,6 +65,14 @@ class CNNPolicy(NeuralNetBase):
         moves = moves or state.get_legal_moves()
         return self._select_moves_and_normalize(network_output[0], moves, state.get_size())
 
+    def eval_state_indices(self, state, indices=None):
+        """Array version of eval_state: returns a pair of arrays (indices, probabilities) with
+        the flat index of each move (see GameState.get_legal_indices) and its probability
+
+        If an array of indices is specified, only those moves are kept in the distribution
+        """
+        return self._batch_select_indices([state], None if indices is None else [indices])[0]
+
     @staticmethod
     def create_network(**kwargs):
         """construct a convolutional neural network.
@@ -1,8 +1,10 @@
+import numpy as np
 from keras.models import Sequential
 from AlphaGo.util import flatten_idx
 from keras.layers import convolutional
 from keras.layers.core import Activation, Flatten
 from nn_util import Bias, NeuralNetBase, neuralnet
+from AlphaGo.preprocessing.rollout_policy import LinearRolloutPolicy
 
 
 @neuralnet
@@ -35,7 +37,48 @@ class CNNRollout(NeuralNetBase):
         network_output = self.forward(tensor)
 
         moves = moves or state.get_legal_moves()
-        return self._select_moves_and_normalize(network_output[0], moves, state.size)
+        return self._select_moves_and_normalize(network_output[0], moves, state.get_size())
+
+    def batch_eval_state(self, states, moves_lists=None):
+        """Given a list of same-sized states, evaluates them all at once and returns a parallel
+        list of move distributions as in eval_state
+        """
+        if len(states) == 0:
+            return []
+
+        network_output = self._batch_forward(states)
+
+        results = [None] * len(states)
+        for i, st in enumerate(states):
+            moves = st.get_legal_moves() if moves_lists is None else moves_lists[i]
+            results[i] = self._select_moves_and_normalize(network_output[i], moves, st.get_size())
+        return results
+
+    def eval_state_indices(self, state, indices=None):
+        """Array version of eval_state: returns a pair of arrays (indices, probabilities) with
+        the flat index of each move (see GameState.get_legal_indices) and its probability
+
+        If an array of indices is specified, only those moves are kept in the distribution
+        """
+        return self._batch_select_indices([state], None if indices is None else [indices])[0]
+
+    def batch_eval_state_indices(self, states, indices_lists=None):
+        """Given a list of same-sized states, evaluates them all at once and returns a parallel
+        list of (indices, probabilities) pairs as in eval_state_indices
+        """
+        return self._batch_select_indices(states, indices_lists)
+
+    def to_linear_policy(self, seed=None):
+        """Export the weights of this network to a LinearRolloutPolicy, which evaluates the same
+        distribution over sensible moves directly on the board and plays complete rollouts
+        without building tensors (see LinearRolloutPolicy.run_rollout)
+        """
+        conv_layer, bias_layer = self.model.layers[0], self.model.layers[2]
+        kernel, conv_bias = conv_layer.get_weights()
+        location_bias = bias_layer.get_weights()[0]
+        size = int(np.sqrt(location_bias.size))
+        return LinearRolloutPolicy(self.preprocessor.get_feature_list(), kernel.ravel(),
+                                   float(conv_bias[0]), location_bias, size=size, seed=seed)
 
     @staticmethod
     def create_network(**kwargs):
@@ -13,13 +13,11 @@ class CNNValue(NeuralNetBase):
 
     def normalize(self, nn_output, percentage):
         # value network has tanh output (-1/1)
-        # convert to (0/1) or (0/100)
+        # convert to range (0/1)
+        values = (np.asarray(nn_output, dtype=np.float64)[:, 0] + 1.) / 2.
         if percentage:
             # convert to range (0/100)
-            values = [(value[0] + 1.) / 2. * 100 for value in nn_output]
-        else:
-            # convert to range (0/1)
-            values = [(value[0] + 1.) / 2. for value in nn_output]
+            values = values * 100
 
         return values
 
@@ -39,7 +37,7 @@ class CNNValue(NeuralNetBase):
            in range (0/1) or if percentage (0/100)
         """
         # concatenate together all one-hot encoded states along the 'batch' dimension
-        nn_input = np.concatenate([self.preprocessor.state_to_tensor(s) for s in states], axis=0)
+        nn_input = self.preprocessor.states_to_tensor(states)
 
         # pass all input through the network at once (backend makes use of
         # batches if len(states) is large)
@@ -5,7 +5,7 @@ import warnings
 import h5py as h5
 import numpy as np
 import AlphaGo.go as go
-from AlphaGo.preprocessing.preprocessing import Preprocess
+from AlphaGo.preprocessing.preprocessing import Preprocess, FeatureTracker
 from AlphaGo.util import sgf_iter_states
 
 
@@ -32,11 +32,13 @@ class GameConverter:
         with open(file_name, 'r') as file_object:
             state_action_iterator = sgf_iter_states(file_object.read(), include_end=False)
 
+        # Consecutive positions differ by a single move, so features are updated incrementally.
+        tracker = FeatureTracker(self.feature_processor)
         for (state, move, player) in state_action_iterator:
             if state.get_size() != bd_size:
                 raise SizeMismatchError()
             if move != go.PASS:
-                nn_input = self.feature_processor.state_to_tensor(state)
+                nn_input = tracker.state_to_tensor(state)
                 yield (nn_input, move)
 
     def sgfs_to_hdf5(self, sgf_files, hdf5_file, bd_size=19, ignore_errors=True, verbose=False):
@@ -151,6 +153,27 @@ class GameConverter:
         os.rename(tmp_file, hdf5_file)
 
 
+def _is_sgf(fname):
+    return fname.strip()[-4:] == ".sgf"
+
+
+def _walk_all_sgfs(root):
+    """a helper function/generator to get all SGF files in subdirectories of root
+    """
+    for (dirpath, dirname, files) in os.walk(root):
+        for filename in files:
+            if _is_sgf(filename):
+                # yield the full (relative) path to the file
+                yield os.path.join(dirpath, filename)
+
+
+def _list_sgfs(path):
+    """helper function to get all SGF files in a directory (does not recurse)
+    """
+    files = os.listdir(path)
+    return (os.path.join(path, f) for f in files if _is_sgf(f))
+
+
 def run_game_converter(cmd_line_args=None):
     """Run conversions. command-line args may be passed in as a list
     """
@@ -195,24 +218,6 @@ def run_game_converter(cmd_line_args=None):
 
     converter = GameConverter(feature_list)
 
-    def _is_sgf(fname):
-        return fname.strip()[-4:] == ".sgf"
-
-    def _walk_all_sgfs(root):
-        """a helper function/generator to get all SGF files in subdirectories of root
-        """
-        for (dirpath, dirname, files) in os.walk(root):
-            for filename in files:
-                if _is_sgf(filename):
-                    # yield the full (relative) path to the file
-                    yield os.path.join(dirpath, filename)
-
-    def _list_sgfs(path):
-        """helper function to get all SGF files in a directory (does not recurse)
-        """
-        files = os.listdir(path)
-        return (os.path.join(path, f) for f in files if _is_sgf(f))
-
     # get an iterator of SGF files according to command line args
     if args.directory:
         if args.recurse:
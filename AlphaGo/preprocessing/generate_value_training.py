@@ -5,7 +5,7 @@ import warnings
 import numpy as np
 from AlphaGo.go import WHITE
 from AlphaGo.go import BLACK
-from AlphaGo.go import GameState
+from AlphaGo.go import GameStateBatch
 from AlphaGo.models.policy import CNNPolicy
 from AlphaGo.util import save_gamestate_to_sgf
 from AlphaGo.ai import ProbabilisticPolicyPlayer
@@ -68,51 +68,43 @@ def play_batch(player_RL, player_SL, batch_size, features, i_rand_move, next_idx
     * and the end result of the game, as the training pair
     """
 
-    def do_move(states, moves):
-        for st, mv in zip(states, moves):
-            if not st.is_end_of_game():
-                # Only do more moves if not end of game already
-                st.do_move(mv)
-        return states
-
-    def do_rand_move(states):
+    def do_rand_move(batch):
         """Do a uniform-random move over legal moves and record info for
            training. Only gets called once per game.
         """
 
         # get legal moves and play one at random
-        legal_moves = [st.get_legal_moves() for st in states]
-        rand_moves = [lm[np.random.choice(len(lm))] for lm in legal_moves]
-        states = do_move(states, rand_moves)
+        rand_moves = [np.random.choice(np.flatnonzero(mask)) for mask in batch.legal_mask()]
+        batch.do_moves(rand_moves)
 
         # copy all states, these are the generated training data
-        training_state_list = [st.copy() for st in states]  # For later 1hot preprocessing
-        return training_state_list, states
+        return [st.copy() for st in batch.get_states()]  # For later 1hot preprocessing
 
     def convert(state_list, preprocessor):
         """Convert states to 1-hot and concatenate. X's are game state objects.
         """
 
-        states = np.concatenate(
-            [preprocessor.state_to_tensor(state) for state in state_list], axis=0)
-        return states
+        return preprocessor.states_to_tensor(state_list)
 
     # Lists of game training pairs (1-hot)
     preprocessor = Preprocess(features)
-    states = [GameState() for _ in xrange(batch_size)]
+    # Moves of games that are finished are ignored by the batch.
+    batch = GameStateBatch(batch_size)
 
     # play player_SL moves
     for _ in xrange(i_rand_move - 1):
         # Get moves (batch)
-        batch_moves = player_SL.get_moves(states)
+        batch_moves = player_SL.get_moves(batch.get_states())
         # Do moves (black)
-        states = do_move(states, batch_moves)
+        batch.do_actions(batch_moves)
 
     # remove games that are finished
-    states = [state for state in states if not state.is_end_of_game()]
+    states = [state for (state, ended) in zip(batch.get_states(), batch.is_end_of_game())
+              if not ended]
+    batch = GameStateBatch(states=states)
 
     # Make random move
-    states_list, states = do_rand_move(states)
+    states_list = do_rand_move(batch)
 
     # color is random move player color
     color = WHITE if i_rand_move % 2 == 0 else BLACK
@@ -122,12 +114,10 @@ def play_batch(player_RL, player_SL, batch_size, features, i_rand_move, next_idx
         # Get moves (batch)
         batch_moves = player_RL.get_moves(states)
         # Do moves (black)
-        states = do_move(states, batch_moves)
+        batch.do_actions(batch_moves)
 
         # check if all games are finished
-        done = [st.is_end_of_game() for st in states]
-
-        if all(done):
+        if batch.is_end_of_game().all():
             break
 
     if sgf_path is not None:
@@ -162,8 +152,7 @@ def play_batch(player_RL, player_SL, batch_size, features, i_rand_move, next_idx
     # winner BLACK & color WHITE -> LOSE
     # winner WHITE & color Black -> LOSE
     actual_batch_size = len(states)
-    winners = np.array([WIN if st.get_winner_color() == color else
-                        LOSE for st in states]).reshape(actual_batch_size, 1)
+    winners = np.where(batch.winners() == color, WIN, LOSE).reshape(actual_batch_size, 1)
     return training_states, winners
 
 
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+import os
+import sgf
+import warnings
+import AlphaGo.go as go
+from AlphaGo.preprocessing.game_converter import SizeMismatchError, _is_sgf, _list_sgfs, \
+    _walk_all_sgfs
+from AlphaGo.preprocessing.patterns import PatternTable, PATTERN_TYPES, get_move_patterns
+from AlphaGo.util import sgf_iter_states
+
+
+class PatternMiner:
+
+    def __init__(self):
+        # Number of occurrences of every pattern hash, one dict per pattern type
+        self.counts = {pattern_type: {} for pattern_type in PATTERN_TYPES}
+        self.n_moves = 0
+
+    def count_game(self, file_name, bd_size):
+        """Count the patterns of every move (passes are skipped) of the given SGF file
+
+        If this game's size does not match bd_size, a SizeMismatchError is raised
+        """
+
+        with open(file_name, 'r') as file_object:
+            state_action_iterator = sgf_iter_states(file_object.read(), include_end=False)
+
+        for (state, move, player) in state_action_iterator:
+            if state.get_size() != bd_size:
+                raise SizeMismatchError()
+            if move != go.PASS:
+                for pattern_type, pattern in zip(PATTERN_TYPES, get_move_patterns(state, move)):
+                    if pattern is not None:
+                        counts = self.counts[pattern_type]
+                        counts[pattern] = counts.get(pattern, 0) + 1
+                self.n_moves += 1
+
+    def count_sgfs(self, sgf_files, bd_size=19, verbose=False):
+        """Count the patterns of all files in the iterable sgf_files. Games that cannot be parsed
+           or have the wrong size are skipped with a warning, games with an illegal move are
+           counted up to that move.
+        """
+
+        for file_name in sgf_files:
+            if verbose:
+                print(file_name)
+            try:
+                self.count_game(file_name, bd_size)
+            except go.IllegalMove:
+                warnings.warn("Illegal Move encountered in %s\n"
+                              "\tdropping the remainder of the game" % file_name)
+            except sgf.ParseException:
+                warnings.warn("Could not parse %s\n\tdropping game" % file_name)
+            except SizeMismatchError:
+                warnings.warn("Skipping %s; wrong board size" % file_name)
+
+    def get_table(self, pattern_type, min_count=1, max_patterns=None):
+        """Return a PatternTable of the patterns of the given type that occurred at least
+           min_count times, at most max_patterns of them, with ids from most to least frequent
+        """
+
+        counts = self.counts[pattern_type]
+        # Break ties by hash so that the ids do not depend on dict order.
+        patterns = sorted((pattern for (pattern, count) in counts.items() if count >= min_count),
+                          key=lambda pattern: (-counts[pattern], pattern))
+        return PatternTable(patterns[:max_patterns])
+
+    def save(self, directory, min_count=1, max_patterns=None):
+        """Save the table of every pattern type to <directory>/<pattern type>.json, to be passed
+           to Preprocess as dict_nakade, dict_12d and dict_3x3
+        """
+
+        for pattern_type in PATTERN_TYPES:
+            table = self.get_table(pattern_type, min_count, max_patterns)
+            table.save(os.path.join(directory, pattern_type + ".json"), self.counts[pattern_type])
+
+
+def run_pattern_miner(cmd_line_args=None):
+    """Run pattern mining. command-line args may be passed in as a list
+    """
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(
+        description='Mine the nakade, response_12d and non_response_3x3 pattern dictionaries '
+                    'from SGF Go game files.',
+        epilog="Writes nakade.json, response_12d.json and non_response_3x3.json to the output\
+        directory; pass them to Preprocess as dict_nakade, dict_12d and dict_3x3.")
+    parser.add_argument("--outdir", "-o", help="Directory to write the pattern files to", required=True)  # noqa: E501
+    parser.add_argument("--recurse", "-R", help="Set to recurse through directories searching for SGF files", default=False, action="store_true")  # noqa: E501
+    parser.add_argument("--directory", "-d", help="Directory containing SGF files to process. if not present, expects files from stdin", default=None)  # noqa: E501
+    parser.add_argument("--size", "-s", help="Size of the game board. SGFs not matching this are discarded with a warning", type=int, default=19)  # noqa: E501
+    parser.add_argument("--min-count", help="Minimum number of occurrences of a pattern (Default: 10)", type=int, default=10)  # noqa: E501
+    parser.add_argument("--max-patterns", help="Maximum number of patterns of each type (Default: no limit)", type=int, default=None)  # noqa: E501
+    parser.add_argument("--verbose", "-v", help="Turn on verbose mode", default=False, action="store_true")  # noqa: E501
+
+    if cmd_line_args is None:
+        args = parser.parse_args()
+    else:
+        args = parser.parse_args(cmd_line_args)
+
+    # get an iterator of SGF files according to command line args
+    if args.directory:
+        if args.recurse:
+            files = _walk_all_sgfs(args.directory)
+        else:
+            files = _list_sgfs(args.directory)
+    else:
+        files = (f.strip() for f in sys.stdin if _is_sgf(f))
+
+    miner = PatternMiner()
+    miner.count_sgfs(files, bd_size=args.size, verbose=args.verbose)
+
+    if not os.path.exists(args.outdir):
+        os.makedirs(args.outdir)
+    miner.save(args.outdir, min_count=args.min_count, max_patterns=args.max_patterns)
+
+    if args.verbose:
+        for pattern_type in PATTERN_TYPES:
+            print("%s: %d of %d patterns saved" % (
+                pattern_type, len(miner.get_table(pattern_type, args.min_count, args.max_patterns)),
+                len(miner.counts[pattern_type])))
+
+
+if __name__ == '__main__':
+    run_pattern_miner()
@@ -0,0 +1,67 @@
+from AlphaGo.go.constants cimport stone_t, action_t
+from AlphaGo.go.game_state cimport GameState
+from AlphaGo.go.group_logic cimport bitboard_get
+from libcpp cimport bool
+from libcpp.vector cimport vector
+import numpy as np
+cimport numpy as np
+
+
+############################################################################
+#   Typedefs                                                               #
+#                                                                          #
+############################################################################
+
+ctypedef short location_t
+ctypedef unsigned long pattern_hash_t
+
+
+############################################################################
+#   Class definition                                                       #
+#                                                                          #
+############################################################################
+
+cdef class PatternTable:
+
+    # Open-addressing hash table with linear probing: the pattern hash and id of every slot. Empty
+    # slots have id -1. The number of slots is a power of two, at least twice the number of
+    # patterns.
+    cdef vector[pattern_hash_t] keys
+    cdef vector[int] ids
+
+    # Number of slots minus one, to map a hash to a slot with a bitwise and
+    cdef size_t mask
+
+    # Number of patterns in the table
+    cdef int count
+
+    cdef int lookup(self, pattern_hash_t pattern) nogil
+    """Return the id of pattern, or -1 if it is not in the table
+    """
+
+    cdef void insert(self, pattern_hash_t pattern, int pattern_id)
+    """Add pattern with the given id, or replace the id if it is already in the table
+    """
+
+
+############################################################################
+#   Pattern hash functions                                                 #
+#                                                                          #
+############################################################################
+
+cdef pattern_hash_t non_response_hash(pattern_hash_t hash_3x3, stone_t player) nogil
+"""Hash of the 'non-response' pattern of a move by player, given the hash of the 3x3 pattern
+   around the move without player (GameState.get_3x3_hash(location, False)). Equal to
+   GameState.get_3x3_hash(location, True) if player is the current player.
+"""
+
+cdef pattern_hash_t response_hash(pattern_hash_t hash_12d, int index) nogil
+"""Hash of the 'response' pattern of a move by the current player at the index-th location of the
+   12d pattern around the previous move (see get_12d_neighbors()), given the hash of that 12d
+   pattern with player (GameState.get_12d_hash(last_move, True)).
+"""
+
+cdef pattern_hash_t nakade_hash(GameState state, location_t location) nogil
+"""Hash of the 'nakade' pattern of a move by the current player at location; the 12d pattern around
+   location with colors only, ignoring liberties.
+"""
@@ -0,0 +1,232 @@
+# cython: wraparound=False
+# cython: boundscheck=False
+# cython: initializedcheck=False
+# cython: nonecheck=False
+import json
+from cython.operator cimport dereference as d
+from AlphaGo.go.coordinates cimport calculate_board_location
+
+
+# Constant value used to generate pattern hashes, the same as in GameState.
+cdef int _HASHVALUE = 33
+
+# Names of the pattern types; each has its own PatternTable.
+PATTERN_TYPES = ["nakade", "response_12d", "non_response_3x3"]
+
+
+cdef inline size_t mix_hash(pattern_hash_t pattern) nogil:
+    """Finalizer of the splitmix64 generator; spreads pattern hashes, which differ mostly in their
+       low bits, over all bits.
+    """
+
+    pattern ^= pattern >> 30
+    pattern *= 0xbf58476d1ce4e5b9ULL
+    pattern ^= pattern >> 27
+    pattern *= 0x94d049bb133111ebULL
+    pattern ^= pattern >> 31
+    return pattern
+
+
+cdef class PatternTable:
+
+    ############################################################################
+    #   Variables are declared in the .pxd file                                #
+    #                                                                          #
+    ############################################################################
+
+    """
+    # Open-addressing hash table with linear probing: the pattern hash and id of every slot. Empty
+    # slots have id -1. The number of slots is a power of two, at least twice the number of
+    # patterns.
+    cdef vector[pattern_hash_t] keys
+    cdef vector[int] ids
+
+    # Number of slots minus one, to map a hash to a slot with a bitwise and
+    cdef size_t mask
+
+    # Number of patterns in the table
+    cdef int count
+    """
+
+    ############################################################################
+    #   init function                                                          #
+    #                                                                          #
+    ############################################################################
+
+    def __init__(self, patterns=()):
+        """Create a table from a dict of pattern hash -> id, or from a sequence of pattern hashes
+           whose ids are their indices (e.g. sorted from most to least frequent)
+        """
+
+        cdef size_t n_slots = 16
+
+        if not isinstance(patterns, dict):
+            patterns = {pattern: i for (i, pattern) in enumerate(patterns)}
+
+        while n_slots < 2 * len(patterns):
+            n_slots *= 2
+        self.keys = vector[pattern_hash_t](n_slots, 0)
+        self.ids = vector[int](n_slots, -1)
+        self.mask = n_slots - 1
+        self.count = 0
+
+        for pattern, pattern_id in patterns.items():
+            if pattern_id < 0:
+                raise ValueError("pattern ids must not be negative")
+            self.insert(pattern, pattern_id)
+
+    ############################################################################
+    #   cdef functions                                                         #
+    #                                                                          #
+    ############################################################################
+
+    cdef int lookup(self, pattern_hash_t pattern) nogil:
+        """Return the id of pattern, or -1 if it is not in the table
+        """
+
+        cdef size_t slot = mix_hash(pattern) & self.mask
+
+        while self.ids[slot] >= 0:
+            if self.keys[slot] == pattern:
+                return self.ids[slot]
+            slot = (slot + 1) & self.mask
+
+        return -1
+
+    cdef void insert(self, pattern_hash_t pattern, int pattern_id):
+        """Add pattern with the given id, or replace the id if it is already in the table
+        """
+
+        cdef size_t slot = mix_hash(pattern) & self.mask
+
+        while self.ids[slot] >= 0 and self.keys[slot] != pattern:
+            slot = (slot + 1) & self.mask
+
+        if self.ids[slot] < 0:
+            self.count += 1
+        self.keys[slot] = pattern
+        self.ids[slot] = pattern_id
+
+    ############################################################################
+    #   public def functions (Python)                                          #
+    #                                                                          #
+    ############################################################################
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, pattern):
+        return self.lookup(pattern) >= 0
+
+    def get(self, pattern, default=None):
+        """Return the id of pattern, or default if it is not in the table
+        """
+
+        cdef int pattern_id = self.lookup(pattern)
+        return pattern_id if pattern_id >= 0 else default
+
+    def to_dict(self):
+        """Return a dict of pattern hash -> id
+        """
+
+        cdef size_t slot
+        return {self.keys[slot]: self.ids[slot] for slot in range(self.mask + 1)
+                if self.ids[slot] >= 0}
+
+    @staticmethod
+    def load(path):
+        """Load a table from a file written by save() or by the pattern miner, keeping the saved
+           id of every pattern
+        """
+
+        with open(path, 'r') as f:
+            data = json.load(f)
+        return PatternTable({pattern: pattern_id
+                             for (pattern, pattern_id, count) in data["patterns"]})
+
+    def save(self, path, counts=None):
+        """Save the patterns, ordered by id, as JSON: a list of [pattern hash, id, count]. counts
+           is an optional dict of pattern hash -> number of occurrences, stored for reference.
+        """
+
+        patterns = sorted(self.to_dict().items(), key=lambda item: item[1])
+        if counts is None:
+            counts = {}
+        with open(path, 'w') as f:
+            json.dump({"patterns": [[pattern, pattern_id, counts.get(pattern, 0)]
+                                    for (pattern, pattern_id) in patterns]}, f)
+
+
+############################################################################
+#   Pattern hash functions                                                 #
+#                                                                          #
+############################################################################
+
+cdef pattern_hash_t non_response_hash(pattern_hash_t hash_3x3, stone_t player) nogil:
+    """Hash of the 'non-response' pattern of a move by player, given the hash of the 3x3 pattern
+       around the move without player (GameState.get_3x3_hash(location, False)). Equal to
+       GameState.get_3x3_hash(location, True) if player is the current player.
+    """
+
+    return (hash_3x3 + player) * _HASHVALUE
+
+
+cdef pattern_hash_t response_hash(pattern_hash_t hash_12d, int index) nogil:
+    """Hash of the 'response' pattern of a move by the current player at the index-th location of
+       the 12d pattern around the previous move (see get_12d_neighbors()), given the hash of that
+       12d pattern with player (GameState.get_12d_hash(last_move, True)).
+    """
+
+    return (hash_12d + index) * _HASHVALUE
+
+
+cdef pattern_hash_t nakade_hash(GameState state, location_t location) nogil:
+    """Hash of the 'nakade' pattern of a move by the current player at location; the 12d pattern
+       around location with colors only, ignoring liberties.
+    """
+
+    return state.get_12d_hash(location, True, 0)
+
+
+def get_pattern_table(patterns):
+    """Return patterns as a PatternTable, or None if it is None. patterns may be a PatternTable,
+       the path of a file written by PatternTable.save(), a dict of pattern hash -> id or a
+       sequence of pattern hashes.
+    """
+
+    if patterns is None or isinstance(patterns, PatternTable):
+        return patterns
+    elif isinstance(patterns, basestring):
+        return PatternTable.load(patterns)
+    else:
+        return PatternTable(patterns)
+
+
+def get_move_patterns(GameState state, tuple action):
+    """Return the hashes of the (nakade, response_12d, non_response_3x3) patterns of a move by the
+       current player at action. Patterns that do not apply to the move are None: nakade patterns
+       only apply to locations captured by the previous move, and response patterns only to the
+       12d neighborhood of a previous move that was not a pass.
+    """
+
+    cdef location_t location = calculate_board_location(action[1], action[0], state.size)
+    cdef location_t last_move = action_t.PASS
+    cdef int i
+
+    nakade = response = None
+
+    if state.moves_history.size() > 0:
+        last_move = state.moves_history.back()
+
+    if last_move != action_t.PASS:
+        for i in range(12):
+            if d(state.ptr_neighbor12d)[last_move * 12 + i] == location:
+                response = response_hash(state.get_12d_hash(last_move, True), i)
+                break
+
+        if bitboard_get(d(state.last_captured).stones, location):
+            nakade = nakade_hash(state, location)
+
+    non_response = state.get_3x3_hash(location, True)
+
+    return (nakade, response, non_response)
@@ -1,10 +1,14 @@
 from AlphaGo.go.constants cimport stone_t, group_t, action_t
 from AlphaGo.go.game_state cimport GameState
 from AlphaGo.go.group_logic cimport Group, group_new, group_add_stone, group_add_liberty, \
-    group_remove_liberty, group_merge, group_lookup
+    group_remove_liberty, group_merge, group_lookup, bitboard_word_t, BITBOARD_WORDS, \
+    bitboard_get, bitboard_set, bitboard_clear, bitboard_count, bitboard_locations, popcount, \
+    count_trailing_zeros
 from AlphaGo.go.coordinates cimport get_pattern_hash
+from AlphaGo.preprocessing.patterns cimport PatternTable, pattern_hash_t, non_response_hash, \
+    response_hash, nakade_hash
 from AlphaGo.go.ladders cimport is_ladder_escape_move, is_ladder_capture_move, \
-    get_plausible_escape_moves, get_plausible_capture_moves
+    get_plausible_escape_moves, get_plausible_capture_moves, location_set_t, LadderCache
 from libcpp cimport bool
 from libcpp.memory cimport shared_ptr
 from libcpp.vector cimport vector
@@ -28,7 +32,18 @@ ctypedef np.uint8_t onehot_t
 ctypedef np.uint16_t lookahead_t
 
 # Type defining cdef function handle.
-ctypedef int (*preprocess_method)(Preprocess, GameState, onehot_t[:, :], lookahead_t[:, :], int)
+ctypedef int (*preprocess_method)(Preprocess, GameState, onehot_t[:, :], lookahead_t[:, :], pattern_hash_t[:], LadderCache, int) nogil  # noqa: E501
+
+
+############################################################################
+#   Constants                                                              #
+#                                                                          #
+############################################################################
+
+cdef enum:
+    # Flags of FeatureTracker.dirty
+    DIRTY_GROUPS_AFTER = 1
+    DIRTY_HASH = 2
 
 
 ############################################################################
@@ -44,6 +59,9 @@ cdef class Preprocess:
     # Flag whether or not any features require 'lookahead' to groups_after
     cdef bool requires_groups_after
 
+    # Flag whether or not any features require the 3x3 pattern hashes of all legal moves
+    cdef bool requires_hashes_3x3
+
     # List with all string names of features used currently
     cdef list feature_list
 
@@ -53,17 +71,17 @@ cdef class Preprocess:
     # Board size, same convention as in GameState
     cdef short size, board_size
 
-    # Sets of pattern hashes of the Top-N most common response patterns of each type
-    cdef set pattern_nakade
-    cdef set pattern_response_12d
-    cdef set pattern_non_response_3x3
+    # Tables of the ids of the most common patterns of each type, or None if not given
+    cdef PatternTable pattern_nakade
+    cdef PatternTable pattern_response_12d
+    cdef PatternTable pattern_non_response_3x3
 
     ############################################################################
     #   Feature-generating functions                                           #
     #                                                                          #
     ############################################################################
 
-    cdef int get_board(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset)  # noqa: E501
+    cdef int get_board(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil  # noqa: E501
     """A feature encoding _WHITE _BLACK and _EMPTY on separate planes.
 
        Note:
@@ -72,7 +90,7 @@ cdef class Preprocess:
        - plane 2 to empty locations
     """
 
-    cdef int get_turns_since(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset)  # noqa: E501
+    cdef int get_turns_since(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil  # noqa: E501
     """A feature encoding the age of the stone at each location up to 'maximum'
 
        Note:
@@ -80,7 +98,7 @@ cdef class Preprocess:
        - _EMPTY locations are all-zero features
     """
 
-    cdef int get_liberties(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset)  # noqa: E501
+    cdef int get_liberties(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil  # noqa: E501
     """A feature encoding the number of liberties of the group connected to the stone at each
        location
 
@@ -90,7 +108,7 @@ cdef class Preprocess:
        - _EMPTY locations are all-zero features
     """
 
-    cdef int get_capture_size(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset)  # noqa: E501
+    cdef int get_capture_size(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil  # noqa: E501
     """A feature encoding the number of opponent stones that would be captured by playing at each
        location, up to 'maximum'
 
@@ -102,12 +120,12 @@ cdef class Preprocess:
        - illegal move locations are all-zero features
     """
 
-    cdef int get_self_atari_size(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset)  # noqa: E501
+    cdef int get_self_atari_size(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil  # noqa: E501
     """A feature encoding the size of the own-stone group that is put into atari by playing at a
        location
     """
 
-    cdef int get_liberties_after(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset)  # noqa: E501
+    cdef int get_liberties_after(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil  # noqa: E501
     """A feature encoding what the number of liberties *would be* of the group connected to the
        stone *if* played at a location
 
@@ -117,76 +135,89 @@ cdef class Preprocess:
        - illegal move locations are all-zero features
     """
 
-    cdef int get_ladder_capture(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset)  # noqa: E501
+    cdef int get_ladder_capture(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil  # noqa: E501
     """A feature wrapping GameState.is_ladder_capture(). Check if an opponent group can be captured
-       in a ladder
+       in a ladder. Searches are reused from ladder_cache if it is not None.
     """
 
-    cdef int get_ladder_escape(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset)  # noqa: E501
+    cdef int get_ladder_escape(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil  # noqa: E501
     """A feature wrapping GameState.is_ladder_escape(). Check if current_player group can escape
-       ladder
+       ladder. Searches are reused from ladder_cache if it is not None.
     """
 
-    cdef int get_sensibleness(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset)  # noqa: E501
+    cdef int get_sensibleness(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil  # noqa: E501
     """A move is 'sensible' if it is legal and if it does not fill the current_player's own eye
     """
 
-    cdef int get_legal(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset)  # noqa: E501
+    cdef int get_legal(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil  # noqa: E501
     """Zero at all illegal moves, one at all legal moves. Unlike sensibleness, no eyes check.
     """
 
-    cdef int zeros(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset)  # noqa: E501
+    cdef int zeros(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil  # noqa: E501
     """Plane filled with zeros
     """
 
-    cdef int ones(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset)  # noqa: E501
+    cdef int ones(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil  # noqa: E501
     """Plane filled with ones
     """
 
-    cdef int color(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset)  # noqa: E501
+    cdef int color(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil  # noqa: E501
     """Value net feature, plane with ones if active_player is black else zeros
     """
 
-    cdef int ko(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset)  # noqa: E501
+    cdef int ko(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil  # noqa: E501
     """Ko positions
     """
 
-    cdef int get_response(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset)  # noqa:E501
+    cdef int get_response(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil  # noqa:E501
     """Single feature plane encoding whether this location matches any of the response
        patterns, for now it only checks the 12d response patterns as we do not use the
        3x3 response patterns.
     """
 
-    cdef int get_save_atari(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset)  # noqa:E501
+    cdef int get_save_atari(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil  # noqa:E501
     """A feature wrapping GameState.is_ladder_escape().
        check if current_player group can escape atari for at least one turn
     """
 
-    cdef int get_neighbor(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset)  # noqa:E501
+    cdef int get_neighbor(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil  # noqa:E501
     """Encode last move neighbor positions in two planes:
        - horizontal & vertical / direct neighbor
        - diagonal neighbor
     """
 
-    cdef int get_nakade(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset)  # noqa:E501
-    """A nakade pattern is a 12d pattern on a location a stone was captured before
-       it is unclear if a max size of the captured group has to be considered and
-       how recent the capture event should have been
+    cdef int get_nakade(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil  # noqa:E501
+    """A nakade pattern is a 12d pattern on a location a stone was captured before. The plane is
+       one at legal moves on the stones captured by the previous move whose 12d pattern, with
+       colors but without liberty counts, is in the nakade table.
+    """
 
-       the 12d pattern can be encoded without stone color and liberty count
-       unclear if a border location should be considered a stone or liberty
+    cdef int get_response_12d(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil  # noqa:E501
+    """One at legal moves in the 12d shape around the previous move whose response pattern is in
+       the response_12d table. The ids of the patterns are returned by get_pattern_ids().
+    """
 
-       pattern lookup value is being set instead of 1
+    cdef int get_non_response_3x3(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil  # noqa:E501
+    """One at legal moves whose 3x3 pattern is in the non_response_3x3 table. The ids of the
+       patterns are returned by get_pattern_ids().
     """
 
-    cdef int get_response_12d(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset)  # noqa:E501
-    """Set 12d hash pattern for 12d shape around last move
-       pattern lookup value is being set instead of 1
+    ############################################################################
+    #   Pattern lookup                                                         #
+    #                                                                          #
+    ############################################################################
+
+    cdef int get_nakade_id(self, GameState state, location_t location) nogil
+    """Id of the nakade pattern of a move at location, or -1 if there is none
     """
 
-    cdef int get_non_response_3x3(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset)  # noqa:E501
-    """Set 3x3 hash pattern for every legal location where
-       pattern lookup value is being set instead of 1
+    cdef int get_response_12d_id(self, GameState state, location_t location) nogil
+    """Id of the response pattern of a move at location, or -1 if there is none
+    """
+
+    cdef int get_non_response_3x3_id(self, GameState state, location_t location, pattern_hash_t hash_3x3) nogil  # noqa: E501
+    """Id of the non-response pattern of a move at location, given the 3x3 hash of location
+       without player, or -1 if there is none
     """
 
     ############################################################################
@@ -194,10 +225,86 @@ cdef class Preprocess:
     #                                                                          #
     ############################################################################
 
+    cdef void fill_tensor(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache) nogil  # noqa: E501
+    """Write the features of state to tensor, of shape (output_dim, board_size), which is cleared
+       first. groups_after and hashes_3x3 are scratch space of shape (board_size, 3) and
+       (board_size,). ladder_cache is used by the ladder features, or None. Can be called without
+       the GIL, for different states in parallel (with different caches).
+    """
+
+    cdef void fill_planes(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache) nogil  # noqa: E501
+    """Clear tensor and run all processors on it, given the groups_after and 3x3 hashes of every
+       legal move of the current player and the ladder cache, or None.
+    """
+
     cpdef np.ndarray[onehot_t, ndim=4] state_to_tensor(self, GameState state)
     """Convert a GameState to a Theano-compatible tensor of one-hot features
     """
 
+    cpdef np.ndarray[onehot_t, ndim=4] states_to_tensor(self, states, np.ndarray out=*)
+    """Convert a list of GameStates (or a GameStateBatch) to a tensor of shape
+       (N, features, size, size), optionally written to the preallocated array out.
+       Distinct states are processed in parallel without the GIL.
+    """
+
+cdef class FeatureTracker:
+
+    # Preprocess whose features are computed
+    cdef Preprocess preprocess
+
+    # Board size, same convention as in GameState
+    cdef short size, board_size
+
+    # Color and liberty count (up to 3) of every location at the previous update, as in the
+    # pattern hashes, or 0 before the first update
+    cdef vector[char] cells
+
+    # Flags of the locations whose groups_after (DIRTY_GROUPS_AFTER) or 3x3 hash (DIRTY_HASH) must
+    # be recomputed in the current update
+    cdef vector[char] dirty
+
+    # groups_after of every empty location for a move by WHITE and by BLACK, respectively
+    cdef lookahead_t[:, :] groups_after_white
+    cdef lookahead_t[:, :] groups_after_black
+
+    # 3x3 pattern hash without player of every location
+    cdef pattern_hash_t[:] hashes_3x3
+
+    # Results of ladder searches in previous positions
+    cdef LadderCache ladder_cache
+
+    cdef void mark_liberties(self, group_ptr_t group) nogil
+    """Mark all liberties of group as dirty
+    """
+
+    cdef int update_lookahead(self, GameState state) nogil
+    """Bring groups_after of both players and the 3x3 hashes up to date with state and return the
+       number of locations whose groups_after were recomputed.
+    """
+
+    cpdef np.ndarray[onehot_t, ndim=4] state_to_tensor(self, GameState state)
+    """Same as Preprocess.state_to_tensor(), computing groups_after and 3x3 hashes only around
+       the locations that changed since the previous call, and reusing ladder searches whose
+       region did not change
+    """
+
+    cpdef int update(self, GameState state) except -1
+    """Update the tracked board to state. Returns the number of locations whose groups_after were
+       recomputed, or 0 if the features do not need groups_after.
+    """
+
+
+############################################################################
+#   Pattern hash helper functions                                          #
+#                                                                          #
+############################################################################
+
+cdef void fill_hashes_3x3(GameState state, pattern_hash_t[:] result) nogil
+"""Compute the 3x3 pattern hash without player (GameState.get_3x3_hash(loc, False)) of every legal
+   move into result, an array of size board_size. Entries of other locations are not changed.
+"""
+
+
 ############################################################################
 #   "Groups after" helper functions for lookahead without copying state    #
 #                                                                          #
@@ -217,9 +324,23 @@ cdef np.ndarray[lookahead_t, ndim=2] get_groups_after(GameState state)
    - groups_after[loc, 2] = number of stones captured by playing at loc
 """
 
+cdef void fill_groups_after(GameState state, lookahead_t[:, :] result) nogil
+"""nogil version of get_groups_after() writing to result, an array of size (board_size, 3).
+   Entries of locations that are not legal moves are not changed.
+"""
+
 cdef np.ndarray[lookahead_t, ndim=1] get_groups_after_at(GameState state, location_t loc)
 """Compute 'groups_after' results at a single location, which must be a legal move.
 
    Returns a size (3,) numpy arry with group size in index 0, liberty count in index 1, and
    number of opponent stones captured in index 2 (see get_groups_after())
 """
+
+cdef void compute_groups_after_at(GameState state, location_t loc, lookahead_t* result) nogil
+"""nogil version of get_groups_after_at() writing the three results to result[0:3]
+"""
+
+cdef void compute_groups_after_for(GameState state, location_t loc, stone_t player, lookahead_t* result) nogil  # noqa: E501
+"""Compute 'groups_after' results of a move by player at the empty location loc into
+   result[0:3], regardless of whose turn it is
+"""
@@ -3,6 +3,11 @@
 # cython: initializedcheck=False
 # cython: nonecheck=False
 from cython.operator cimport dereference as d
+from cython.parallel cimport prange
+from cpython.ref cimport PyObject
+from libc.string cimport memset
+from AlphaGo.go.game_state_batch import GameStateBatch
+from AlphaGo.preprocessing.patterns import get_pattern_table
 import numpy as np
 cimport numpy as np
 
@@ -21,6 +26,9 @@ cdef class Preprocess:
     # Flag whether or not any features require 'lookahead' to groups_after
     cdef bool requires_groups_after
 
+    # Flag whether or not any features require the 3x3 pattern hashes of all legal moves
+    cdef bool requires_hashes_3x3
+
     # List with all string names of features used currently
     cdef list feature_list
 
@@ -30,10 +38,10 @@ cdef class Preprocess:
     # Board size, same convention as in GameState
     cdef short size, board_size
 
-    # Sets of pattern hashes of the Top-N most common response patterns of each type
-    cdef set pattern_nakade
-    cdef set pattern_response_12d
-    cdef set pattern_non_response_3x3
+    # Tables of the ids of the most common patterns of each type, or None if not given
+    cdef PatternTable pattern_nakade
+    cdef PatternTable pattern_response_12d
+    cdef PatternTable pattern_non_response_3x3
     """
 
     ############################################################################
@@ -41,7 +49,7 @@ cdef class Preprocess:
     #                                                                          #
     ############################################################################
 
-    cdef int get_board(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset):  # noqa: E501
+    cdef int get_board(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil:  # noqa: E501
         """A feature encoding WHITE BLACK and EMPTY on separate planes.
 
            Note:
@@ -70,7 +78,7 @@ cdef class Preprocess:
 
         return offset + 3
 
-    cdef int get_turns_since(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset):  # noqa: E501
+    cdef int get_turns_since(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil:  # noqa: E501
         """A feature encoding the age of the stone at each location up to 'maximum'
 
            Note:
@@ -79,30 +87,26 @@ cdef class Preprocess:
         """
 
         cdef location_t location
-        cdef int age = offset + 7
-        cdef set marked_locations = set()
+        cdef int age, n_history = state.moves_history.size()
 
         # Set all stones to max age
         for location in state.moves_history:
             if location != action_t.PASS and d(state.board[location]).color > stone_t.EMPTY:
-                tensor[age, location] = 1
+                tensor[offset + 7, location] = 1
 
         # Loop over state.moves_history backwards so that recently-captured stones aren't counted.
-        for age, location in enumerate(reversed(state.moves_history)):
-            # If age has not been set yet (i.e. this is not a stone that was captured and re-placed)
-            if location != action_t.PASS and location not in marked_locations and \
-                    d(state.board[location]).color > stone_t.EMPTY:
+        # Break at maximum-1, since all other stones were set to maximum-1 already.
+        for age in range(min(n_history, 7)):
+            location = state.moves_history[n_history - 1 - age]
+            # If age has not been set yet (i.e. this is not a stone that was captured and
+            # re-placed), in which case the max age plane is still set.
+            if location != action_t.PASS and tensor[offset + 7, location] == 1:
                 tensor[offset + age, location] = 1
                 tensor[offset + 7, location] = 0
-                marked_locations.add(location)
-
-            # Break if reached maximum-1, since all other stones were set to maximum-1 already.
-            if age >= 6:
-                break
 
         return offset + 8
 
-    cdef int get_liberties(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset):  # noqa: E501
+    cdef int get_liberties(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil:  # noqa: E501
         """A feature encoding the number of liberties of the group connected to the stone at each
            location
 
@@ -126,7 +130,7 @@ cdef class Preprocess:
 
         return offset + 8
 
-    cdef int get_capture_size(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset):  # noqa: E501
+    cdef int get_capture_size(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil:  # noqa: E501
         """A feature encoding the number of opponent stones that would be captured by playing at
            each location, up to 'maximum'
 
@@ -146,7 +150,7 @@ cdef class Preprocess:
 
         return offset + 8
 
-    cdef int get_self_atari_size(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset):  # noqa: E501
+    cdef int get_self_atari_size(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil:  # noqa: E501
         """A feature encoding the size of the own-stone group that is put into atari by playing at
            a location
 
@@ -168,7 +172,7 @@ cdef class Preprocess:
 
         return offset + 8
 
-    cdef int get_liberties_after(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset):  # noqa: E501
+    cdef int get_liberties_after(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil:  # noqa: E501
         """A feature encoding what the number of liberties *would be* of the group connected to
            the stone *if* played at a location
 
@@ -189,45 +193,65 @@ cdef class Preprocess:
 
         return offset + 8
 
-    cdef int get_ladder_capture(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset):  # noqa: E501
+    cdef int get_ladder_capture(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil:  # noqa: E501
         """A feature with 1 indicating that playing at a location would play out a ladder that
-           results in capturing an opponent group.
+           results in capturing an opponent group. Searches are reused from ladder_cache if it is
+           not None.
         """
 
-        cdef vector[location_t] captures = vector[location_t]()
+        cdef vector[group_ptr_t] prey_groups = vector[group_ptr_t]()
+        cdef location_set_t plausible_captures
         cdef location_t location
         cdef group_ptr_t group
 
-        # Search for any groups of the opponent player that have exactly 2 liberties
+        # Search for any groups of the opponent player that have exactly 2 liberties. These are
+        # collected first since the ladder search temporarily modifies state.groups_set.
         for group in state.groups_set:
             if d(group).color != state.current_player and d(group).count_liberty == 2:
-                # Try each "plausible" capture move on a copy of this state
-                for location in get_plausible_capture_moves(state, group):
-                    if is_ladder_capture_move(state.copy(), group, location):
+                prey_groups.push_back(group)
+
+        for group in prey_groups:
+            # Try each "plausible" capture move; the state is restored after each search.
+            plausible_captures = get_plausible_capture_moves(state, group)
+            for location in plausible_captures:
+                if ladder_cache is None:
+                    if is_ladder_capture_move(state, group, location):
                         tensor[offset, location] = 1
+                elif ladder_cache.is_ladder_capture_move(state, group, location):
+                    tensor[offset, location] = 1
 
         return offset + 1
 
-    cdef int get_ladder_escape(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset):  # noqa: E501
+    cdef int get_ladder_escape(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil:  # noqa: E501
         """A feature with 1 indicating that playing at a location would play out a ladder with the
-           current player ultimately escaping.
+           current player ultimately escaping. Searches are reused from ladder_cache if it is not
+           None.
         """
 
-        cdef vector[location_t] escapes = vector[location_t]()
+        cdef vector[group_ptr_t] prey_groups = vector[group_ptr_t]()
+        cdef location_set_t plausible_escapes
         cdef location_t location
         cdef group_ptr_t group
 
-        # Search for any groups of the current player that are in atari
+        # Search for any groups of the current player that are in atari. These are collected first
+        # since the ladder search temporarily modifies state.groups_set.
         for group in state.groups_set:
             if d(group).color == state.current_player and d(group).count_liberty == 1:
-                # Try each "plausible" escape move on a copy of this state
-                for location in get_plausible_escape_moves(state, group):
-                    if is_ladder_escape_move(state.copy(), group, location):
+                prey_groups.push_back(group)
+
+        for group in prey_groups:
+            # Try each "plausible" escape move; the state is restored after each search.
+            plausible_escapes = get_plausible_escape_moves(state, group)
+            for location in plausible_escapes:
+                if ladder_cache is None:
+                    if is_ladder_escape_move(state, group, location):
                         tensor[offset, location] = 1
+                elif ladder_cache.is_ladder_escape_move(state, group, location):
+                    tensor[offset, location] = 1
 
         return offset + 1
 
-    cdef int get_sensibleness(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset):  # noqa: E501
+    cdef int get_sensibleness(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil:  # noqa: E501
         """A move is 'sensible' if it is legal and if it does not fill the current_player's own eye
         """
 
@@ -239,7 +263,7 @@ cdef class Preprocess:
 
         return offset + 1
 
-    cdef int get_legal(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset):  # noqa: E501
+    cdef int get_legal(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil:  # noqa: E501
         """Zero at all illegal moves, one at all legal moves. Unlike sensibleness, no eyes check.
         """
 
@@ -250,12 +274,16 @@ cdef class Preprocess:
 
         return offset + 1
 
-    cdef int get_response(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset):  # noqa: E501
-        # TODO - implement response pattern features as a lookup table ?
+    cdef int get_response(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil:  # noqa: E501
+        """Single feature plane encoding whether this location matches any of the response
+           patterns, for now it only checks the 12d response patterns as we do not use the
+           3x3 response patterns.
+        """
 
-        return offset + 1
+        return self.get_response_12d(state, tensor, groups_after, hashes_3x3, ladder_cache,
+                                     offset)
 
-    cdef int get_save_atari(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset):  # noqa: E501
+    cdef int get_save_atari(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil:  # noqa: E501
         """A feature wrapping a shallow GameState.is_ladder_escape() search. Effectively this
            feature encodes whether a group in atari can be saved for at least one more turn.
         """
@@ -263,65 +291,125 @@ cdef class Preprocess:
         # TODO - pass additional args to feature processors, redirect this function to
         # get_ladder_escapes with less depth.
 
-        cdef vector[location_t] escapes = vector[location_t]()
+        cdef vector[group_ptr_t] prey_groups = vector[group_ptr_t]()
+        cdef location_set_t plausible_escapes
         cdef location_t location
         cdef group_ptr_t group
 
-        # Search for any groups of the current player that are in atari
+        # Search for any groups of the current player that are in atari. These are collected first
+        # since the ladder search temporarily modifies state.groups_set.
         for group in state.groups_set:
             if d(group).color != state.current_player and d(group).count_liberty == 2:
-                # Try each "plausible" escape move on a copy of this state
-                for location in get_plausible_escape_moves(state, group):
-                    if is_ladder_escape_move(state.copy(), group, location, 2):
-                        tensor[offset, location] = 1
+                prey_groups.push_back(group)
+
+        for group in prey_groups:
+            # Try each "plausible" escape move; the state is restored after each search.
+            plausible_escapes = get_plausible_escape_moves(state, group)
+            for location in plausible_escapes:
+                if is_ladder_escape_move(state, group, location, 2):
+                    tensor[offset, location] = 1
 
         return offset + 1
 
-    cdef int get_neighbor(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset):  # noqa: E501
-        # TODO - implement response pattern features as a lookup table ?
+    cdef int get_neighbor(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil:  # noqa: E501
+        """Encode last move neighbor positions in two planes:
+           - horizontal & vertical / direct neighbor
+           - diagonal neighbor
+        """
 
-        return offset + 1
+        cdef location_t last_move, location
+        cdef int i
+
+        if state.moves_history.size() == 0 or state.moves_history.back() == action_t.PASS:
+            return offset + 2
+
+        last_move = state.moves_history.back()
+        for i in range(8):
+            location = d(state.ptr_neighbor3x3)[last_move * 8 + i]
+            if state.is_legal_location(location):
+                # The first four locations are direct neighbors, the last four diagonal.
+                tensor[offset + i // 4, location] = 1
+
+        return offset + 2
 
-    cdef int get_nakade(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset):  # noqa: E501
-        # TODO - implement response pattern features as a lookup table ?
+    cdef int get_nakade(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil:  # noqa: E501
+        """A nakade pattern is a 12d pattern on a location a stone was captured before. The plane
+           is one at legal moves on the stones captured by the previous move whose 12d pattern,
+           with colors but without liberty counts, is in the nakade table.
+        """
+
+        cdef location_t location
+        cdef vector[location_t] captured = bitboard_locations(d(state.last_captured).stones)
+
+        for location in captured:
+            if self.get_nakade_id(state, location) >= 0:
+                tensor[offset, location] = 1
 
         return offset + 1
 
-    cdef int get_response_12d(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset):  # noqa: E501
-        # TODO - implement response pattern features as a lookup table ?
+    cdef int get_response_12d(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil:  # noqa: E501
+        """One at legal moves in the 12d shape around the previous move whose response pattern is
+           in the response_12d table.
+        """
+
+        cdef location_t last_move, location
+        cdef pattern_hash_t hash_12d
+        cdef int i
+
+        if state.moves_history.size() == 0 or state.moves_history.back() == action_t.PASS:
+            return offset + 1
+
+        last_move = state.moves_history.back()
+        hash_12d = state.get_12d_hash(last_move, True)
+        for i in range(12):
+            location = d(state.ptr_neighbor12d)[last_move * 12 + i]
+            if state.is_legal_location(location) and \
+                    self.pattern_response_12d.lookup(response_hash(hash_12d, i)) >= 0:
+                tensor[offset, location] = 1
 
         return offset + 1
 
-    cdef int get_non_response_3x3(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset):  # noqa: E501
-        # TODO - implement response pattern features as a lookup table ?
+    cdef int get_non_response_3x3(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil:  # noqa: E501
+        """One at legal moves whose 3x3 pattern is in the non_response_3x3 table, given the 3x3
+           hash of every legal move.
+        """
+
+        cdef location_t location
+
+        for location in state.legal_moves:
+            if self.get_non_response_3x3_id(state, location, hashes_3x3[location]) >= 0:
+                tensor[offset, location] = 1
 
         return offset + 1
 
-    cdef int zeros(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset):  # noqa: E501
+    cdef int zeros(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil:  # noqa: E501
         """Plane filled with zeros
         """
 
-        # Nothing to do; all features begin with zeros.         return offset + 1
+        # Nothing to do; all features begin with zeros.
+        return offset + 1
 
-    cdef int ones(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset):  # noqa: E501
+    cdef int ones(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil:  # noqa: E501
         """Plane filled with ones
         """
 
-        # Taking advantage of numpy slice indexing
-        tensor[offset, :] = 1
+        cdef location_t location
+
+        for location in range(self.board_size):
+            tensor[offset, location] = 1
 
         return offset + 1
 
-    cdef int color(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset):  # noqa: E501
+    cdef int color(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil:  # noqa: E501
         """Value net feature, plane with ones if active_player is black else zeros
         """
 
         if state.current_player == stone_t.BLACK:
-            return self.ones(state, tensor, groups_after, offset)
+            return self.ones(state, tensor, groups_after, hashes_3x3, ladder_cache, offset)
         else:
-            return self.zeros(state, tensor, groups_after, offset)
+            return self.zeros(state, tensor, groups_after, hashes_3x3, ladder_cache, offset)
 
-    cdef int ko(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, int offset):  # noqa: E501
+    cdef int ko(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache, int offset) nogil:  # noqa: E501
         """Ko feature (note: only aware of one-move-back ko, not superko)
         """
 
@@ -330,6 +418,52 @@ cdef class Preprocess:
 
         return offset + 1
 
+    ############################################################################
+    #   Pattern lookup                                                         #
+    #                                                                          #
+    ############################################################################
+
+    cdef int get_nakade_id(self, GameState state, location_t location) nogil:
+        """Id of the nakade pattern of a move at location, or -1 if there is none
+        """
+
+        if self.pattern_nakade is None or not state.is_legal_location(location) or \
+                not bitboard_get(d(state.last_captured).stones, location):
+            return -1
+
+        return self.pattern_nakade.lookup(nakade_hash(state, location))
+
+    cdef int get_response_12d_id(self, GameState state, location_t location) nogil:
+        """Id of the response pattern of a move at location, or -1 if there is none
+        """
+
+        cdef location_t last_move
+        cdef int i
+
+        if self.pattern_response_12d is None or state.moves_history.size() == 0 or \
+                state.moves_history.back() == action_t.PASS or \
+                not state.is_legal_location(location):
+            return -1
+
+        last_move = state.moves_history.back()
+        for i in range(12):
+            if d(state.ptr_neighbor12d)[last_move * 12 + i] == location:
+                return self.pattern_response_12d.lookup(
+                    response_hash(state.get_12d_hash(last_move, True), i))
+
+        return -1
+
+    cdef int get_non_response_3x3_id(self, GameState state, location_t location, pattern_hash_t hash_3x3) nogil:  # noqa: E501
+        """Id of the non-response pattern of a move at location, given the 3x3 hash of location
+           without player, or -1 if there is none
+        """
+
+        if self.pattern_non_response_3x3 is None or not state.is_legal_location(location):
+            return -1
+
+        return self.pattern_non_response_3x3.lookup(
+            non_response_hash(hash_3x3, state.current_player))
+
     ############################################################################
     #   init function                                                          #
     #                                                                          #
@@ -347,8 +481,12 @@ cdef class Preprocess:
         self.processors = vector[preprocess_method]()
 
         self.requires_groups_after = False
+        self.requires_hashes_3x3 = False
 
-        # TODO - load response pattern files
+        # Load the pattern tables once; features that need one check that it was given.
+        self.pattern_nakade = get_pattern_table(dict_nakade)
+        self.pattern_response_12d = get_pattern_table(dict_12d)
+        self.pattern_non_response_3x3 = get_pattern_table(dict_3x3)
 
         self.feature_list = feature_list
         self.output_dim = 0
@@ -409,23 +547,37 @@ cdef class Preprocess:
                 self.output_dim += 1
 
             elif feat == "response":
-                raise NotImplementedError("response is not yet implemented; requires preprocessing and training redesign")  # noqa: E501
+                if self.pattern_response_12d is None:
+                    raise ValueError("response requires dict_12d")
+                processor = self.get_response
+                self.output_dim += 1
 
             elif feat == "save_atari":
                 processor = self.get_save_atari
                 self.output_dim += 1
 
             elif feat == "neighbor":
-                raise NotImplementedError("neighbor is not yet implemented; requires preprocessing and training redesign")  # noqa: E501
+                processor = self.get_neighbor
+                self.output_dim += 2
 
             elif feat == "nakade":
-                raise NotImplementedError("nakade is not yet implemented; requires preprocessing and training redesign")  # noqa: E501
+                if self.pattern_nakade is None:
+                    raise ValueError("nakade requires dict_nakade")
+                processor = self.get_nakade
+                self.output_dim += 1
 
             elif feat == "response_12d":
-                raise NotImplementedError("response_12d is not yet implemented; requires preprocessing and training redesign")  # noqa: E501
+                if self.pattern_response_12d is None:
+                    raise ValueError("response_12d requires dict_12d")
+                processor = self.get_response_12d
+                self.output_dim += 1
 
             elif feat == "non_response_3x3":
-                raise NotImplementedError("non_response_3x3 is not yet implemented; requires preprocessing and training redesign")  # noqa: E501
+                if self.pattern_non_response_3x3 is None:
+                    raise ValueError("non_response_3x3 requires dict_3x3")
+                processor = self.get_non_response_3x3
+                self.output_dim += 1
+                self.requires_hashes_3x3 = True
 
             elif feat == "color":
                 processor = self.color
@@ -445,39 +597,137 @@ cdef class Preprocess:
     #                                                                          #
     ############################################################################
 
-    cpdef np.ndarray[onehot_t, ndim=4] state_to_tensor(self, GameState state):
-        """Convert a GameState to a Theano-compatible tensor of one-hot features
+    cdef void fill_tensor(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache) nogil:  # noqa: E501
+        """Write the features of state to tensor, of shape (output_dim, board_size), which is
+           cleared first. groups_after and hashes_3x3 are scratch space of shape (board_size, 3)
+           and (board_size,). ladder_cache is used by the ladder features, or None.
+
+           Only state is changed (temporarily, by ladder searches), so different states can be
+           processed in parallel without the GIL.
         """
 
-        cdef int i
-        cdef preprocess_method proc
-        cdef np.ndarray[lookahead_t, ndim=2] groups_after
+        # Get char array with next move information
+        if self.requires_groups_after:
+            fill_groups_after(state, groups_after)
+        if self.requires_hashes_3x3:
+            fill_hashes_3x3(state, hashes_3x3)
 
-        # Create complete array now instead of concatenate later
-        cdef np.ndarray[onehot_t, ndim=2] np_tensor = \
-            np.zeros((self.output_dim, self.board_size), dtype=np.uint8)
+        self.fill_planes(state, tensor, groups_after, hashes_3x3, ladder_cache)
 
-        cdef int offset = 0
+    cdef void fill_planes(self, GameState state, onehot_t[:, :] tensor, lookahead_t[:, :] groups_after, pattern_hash_t[:] hashes_3x3, LadderCache ladder_cache) nogil:  # noqa: E501
+        """Clear tensor and run all processors on it, given the groups_after and 3x3 hashes of
+           every legal move of the current player and the ladder cache, or None.
+        """
 
-        # Get char array with next move information
-        if self.requires_groups_after:
-            groups_after = get_groups_after(state)
-        else:
-            groups_after = np.zeros((1, 1), dtype=np.uint16)
+        cdef preprocess_method proc
+        cdef int offset = 0, plane
+        cdef location_t location
+
+        for plane in range(self.output_dim):
+            for location in range(self.board_size):
+                tensor[plane, location] = 0
 
         # Loop over all processors and generate tensor
         for proc in self.processors:
-            offset = proc(self, state, np_tensor, groups_after, offset)
+            offset = proc(self, state, tensor, groups_after, hashes_3x3, ladder_cache, offset)
+
+    cpdef np.ndarray[onehot_t, ndim=4] state_to_tensor(self, GameState state):
+        """Convert a GameState to a Theano-compatible tensor of one-hot features
+        """
+
+        # Create complete array now instead of concatenate later
+        cdef np.ndarray[onehot_t, ndim=2] np_tensor = \
+            np.empty((self.output_dim, self.board_size), dtype=np.uint8)
+        cdef onehot_t[:, :] tensor = np_tensor
+        cdef lookahead_t[:, :] groups_after = np.empty((self.board_size, 3), dtype=np.uint16)
+        cdef pattern_hash_t[:] hashes_3x3 = np.empty(self.board_size, dtype=np.uint64)
+        # Ladder searches are only cached by a FeatureTracker following a game.
+        cdef LadderCache ladder_cache = None
+
+        with nogil:
+            self.fill_tensor(state, tensor, groups_after, hashes_3x3, ladder_cache)
 
         # Reshape result from (features, board_size) to (1, features, size, size), i.e. with a
         # 2D board for input to a convolutional network and a singleton 'batch' dimension.
         return np_tensor.reshape((1, self.output_dim, self.size, self.size))
 
+    cpdef np.ndarray[onehot_t, ndim=4] states_to_tensor(self, states, np.ndarray out=None):
+        """Convert a list of GameStates (or a GameStateBatch) to a tensor of shape
+           (N, features, size, size), the concatenation of state_to_tensor() of every state.
+
+           If out is given, the features are written to it and it is returned; it must be a
+           C-contiguous uint8 array of that shape. Distinct states are processed in parallel
+           without the GIL.
+        """
+
+        cdef vector[PyObject*] state_pointers
+        cdef onehot_t[:, :, :] tensors
+        cdef lookahead_t[:, :, :] groups_after
+        cdef pattern_hash_t[:, :] hashes_3x3
+        cdef LadderCache ladder_cache = None
+        cdef GameState state
+        cdef int i, n_states
+
+        if isinstance(states, GameStateBatch):
+            states = states.get_states()
+        n_states = len(states)
+
+        for state in states:
+            if state.size != self.size:
+                raise ValueError("Expected states of size %d, got %d" % (self.size, state.size))
+            state_pointers.push_back(<PyObject*> state)
+
+        shape = (n_states, self.output_dim, self.size, self.size)
+        if out is None:
+            out = np.empty(shape, dtype=np.uint8)
+        elif (<object> out).shape != shape or out.dtype != np.uint8 or \
+                not out.flags.c_contiguous:
+            raise ValueError("out must be a C-contiguous uint8 array of shape %s" % (shape,))
+
+        tensors = out.reshape((n_states, self.output_dim, self.board_size))
+        groups_after = np.empty((n_states, self.board_size, 3), dtype=np.uint16)
+        hashes_3x3 = np.empty((n_states, self.board_size), dtype=np.uint64)
+
+        if len(set(map(id, states))) == n_states:
+            for i in prange(n_states, nogil=True, schedule="dynamic"):
+                self.fill_tensor(<GameState> state_pointers[i], tensors[i], groups_after[i],
+                                 hashes_3x3[i], ladder_cache)
+        else:
+            # The same state twice; ladder searches on it must not run concurrently.
+            with nogil:
+                for i in range(n_states):
+                    self.fill_tensor(<GameState> state_pointers[i], tensors[i], groups_after[i],
+                                     hashes_3x3[i], ladder_cache)
+
+        return out
+
     ############################################################################
     #   public def function (Python)                                           #
     #                                                                          #
     ############################################################################
 
+    def get_pattern_ids(self, GameState state):
+        """Return the ids of the patterns of every move of the current player as an int32 array
+           of shape (3, size, size): nakade, response_12d and non_response_3x3 ids, in the order of
+           patterns.PATTERN_TYPES. Locations without a pattern in the table, illegal moves and
+           pattern types without a table are -1. Feature planes only encode whether a move matches
+           a pattern; models that learn a weight per pattern use these ids instead.
+        """
+
+        cdef np.ndarray[np.int32_t, ndim=2] ids = np.empty((3, self.board_size), dtype=np.int32)
+        cdef location_t location
+
+        if state.size != self.size:
+            raise ValueError("Expected a state of size %d, got %d" % (self.size, state.size))
+
+        for location in range(self.board_size):
+            ids[0, location] = self.get_nakade_id(state, location)
+            ids[1, location] = self.get_response_12d_id(state, location)
+            ids[2, location] = self.get_non_response_3x3_id(
+                state, location, state.get_3x3_hash(location, False))
+
+        return ids.reshape((3, self.size, self.size))
+
     def get_output_dimension(self):
         """return output_dim, the amount of planes an output tensor will have
         """
@@ -489,6 +739,213 @@ cdef class Preprocess:
         return self.feature_list
 
 
+cdef class FeatureTracker:
+
+    ############################################################################
+    #   Variables are declared in the .pxd file                                #
+    #                                                                          #
+    ############################################################################
+
+    """
+    # Preprocess whose features are computed
+    cdef Preprocess preprocess
+
+    # Board size, same convention as in GameState
+    cdef short size, board_size
+
+    # Color and liberty count (up to 3) of every location at the previous update, as in the
+    # pattern hashes, or 0 before the first update
+    cdef vector[char] cells
+
+    # Flags of the locations whose groups_after (DIRTY_GROUPS_AFTER) or 3x3 hash (DIRTY_HASH) must
+    # be recomputed in the current update
+    cdef vector[char] dirty
+
+    # groups_after of every empty location for a move by WHITE and by BLACK, respectively
+    cdef lookahead_t[:, :] groups_after_white
+    cdef lookahead_t[:, :] groups_after_black
+
+    # 3x3 pattern hash without player of every location
+    cdef pattern_hash_t[:] hashes_3x3
+
+    # Results of ladder searches in previous positions
+    cdef LadderCache ladder_cache
+    """
+
+    ############################################################################
+    #   init function                                                          #
+    #                                                                          #
+    ############################################################################
+
+    def __init__(self, Preprocess preprocess):
+        """Create a tracker computing the features of preprocess. A tracker should follow a
+           single game, i.e. a sequence of states that differ by a few moves each.
+        """
+
+        self.preprocess = preprocess
+        self.size = preprocess.size
+        self.board_size = preprocess.board_size
+        self.cells = vector[char](self.board_size, 0)
+        # One more entry for the border, which is a neighbor in 3x3 patterns.
+        self.dirty = vector[char](self.board_size + 1, 0)
+        self.groups_after_white = np.zeros((self.board_size, 3), dtype=np.uint16)
+        self.groups_after_black = np.zeros((self.board_size, 3), dtype=np.uint16)
+        self.hashes_3x3 = np.zeros(self.board_size, dtype=np.uint64)
+        self.ladder_cache = LadderCache()
+
+    ############################################################################
+    #   cdef functions                                                         #
+    #                                                                          #
+    ############################################################################
+
+    cdef void mark_liberties(self, group_ptr_t group) nogil:
+        """Mark all liberties of group as dirty
+        """
+
+        cdef location_t location
+        cdef vector[location_t] liberties = bitboard_locations(d(group).liberties)
+
+        for location in liberties:
+            self.dirty[location] |= DIRTY_GROUPS_AFTER
+
+    cdef int update_lookahead(self, GameState state) nogil:
+        """Bring groups_after of both players and the 3x3 hashes up to date with state and return
+           the number of locations whose groups_after were recomputed.
+
+           groups_after at an empty location only depends on the groups next to it. These can
+           only have changed if a neighbor changed color or belongs to a group that contains or
+           touches a location that changed color, i.e. if the location is a liberty of such a
+           group. The 3x3 hash of a location only depends on the color and liberty count of its
+           eight neighbors.
+        """
+
+        cdef location_t location, neighbor_loc
+        cdef Group* group
+        cdef group_ptr_t neighbor_group
+        cdef stone_t color
+        cdef char cell
+        cdef int i, count = 0
+        cdef bool groups_after = self.preprocess.requires_groups_after
+        cdef bool hashes = self.preprocess.requires_hashes_3x3
+
+        for location in range(self.board_size):
+            group = state.board[location].get()
+            color = group.color
+            cell = color << 2 | min(group.count_liberty, 3)
+            if cell == self.cells[location]:
+                continue
+
+            if hashes:
+                # The hash of a location is only kept up to date while it is empty.
+                self.dirty[location] |= DIRTY_HASH
+                for i in range(8):
+                    self.dirty[d(state.ptr_neighbor3x3)[location * 8 + i]] |= DIRTY_HASH
+
+            if groups_after and color != self.cells[location] >> 2:
+                self.dirty[location] |= DIRTY_GROUPS_AFTER
+
+                if color > stone_t.EMPTY:
+                    self.mark_liberties(state.board[location])
+
+                for i in range(4):
+                    neighbor_loc = d(state.ptr_neighbor)[location * 4 + i]
+                    neighbor_group = state.board[neighbor_loc]
+                    if d(neighbor_group).color == stone_t.EMPTY:
+                        self.dirty[neighbor_loc] |= DIRTY_GROUPS_AFTER
+                    elif d(neighbor_group).color > stone_t.EMPTY:
+                        self.mark_liberties(neighbor_group)
+
+            self.cells[location] = cell
+
+        for location in range(self.board_size):
+            if not self.dirty[location]:
+                continue
+            if self.cells[location] >> 2 == stone_t.EMPTY:
+                if self.dirty[location] & DIRTY_GROUPS_AFTER:
+                    compute_groups_after_for(state, location, stone_t.WHITE,
+                                             &self.groups_after_white[location, 0])
+                    compute_groups_after_for(state, location, stone_t.BLACK,
+                                             &self.groups_after_black[location, 0])
+                    count += 1
+                if self.dirty[location] & DIRTY_HASH:
+                    self.hashes_3x3[location] = state.get_3x3_hash(location, False)
+            self.dirty[location] = 0
+
+        return count
+
+    ############################################################################
+    #   public functions                                                       #
+    #                                                                          #
+    ############################################################################
+
+    cpdef np.ndarray[onehot_t, ndim=4] state_to_tensor(self, GameState state):
+        """Same as Preprocess.state_to_tensor(), computing groups_after and 3x3 hashes only
+           around the locations that changed since the previous call, and reusing ladder searches
+           whose region did not change
+        """
+
+        cdef np.ndarray[onehot_t, ndim=2] np_tensor = \
+            np.empty((self.preprocess.output_dim, self.board_size), dtype=np.uint8)
+        cdef onehot_t[:, :] tensor = np_tensor
+
+        self.update(state)
+        with nogil:
+            if state.current_player == stone_t.BLACK:
+                self.preprocess.fill_planes(state, tensor, self.groups_after_black,
+                                            self.hashes_3x3, self.ladder_cache)
+            else:
+                self.preprocess.fill_planes(state, tensor, self.groups_after_white,
+                                            self.hashes_3x3, self.ladder_cache)
+
+        return np_tensor.reshape((1, self.preprocess.output_dim, self.size, self.size))
+
+    cpdef int update(self, GameState state) except -1:
+        """Update the tracked board to state. Returns the number of locations whose groups_after
+           were recomputed, or 0 if the features do not need groups_after.
+        """
+
+        if state.size != self.size:
+            raise ValueError("Expected a state of size %d, got %d" % (self.size, state.size))
+        if not self.preprocess.requires_groups_after and not self.preprocess.requires_hashes_3x3:
+            return 0
+
+        with nogil:
+            return self.update_lookahead(state)
+
+    def reset(self):
+        """Forget the tracked board and ladder searches, e.g. before following a new game. Not
+           required for correctness; the next update recomputes every location that differs.
+        """
+
+        cdef location_t location
+
+        for location in range(self.board_size):
+            self.cells[location] = 0
+        self.ladder_cache.clear()
+
+    def get_ladder_cache(self):
+        """Return the LadderCache of the ladder features, e.g. to report its hits and misses
+        """
+        return self.ladder_cache
+
+
+############################################################################
+#   Pattern hash helper functions                                          #
+#                                                                          #
+############################################################################
+
+cdef void fill_hashes_3x3(GameState state, pattern_hash_t[:] result) nogil:
+    """Compute the 3x3 pattern hash without player (GameState.get_3x3_hash(loc, False)) of every
+       legal move into result, an array of size board_size. Entries of other locations are not
+       changed.
+    """
+
+    cdef location_t loc
+
+    for loc in state.legal_moves:
+        result[loc] = state.get_3x3_hash(loc, False)
+
+
 ############################################################################
 #   "Groups after" helper functions for lookahead without copying state    #
 #                                                                          #
@@ -508,19 +965,28 @@ cdef np.ndarray[lookahead_t, ndim=2] get_groups_after(GameState state):
        - groups_after[loc, 2] = number of stones captured by playing at loc
     """
 
-    cdef location_t loc
     cdef np.ndarray[lookahead_t, ndim=2] result = np.zeros((state.board_size, 3), dtype=np.uint16)
-    cdef np.ndarray[lookahead_t, ndim=1] result_at
 
-    # Call get_groups_after_at() for each legal move
+    fill_groups_after(state, result)
+
+    return result
+
+
+cdef void fill_groups_after(GameState state, lookahead_t[:, :] result) nogil:
+    """Compute 'groups_after' results of every legal move into result, an array of size
+       (board_size, 3). Entries of other locations are not changed (see get_groups_after()).
+    """
+
+    cdef location_t loc
+    cdef lookahead_t result_at[3]
+
+    # Call compute_groups_after_at() for each legal move
     for loc in state.legal_moves:
-        result_at = get_groups_after_at(state, loc)
+        compute_groups_after_at(state, loc, result_at)
         result[loc, 0] = result_at[0]
         result[loc, 1] = result_at[1]
         result[loc, 2] = result_at[2]
 
-    return result
-
 
 cdef np.ndarray[lookahead_t, ndim=1] get_groups_after_at(GameState state, location_t loc):
     """Compute 'groups_after' results at a single location, which must be a legal move.
@@ -530,17 +996,98 @@ cdef np.ndarray[lookahead_t, ndim=1] get_groups_after_at(GameState state, locati
     """
 
     cdef np.ndarray[lookahead_t, ndim=1] result = np.zeros((3,), dtype=np.uint16)
+    cdef lookahead_t result_at[3]
+
+    compute_groups_after_at(state, loc, result_at)
+    result[0] = result_at[0]
+    result[1] = result_at[1]
+    result[2] = result_at[2]
 
-    cdef short capture_before = \
-        state.capture_black if state.current_player == stone_t.WHITE else state.capture_white
-    cdef short capture_after
+    return result
 
-    with state.try_stone(loc, False):
-        result[0] = d(state.board[loc]).count_stones
-        result[1] = d(state.board[loc]).count_liberty
 
-        capture_after = \
-            state.capture_black if state.current_player == stone_t.WHITE else state.capture_white
-        result[2] = capture_after - capture_before
+cdef void compute_groups_after_at(GameState state, location_t loc, lookahead_t* result) nogil:
+    """Compute 'groups_after' results at a single location, which must be a legal move, into
+       result[0:3] (see get_groups_after_at()).
+    """
 
-    return result
+    compute_groups_after_for(state, loc, state.current_player, result)
+
+
+cdef void compute_groups_after_for(GameState state, location_t loc, stone_t player, lookahead_t* result) nogil:  # noqa: E501
+    """Compute 'groups_after' results of a move by player at the empty location loc into
+       result[0:3], regardless of whose turn it is.
+
+       The new group is the union of the stone at loc and all friendly neighboring groups, and
+       opponent neighbors with a single liberty are captured. Everything is computed on the
+       bitboards of the neighboring groups, without playing the move. Groups are accessed through
+       raw pointers, since copying a group_ptr_t updates its reference count.
+    """
+
+    cdef bitboard_word_t stones[BITBOARD_WORDS]
+    cdef bitboard_word_t liberties[BITBOARD_WORDS]
+    cdef bitboard_word_t captured[BITBOARD_WORDS]
+    cdef bitboard_word_t word
+    cdef Group* neighbor_groups[4]
+    cdef location_t neighbor_loc, captured_loc
+    cdef stone_t opponent = stone_t.WHITE if player == stone_t.BLACK else stone_t.BLACK
+    cdef short empty_neighbors = 0
+    cdef bool merges = False, captures = False
+    cdef int i, j
+
+    for i in range(4):
+        neighbor_groups[i] = state.board[d(state.ptr_neighbor)[loc * 4 + i]].get()
+        if neighbor_groups[i].color == stone_t.EMPTY:
+            empty_neighbors += 1
+        elif neighbor_groups[i].color == player:
+            merges = True
+        elif neighbor_groups[i].color == opponent and neighbor_groups[i].count_liberty == 1:
+            captures = True
+
+    # Most moves neither connect nor capture; the new group is then a single stone whose liberties
+    # are its empty neighbors.
+    if not merges and not captures:
+        result[0] = 1
+        result[1] = empty_neighbors
+        result[2] = 0
+        return
+
+    memset(stones, 0, sizeof(stones))
+    memset(liberties, 0, sizeof(liberties))
+    memset(captured, 0, sizeof(captured))
+    bitboard_set(stones, loc)
+
+    for i in range(4):
+        if neighbor_groups[i].color == stone_t.EMPTY:
+            bitboard_set(liberties, d(state.ptr_neighbor)[loc * 4 + i])
+
+        # Friendly groups are merged into the new group.
+        elif neighbor_groups[i].color == player:
+            for j in range(BITBOARD_WORDS):
+                stones[j] |= neighbor_groups[i].stones[j]
+                liberties[j] |= neighbor_groups[i].liberties[j]
+
+        # Opponent groups whose only liberty is loc are captured.
+        elif neighbor_groups[i].color == opponent and neighbor_groups[i].count_liberty == 1:
+            for j in range(BITBOARD_WORDS):
+                captured[j] |= neighbor_groups[i].stones[j]
+
+    # loc itself is no longer a liberty, but every captured stone adjacent to the new group is.
+    bitboard_clear(liberties, loc)
+    result[2] = 0
+    if captures:
+        for j in range(BITBOARD_WORDS):
+            word = captured[j]
+            result[2] += popcount(word)
+            while word != 0:
+                captured_loc = j * 64 + count_trailing_zeros(word)
+                # Clear lowest set bit.
+                word &= word - 1
+                for i in range(4):
+                    neighbor_loc = d(state.ptr_neighbor)[captured_loc * 4 + i]
+                    if bitboard_get(stones, neighbor_loc):
+                        bitboard_set(liberties, captured_loc)
+                        break
+
+    result[0] = bitboard_count(stones)
+    result[1] = bitboard_count(liberties)
@@ -0,0 +1,67 @@
+from AlphaGo.go.constants cimport stone_t, action_t
+from AlphaGo.go.game_state cimport GameState
+from AlphaGo.preprocessing.preprocessing cimport compute_groups_after_at, lookahead_t
+from libcpp cimport bool
+from libc.stdint cimport uint64_t
+import numpy as np
+cimport numpy as np
+
+
+############################################################################
+#   Typedefs                                                               #
+#                                                                          #
+############################################################################
+
+ctypedef short location_t
+
+
+############################################################################
+#   Constants                                                              #
+#                                                                          #
+############################################################################
+
+cdef enum:
+    # Number of planes of the 'capture_size', 'self_atari_size' and 'liberties_after' features.
+    LOOKAHEAD_PLANES = 8
+    # Upper bound on the number of locations of a board (19x19 rounded up).
+    MAX_LOCATIONS = 384
+
+
+############################################################################
+#   Class definition                                                       #
+#                                                                          #
+############################################################################
+
+cdef class LinearRolloutPolicy:
+
+    # Board size, same convention as in GameState
+    cdef short size, board_size
+
+    # List with all string names of the features of the exported network
+    cdef list feature_list
+
+    # exp() of the relu-activated convolution output at a candidate move, by current player
+    # (0: WHITE, 1: BLACK), capture size, self-atari size (LOOKAHEAD_PLANES if not in atari) and
+    # liberties after the move.
+    cdef double exp_conv[2][LOOKAHEAD_PLANES][LOOKAHEAD_PLANES + 1][LOOKAHEAD_PLANES]
+
+    # exp() of the per-location bias, shifted by its maximum.
+    cdef double exp_location[MAX_LOCATIONS]
+
+    # State of the random number generator; every rollout continues from its own copy.
+    cdef uint64_t rng_state
+
+    cdef location_t select_move(self, GameState state, uint64_t* rng) nogil
+    """Sample a move for the current player of state from all sensible moves, proportional to the
+       output of the exported network. Returns PASS if there are no sensible moves.
+    """
+
+    cdef double get_move_weight(self, GameState state, location_t location) nogil
+    """Unnormalized probability of the (legal) move at location.
+    """
+
+    cpdef int run_rollout(self, GameState state, int limit)
+    """Play sampled moves on state with push_location() until the game ends with two consecutive
+       passes or limit moves were played. Returns the number of moves played; the caller may undo
+       them with state.pop().
+    """
@@ -0,0 +1,288 @@
+# cython: wraparound=False
+# cython: boundscheck=False
+# cython: initializedcheck=False
+# cython: nonecheck=False
+from AlphaGo.go.coordinates cimport calculate_tuple_location
+from libc.math cimport exp
+from libcpp.vector cimport vector
+import numpy as np
+cimport numpy as np
+
+
+# Features whose planes are either zero or constant at every candidate move of a rollout (a legal
+# move that does not fill an eye of the current player), and the number of planes of each.
+CONSTANT_FEATURES = {"board": 3, "ones": 1, "turns_since": 8, "liberties": 8, "sensibleness": 1,
+                     "zeros": 1, "legal": 1, "color": 1, "ko": 1}
+
+# Features computed from the groups after a move, see Preprocess.get_groups_after().
+LOOKAHEAD_FEATURES = ["capture_size", "self_atari_size", "liberties_after"]
+
+
+cdef inline uint64_t next_random(uint64_t* rng) nogil:
+    """xorshift64* random number generator
+    """
+
+    rng[0] ^= rng[0] >> 12
+    rng[0] ^= rng[0] << 25
+    rng[0] ^= rng[0] >> 27
+    return rng[0] * 2685821657736338717ULL
+
+
+cdef inline double next_uniform(uint64_t* rng) nogil:
+    """Uniform random number in [0, 1)
+    """
+
+    return (next_random(rng) >> 11) * (1.0 / 9007199254740992.0)
+
+
+cdef class LinearRolloutPolicy:
+
+    ############################################################################
+    #   Variables are declared in the .pxd file                                #
+    #                                                                          #
+    ############################################################################
+
+    """
+    # Board size, same convention as in GameState
+    cdef short size, board_size
+
+    # List with all string names of the features of the exported network
+    cdef list feature_list
+
+    # exp() of the relu-activated convolution output at a candidate move, by current player
+    # (0: WHITE, 1: BLACK), capture size, self-atari size (LOOKAHEAD_PLANES if not in atari) and
+    # liberties after the move.
+    cdef double exp_conv[2][LOOKAHEAD_PLANES][LOOKAHEAD_PLANES + 1][LOOKAHEAD_PLANES]
+
+    # exp() of the per-location bias, shifted by its maximum.
+    cdef double exp_location[MAX_LOCATIONS]
+
+    # State of the random number generator; every rollout continues from its own copy.
+    cdef uint64_t rng_state
+    """
+
+    ############################################################################
+    #   init function                                                          #
+    #                                                                          #
+    ############################################################################
+
+    def __init__(self, list feature_list, weights, double conv_bias, location_bias, char size=19,
+                 seed=None):
+        """Create a rollout policy from the weights of a CNNRollout network: a 1x1 convolution
+           with one output plane and relu activation, a bias for every location and a softmax.
+
+           Arguments:
+           feature_list -- the features of the network, in order
+           weights -- the convolution weight of every input plane
+           conv_bias -- the bias of the convolution
+           location_bias -- the bias added to the convolution output at every location
+           size -- board size
+           seed -- seed of the random number generator, or None to seed it from numpy
+        """
+
+        cdef np.ndarray[np.float64_t, ndim=1] plane_weights
+        cdef np.ndarray[np.float64_t, ndim=1] bias
+        cdef double lookahead[3][LOOKAHEAD_PLANES]
+        cdef double constant[2]
+        cdef double[:, :, :, :] logits
+        cdef int offset = 0, player, capture, atari, liberties, i
+        cdef double logit, max_logit
+
+        self.size = size
+        self.board_size = size * size
+        self.feature_list = feature_list
+
+        plane_weights = np.asarray(weights, dtype=np.float64).ravel()
+        bias = np.asarray(location_bias, dtype=np.float64).ravel()
+        if bias.shape[0] != self.board_size:
+            raise ValueError("location_bias must have %d entries" % self.board_size)
+
+        # Sum the weights of all planes that are one at every candidate move into a constant for
+        # each player, and collect the weights of the lookahead planes.
+        constant[0] = constant[1] = conv_bias
+        for i in range(3):
+            for j in range(LOOKAHEAD_PLANES):
+                lookahead[i][j] = 0
+        for feat in feature_list:
+            feat = feat.lower()
+            if feat in LOOKAHEAD_FEATURES:
+                i = LOOKAHEAD_FEATURES.index(feat)
+                for j in range(LOOKAHEAD_PLANES):
+                    lookahead[i][j] = plane_weights[offset + j]
+                offset += LOOKAHEAD_PLANES
+            elif feat in CONSTANT_FEATURES:
+                if feat == "board":
+                    # Only the plane of empty locations is one at a move.
+                    constant[0] += plane_weights[offset + 2]
+                    constant[1] += plane_weights[offset + 2]
+                elif feat in ("ones", "sensibleness", "legal"):
+                    constant[0] += plane_weights[offset]
+                    constant[1] += plane_weights[offset]
+                elif feat == "color":
+                    constant[1] += plane_weights[offset]
+                offset += CONSTANT_FEATURES[feat]
+            else:
+                raise ValueError("feature %s is not supported by LinearRolloutPolicy" % feat)
+
+        if offset != plane_weights.shape[0]:
+            raise ValueError("expected %d weights for the features, got %d" %
+                             (offset, plane_weights.shape[0]))
+
+        # Tabulate the relu-activated output of the convolution for every combination of feature
+        # values, shifted by the maximum, so that sampling a move requires no calls to exp().
+        logits = np.zeros((2, LOOKAHEAD_PLANES, LOOKAHEAD_PLANES + 1, LOOKAHEAD_PLANES))
+        max_logit = 0
+        for player in range(2):
+            for capture in range(LOOKAHEAD_PLANES):
+                for atari in range(LOOKAHEAD_PLANES + 1):
+                    for liberties in range(LOOKAHEAD_PLANES):
+                        logit = constant[player] + lookahead[0][capture] + lookahead[2][liberties]
+                        if atari < LOOKAHEAD_PLANES:
+                            logit += lookahead[1][atari]
+                        logit = max(logit, 0)
+                        logits[player, capture, atari, liberties] = logit
+                        max_logit = max(max_logit, logit)
+
+        for player in range(2):
+            for capture in range(LOOKAHEAD_PLANES):
+                for atari in range(LOOKAHEAD_PLANES + 1):
+                    for liberties in range(LOOKAHEAD_PLANES):
+                        self.exp_conv[player][capture][atari][liberties] = \
+                            exp(logits[player, capture, atari, liberties] - max_logit)
+
+        max_logit = bias.max()
+        for i in range(self.board_size):
+            self.exp_location[i] = exp(bias[i] - max_logit)
+
+        self.seed(seed)
+
+    ############################################################################
+    #   Move selection                                                         #
+    #                                                                          #
+    ############################################################################
+
+    cdef double get_move_weight(self, GameState state, location_t location) nogil:
+        """Unnormalized probability of the (legal) move at location.
+        """
+
+        cdef lookahead_t groups_after[3]
+        cdef int capture, atari, liberties
+
+        compute_groups_after_at(state, location, groups_after)
+
+        capture = min(groups_after[2], LOOKAHEAD_PLANES - 1)
+        liberties = min(groups_after[1] - 1, LOOKAHEAD_PLANES - 1)
+        if groups_after[1] == 1:
+            atari = min(groups_after[0] - 1, LOOKAHEAD_PLANES - 1)
+        else:
+            atari = LOOKAHEAD_PLANES
+
+        return self.exp_conv[state.current_player == stone_t.BLACK][capture][atari][liberties] * \
+            self.exp_location[location]
+
+    cdef location_t select_move(self, GameState state, uint64_t* rng) nogil:
+        """Sample a move for the current player of state from all sensible moves, proportional to
+           the output of the exported network. Returns PASS if there are no sensible moves.
+        """
+
+        cdef location_t candidates[MAX_LOCATIONS]
+        cdef double cumulative[MAX_LOCATIONS]
+        cdef double total = 0
+        cdef double target
+        cdef location_t location
+        cdef int count = 0, low, high, middle
+
+        for location in state.legal_moves:
+            if not state.is_true_eye(location, state.current_player):
+                total += self.get_move_weight(state, location)
+                candidates[count] = location
+                cumulative[count] = total
+                count += 1
+
+        if count == 0:
+            return action_t.PASS
+
+        # Binary search for the first candidate whose cumulative weight exceeds the target.
+        target = next_uniform(rng) * total
+        low = 0
+        high = count - 1
+        while low < high:
+            middle = (low + high) // 2
+            if cumulative[middle] > target:
+                high = middle
+            else:
+                low = middle + 1
+
+        return candidates[low]
+
+    ############################################################################
+    #   public functions                                                       #
+    #                                                                          #
+    ############################################################################
+
+    cpdef int run_rollout(self, GameState state, int limit):
+        """Play sampled moves on state with push_location() until the game ends with two
+           consecutive passes or limit moves were played. Returns the number of moves played; the
+           caller may undo them with state.pop().
+        """
+
+        cdef uint64_t rng = self.rng_state
+        cdef uint64_t next_seed = self.rng_state
+        cdef location_t location
+        cdef int count = 0
+
+        if state.size != self.size:
+            raise ValueError("expected a state of size %d" % self.size)
+
+        # Give the next rollout a different random sequence.
+        self.rng_state = next_random(&next_seed) or 1
+
+        with nogil:
+            while count < limit:
+                location = self.select_move(state, &rng)
+                state.push_location(location)
+                count += 1
+
+                if location == action_t.PASS and state.moves_history.size() > 1 and \
+                        state.moves_history[state.moves_history.size() - 2] == action_t.PASS:
+                    break
+
+        return count
+
+    def seed(self, seed=None):
+        """Reset the random number generator with the given seed, or with a seed from numpy if it
+           is None
+        """
+
+        if seed is None:
+            seed = np.random.randint(1, np.iinfo(np.int64).max)
+        # xorshift requires a non-zero state.
+        self.rng_state = <uint64_t> seed or 1
+
+    def eval_state(self, GameState state):
+        """Given a GameState object, returns a list of (action, probability) pairs over all
+           sensible moves, in the same format as CNNRollout.eval_state().
+        """
+
+        cdef location_t location
+        cdef vector[location_t] sensible_moves = state.get_sensible_moves()
+        cdef list moves = []
+        cdef list weights = []
+
+        if state.size != self.size:
+            raise ValueError("expected a state of size %d" % self.size)
+
+        for location in sensible_moves:
+            moves.append(calculate_tuple_location(location, self.size))
+            weights.append(self.get_move_weight(state, location))
+
+        if len(moves) == 0:
+            return []
+        probabilities = np.array(weights) / sum(weights)
+        return zip(moves, probabilities)
+
+    def get_feature_list(self):
+        """Return the features of the exported network
+        """
+
+        return list(self.feature_list)
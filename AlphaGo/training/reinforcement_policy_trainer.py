@@ -9,10 +9,11 @@ from keras.optimizers import SGD
 from AlphaGo.util import flatten_idx
 from AlphaGo.models.policy import CNNPolicy
 from AlphaGo.ai import ProbabilisticPolicyPlayer
+from AlphaGo.preprocessing.preprocessing import FeatureTracker
 
 
 def _make_training_pair(st, mv, preprocessor):
-    # Convert move to one-hot
+    # Convert move to one-hot. 'preprocessor' is a Preprocess or a FeatureTracker following st.
     st_tensor = preprocessor.state_to_tensor(st)
     mv_tensor = np.zeros((1, st.get_size() * st.get_size()))
     mv_tensor[(0, flatten_idx(mv, st.get_size()))] = 1
@@ -32,10 +33,14 @@ def run_n_games(optimizer, lr, learner, opponent, num_games, mock_states=[]):
     # Allowing injection of a mock state object for testing purposes
     if mock_states:
         states = mock_states
+    # All games advance together; moves of games that are finished are ignored by the batch.
+    batch = go.GameStateBatch(states=states)
 
     # Create one list of features (aka state tensors) and one of moves for each game being played.
     state_tensors = [[] for _ in range(num_games)]
     move_tensors = [[] for _ in range(num_games)]
+    # Each game's features are computed incrementally from one position to the next.
+    trackers = [FeatureTracker(learner.policy.preprocessor) for _ in range(num_games)]
 
     # List of booleans indicating whether the 'learner' player won.
     learner_won = [None] * num_games
@@ -44,33 +49,32 @@ def run_n_games(optimizer, lr, learner, opponent, num_games, mock_states=[]):
     learner_color = [go.BLACK if i % 2 == 0 else go.WHITE for i in range(num_games)]
     odd_states = states[1::2]
     moves = opponent.get_moves(odd_states)
-    for st, mv in zip(odd_states, moves):
-        st.do_move(mv)
+    go.GameStateBatch(states=odd_states).do_actions(moves)
 
     current = learner
     other = opponent
-    idxs_to_unfinished_states = {i: states[i] for i in range(num_games)}
-    while len(idxs_to_unfinished_states) > 0:
+    finished = batch.is_end_of_game()
+    while not finished.all():
         # Get next moves by current player for all unfinished states.
-        moves = current.get_moves(idxs_to_unfinished_states.values())
-        just_finished = []
-        # Do each move to each state in order.
-        for (idx, state), mv in zip(idxs_to_unfinished_states.iteritems(), moves):
+        unfinished = np.flatnonzero(~finished)
+        moves = current.get_moves([states[idx] for idx in unfinished])
+        if current is learner:
             # Order is important here. We must get the training pair on the unmodified state before
-            # updating it with do_move.
-            is_learnable = current is learner and mv is not go.PASS
-            if is_learnable:
-                (st_tensor, mv_tensor) = _make_training_pair(state, mv, learner.policy.preprocessor)
-                state_tensors[idx].append(st_tensor)
-                move_tensors[idx].append(mv_tensor)
-            state.do_move(mv)
-            if state.is_end_of_game():
-                learner_won[idx] = state.get_winner_color() == learner_color[idx]
-                just_finished.append(idx)
-
-        # Remove games that have finished from dict.
-        for idx in just_finished:
-            del idxs_to_unfinished_states[idx]
+            # updating it with the moves.
+            for idx, mv in zip(unfinished, moves):
+                if mv is not go.PASS:
+                    (st_tensor, mv_tensor) = _make_training_pair(states[idx], mv, trackers[idx])
+                    state_tensors[idx].append(st_tensor)
+                    move_tensors[idx].append(mv_tensor)
+        all_moves = [go.PASS] * num_games
+        for idx, mv in zip(unfinished, moves):
+            all_moves[idx] = mv
+        batch.do_actions(all_moves)
+
+        finished = batch.is_end_of_game()
+        for idx in unfinished:
+            if finished[idx]:
+                learner_won[idx] = states[idx].get_winner_color() == learner_color[idx]
 
         # Swap 'current' and 'other' for next turn.
         current, other = other, current
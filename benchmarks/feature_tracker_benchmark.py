@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+
+p = os.path
+parentddir = p.abspath(p.join(p.dirname(__file__), ".."))
+sys.path.append(parentddir)
+
+from AlphaGo.preprocessing.preprocessing import Preprocess, FeatureTracker  # noqa: E402
+from AlphaGo.util import sgf_iter_states  # noqa: E402
+
+# Report positions per second when converting every position of a game to features with
+# Preprocess.state_to_tensor(), and with a FeatureTracker that follows the game.
+features = ["board", "ones", "turns_since", "liberties", "capture_size", "self_atari_size",
+            "liberties_after", "sensibleness", "zeros"]
+sgf_file = 'tests/test_data/sgf/Lee-Sedol-vs-AlphaGo-20160309.sgf'
+n_repeats = 5
+
+preprocessor = Preprocess(features)
+with open(sgf_file, 'r') as f:
+    sgf_string = f.read()
+
+
+def positions_per_second(make_convert):
+    positions = 0
+    start = time.time()
+    for i in range(n_repeats):
+        convert = make_convert()
+        for (state, move, player) in sgf_iter_states(sgf_string, include_end=False):
+            convert(state)
+            positions += 1
+    return positions / (time.time() - start)
+
+
+def iterate_only():
+    return lambda state: None
+
+
+def stateless():
+    return preprocessor.state_to_tensor
+
+
+def tracked():
+    return FeatureTracker(preprocessor).state_to_tensor
+
+
+# The time to replay the game is the same for both and subtracted.
+replay = 1.0 / positions_per_second(iterate_only)
+stateless_rate = 1.0 / (1.0 / positions_per_second(stateless) - replay)
+print("Preprocess.state_to_tensor      %8.1f positions/s" % stateless_rate)
+tracked_rate = 1.0 / (1.0 / positions_per_second(tracked) - replay)
+print("FeatureTracker.state_to_tensor  %8.1f positions/s  (x%.2f)" %
+      (tracked_rate, tracked_rate / stateless_rate))
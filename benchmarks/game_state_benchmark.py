@@ -0,0 +1,44 @@
+import os
+import sys
+import timeit
+import numpy as np
+
+p = os.path
+parentddir = p.abspath(p.join(p.dirname(__file__), ".."))
+sys.path.append(parentddir)
+
+from AlphaGo.go import GameState, ArrayGameState  # noqa: E402
+
+# Compare copy() and do_move() of the GameState and ArrayGameState board backends on the positions
+# of a random 19x19 game.
+n_moves = 200
+repeat = 200
+
+
+def random_game(state_class, seed=0):
+    rng = np.random.RandomState(seed)
+    state = state_class(size=19)
+    moves = []
+    for _ in range(n_moves):
+        legal_moves = state.get_legal_moves(include_eyes=False)
+        if len(legal_moves) == 0:
+            break
+        moves.append(legal_moves[rng.randint(len(legal_moves))])
+        state.do_move(moves[-1])
+    return state, moves
+
+
+def play(state_class, moves):
+    state = state_class(size=19)
+    for move in moves:
+        state.do_move(move)
+
+
+for state_class in [GameState, ArrayGameState]:
+    state, moves = random_game(state_class)
+
+    copy_time = timeit.timeit(state.copy, number=repeat) / repeat
+    move_time = timeit.timeit(lambda: play(state_class, moves), number=10) / 10 / len(moves)
+
+    print("%-15s copy: %7.2f us   do_move: %7.2f us" %
+          (state_class.__name__, copy_time * 1e6, move_time * 1e6))
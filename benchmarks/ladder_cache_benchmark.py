@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+import glob
+
+p = os.path
+parentddir = p.abspath(p.join(p.dirname(__file__), ".."))
+sys.path.append(parentddir)
+
+from AlphaGo.preprocessing.preprocessing import Preprocess, FeatureTracker  # noqa: E402
+from AlphaGo.util import sgf_iter_states  # noqa: E402
+
+# Report the time to compute the ladder features of every position of each game with
+# Preprocess.state_to_tensor(), and with a FeatureTracker that reuses ladder searches whose
+# region of the board did not change, together with the hits and misses of its cache.
+features = ["ladder_capture", "ladder_escape"]
+sgf_files = sorted(glob.glob(os.path.join(parentddir, 'tests', 'test_data', 'sgf', '*.sgf')))
+
+preprocessor = Preprocess(features)
+tracker = FeatureTracker(preprocessor)
+
+
+def game_seconds(sgf_string, convert):
+    # The time to replay the game is subtracted.
+    start = time.time()
+    for (state, move, player) in sgf_iter_states(sgf_string, include_end=False):
+        pass
+    replay = time.time() - start
+
+    start = time.time()
+    for (state, move, player) in sgf_iter_states(sgf_string, include_end=False):
+        convert(state)
+    return time.time() - start - replay
+
+
+total_hits = total_misses = 0
+total_stateless = total_tracked = 0.0
+print("%-40s %10s %10s %8s %8s %6s" % ("game", "stateless", "tracked", "hits", "misses", "hit %"))
+for sgf_file in sgf_files:
+    with open(sgf_file, 'r') as f:
+        sgf_string = f.read()
+
+    stateless = game_seconds(sgf_string, preprocessor.state_to_tensor)
+    tracker.reset()
+    tracked = game_seconds(sgf_string, tracker.state_to_tensor)
+
+    cache = tracker.get_ladder_cache()
+    hits, misses = cache.get_hits(), cache.get_misses()
+    total_hits += hits
+    total_misses += misses
+    total_stateless += stateless
+    total_tracked += tracked
+    print("%-40s %9.2fs %9.2fs %8d %8d %5.1f%%" % (
+        os.path.basename(sgf_file), stateless, tracked, hits, misses,
+        100.0 * hits / max(hits + misses, 1)))
+
+print("%-40s %9.2fs %9.2fs %8d %8d %5.1f%%  (x%.2f)" % (
+    "total", total_stateless, total_tracked, total_hits, total_misses,
+    100.0 * total_hits / max(total_hits + total_misses, 1), total_stateless / total_tracked))
@@ -0,0 +1,38 @@
+import os
+import sys
+import time
+import numpy as np
+
+p = os.path
+parentddir = p.abspath(p.join(p.dirname(__file__), ".."))
+sys.path.append(parentddir)
+
+from AlphaGo.go import GameState  # noqa: E402
+from AlphaGo.preprocessing.preprocessing import Preprocess  # noqa: E402
+
+# Report the time per position to compute the lookahead features, which evaluate every legal move
+# from the groups next to it, on random 19x19 positions.
+features = ["capture_size", "self_atari_size", "liberties_after"]
+n_states = 30
+n_repeats = 20
+
+preprocessor = Preprocess(features)
+random = np.random.RandomState(0)
+states = []
+for i in range(n_states):
+    gs = GameState()
+    for j in range(random.randint(50, 250)):
+        moves = gs.get_legal_moves(include_eyes=False)
+        if len(moves) == 0:
+            break
+        gs.do_move(moves[random.randint(len(moves))])
+    states.append(gs)
+out = np.empty((n_states, preprocessor.get_output_dimension(), 19, 19), dtype=np.uint8)
+
+start = time.time()
+for i in range(n_repeats):
+    preprocessor.states_to_tensor(states, out=out)
+elapsed = time.time() - start
+n_moves = sum(len(gs.get_legal_moves()) for gs in states)
+print("lookahead features  %6.1f us/position  %6.1f ns/legal move" %
+      (elapsed / (n_states * n_repeats) * 1e6, elapsed / (n_moves * n_repeats) * 1e9))
@@ -0,0 +1,46 @@
+import os
+import sys
+import time
+import numpy as np
+
+p = os.path
+parentddir = p.abspath(p.join(p.dirname(__file__), ".."))
+sys.path.append(parentddir)
+
+from AlphaGo.go import GameState  # noqa: E402
+from AlphaGo.mcts import MCTS, ParallelMCTS  # noqa: E402
+
+# Report playouts per second of MCTS and of ParallelMCTS with an increasing number of workers, for
+# (1) rollouts only, with a cheap uniform rollout policy, and (2) value evaluation only, where the
+# value function sleeps to stand in for a network evaluation that releases the GIL.
+n_playout = 200
+worker_counts = [1, 2, 4, 8]
+value_delay = 0.005
+
+
+def uniform_policy(state):
+    moves = state.get_legal_moves(include_eyes=False)
+    return zip(moves, np.ones(len(moves)) / max(len(moves), 1))
+
+
+def slow_value(state):
+    time.sleep(value_delay)
+    return 0.0
+
+
+def playouts_per_second(search_class, lmbda, **kwargs):
+    search = search_class(slow_value, uniform_policy, uniform_policy, lmbda=lmbda,
+                          rollout_limit=400, n_playout=n_playout, **kwargs)
+    start = time.time()
+    search.get_move(GameState(size=9))
+    return n_playout / (time.time() - start)
+
+
+for name, lmbda in [("rollouts", 1.0), ("value", 0.0)]:
+    baseline = playouts_per_second(MCTS, lmbda)
+    print("%-8s MCTS                %8.1f playouts/s" % (name, baseline))
+
+    for n_workers in worker_counts:
+        rate = playouts_per_second(ParallelMCTS, lmbda, n_workers=n_workers)
+        print("%-8s ParallelMCTS (%d)    %8.1f playouts/s  (x%.2f)" %
+              (name, n_workers, rate, rate / baseline))
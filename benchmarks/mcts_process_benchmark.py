@@ -0,0 +1,50 @@
+import os
+import sys
+import time
+import numpy as np
+
+p = os.path
+parentddir = p.abspath(p.join(p.dirname(__file__), ".."))
+sys.path.append(parentddir)
+
+from AlphaGo.go import GameState  # noqa: E402
+from AlphaGo.mcts import MCTS, RootParallelMCTS, LeafParallelMCTS  # noqa: E402
+
+# Report playouts per second of MCTS and of root- and leaf-parallel search with an increasing
+# number of worker processes. The policies are plain python functions that hold the GIL, which
+# limits ParallelMCTS (see mcts_benchmark.py) but not worker processes.
+n_playout = 200
+process_counts = [1, 2, 4, 8]
+
+
+def uniform_policy(state):
+    moves = state.get_legal_moves(include_eyes=False)
+    return zip(moves, np.ones(len(moves)) / max(len(moves), 1))
+
+
+def zero_value(state):
+    return 0.0
+
+
+def playouts_per_second(search_class, **kwargs):
+    search = search_class(zero_value, uniform_policy, uniform_policy, lmbda=1.0,
+                          rollout_limit=400, n_playout=n_playout, **kwargs)
+    try:
+        # The first move includes starting the worker processes.
+        search.get_move(GameState(size=9))
+        start = time.time()
+        search.get_move(GameState(size=9))
+        return n_playout / (time.time() - start)
+    finally:
+        if hasattr(search, "close"):
+            search.close()
+
+
+baseline = playouts_per_second(MCTS)
+print("MCTS                    %8.1f playouts/s" % baseline)
+
+for search_class in [RootParallelMCTS, LeafParallelMCTS]:
+    for n_processes in process_counts:
+        rate = playouts_per_second(search_class, n_processes=n_processes)
+        print("%-16s (%d)    %8.1f playouts/s  (x%.2f)" %
+              (search_class.__name__, n_processes, rate, rate / baseline))
@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+import numpy as np
+
+p = os.path
+parentddir = p.abspath(p.join(p.dirname(__file__), ".."))
+sys.path.append(parentddir)
+
+from AlphaGo.mcts import ArrayTree, TreeNode  # noqa: E402
+
+# Compare TreeNode objects and ArrayTree for the tree operations only: expanding nodes with 361
+# children and selecting among them, as in a 19x19 search.
+n_expand = 2000
+n_select = 20000
+priors = np.random.dirichlet(np.ones(361))
+action_priors = [((i // 19, i % 19), prob) for i, prob in enumerate(priors)]
+
+
+def benchmark_tree_node():
+    start = time.time()
+    nodes = [TreeNode(None, 1.0) for _ in range(n_expand)]
+    for node in nodes:
+        node.expand(action_priors)
+    expand_time = time.time() - start
+
+    root = nodes[0]
+    start = time.time()
+    for _ in range(n_select):
+        _, child = root.select(5.0)
+        child.update_recursive(0.0)
+    return expand_time, time.time() - start
+
+
+def benchmark_array_tree():
+    tree = ArrayTree()
+    start = time.time()
+    tree.expand(tree.root, action_priors)
+    for node in range(1, n_expand):
+        tree.expand(node, action_priors)
+    expand_time = time.time() - start
+
+    start = time.time()
+    for _ in range(n_select):
+        _, child = tree.select(tree.root, 5.0)
+        tree.update_recursive(child, 0.0)
+    return expand_time, time.time() - start
+
+
+for name, benchmark in [("TreeNode", benchmark_tree_node), ("ArrayTree", benchmark_array_tree)]:
+    expand_time, select_time = benchmark()
+    print("%-10s %8.0f nodes/s expanded  %8.0f selections/s" %
+          (name, n_expand * 361 / expand_time, n_select / select_time))
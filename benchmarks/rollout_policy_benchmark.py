@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+
+p = os.path
+parentddir = p.abspath(p.join(p.dirname(__file__), ".."))
+sys.path.append(parentddir)
+
+from AlphaGo.go import GameState  # noqa: E402
+from AlphaGo.mcts import BatchRollout  # noqa: E402
+from AlphaGo.models.rollout import CNNRollout  # noqa: E402
+
+# Report rollout moves per second of a CNNRollout network, when every move is chosen with
+# eval_state() and played from Python, when batch_size games are played in lockstep with
+# batch_eval_state(), and of the same network exported to a LinearRolloutPolicy.
+features = ["board", "ones", "liberties", "capture_size", "self_atari_size", "liberties_after",
+            "sensibleness"]
+n_rollouts = 20
+batch_size = 16
+rollout_limit = 500
+
+rollout = CNNRollout(features)
+policy = rollout.to_linear_policy(seed=1)
+
+
+def python_rollout(state):
+    for i in range(rollout_limit):
+        action_probs = rollout.eval_state(state, state.get_legal_moves(include_eyes=False))
+        if len(action_probs) == 0:
+            break
+        state.push(max(action_probs, key=lambda a: a[1])[0])
+    return i + 1
+
+
+def moves_per_second(run, n):
+    moves = 0
+    start = time.time()
+    for i in range(n):
+        moves += run(GameState())
+    return moves / (time.time() - start)
+
+
+python_rate = moves_per_second(python_rollout, 1)
+print("CNNRollout.eval_state    %10.1f moves/s" % python_rate)
+batch_rollout = BatchRollout(lambda states: rollout.batch_eval_state(
+    states, [st.get_legal_moves(include_eyes=False) for st in states]), rollout_limit)
+start = time.time()
+batch_states = [GameState() for i in range(batch_size)]
+batch_rollout.run(batch_states)
+batch_rate = sum(len(st.get_history()) for st in batch_states) / (time.time() - start)
+print("BatchRollout (%2d games)  %10.1f moves/s  (x%.1f)" %
+      (batch_size, batch_rate, batch_rate / python_rate))
+native_rate = moves_per_second(lambda gs: policy.run_rollout(gs, rollout_limit), n_rollouts)
+print("LinearRolloutPolicy      %10.1f moves/s  (x%.1f)" % (native_rate, native_rate / python_rate))
@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+import numpy as np
+
+p = os.path
+parentddir = p.abspath(p.join(p.dirname(__file__), ".."))
+sys.path.append(parentddir)
+
+from AlphaGo.go import GameState  # noqa: E402
+from AlphaGo.preprocessing.preprocessing import Preprocess  # noqa: E402
+
+# Report states per second when preprocessing a batch of positions one state_to_tensor() call at a
+# time and concatenating the results, and with states_to_tensor() into a preallocated buffer. The
+# latter preprocesses the states in parallel if the extension was built with OpenMP.
+features = ["board", "ones", "turns_since", "liberties", "capture_size", "self_atari_size",
+            "liberties_after", "ladder_capture", "ladder_escape", "sensibleness", "zeros"]
+batch_size = 64
+n_batches = 10
+
+preprocessor = Preprocess(features)
+random = np.random.RandomState(0)
+states = []
+for i in range(batch_size):
+    gs = GameState()
+    for j in range(random.randint(50, 200)):
+        moves = gs.get_legal_moves(include_eyes=False)
+        if len(moves) == 0:
+            break
+        gs.do_move(moves[random.randint(len(moves))])
+    states.append(gs)
+out = np.empty((batch_size, preprocessor.get_output_dimension(), 19, 19), dtype=np.uint8)
+
+
+def states_per_second(run):
+    start = time.time()
+    for i in range(n_batches):
+        run()
+    return batch_size * n_batches / (time.time() - start)
+
+
+loop_rate = states_per_second(lambda: np.concatenate(
+    [preprocessor.state_to_tensor(gs) for gs in states], axis=0))
+print("state_to_tensor + concatenate  %8.1f states/s" % loop_rate)
+batch_rate = states_per_second(lambda: preprocessor.states_to_tensor(states, out=out))
+print("states_to_tensor               %8.1f states/s  (x%.2f)" %
+      (batch_rate, batch_rate / loop_rate))
@@ -0,0 +1,38 @@
+import os
+import sys
+import numpy as np
+
+p = os.path
+parentddir = p.abspath(p.join(p.dirname(__file__), ".."))
+sys.path.append(parentddir)
+
+from AlphaGo.go import GameState  # noqa: E402
+from AlphaGo.mcts import MCTS, TranspositionTable  # noqa: E402
+
+# Report, per move of a short 9x9 game, the hit rate of the transposition table and the number
+# of policy and value evaluations it saved. The policy is uniform and the value constant, so only
+# the number of evaluations is of interest.
+n_moves = 10
+n_playout = 500
+
+
+def uniform_policy(state):
+    moves = state.get_legal_moves(include_eyes=False)
+    return zip(moves, np.ones(len(moves)) / max(len(moves), 1))
+
+
+def zero_value(state):
+    return 0.0
+
+
+table = TranspositionTable()
+search = MCTS(zero_value, uniform_policy, uniform_policy, lmbda=0.0, playout_depth=8,
+              n_playout=n_playout, transposition_table=table)
+state = GameState(size=9)
+for i in range(n_moves):
+    table.reset_stats()
+    move = search.get_move(state)
+    print("move %2d  hit rate %5.1f%%  evaluations %5d  saved %5d  table size %6d" %
+          (i + 1, 100 * table.get_hit_rate(), table.misses, table.hits, len(table)))
+    state.do_move(move)
+    search.update_with_move(move)
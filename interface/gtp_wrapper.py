@@ -44,8 +44,23 @@ class ExtendedGtpEngine(gtp.Engine):
             # if can't get answer from GnuGo, return no result
             return ''
 
+    def cmd_time_settings(self, arguments):
+        try:
+            main_time, byoyomi_time, byoyomi_stones = [int(arg) for arg in arguments.split()]
+        except Exception:
+            raise ValueError('Time settings could not be parsed: {}'.format(arguments))
+        self._game.set_time_settings(main_time, byoyomi_time, byoyomi_stones)
+
     def cmd_time_left(self, arguments):
-        pass
+        try:
+            color, time_left, stones = arguments.split()
+            color = gtp.parse_color(color)
+            time_left, stones = float(time_left), int(stones)
+        except Exception:
+            raise ValueError('Time left could not be parsed: {}'.format(arguments))
+        if not color:
+            raise ValueError('Unknown player: {}'.format(arguments))
+        self._game.set_time_left(color, time_left, stones)
 
     def cmd_place_free_handicap(self, arguments):
         try:
@@ -90,6 +105,8 @@ class GTPGameConnector(object):
         self._state = GameState(enforce_superko=True)
         self._player = player
         self._komi = 0
+        # A map from GTP color to the (time_left, stones) of the most recent time_left command.
+        self._time_left = {}
 
     def clear(self):
         self._state = GameState()
@@ -116,13 +133,27 @@ class GTPGameConnector(object):
     def set_komi(self, k):
         self._komi = k
 
+    def set_time_settings(self, main_time, byoyomi_time, byoyomi_stones):
+        # Only players with a time control, such as MCTSPlayer, use the time settings.
+        self._time_left = {}
+        if hasattr(self._player, 'set_time_settings'):
+            self._player.set_time_settings(main_time, byoyomi_time, byoyomi_stones)
+
+    def set_time_left(self, color, time_left, stones):
+        self._time_left[color] = (time_left, stones)
+
     def get_move(self, color):
+        if color in self._time_left and hasattr(self._player, 'set_time_left'):
+            self._player.set_time_left(*self._time_left.pop(color))
         if color == gtp.BLACK:
             color = go.BLACK
         else:
             color = go.WHITE
         self._state.set_current_player(color)
         move = self._player.get_move(self._state)
+        if hasattr(self._player, 'mcts'):
+            sys.stderr.write("%.0f playouts/s\n" % self._player.mcts.get_playouts_per_second())
+            sys.stderr.flush()
         if move == go.PASS:
             return gtp.PASS
         else:
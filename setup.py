@@ -1,8 +1,41 @@
+import os
 import numpy
+import shutil
+import tempfile
 from distutils.core import setup
 from distutils.extension import Extension
+from distutils.ccompiler import new_compiler
+from distutils.errors import CompileError, LinkError
+from distutils.sysconfig import customize_compiler
 from Cython.Build import cythonize
 
+
+def get_openmp_flags():
+    """Return ["-fopenmp"] if the compiler can build and link an OpenMP program, otherwise []
+       (e.g. Apple clang), in which case prange loops run serially
+    """
+
+    compiler = new_compiler()
+    customize_compiler(compiler)
+    directory = tempfile.mkdtemp()
+    try:
+        source = os.path.join(directory, "openmp_test.c")
+        with open(source, "w") as f:
+            f.write("#include <omp.h>\n"
+                    "int main(void) { return omp_get_num_threads() > 0 ? 0 : 1; }\n")
+        objects = compiler.compile([source], output_dir=directory, extra_postargs=["-fopenmp"])
+        compiler.link_executable(objects, os.path.join(directory, "openmp_test"),
+                                 extra_postargs=["-fopenmp"])
+    except (CompileError, LinkError):
+        print("OpenMP is not supported by the compiler, preprocessing is built without it")
+        return []
+    finally:
+        shutil.rmtree(directory)
+    return ["-fopenmp"]
+
+
+openmp_flags = get_openmp_flags()
+
 extensions = [
     Extension("AlphaGo.go.constants", ["AlphaGo/go/constants.pyx"],
               include_dirs=[numpy.get_include()], language="c++",
@@ -13,6 +46,12 @@ extensions = [
     Extension("AlphaGo.go.game_state", ["AlphaGo/go/game_state.pyx"],
               include_dirs=[numpy.get_include()], language="c++",
               extra_compile_args=["-std=c++11"], extra_link_args=["-std=c++11"]),
+    Extension("AlphaGo.go.array_state", ["AlphaGo/go/array_state.pyx"],
+              include_dirs=[numpy.get_include()], language="c++",
+              extra_compile_args=["-std=c++11"], extra_link_args=["-std=c++11"]),
+    Extension("AlphaGo.go.game_state_batch", ["AlphaGo/go/game_state_batch.pyx"],
+              include_dirs=[numpy.get_include()], language="c++",
+              extra_compile_args=["-std=c++11"], extra_link_args=["-std=c++11"]),
     Extension("AlphaGo.go.group_logic", ["AlphaGo/go/group_logic.pyx"],
               include_dirs=[numpy.get_include()], language="c++",
               extra_compile_args=["-std=c++11"], extra_link_args=["-std=c++11"]),
@@ -22,7 +61,14 @@ extensions = [
     Extension("AlphaGo.go.zobrist", ["AlphaGo/go/zobrist.pyx"],
               include_dirs=[numpy.get_include()], language="c++",
               extra_compile_args=["-std=c++11"], extra_link_args=["-std=c++11"]),
+    Extension("AlphaGo.preprocessing.patterns", ["AlphaGo/preprocessing/patterns.pyx"],
+              include_dirs=[numpy.get_include()], language="c++",
+              extra_compile_args=["-std=c++11"], extra_link_args=["-std=c++11"]),
     Extension("AlphaGo.preprocessing.preprocessing", ["AlphaGo/preprocessing/preprocessing.pyx"],
+              include_dirs=[numpy.get_include()], language="c++",
+              extra_compile_args=["-std=c++11"] + openmp_flags,
+              extra_link_args=["-std=c++11"] + openmp_flags),
+    Extension("AlphaGo.preprocessing.rollout_policy", ["AlphaGo/preprocessing/rollout_policy.pyx"],
               include_dirs=[numpy.get_include()], language="c++",
               extra_compile_args=["-std=c++11"], extra_link_args=["-std=c++11"]),
 ]
@@ -1,18 +1,18 @@
 from AlphaGo.go import BLACK, WHITE, GameState
 
 
-def parse(boardstr):
+def parse(boardstr, state_class=GameState):
     '''
        Parses a board into a gamestate, and returns the location of any moves
        marked with anything other than 'B', 'X', '#', 'W', 'O', or '.'
 
-       Rows are separated by '|', spaces are ignored.
+       Rows are separated by '|', spaces are ignored. The state is created with state_class.
 
     '''
 
     boardstr = boardstr.replace(' ', '')
     board_size = max(boardstr.index('|'), boardstr.count('|'))
-    state = GameState(size=board_size)
+    state = state_class(size=board_size)
 
     moves = {}
 
@@ -0,0 +1,110 @@
+import unittest
+import numpy as np
+import test_gamestate
+import AlphaGo.go as go
+from AlphaGo.go import GameState, ArrayGameState
+
+
+# Run all GameState tests against ArrayGameState.
+
+class TestArrayKo(test_gamestate.TestKo):
+    state_class = ArrayGameState
+
+
+class TestArrayEye(test_gamestate.TestEye):
+    state_class = ArrayGameState
+
+
+class TestArrayGroups(test_gamestate.TestGroups):
+    state_class = ArrayGameState
+
+
+class TestArrayLegalMoves(test_gamestate.TestLegalMoves):
+    state_class = ArrayGameState
+
+
+class TestArrayPushPop(test_gamestate.TestPushPop):
+    state_class = ArrayGameState
+
+
+class TestArrayCopy(test_gamestate.TestCopy):
+    state_class = ArrayGameState
+
+
+class TestArrayTemporaryMove(test_gamestate.TestTemporaryMove):
+    state_class = ArrayGameState
+
+
+class TestArrayMatchesGameState(unittest.TestCase):
+
+    def random_game_equivalence(self, size, enforce_superko, n_moves, seed):
+        rng = np.random.RandomState(seed)
+        gs = GameState(size=size, enforce_superko=enforce_superko)
+        array_gs = ArrayGameState(size=size, enforce_superko=enforce_superko)
+
+        for _ in range(n_moves):
+            legal_moves = gs.get_legal_moves()
+            self.assertListEqual(array_gs.get_legal_moves(), legal_moves)
+            self.assertListEqual(array_gs.get_legal_moves(include_eyes=False),
+                                 gs.get_legal_moves(include_eyes=False))
+            self.assertTrue(np.array_equal(array_gs.get_board(), gs.get_board()))
+            self.assertTrue(np.array_equal(array_gs.get_liberty(), gs.get_liberty()))
+            self.assertEqual(array_gs.get_ko_location(), gs.get_ko_location())
+            self.assertEqual(array_gs.get_score(), gs.get_score())
+
+            if len(legal_moves) == 0 or rng.rand() < 0.02:
+                move = go.PASS
+            else:
+                move = legal_moves[rng.randint(len(legal_moves))]
+            gs.do_move(move)
+            array_gs.do_move(move)
+
+        self.assertEqual(array_gs.get_captures_black(), gs.get_captures_black())
+        self.assertEqual(array_gs.get_captures_white(), gs.get_captures_white())
+        self.assertTrue(array_gs.sanity_check_groups())
+
+    def test_random_games(self):
+        for seed in range(5):
+            self.random_game_equivalence(7, True, 200, seed)
+        self.random_game_equivalence(19, False, 500, 0)
+
+    def test_copy_is_independent(self):
+        gs = ArrayGameState(size=7)
+        gs.do_move((3, 3))
+        copy = gs.copy()
+        copy.do_move((3, 4))
+
+        self.assertEqual(gs.get_board()[3, 4], go.EMPTY)
+        self.assertEqual(gs.get_liberty()[3, 3], 4)
+        self.assertEqual(copy.get_liberty()[3, 3], 3)
+        self.assertTrue(gs.sanity_check_groups())
+        self.assertTrue(copy.sanity_check_groups())
+
+    def test_interleaved_push_pop(self):
+        # Undo records only hold the entries a move changed, so popping in the middle of a game
+        # and pushing other moves (replaying captured locations) must keep all groups intact.
+        rng = np.random.RandomState(1)
+        gs = ArrayGameState(size=7)
+        copies = []
+
+        for _ in range(1000):
+            legal_moves = gs.get_legal_moves()
+            if len(copies) > 0 and rng.rand() < 0.4:
+                gs.pop()
+                copy = copies.pop()
+                self.assertTrue(np.array_equal(gs.get_board(), copy.get_board()))
+                self.assertTrue(np.array_equal(gs.get_liberty(), copy.get_liberty()))
+                self.assertListEqual(gs.get_legal_moves(), copy.get_legal_moves())
+                self.assertEqual(gs.get_hash(), copy.get_hash())
+                self.assertTrue(gs.sanity_check_groups())
+            else:
+                copies.append(gs.copy())
+                if len(legal_moves) == 0 or rng.rand() < 0.02:
+                    gs.push(go.PASS)
+                else:
+                    gs.push(legal_moves[rng.randint(len(legal_moves))])
+        self.assertEqual(gs.get_undo_depth(), len(copies))
+
+
+if __name__ == '__main__':
+    unittest.main()
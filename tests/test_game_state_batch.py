@@ -0,0 +1,108 @@
+import unittest
+import numpy as np
+import AlphaGo.go as go
+from AlphaGo.go import GameState, GameStateBatch
+from AlphaGo.util import flatten_idx
+
+
+class TestGameStateBatch(unittest.TestCase):
+
+    def test_new_batch(self):
+        batch = GameStateBatch(3, size=7)
+
+        self.assertEqual(len(batch), 3)
+        self.assertEqual(batch.get_size(), 7)
+        self.assertTrue(np.all(batch.legal_mask() == 1))
+        self.assertFalse(np.any(batch.is_end_of_game()))
+        self.assertTrue(np.all(batch.current_players() == go.BLACK))
+
+    def test_matches_single_games(self):
+        rng = np.random.RandomState(0)
+        states = [GameState(size=7) for _ in range(4)]
+        batch = GameStateBatch(4, size=7)
+
+        for _ in range(100):
+            mask = batch.legal_mask()
+            moves = np.zeros(4, dtype=np.int32)
+            for i, state in enumerate(states):
+                legal_moves = state.get_legal_moves()
+                expected = np.zeros(49, dtype=np.uint8)
+                expected[[flatten_idx(move, 7) for move in legal_moves]] = 1
+                self.assertTrue(np.array_equal(mask[i], expected))
+
+                if len(legal_moves) == 0 or rng.rand() < 0.05:
+                    moves[i] = -1
+                    move = go.PASS
+                else:
+                    move = legal_moves[rng.randint(len(legal_moves))]
+                    moves[i] = flatten_idx(move, 7)
+                if not state.is_end_of_game():
+                    state.do_move(move)
+            batch.do_moves(moves)
+
+            for state, batch_state in zip(states, batch.get_states()):
+                self.assertTrue(np.array_equal(state.get_board(), batch_state.get_board()))
+            self.assertListEqual(list(batch.is_end_of_game()),
+                                 [state.is_end_of_game() for state in states])
+            self.assertListEqual(list(batch.winners()),
+                                 [state.get_winner_color() for state in states])
+
+    def test_end_of_game(self):
+        batch = GameStateBatch(2, size=5)
+        batch.do_moves([12, 12])
+        batch.do_moves([-1, 13])
+        batch.do_moves([-1, -1])
+
+        self.assertListEqual(list(batch.is_end_of_game()), [True, False])
+
+        # Moves of ended games are ignored.
+        batch.do_moves([0, -1])
+        batch.do_moves([0, -1])
+        self.assertListEqual(list(batch.is_end_of_game()), [True, True])
+        self.assertEqual(batch[0].get_board()[0, 0], go.EMPTY)
+        self.assertEqual(batch.winners(komi=0.5)[0], go.BLACK)
+
+    def test_illegal_move(self):
+        batch = GameStateBatch(2, size=5)
+        batch.do_moves([12, 12])
+
+        # The whole batch is rejected if any move is illegal.
+        self.assertRaises(go.IllegalMove, batch.do_moves, [0, 12])
+        self.assertRaises(go.IllegalMove, batch.do_moves, [0, 25])
+        self.assertEqual(batch[0].get_board()[0, 0], go.EMPTY)
+        self.assertRaises(ValueError, batch.do_moves, [0])
+
+    def test_out_of_range_move(self):
+        batch = GameStateBatch(1, size=9)
+
+        # Locations that do not fit in a location_t are not wrapped around onto the board.
+        for move in [81, -2, 65541, 2 ** 40]:
+            self.assertRaises(go.IllegalMove, batch.do_moves, [move])
+        self.assertEqual(len(batch[0].get_history()), 0)
+
+    def test_wrap_states(self):
+        state = GameState(size=5)
+        state.do_move((1, 1))
+        batch = GameStateBatch(states=[state])
+
+        self.assertEqual(batch.legal_mask()[0, flatten_idx((1, 1), 5)], 0)
+        self.assertRaises(ValueError, GameStateBatch, states=[state, GameState(size=7)])
+
+        # The number of games is given by either 'count' or 'states'.
+        self.assertRaises(ValueError, GameStateBatch, 1, states=[state])
+        self.assertRaises(ValueError, GameStateBatch)
+
+    def test_do_actions(self):
+        batch = GameStateBatch(3, size=5)
+        batch.do_actions([(1, 2), go.PASS, (4, 0)])
+
+        self.assertEqual(batch[0].get_board()[1, 2], go.BLACK)
+        self.assertTrue(np.all(batch[1].get_board() == go.EMPTY))
+        self.assertEqual(batch[2].get_board()[4, 0], go.BLACK)
+        self.assertTrue(np.all(batch.current_players() == go.WHITE))
+        self.assertRaises(go.IllegalMove, batch.do_actions, [(1, 2), None, None])
+        self.assertRaises(ValueError, batch.do_actions, [None])
+
+
+if __name__ == '__main__':
+    unittest.main()
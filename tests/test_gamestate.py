@@ -1,15 +1,29 @@
 import parseboard
+import pickle
 import unittest
+import numpy as np
+from multiprocessing.pool import ThreadPool
 import AlphaGo.go as go
-from AlphaGo.go import GameState
+from AlphaGo.go import GameState, ArrayGameState
 from AlphaGo.util import flatten_idx
 
 
-class TestKo(unittest.TestCase):
+class GameStateTestCase(unittest.TestCase):
+    """Base class for GameState tests. Other board backends with the same interface are tested by
+    overriding state_class.
+    """
+
+    state_class = GameState
+
+    def parse(self, boardstr):
+        return parseboard.parse(boardstr, self.state_class)
+
+
+class TestKo(GameStateTestCase):
 
     def test_standard_ko(self):
 
-        gs = GameState(size=9)
+        gs = self.state_class(size=9)
 
         gs.do_move((1, 0))  # B
         gs.do_move((2, 0))  # W
@@ -33,7 +47,7 @@ class TestKo(unittest.TestCase):
 
     def test_snapback_is_not_ko(self):
 
-        gs = GameState(size=5)
+        gs = self.state_class(size=5)
 
         # B o W B .
         # W W B . .
@@ -65,7 +79,7 @@ class TestKo(unittest.TestCase):
     def test_positional_superko(self):
 
         # test with enforce_superko=False
-        gs = GameState(size=9, enforce_superko=False)
+        gs = self.state_class(size=9, enforce_superko=False)
 
         move_list = [(0, 3), (0, 4), (1, 3), (1, 4), (2, 3), (2, 4), (2, 2), (3, 4), (2, 1), (3, 3),
                      (3, 1), (3, 2), (3, 0), (4, 2), (1, 1), (4, 1), (8, 0), (4, 0), (8, 1), (0, 2),
@@ -76,17 +90,45 @@ class TestKo(unittest.TestCase):
         self.assertTrue(gs.is_legal((1, 0)))
 
         # test with enforce_superko=True
-        gs = GameState(size=9, enforce_superko=True)
+        gs = self.state_class(size=9, enforce_superko=True)
         for move in move_list:
             gs.do_move(move)
         self.assertFalse(gs.is_legal((1, 0)))
 
-
-class TestEye(unittest.TestCase):
+    def test_positional_superko_matches_played_hashes(self):
+        # Superko-legal moves must be exactly the moves whose resulting hash (found by actually
+        # playing the move) has not been seen before.
+        rng = np.random.RandomState(0)
+
+        for _ in range(5):
+            gs = self.state_class(size=5, enforce_superko=True)
+            gs_free = self.state_class(size=5, enforce_superko=False)
+            seen_hashes = set()
+
+            for _ in range(200):
+                expected = []
+                for move in gs_free.get_legal_moves():
+                    with gs_free.try_stone(flatten_idx(move, 5)):
+                        if gs_free.get_hash() not in seen_hashes:
+                            expected.append(move)
+                legal_moves = gs.get_legal_moves()
+                self.assertListEqual(legal_moves, expected)
+
+                if len(legal_moves) == 0 or rng.rand() < 0.02:
+                    move = go.PASS
+                else:
+                    move = legal_moves[rng.randint(len(legal_moves))]
+                gs.do_move(move)
+                gs_free.do_move(move)
+                if move is not go.PASS:
+                    seen_hashes.add(gs.get_hash())
+
+
+class TestEye(GameStateTestCase):
 
     def test_true_eye(self):
 
-        gs = GameState(size=7)
+        gs = self.state_class(size=7)
 
         gs.do_move((1, 0), go.BLACK)
         gs.do_move((0, 1), go.BLACK)
@@ -108,7 +150,7 @@ class TestEye(unittest.TestCase):
         # a checkerboard pattern of black is 'technically' all true eyes
         # mutually supporting each other
 
-        gs = GameState(size=7)
+        gs = self.state_class(size=7)
 
         for x in range(gs.get_size()):
             for y in range(gs.get_size()):
@@ -116,16 +158,138 @@ class TestEye(unittest.TestCase):
                     gs.do_move((x, y), color=go.BLACK)
         self.assertTrue(gs.is_eye((0, 0), go.BLACK))
 
+    def assert_eyes_match_new_state(self, gs, played):
+        # Replay the moves 'played' on an ArrayGameState, which searches every eye from scratch.
+        new_gs = ArrayGameState(size=gs.get_size())
+        for move in played:
+            new_gs.do_move(move)
 
-class TestGroups(unittest.TestCase):
+        board = gs.get_board()
+        for x in range(gs.get_size()):
+            for y in range(gs.get_size()):
+                if board[x, y] == go.EMPTY:
+                    for color in [go.BLACK, go.WHITE]:
+                        self.assertEqual(gs.is_eye((x, y), color), new_gs.is_eye((x, y), color))
+        self.assertListEqual(gs.get_legal_moves(include_eyes=False),
+                             new_gs.get_legal_moves(include_eyes=False))
+        self.assertEqual(gs.get_score(), new_gs.get_score())
+
+    def test_cached_eyes_match_new_state(self):
+        rng = np.random.RandomState(0)
+        gs = self.state_class(size=7)
+        played = []
+
+        for i in range(300):
+            # Fill the eye cache for both players.
+            moves = gs.get_legal_moves(include_eyes=False)
+            gs.get_score()
+
+            if i % 5 == 0:
+                self.assert_eyes_match_new_state(gs, played)
+
+            if len(moves) == 0:
+                gs.do_move(go.PASS)
+                played.append(go.PASS)
+                continue
+
+            # Query eyes in a position that is undone again.
+            gs.push(moves[rng.randint(len(moves))])
+            gs.get_score()
+            gs.pop()
+
+            move = moves[rng.randint(len(moves))]
+            gs.do_move(move)
+            played.append(move)
+
+
+class TestScore(GameStateTestCase):
+
+    def rescan_score(self, reference, passes, komi):
+        # Area score from a full scan of the board, as in the original get_score(). The reference
+        # is an ArrayGameState with the same position, which searches every eye from scratch.
+        score = passes[go.WHITE] - passes[go.BLACK] - komi
+        board = reference.get_board()
+        for x in range(reference.get_size()):
+            for y in range(reference.get_size()):
+                if board[x, y] == go.BLACK:
+                    score += 1
+                elif board[x, y] == go.WHITE:
+                    score -= 1
+                elif reference.is_eye((x, y), go.BLACK):
+                    score += 1
+                elif reference.is_eye((x, y), go.WHITE):
+                    score -= 1
+        return score
+
+    def random_game_equivalence(self, size, n_moves, seed):
+        rng = np.random.RandomState(seed)
+        gs = self.state_class(size=size)
+        reference = ArrayGameState(size=size)
+        passes = {go.BLACK: 0, go.WHITE: 0}
+
+        for _ in range(n_moves):
+            for komi in [0, 7.5]:
+                self.assertEqual(gs.get_score(komi), self.rescan_score(reference, passes, komi))
+
+            moves = gs.get_legal_moves(include_eyes=False)
+            if len(moves) == 0 or rng.rand() < 0.02:
+                passes[gs.get_current_player()] += 1
+                gs.do_move(go.PASS)
+                reference.do_move(go.PASS)
+                continue
+
+            # Scores must also match in a position that is undone again.
+            move = moves[rng.randint(len(moves))]
+            gs.push(move)
+            reference.push(move)
+            self.assertEqual(gs.get_score(), self.rescan_score(reference, passes, 7.5))
+            gs.pop()
+            reference.pop()
+
+            move = moves[rng.randint(len(moves))]
+            gs.do_move(move)
+            reference.do_move(move)
+
+        self.assertTrue(np.array_equal(gs.get_board(), reference.get_board()))
+        self.assertEqual(gs.get_score(), self.rescan_score(reference, passes, 7.5))
+
+    def test_incremental_equals_rescan_small_board(self):
+        for seed in range(5):
+            self.random_game_equivalence(5, 150, seed)
+
+    def test_incremental_equals_rescan_full_board(self):
+        self.random_game_equivalence(19, 500, 0)
+
+    def test_score_after_copy(self):
+        gs, _ = self.parse("B . B W . W .|"
+                           ". B B W W . W|"
+                           "B B . W . W W|"
+                           ". . B W W . .|"
+                           ". . . . . . .|"
+                           ". . . . . . .|"
+                           ". . . . . . .|")
+        reference, _ = parseboard.parse("B . B W . W .|"
+                                        ". B B W W . W|"
+                                        "B B . W . W W|"
+                                        ". . B W W . .|"
+                                        ". . . . . . .|"
+                                        ". . . . . . .|"
+                                        ". . . . . . .|", ArrayGameState)
+        copy = gs.copy()
+        self.assertEqual(copy.get_score(0),
+                         self.rescan_score(reference, {go.BLACK: 0, go.WHITE: 0}, 0))
+        self.assertEqual(copy.get_winner_color(0), gs.get_winner_color(0))
+
+
+class TestGroups(GameStateTestCase):
 
     def test_liberties_after_capture(self):
         # creates 3x3 black group in the middle, that is then all captured
         # ...then an assertion is made that the resulting liberties after
         # capture are the same as if the group had never been there
 
-        gs_capture = GameState(size=7)
-        gs_reference = GameState(size=7)
+        gs_capture = self.state_class(size=7)
+        gs_reference = self.state_class(size=7)
         # add in 3x3 black stones
         for x in range(2, 5):
             for y in range(2, 5):
@@ -151,17 +315,160 @@ class TestGroups(unittest.TestCase):
 
     def test_large_group_neighbors(self):
 
-        gs, _ = parseboard.parse(". . B B B . .|"
-                                 ". . B B B . .|"
-                                 ". . B B B . .|"
-                                 ". . W W W . .|"
-                                 ". . W W W . .|"
-                                 ". . W W W . .|"
-                                 ". . . . . . .|")
+        gs, _ = self.parse(". . B B B . .|"
+                           ". . B B B . .|"
+                           ". . B B B . .|"
+                           ". . W W W . .|"
+                           ". . W W W . .|"
+                           ". . W W W . .|"
+                           ". . . . . . .|")
+        self.assertTrue(gs.sanity_check_groups())
+
+
+class TestLegalMoves(GameStateTestCase):
+
+    def rescan_legal_moves(self, gs):
+        size = gs.get_size()
+        return [(x, y) for x in range(size) for y in range(size) if gs.is_legal((x, y))]
+
+    def assert_legal_arrays_match(self, gs):
+        size = gs.get_size()
+        for include_eyes in [True, False]:
+            indices = [flatten_idx(move, size) for move in gs.get_legal_moves(include_eyes)]
+            mask = np.zeros(size * size, dtype=np.uint8)
+            mask[indices] = 1
+
+            self.assertEqual(gs.get_legal_indices(include_eyes).dtype, np.int16)
+            self.assertListEqual(list(gs.get_legal_indices(include_eyes)), indices)
+            self.assertTrue(np.array_equal(gs.get_legal_mask(include_eyes), mask))
+
+    def random_game_equivalence(self, size, enforce_superko, n_moves, seed):
+        rng = np.random.RandomState(seed)
+        gs = self.state_class(size=size, enforce_superko=enforce_superko)
+
+        for _ in range(n_moves):
+            legal_moves = gs.get_legal_moves()
+            self.assertListEqual(legal_moves, self.rescan_legal_moves(gs))
+            self.assert_legal_arrays_match(gs)
+
+            # Pass now and then, otherwise play a random legal move.
+            if len(legal_moves) == 0 or rng.rand() < 0.02:
+                gs.do_move(go.PASS)
+            else:
+                gs.do_move(legal_moves[rng.randint(len(legal_moves))])
+
         self.assertTrue(gs.sanity_check_groups())
 
+    def test_incremental_equals_rescan_small_board(self):
+        for seed in range(10):
+            self.random_game_equivalence(5, False, 150, seed)
 
-class TestCopy(unittest.TestCase):
+    def test_incremental_equals_rescan_superko(self):
+        for seed in range(5):
+            self.random_game_equivalence(7, True, 200, seed)
+
+    def test_incremental_equals_rescan_full_board(self):
+        self.random_game_equivalence(19, False, 400, 0)
+
+    def test_incremental_equals_rescan_after_switching_player(self):
+        gs, _ = self.parse(". B . . . . .|"
+                           "B W B . . . .|"
+                           "W . W . . . .|"
+                           ". W . . . . .|"
+                           ". . . . . . .|"
+                           ". . . . . . .|"
+                           ". . . . . . .|")
+        for color in [go.BLACK, go.WHITE, go.BLACK]:
+            gs.set_current_player(color)
+            self.assertListEqual(gs.get_legal_moves(), self.rescan_legal_moves(gs))
+
+
+class TestPushPop(GameStateTestCase):
+
+    def equality_checks(self, original, copy):
+        self.assertEqual(copy.get_current_player(), original.get_current_player())
+        self.assertListEqual(copy.get_legal_moves(), original.get_legal_moves())
+        self.assertListEqual(copy.get_history(), original.get_history())
+        self.assertTrue(copy.is_board_equal(original))
+        self.assertTrue(copy.is_liberty_equal(original))
+        self.assertEqual(copy.get_hash(), original.get_hash())
+        self.assertEqual(copy.get_ko_location(), original.get_ko_location())
+        self.assertEqual(copy.get_captures_white(), original.get_captures_white())
+        self.assertEqual(copy.get_captures_black(), original.get_captures_black())
+        self.assertEqual(copy.get_score(), original.get_score())
+
+    def test_pop_empty(self):
+        gs = self.state_class(size=7)
+        self.assertRaises(IndexError, gs.pop)
+
+    def test_push_illegal(self):
+        gs = self.state_class(size=7)
+        gs.push((3, 3))
+        self.assertRaises(go.IllegalMove, gs.push, (3, 3))
+        self.assertEqual(gs.get_undo_depth(), 1)
+
+    def test_ko_push_pop(self):
+        gs, moves = self.parse(". B . . . . .|"
+                               "B W B . . . .|"
+                               "W k W . . . .|"
+                               ". W . . . . .|"
+                               ". . . . . . .|"
+                               ". . . . a . .|"
+                               ". . . . . . .|")
+        gs.set_current_player(go.BLACK)
+        copy = gs.copy()
+
+        # Trigger ko at (1, 1), then pass and play elsewhere.
+        gs.push(moves['k'])
+        ko = gs.get_ko_location()
+        self.assertIsNotNone(ko)
+        gs.push(go.PASS)
+        self.assertIsNone(gs.get_ko_location())
+        gs.push(moves['a'])
+
+        self.assertEqual(gs.pop(), moves['a'])
+        self.assertEqual(gs.pop(), go.PASS)
+        self.assertEqual(gs.get_ko_location(), ko)
+        self.assertEqual(gs.pop(), moves['k'])
+
+        self.assertTrue(gs.sanity_check_groups())
+        self.equality_checks(gs, copy)
+
+    def test_random_push_pop(self):
+        rng = np.random.RandomState(0)
+
+        for size, enforce_superko in [(5, False), (7, True), (19, False)]:
+            gs = self.state_class(size=size, enforce_superko=enforce_superko)
+
+            # Play a random game, saving a copy of the state before every pushed move.
+            copies = []
+            for _ in range(size * size * 2):
+                legal_moves = gs.get_legal_moves()
+                copies.append(gs.copy())
+                if len(legal_moves) == 0 or rng.rand() < 0.02:
+                    gs.push(go.PASS)
+                else:
+                    gs.push(legal_moves[rng.randint(len(legal_moves))])
+
+                # A try_stone() can be nested inside pushed moves.
+                legal_moves = gs.get_legal_moves()
+                if len(legal_moves) > 0:
+                    move = legal_moves[rng.randint(len(legal_moves))]
+                    copy = gs.copy()
+                    with gs.try_stone(flatten_idx(move, size)):
+                        pass
+                    self.equality_checks(gs, copy)
+
+            # Popping all moves must return to each saved state in reverse order.
+            while len(copies) > 0:
+                gs.pop()
+                self.equality_checks(gs, copies.pop())
+                self.assertTrue(gs.sanity_check_groups())
+
+            self.assertEqual(gs.get_undo_depth(), 0)
+
+
+class TestCopy(GameStateTestCase):
 
     def equality_checks(self, original, copy):
         self.assertListEqual(copy.get_legal_moves(), original.get_legal_moves())
@@ -174,12 +481,12 @@ class TestCopy(unittest.TestCase):
         self.assertEqual(copy.get_captures_black(), original.get_captures_black())
 
     def test_copy(self):
-        gs, _ = parseboard.parse(". B . . . . .|"
-                                 "B W W . . . .|"
-                                 ". B W . B . .|"
-                                 ". . . . . . B|"
-                                 ". . B . . . .|"
-                                 "W . . . W W .|")
+        gs, _ = self.parse(". B . . . . .|"
+                           "B W W . . . .|"
+                           ". B W . B . .|"
+                           ". . . . . . B|"
+                           ". . B . . . .|"
+                           "W . . . W W .|")
 
         copy = gs.copy()
 
@@ -187,7 +494,73 @@ class TestCopy(unittest.TestCase):
         self.equality_checks(gs, copy)
 
 
-class TestTemporaryMove(unittest.TestCase):
+class TestSerialize(GameStateTestCase):
+
+    def equality_checks(self, original, copy):
+        self.assertListEqual(copy.get_legal_moves(), original.get_legal_moves())
+        self.assertListEqual(copy.get_history(), original.get_history())
+        self.assertTrue(copy.is_board_equal(original))
+        self.assertTrue(copy.is_liberty_equal(original))
+        self.assertEqual(copy.get_hash(), original.get_hash())
+        self.assertEqual(copy.get_captures_white(), original.get_captures_white())
+        self.assertEqual(copy.get_captures_black(), original.get_captures_black())
+        self.assertTrue(copy.sanity_check_groups())
+        self.assertEqual(copy.get_current_player(), original.get_current_player())
+        self.assertEqual(copy.get_ko_location(), original.get_ko_location())
+        self.assertEqual(copy.get_handicaps(), original.get_handicaps())
+        self.assertEqual(copy.get_score(), original.get_score())
+
+    def test_replay(self):
+        gs = GameState(size=7)
+        gs.place_handicaps([(1, 1), (5, 5)])
+        for move in [(3, 3), (3, 4), None, (4, 3), (2, 4)]:
+            gs.do_move(move)
+
+        copy = GameState.deserialize(gs.serialize())
+        self.equality_checks(gs, copy)
+
+    def test_ko(self):
+        gs, moves = self.parse(". B W . . . .|"
+                               "B W . W . . .|"
+                               ". B W . . . .|"
+                               ". . . . . . .|")
+        gs.set_current_player(go.BLACK)
+        gs.do_move((1, 2))
+        self.assertIsNotNone(gs.get_ko_location())
+
+        copy = GameState.deserialize(gs.serialize())
+        self.equality_checks(gs, copy)
+
+    def test_board_setup(self):
+        # Stones placed out of turn can't be replayed, so the board is set up directly.
+        gs, _ = self.parse(". B . . . . .|"
+                           "B W W . . . .|"
+                           ". B W . B . .|"
+                           ". . . . . . B|"
+                           ". . B . . . .|"
+                           "W . . . W W .|")
+
+        copy = GameState.deserialize(gs.serialize())
+        self.equality_checks(gs, copy)
+
+    def test_pickle(self):
+        gs = GameState(size=9)
+        gs.do_move((4, 4))
+        gs.push((3, 3))
+
+        data = pickle.dumps(gs, pickle.HIGHEST_PROTOCOL)
+        self.assertLess(len(data), 200)
+        copy = pickle.loads(data)
+        self.equality_checks(gs, copy)
+        # Like copy(), pushed moves can't be popped from the unpickled state.
+        self.assertEqual(0, copy.get_undo_depth())
+
+    def test_version(self):
+        data = GameState(size=9).serialize()
+        self.assertRaises(ValueError, GameState.deserialize, b"\x02" + data[1:])
+
+
+class TestTemporaryMove(GameStateTestCase):
 
     def listNotEqual(self, listA, listB):
         if len(listA) != len(listB):
@@ -216,7 +589,7 @@ class TestTemporaryMove(unittest.TestCase):
         self.assertNotEqual(copy.get_hash(), original.get_hash())
 
     def test_simple_undo(self):
-        gs = GameState(size=7)
+        gs = self.state_class(size=7)
         copy = gs.copy()
 
         # Baseline equality checks between gs and copy
@@ -239,13 +612,13 @@ class TestTemporaryMove(unittest.TestCase):
         self.assertTrue(copy.is_legal((0, 0)))
 
     def test_ko_undo(self):
-        gs, moves = parseboard.parse(". B . . . . .|"
-                                     "B W B . . . .|"
-                                     "W k W . . . .|"
-                                     ". W . . . . .|"
-                                     ". . . . . . .|"
-                                     ". . . . a . .|"
-                                     ". . . . . . .|")
+        gs, moves = self.parse(". B . . . . .|"
+                               "B W B . . . .|"
+                               "W k W . . . .|"
+                               ". W . . . . .|"
+                               ". . . . . . .|"
+                               ". . . . a . .|"
+                               ". . . . . . .|")
         gs.set_current_player(go.BLACK)
 
         # Trigger ko at (1, 1)
@@ -269,13 +642,13 @@ class TestTemporaryMove(unittest.TestCase):
         self.assertEqual(copy.get_ko_location(), ko)
 
     def test_simple_merge_undo(self):
-        gs, moves = parseboard.parse(". . . . . . .|"
-                                     ". . . B W . .|"
-                                     ". . . B W . .|"
-                                     ". . . a W . .|"
-                                     ". . . B W . .|"
-                                     ". . . B W . .|"
-                                     ". . . . . . .|")
+        gs, moves = self.parse(". . . . . . .|"
+                               ". . . B W . .|"
+                               ". . . B W . .|"
+                               ". . . a W . .|"
+                               ". . . B W . .|"
+                               ". . . B W . .|"
+                               ". . . . . . .|")
         gs.set_current_player(go.BLACK)
 
         copy = gs.copy()
@@ -293,13 +666,13 @@ class TestTemporaryMove(unittest.TestCase):
         self.equality_checks(gs, copy)
 
     def test_simple_capture_undo(self):
-        gs, moves = parseboard.parse(". . . . . . .|"
-                                     ". . . . . . .|"
-                                     ". . . . B . .|"
-                                     ". . . B W c .|"
-                                     ". . . B W B .|"
-                                     ". . . . B . .|"
-                                     ". . . . . . .|")
+        gs, moves = self.parse(". . . . . . .|"
+                               ". . . . . . .|"
+                               ". . . . B . .|"
+                               ". . . B W c .|"
+                               ". . . B W B .|"
+                               ". . . . B . .|"
+                               ". . . . . . .|")
         gs.set_current_player(go.BLACK)
 
         copy = gs.copy()
@@ -317,13 +690,13 @@ class TestTemporaryMove(unittest.TestCase):
         self.equality_checks(gs, copy)
 
     def test_merge_and_capture_undo(self):
-        gs, moves = parseboard.parse(". . B B B . .|"
-                                     ". B W W W B .|"
-                                     ". B W B W B .|"
-                                     ". B W c W B .|"
-                                     ". B W B W B .|"
-                                     ". B W W W B .|"
-                                     ". . B B B . .|")
+        gs, moves = self.parse(". . B B B . .|"
+                               ". B W W W B .|"
+                               ". B W B W B .|"
+                               ". B W c W B .|"
+                               ". B W B W B .|"
+                               ". B W W W B .|"
+                               ". . B B B . .|")
         gs.set_current_player(go.BLACK)
 
         copy = gs.copy()
@@ -341,14 +714,14 @@ class TestTemporaryMove(unittest.TestCase):
         self.equality_checks(gs, copy)
 
     def test_hash_update_matches_actual_hash(self):
-        gs = GameState(size=7)
-        gs, moves = parseboard.parse("a x b . . . .|"
-                                     "z c d . . . .|"
-                                     ". . . . . . .|"
-                                     ". . . y . . .|"
-                                     ". . . . . . .|"
-                                     ". . . . . . .|"
-                                     ". . . . . . .|")
+        gs = self.state_class(size=7)
+        gs, moves = self.parse("a x b . . . .|"
+                               "z c d . . . .|"
+                               ". . . . . . .|"
+                               ". . . y . . .|"
+                               ". . . . . . .|"
+                               ". . . . . . .|"
+                               ". . . . . . .|")
 
         # a,b,c,d are black, x,y,z,x are white
         move_order = ['a', 'x', 'b', 'y', 'c', 'z', 'd', 'x']
@@ -366,5 +739,43 @@ class TestTemporaryMove(unittest.TestCase):
             self.assertEqual(hash1, hash2)
 
 
+class TestThreads(GameStateTestCase):
+
+    def play_random_game(self, seed):
+        # Play one game with pushes, pops and passes and return a summary of the final state.
+        rng = np.random.RandomState(seed)
+        gs = self.state_class(size=[7, 9][seed % 2])
+
+        for _ in range(200):
+            moves = gs.get_legal_moves(include_eyes=False)
+            if len(moves) == 0 or rng.rand() < 0.02:
+                gs.do_move(go.PASS)
+                continue
+
+            gs.push(moves[rng.randint(len(moves))])
+            gs.push(None)
+            gs.pop()
+            gs.pop()
+
+            gs.do_move(moves[rng.randint(len(moves))])
+
+        return gs.get_history(), gs.get_hash(), gs.get_score(), gs.sanity_check_groups()
+
+    def test_concurrent_games_match_sequential(self):
+        seeds = range(32)
+        expected = [self.play_random_game(seed) for seed in seeds]
+
+        pool = ThreadPool(8)
+        try:
+            results = pool.map(self.play_random_game, seeds)
+        finally:
+            pool.close()
+            pool.join()
+
+        for result, expect in zip(results, expected):
+            self.assertTrue(result[3])
+            self.assertEqual(result, expect)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,7 +1,10 @@
+import gtp
 import unittest
 from AlphaGo import go
+from AlphaGo.ai import MCTSPlayer
 from multiprocessing import Process
-from interface.gtp_wrapper import run_gtp
+from interface.gtp_wrapper import run_gtp, GTPGameConnector, ExtendedGtpEngine
+from tests.test_mcts import dummy_policy, dummy_rollout, dummy_value
 
 
 class PassPlayer(object):
@@ -26,5 +29,40 @@ class TestGTPProcess(unittest.TestCase):
         gtp_proc.join(timeout=1)
 
 
+class TestGTPGameConnector(unittest.TestCase):
+
+    def test_tree_reuse(self):
+        player = MCTSPlayer(dummy_value, dummy_policy, dummy_rollout, playout_depth=4,
+                            rollout_limit=10, n_playout=20)
+        game = GTPGameConnector(player)
+        game.set_size(19)
+
+        # As in 'genmove black' followed by 'play white' with a reply that was searched.
+        vertex = game.get_move(gtp.BLACK)
+        game.make_move(gtp.BLACK, vertex)
+        reply, subtree = player.mcts._root.select(5.0)
+        game.make_move(gtp.WHITE, (reply[0] + 1, reply[1] + 1))
+        n_visits = subtree._n_visits
+
+        game.get_move(gtp.BLACK)
+        # The search continued in the subtree of the opponent's move, and the new root is the
+        # child for the chosen move.
+        self.assertEqual(n_visits + 20, subtree._n_visits)
+        self.assertIn(player.mcts._root, subtree._children.values())
+
+    def test_time_control(self):
+        player = MCTSPlayer(dummy_value, dummy_policy, dummy_rollout, playout_depth=4,
+                            rollout_limit=10, n_playout=20)
+        game = GTPGameConnector(player)
+        engine = ExtendedGtpEngine(game, "test", "0.0")
+        self.assertEqual("=\n\n", engine.send("time_settings 300 30 5"))
+        self.assertEqual((300, 30, 5),
+                         (player.main_time, player.byoyomi_time, player.byoyomi_stones))
+        # The time left is given to the player when it is asked for a move.
+        self.assertEqual("=\n\n", engine.send("time_left b 12 3"))
+        self.assertEqual({gtp.BLACK: (12, 3)}, game._time_left)
+        self.assertTrue(engine.send("time_left x 12 3").startswith("?"))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,7 +1,9 @@
 import unittest
 import parseboard
+import numpy as np
 from AlphaGo.go import BLACK, WHITE
-from AlphaGo.preprocessing.preprocessing import Preprocess
+from AlphaGo.preprocessing.preprocessing import Preprocess, FeatureTracker
+from AlphaGo.util import sgf_iter_states
 
 
 def is_ladder_capture(state, move):
@@ -164,5 +166,81 @@ class TestLadder(unittest.TestCase):
         self.assertTrue(is_ladder_escape(st, moves['b']))
 
 
+class TestLadderCache(unittest.TestCase):
+    """Ladder features of a FeatureTracker, which reuses ladder searches between positions
+    """
+
+    def assertTracked(self, tracker, pp, state):
+        feature = tracker.state_to_tensor(state)
+        self.assertTrue(np.all(feature == pp.state_to_tensor(state)))
+        return feature.squeeze()
+
+    def test_reuse_and_invalidation(self):
+        st, moves = parseboard.parse(". . . . . . . . .|"
+                                     ". . B . . . . . .|"
+                                     ". B W a . . . . .|"
+                                     ". c b B . . . . .|"
+                                     ". d . . . . . . .|"
+                                     ". . . . . . . . .|"
+                                     ". . . . . . . . .|"
+                                     ". . . . . . . e .|"
+                                     ". . . . . . . . .|")
+        st.set_current_player(BLACK)
+        pp = Preprocess(["ladder_capture"], size=9)
+        tracker = FeatureTracker(pp)
+        cache = tracker.get_ladder_cache()
+
+        # Both 'a' and 'b' capture white in a ladder.
+        feature = self.assertTracked(tracker, pp, st)
+        self.assertEqual((feature[moves['a']], feature[moves['b']]), (1, 1))
+        self.assertEqual((cache.get_hits(), cache.get_misses()), (0, 2))
+
+        # A stone far from both ladders does not change them; both searches are reused.
+        st.do_move(moves['e'], BLACK)
+        st.set_current_player(BLACK)
+        feature = self.assertTracked(tracker, pp, st)
+        self.assertEqual((feature[moves['a']], feature[moves['b']]), (1, 1))
+        self.assertEqual((cache.get_hits(), cache.get_misses()), (2, 2))
+
+        # A ladder breaker at 'd' is in the path of the ladder started by 'a', and next to 'b'.
+        st.do_move(moves['d'], WHITE)
+        st.set_current_player(BLACK)
+        feature = self.assertTracked(tracker, pp, st)
+        self.assertEqual((feature[moves['a']], feature[moves['b']]), (0, 1))
+        self.assertEqual((cache.get_hits(), cache.get_misses()), (2, 4))
+
+        tracker.reset()
+        self.assertEqual((len(cache), cache.get_hits(), cache.get_misses()), (0, 0, 0))
+
+    def test_escape(self):
+        st, moves = parseboard.parse(". . . . . . . . .|"
+                                     ". . B . . . . . .|"
+                                     ". B W B . . . . .|"
+                                     ". . a B . . . . .|"
+                                     ". b . . . . . . .|"
+                                     ". . . . . . . . .|"
+                                     ". . . . . . . . .|"
+                                     ". . . . . . . . .|"
+                                     ". . . . . . . . .|")
+        st.set_current_player(WHITE)
+        pp = Preprocess(["ladder_escape"], size=9)
+        tracker = FeatureTracker(pp)
+
+        self.assertEqual(self.assertTracked(tracker, pp, st)[moves['a']], 0)
+        st.do_move(moves['b'], WHITE)
+        st.set_current_player(WHITE)
+        self.assertEqual(self.assertTracked(tracker, pp, st)[moves['a']], 1)
+
+    def test_game(self):
+        pp = Preprocess(["ladder_capture", "ladder_escape"])
+        tracker = FeatureTracker(pp)
+        with open('tests/test_data/sgf/Lee-Sedol-vs-AlphaGo-20160309.sgf', 'r') as f:
+            sgf_string = f.read()
+
+        for (state, move, player) in sgf_iter_states(sgf_string, include_end=False):
+            self.assertTracked(tracker, pp, state)
+        self.assertGreater(tracker.get_ladder_cache().get_hits(), 0)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,19 +1,23 @@
+import time
 import unittest
 import numpy as np
 from operator import itemgetter
+from AlphaGo import go
 from AlphaGo.go import GameState
-from AlphaGo.mcts import MCTS, TreeNode
+from multiprocessing.pool import ThreadPool
+from AlphaGo.mcts import MCTS, ParallelMCTS, TreeNode, BatchEvaluator, ArrayTree, ArrayMCTS, \
+    TranspositionTable, BatchRollout, RootParallelMCTS, LeafParallelMCTS
 
 
 class TestTreeNode(unittest.TestCase):
 
     def setUp(self):
         self.gs = GameState()
-        self.node = TreeNode(None, 1.0)
+        self.node = TreeNode(None)
 
     def test_selection(self):
         self.node.expand(dummy_policy(self.gs))
-        action, next_node = self.node.select()
+        action, next_node = self.node.select(5.0)
         self.assertEqual(action, (18, 18))  # according to the dummy policy below
         self.assertIsNotNone(next_node)
 
@@ -22,34 +26,64 @@ class TestTreeNode(unittest.TestCase):
         self.node.expand(dummy_policy(self.gs))
         self.assertEqual(19 * 19, len(self.node._children))
         for a, p in dummy_policy(self.gs):
-            self.assertEqual(p, self.node._children[a]._P)
+            self.assertEqual(p, self.node._children[a].get_prior())
 
     def test_update(self):
         self.node.expand(dummy_policy(self.gs))
         child = self.node._children[(18, 18)]
-        # Note: the root must be updated first for the visit count to work.
-        self.node.update(leaf_value=1.0, c_puct=5.0)
-        child.update(leaf_value=1.0, c_puct=5.0)
+        self.node.update(leaf_value=1.0)
+        child.update(leaf_value=1.0)
         expected_score = 1.0 + 5.0 * dummy_distribution[-1] * 0.5
-        self.assertEqual(expected_score, child.get_value())
+        self.assertEqual(expected_score, child.get_value(5.0))
         # After a second update, the Q value should be the average of the two, and the u value
         # should be multiplied by  sqrt(parent visits) / (node visits + 1) (which was simply equal
         # to 0.5 before)
-        self.node.update(leaf_value=0.0, c_puct=5.0)
-        child.update(leaf_value=0.0, c_puct=5.0)
+        self.node.update(leaf_value=0.0)
+        child.update(leaf_value=0.0)
         expected_score = 0.5 + 5.0 * dummy_distribution[-1] * np.sqrt(2.0) / 3.0
-        self.assertEqual(expected_score, child.get_value())
+        self.assertEqual(expected_score, child.get_value(5.0))
 
     def test_update_recursive(self):
         # Assertions are identical to test_treenode_update.
         self.node.expand(dummy_policy(self.gs))
         child = self.node._children[(18, 18)]
-        child.update_recursive(leaf_value=1.0, c_puct=5.0)
+        child.update_recursive(leaf_value=1.0)
         expected_score = 1.0 + 5.0 * dummy_distribution[-1] / 2.0
-        self.assertEqual(expected_score, child.get_value())
-        child.update_recursive(leaf_value=0.0, c_puct=5.0)
+        self.assertEqual(expected_score, child.get_value(5.0))
+        child.update_recursive(leaf_value=0.0)
         expected_score = 0.5 + 5.0 * dummy_distribution[-1] * np.sqrt(2.0) / 3.0
-        self.assertEqual(expected_score, child.get_value())
+        self.assertEqual(expected_score, child.get_value(5.0))
+
+    def test_selection_uses_current_visits(self):
+        # The exploration bonus of every child depends on the current number of visits of the
+        # parent, including children that were not updated since.
+        self.node.expand(dummy_policy(self.gs))
+        np.random.seed(0)
+        for _ in range(50):
+            _, child = self.node.select(5.0)
+            child.update_recursive(np.random.uniform(-1, 1))
+            best = max(self.node._children.values(), key=lambda node: node.get_value(5.0))
+            self.assertIs(best, self.node.select(5.0)[1])
+
+    def test_virtual_loss(self):
+        self.node.expand(dummy_policy(self.gs))
+        child = self.node._children[(18, 18)]
+        self.node.update(leaf_value=1.0)
+        child.update(leaf_value=1.0)
+        expected_score = child.get_value(5.0)
+
+        # Three lost visits lower the value of the child...
+        self.node.add_virtual_loss(3)
+        child.add_virtual_loss(3)
+        self.assertEqual(4, child._n_visits)
+        self.assertAlmostEqual(-0.5, child._Q)
+        self.assertLess(child.get_value(5.0), expected_score)
+
+        # ...until they are reverted.
+        self.node.revert_virtual_loss(3)
+        child.revert_virtual_loss(3)
+        self.assertEqual(1, child._n_visits)
+        self.assertAlmostEqual(expected_score, child.get_value(5.0))
 
 
 class TestMCTS(unittest.TestCase):
@@ -109,7 +143,507 @@ class TestMCTS(unittest.TestCase):
         self.assertIsNone(self.mcts._root._parent)
         # Assert that the next best move according to the root is (18, 17), according to the
         # dummy policy below.
-        self.assertEqual((18, 17), self.mcts._root.select()[0])
+        self.assertEqual((18, 17), self.mcts._root.select(5.0)[0])
+
+    def test_time_limit(self):
+        self.mcts = MCTS(dummy_value, dummy_policy, dummy_rollout, lmbda=0.0, playout_depth=2)
+        start = time.time()
+        self.mcts.get_move(self.gs, time_limit=0.2)
+        self.assertLess(time.time() - start, 0.5)
+        # The time limit replaces n_playout.
+        self.assertGreater(self.mcts._n_searched, 2)
+        self.assertGreater(self.mcts.get_playouts_per_second(), 0)
+
+    def test_time_limit_stops_early(self):
+        # With a policy that strongly prefers one move, the search stops as soon as the other
+        # move can't catch up in the remaining time.
+        def sharp_policy(state):
+            moves = state.get_legal_moves(include_eyes=False)
+            return [(moves[0], 0.99), (moves[1], 0.01)]
+        self.mcts = MCTS(dummy_value, sharp_policy, dummy_rollout, lmbda=0.0, playout_depth=1)
+        start = time.time()
+        self.mcts.get_move(self.gs, time_limit=1.0)
+        self.assertLess(time.time() - start, 0.9)
+
+    def test_no_time_left(self):
+        # Without any time, one playout is run.
+        move = self.mcts.get_move(self.gs, time_limit=0)
+        self.assertEqual(1, self.mcts._n_searched)
+        self.assertIn(move, self.mcts._root._children)
+
+    def test_no_moves(self):
+        # If the root has no children, the move with the highest prior is played, or a pass.
+        self.mcts = MCTS(dummy_value, lambda state: [], dummy_rollout, n_playout=2)
+        self.assertIsNone(self.mcts.get_move(self.gs))
+        self.mcts = MCTS(dummy_value, dummy_policy, dummy_rollout, n_playout=0)
+        self.assertEqual((18, 18), self.mcts.get_move(self.gs))
+
+    def test_reuse_with_opponent_move(self):
+        # The moves of both players are followed through the history of the state.
+        self.mcts = MCTS(dummy_value, dummy_policy, dummy_rollout, playout_depth=4, n_playout=20,
+                         rollout_limit=10)
+        move = self.mcts.get_move(self.gs)
+        self.mcts.update_with_move(move)
+        self.gs.do_move(move)
+        reply, subtree = self.mcts._root.select(5.0)
+        self.gs.do_move(reply)
+        self.mcts.update_with_state(self.gs)
+        self.assertIs(subtree, self.mcts._root)
+        self.assertIsNone(self.mcts._root._parent)
+
+    def test_reuse_requires_same_game(self):
+        self.mcts.get_move(self.gs)
+        # The same position with the other player to move.
+        self.gs.set_current_player(go.WHITE)
+        self.mcts.update_with_state(self.gs)
+        self.assertTrue(self.mcts._root.is_leaf())
+        # A different game.
+        self.mcts.get_move(self.gs)
+        other = GameState()
+        other.do_move((0, 0))
+        self.mcts.update_with_state(other)
+        self.assertTrue(self.mcts._root.is_leaf())
+
+    def test_node_budget(self):
+        self.mcts = MCTS(dummy_value, dummy_policy, dummy_rollout, playout_depth=4, n_playout=20,
+                         rollout_limit=10, max_nodes=1000)
+        self.mcts.get_move(self.gs)
+        self.assertLessEqual(self.mcts._n_nodes, 1000)
+        self.assertEqual(self.mcts._n_nodes, self.mcts._root.count_nodes())
+        self.assertEqual(20, self.mcts._root._n_visits)
+        # Besides the children of the root, the subtree of one of the most visited children is
+        # kept.
+        self.assertEqual(1 + 361 + 360, self.mcts._n_nodes)
+
+    def test_batch_rollouts(self):
+        batch_sizes = []
+
+        def batch_rollout(states):
+            batch_sizes.append(len(states))
+            return [dummy_rollout(st) for st in states]
+
+        self.mcts = MCTS(dummy_value, dummy_policy, dummy_rollout, lmbda=1.0, playout_depth=4,
+                         n_playout=20, rollout_limit=10, batch_rollout_policy_fn=batch_rollout,
+                         rollout_batch_size=8)
+        self.mcts.get_move(self.gs)
+        self.assertEqual(20, self.mcts._root._n_visits)
+        self.assertEqual(20, self.mcts._n_searched)
+        # Three groups of 8, 8 and 4 leaves, with one call per rollout move.
+        self.assertEqual([8] * 10 + [8] * 10 + [4] * 10, batch_sizes)
+        # The virtual losses are all reverted.
+        self.assertEqual(20, sum(self.mcts._root._child_visits))
+        self.assertEqual(self.gs.get_history(), [])
+
+
+class TestBatchRollout(unittest.TestCase):
+
+    def test_matches_single_rollouts(self):
+        mcts = MCTS(dummy_value, dummy_policy, dummy_rollout)
+        states = []
+        for i in range(4):
+            gs = GameState()
+            for move in [(i, 0), (0, i + 1)][:i % 3]:
+                gs.do_move(move)
+            states.append(gs)
+
+        singles = [st.copy() for st in states]
+        expected = [mcts._evaluate_rollout(st, 30) for st in singles]
+
+        rollout = BatchRollout(lambda batch: [dummy_rollout(st) for st in batch], 30)
+        self.assertEqual(expected, rollout.run(states))
+        self.assertEqual(30, rollout.n_batches)
+        for single, batched in zip(singles, states):
+            self.assertEqual(single.get_history(), batched.get_history())
+
+    def test_retire_finished_games(self):
+        states = [GameState() for i in range(3)]
+        lengths = [3, 1, 2]
+        batch_sizes = []
+
+        # Game i has no more moves after lengths[i] moves.
+        def stop_policy(batch):
+            batch_sizes.append(len(batch))
+            return [dummy_rollout(st) if len(st.get_history()) < lengths[states.index(st)] else []
+                    for st in batch]
+
+        rollout = BatchRollout(stop_policy, 10)
+        rollout.run(states)
+        self.assertEqual(lengths, [len(st.get_history()) for st in states])
+        # Only the games that are still running are passed to the policy.
+        self.assertEqual([3, 3, 2, 1], batch_sizes)
+
+
+class TestParallelMCTS(unittest.TestCase):
+
+    def setUp(self):
+        self.gs = GameState()
+        self.mcts = ParallelMCTS(dummy_value, dummy_policy, dummy_rollout, playout_depth=4,
+                                 rollout_limit=10, n_playout=20, n_workers=4)
+
+    def test_get_move(self):
+        move = self.mcts.get_move(self.gs)
+        self.assertIn(move, self.mcts._root._children)
+        # The state itself is not changed by the workers.
+        self.assertEqual(0, len(self.gs.get_history()))
+
+    def test_visit_counts(self):
+        self.mcts.get_move(self.gs)
+        # Every playout is counted exactly once, and all virtual losses have been reverted.
+        self.assertEqual(20, self.mcts._root._n_visits)
+        self.assertEqual(20, sum(node._n_visits for node in self.mcts._root._children.values()))
+
+    def test_virtual_loss_spreads_workers(self):
+        # Without any result backed up, a virtual loss makes the next playout choose another child.
+        root = self.mcts._root
+        root.expand(dummy_policy(self.gs))
+        _, first = root.select(5.0)
+        root.add_virtual_loss(3)
+        first.add_virtual_loss(3)
+        self.assertIsNot(first, root.select(5.0)[1])
+
+    def test_time_limit(self):
+        self.mcts.get_move(self.gs, time_limit=0.2)
+        # Every started playout has finished.
+        self.assertEqual(self.mcts._n_searched, self.mcts._root._n_visits)
+
+    def test_no_time_left(self):
+        move = self.mcts.get_move(self.gs, time_limit=0)
+        self.assertGreaterEqual(self.mcts._n_searched, 1)
+        self.assertIn(move, self.mcts._root._children)
+
+    def test_batch_evaluator(self):
+        policy = BatchEvaluator(lambda states: [dummy_policy(st) for st in states])
+        value = BatchEvaluator(lambda states: [dummy_value(st) for st in states])
+        self.mcts = ParallelMCTS(value, policy, dummy_rollout, playout_depth=4, rollout_limit=10,
+                                 n_playout=20, n_workers=4)
+        self.mcts.get_move(self.gs)
+        policy.close()
+        value.close()
+        self.assertEqual(20, self.mcts._root._n_visits)
+        self.assertEqual(20, value.n_evaluations)
+
+
+class TestRootParallelMCTS(unittest.TestCase):
+
+    def setUp(self):
+        self.gs = GameState()
+        self.mcts = RootParallelMCTS(dummy_value, dummy_policy, dummy_rollout, playout_depth=4,
+                                     n_playout=20, rollout_limit=10, n_processes=2)
+
+    def tearDown(self):
+        self.mcts.close()
+
+    def test_get_move(self):
+        move = self.mcts.get_move(self.gs)
+        self.assertTrue(self.gs.is_legal(move))
+        # Both workers search half of the playouts and their root visits are summed.
+        self.assertEqual(20, self.mcts._n_searched)
+        self.assertEqual(20, self.mcts._get_root_visits().sum())
+        self.assertGreater(self.mcts.get_playouts_per_second(), 0)
+
+    def test_next_move(self):
+        move = self.mcts.get_move(self.gs)
+        self.mcts.update_with_move(move)
+        self.gs.do_move(move)
+        reply = self.mcts.get_move(self.gs)
+        self.assertTrue(self.gs.is_legal(reply))
+        self.assertEqual(20, self.mcts._n_searched)
+        # The workers keep the visits of the subtree of the move from the previous search.
+        self.assertGreater(self.mcts._get_root_visits().sum(), 20)
+
+    def test_worker_error(self):
+        def bad_policy(state):
+            raise ValueError("bad policy")
+
+        mcts = RootParallelMCTS(dummy_value, bad_policy, dummy_rollout, n_playout=2,
+                                n_processes=1)
+        try:
+            self.assertRaises(ValueError, mcts.get_move, self.gs)
+        finally:
+            mcts.close()
+
+
+class TestLeafParallelMCTS(unittest.TestCase):
+
+    def test_get_move(self):
+        mcts = LeafParallelMCTS(dummy_value, dummy_policy, dummy_rollout, lmbda=1.0,
+                                playout_depth=4, n_playout=12, rollout_limit=10, n_processes=2)
+        try:
+            move = mcts.get_move(GameState())
+        finally:
+            mcts.close()
+        self.assertEqual(12, mcts._root._n_visits)
+        self.assertEqual(12, sum(mcts._root._child_visits))
+        self.assertTrue(GameState().is_legal(move))
+
+    def test_matches_batch_rollouts(self):
+        # Rollouts in worker processes give the same results as BatchRollout.
+        states = [GameState() for i in range(5)]
+        for i, gs in enumerate(states):
+            gs.do_move((i, i))
+        mcts = LeafParallelMCTS(dummy_value, dummy_policy, dummy_rollout, rollout_limit=20,
+                                n_processes=2)
+        try:
+            outcomes = mcts._batch_rollout.run(states)
+        finally:
+            mcts.close()
+        rollout = BatchRollout(lambda batch: [dummy_rollout(st) for st in batch], 20)
+        self.assertEqual(rollout.run(states), outcomes)
+
+
+class TestArrayTree(unittest.TestCase):
+
+    def setUp(self):
+        self.gs = GameState()
+        # A small capacity to make the arrays grow.
+        self.tree = ArrayTree(capacity=4)
+
+    def test_selection(self):
+        self.tree.expand(self.tree.root, dummy_policy(self.gs))
+        action, child = self.tree.select(self.tree.root, 5.0)
+        self.assertEqual(action, (18, 18))  # according to the dummy policy below
+        self.assertEqual(child, self.tree.get_children(self.tree.root)[(18, 18)])
+
+    def test_expansion(self):
+        self.assertTrue(self.tree.is_leaf(self.tree.root))
+        self.tree.expand(self.tree.root, dummy_policy(self.gs))
+        self.assertFalse(self.tree.is_leaf(self.tree.root))
+        self.assertEqual(19 * 19 + 1, len(self.tree))
+        children = self.tree.get_children(self.tree.root)
+        for a, p in dummy_policy(self.gs):
+            self.assertAlmostEqual(p, self.tree._P[children[a]])
+
+    def test_update_recursive(self):
+        self.tree.expand(self.tree.root, dummy_policy(self.gs))
+        child = self.tree.get_children(self.tree.root)[(18, 18)]
+        self.tree.update_recursive(child, 1.0)
+        self.tree.update_recursive(child, 0.0)
+        self.assertEqual(2, self.tree.get_visits(self.tree.root))
+        self.assertEqual(2, self.tree.get_visits(child))
+        self.assertAlmostEqual(0.5, self.tree.get_value(child))
+        other = self.tree.get_children(self.tree.root)[(18, 17)]
+        self.tree.update_recursive(other, 1.0)
+        self.assertEqual(3, self.tree.get_visits(self.tree.root))
+        self.assertEqual((18, 18), self.tree.get_most_visited_action(self.tree.root))
+
+    def test_reroot(self):
+        self.tree.expand(self.tree.root, dummy_policy(self.gs))
+        child = self.tree.get_children(self.tree.root)[(18, 18)]
+        self.tree.expand(child, dummy_policy(self.gs))
+        grandchild = self.tree.get_children(child)[(18, 17)]
+        self.tree.update_recursive(grandchild, 1.0)
+
+        self.tree.reroot(child)
+        # Only the subtree of the child is kept, with its statistics.
+        self.assertEqual(19 * 19 + 1, len(self.tree))
+        self.assertEqual(-1, self.tree._parent[self.tree.root])
+        self.assertEqual(1, self.tree.get_visits(self.tree.root))
+        grandchild = self.tree.get_children(self.tree.root)[(18, 17)]
+        self.assertEqual(self.tree.root, self.tree._parent[grandchild])
+        self.assertEqual(1, self.tree.get_visits(grandchild))
+        self.assertAlmostEqual(1.0, self.tree.get_value(grandchild))
+        self.assertTrue(self.tree.is_leaf(grandchild))
+
+    def test_prune(self):
+        self.tree.expand(self.tree.root, dummy_policy(self.gs))
+        children = self.tree.get_children(self.tree.root)
+        for action, visits in [((18, 18), 3), ((18, 17), 2), ((18, 16), 1)]:
+            self.tree.expand(children[action], dummy_policy(self.gs))
+            for _ in range(visits):
+                self.tree.update_recursive(children[action], 1.0)
+
+        self.tree.prune(3 * 361)
+        # The children of the root and of the most visited child are kept.
+        self.assertEqual(2 * 361 + 1, len(self.tree))
+        self.assertEqual(6, self.tree.get_visits(self.tree.root))
+        children = self.tree.get_children(self.tree.root)
+        self.assertFalse(self.tree.is_leaf(children[(18, 18)]))
+        self.assertTrue(self.tree.is_leaf(children[(18, 17)]))
+        self.assertEqual(2, self.tree.get_visits(children[(18, 17)]))
+
+
+class TestArrayMCTS(unittest.TestCase):
+
+    def setUp(self):
+        self.gs = GameState()
+        self.mcts = ArrayMCTS(dummy_value, dummy_policy, dummy_rollout, n_playout=2)
+
+    def _count_expansions(self):
+        """Helper function to count the number of expansions past the root using the dummy policy
+        """
+        tree = self.mcts._tree
+        node = tree.root
+        expansions = 0
+        # Loop over actions in decreasing probability.
+        for action, _ in sorted(dummy_policy(self.gs), key=itemgetter(1), reverse=True):
+            children = tree.get_children(node)
+            if action in children:
+                expansions += 1
+                node = children[action]
+            else:
+                break
+        return expansions
+
+    def test_playout(self):
+        self.mcts._playout(self.gs.copy(), 8)
+        tree = self.mcts._tree
+        self.assertEqual(1, tree.get_visits(tree.get_children(tree.root)[(18, 18)]))
+        self.assertEqual(8, self._count_expansions())
+
+    def test_visit_counts(self):
+        self.mcts = ArrayMCTS(dummy_value, dummy_policy, dummy_rollout, playout_depth=4,
+                              rollout_limit=10, n_playout=30)
+        move = self.mcts.get_move(self.gs)
+        tree = self.mcts._tree
+        children = tree.get_children(tree.root)
+        self.assertIn(move, children)
+        self.assertEqual(30, tree.get_visits(tree.root))
+        self.assertEqual(30, sum(tree.get_visits(child) for child in children.values()))
+
+    def test_update_with_move(self):
+        move = self.mcts.get_move(self.gs)
+        self.gs.do_move(move)
+        self.mcts.update_with_move(move)
+        tree = self.mcts._tree
+        self.assertFalse(tree.is_leaf(tree.root))
+        self.assertEqual(-1, tree._parent[tree.root])
+        self.assertEqual((18, 17), tree.select(tree.root, 5.0)[0])
+        # An unknown move starts a new tree.
+        self.mcts.update_with_move((0, 0))
+        self.assertEqual(1, len(tree))
+
+    def test_no_time_left(self):
+        move = self.mcts.get_move(self.gs, time_limit=0)
+        self.assertEqual(1, self.mcts._n_searched)
+        self.assertIn(move, self.mcts._tree.get_children(self.mcts._tree.root))
+
+    def test_node_budget(self):
+        self.mcts = ArrayMCTS(dummy_value, dummy_policy, dummy_rollout, playout_depth=4,
+                              rollout_limit=10, n_playout=20, max_nodes=1000)
+        self.mcts.get_move(self.gs)
+        tree = self.mcts._tree
+        self.assertLessEqual(len(tree), 1000)
+        self.assertEqual(20, tree.get_visits(tree.root))
+        self.assertEqual(1 + 361 + 360, len(tree))
+
+
+class TestTranspositionTable(unittest.TestCase):
+
+    def setUp(self):
+        self.gs = GameState(size=5)
+        self.calls = []
+
+        def policy(state):
+            self.calls.append(state.get_hash())
+            return dummy_policy(state)
+
+        self.policy = policy
+        self.table = TranspositionTable(max_size=2)
+
+    def test_transposition(self):
+        # The same position reached by a different move order is only evaluated once.
+        self.gs.push((0, 0))
+        self.gs.push((1, 1))
+        self.gs.push((2, 2))
+        priors = self.table.get_priors(self.gs, self.policy)
+        other = GameState(size=5)
+        other.push((2, 2))
+        other.push((1, 1))
+        other.push((0, 0))
+        self.assertEqual(priors, self.table.get_priors(other, self.policy))
+        self.assertEqual(1, len(self.calls))
+        self.assertEqual(1, self.table.hits)
+        self.assertEqual(0.5, self.table.get_hit_rate())
+
+    def test_player_to_move(self):
+        # The same board with the other player to move is a different position.
+        self.gs.push((0, 0))
+        self.gs.push(None)
+        self.table.get_priors(self.gs, self.policy)
+        other = GameState(size=5)
+        other.push((0, 0))
+        self.table.get_priors(other, self.policy)
+        self.assertEqual(2, len(self.calls))
+
+    def test_priors_and_values(self):
+        # Priors and values of a position are cached independently.
+        self.table.get_priors(self.gs, self.policy)
+        self.assertEqual(0, self.table.hits)
+        self.assertEqual(0.5, self.table.get_value(self.gs, lambda state: 0.5))
+        self.assertEqual(0.5, self.table.get_value(self.gs, lambda state: 0.0))
+        self.assertEqual(1, len(self.table))
+        self.assertEqual(1, self.table.hits)
+
+    def test_eviction(self):
+        # The least recently used position is evicted first.
+        self.table.get_priors(self.gs, self.policy)
+        self.gs.push((0, 0))
+        self.table.get_priors(self.gs, self.policy)
+        self.gs.pop()
+        self.table.get_priors(self.gs, self.policy)
+        self.gs.push((1, 1))
+        self.table.get_priors(self.gs, self.policy)
+        self.assertEqual(2, len(self.table))
+        self.assertEqual(1, self.table.evictions)
+        # The empty board is still in the table, the position after (0, 0) is not.
+        self.gs.pop()
+        self.table.get_priors(self.gs, self.policy)
+        self.gs.push((0, 0))
+        self.table.get_priors(self.gs, self.policy)
+        self.assertEqual(4, len(self.calls))
+
+    def test_mcts(self):
+        table = TranspositionTable()
+        mcts = MCTS(dummy_value, self.policy, dummy_rollout, lmbda=0.0, playout_depth=4,
+                    n_playout=50, transposition_table=table)
+        mcts.get_move(GameState())
+        # Playouts reach the same positions by different move orders.
+        self.assertGreater(table.hits, 0)
+        self.assertEqual(len(self.calls), len(set(self.calls)))
+        self.assertEqual(50, mcts._root._n_visits)
+
+
+class TestBatchEvaluator(unittest.TestCase):
+
+    def setUp(self):
+        self.batch_sizes = []
+
+        def double(states):
+            self.batch_sizes.append(len(states))
+            return [2 * st for st in states]
+
+        self.evaluator = BatchEvaluator(double, max_batch_size=4, max_wait=0.05)
+
+    def tearDown(self):
+        self.evaluator.close()
+
+    def test_single_evaluation(self):
+        self.assertEqual(6, self.evaluator(3))
+        self.assertEqual(1, self.evaluator.n_batches)
+        self.assertEqual(1.0, self.evaluator.get_average_batch_size())
+
+    def test_concurrent_evaluations(self):
+        pool = ThreadPool(8)
+        try:
+            results = pool.map(self.evaluator, range(32), chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+        self.assertListEqual([2 * i for i in range(32)], results)
+        self.assertEqual(32, self.evaluator.n_evaluations)
+        self.assertEqual(32, sum(self.batch_sizes))
+        self.assertLessEqual(max(self.batch_sizes), 4)
+        self.assertGreater(self.evaluator.get_average_batch_size(), 1.0)
+
+    def test_error(self):
+        def fail(states):
+            raise ValueError("bad batch")
+
+        evaluator = BatchEvaluator(fail)
+        self.assertRaises(ValueError, evaluator, 1)
+        evaluator.close()
+        self.assertRaises(RuntimeError, evaluator, 1)
 
 
 # A distribution over positions that is smallest at (0,0) and largest at (18,18)
@@ -0,0 +1,160 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import AlphaGo.go as go
+from AlphaGo.go import GameState
+from AlphaGo.preprocessing.patterns import PatternTable, PATTERN_TYPES, get_pattern_table, \
+    get_move_patterns
+from AlphaGo.preprocessing.mine_patterns import PatternMiner, run_pattern_miner
+from AlphaGo.preprocessing.preprocessing import Preprocess
+
+
+class TestPatternTable(unittest.TestCase):
+
+    def test_lookup(self):
+        table = PatternTable([2 ** 64 - 1, 5, 0])
+        self.assertEqual(len(table), 3)
+        self.assertEqual(table.get(2 ** 64 - 1), 0)
+        self.assertEqual(table.get(5), 1)
+        self.assertEqual(table.get(0), 2)
+        self.assertIsNone(table.get(6))
+        self.assertIn(5, table)
+        self.assertNotIn(6, table)
+
+    def test_many_patterns(self):
+        patterns = {pattern * 33 ** 3: i for (i, pattern) in enumerate(range(1000))}
+        table = PatternTable(patterns)
+        self.assertEqual(len(table), 1000)
+        self.assertEqual(table.to_dict(), patterns)
+        self.assertNotIn(1000 * 33 ** 3, table)
+
+    def test_empty(self):
+        table = PatternTable()
+        self.assertEqual(len(table), 0)
+        self.assertNotIn(0, table)
+
+    def test_negative_id(self):
+        with self.assertRaises(ValueError):
+            PatternTable({1: -1})
+
+    def test_save_load(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "patterns.json")
+            table = PatternTable({2 ** 64 - 1: 1, 17: 0})
+            table.save(path, {17: 100, 2 ** 64 - 1: 50})
+            with open(path) as f:
+                self.assertEqual(json.load(f),
+                                 {"patterns": [[17, 0, 100], [2 ** 64 - 1, 1, 50]]})
+
+            for loaded in [PatternTable.load(path), get_pattern_table(path)]:
+                self.assertEqual(loaded.to_dict(), table.to_dict())
+        finally:
+            shutil.rmtree(directory)
+
+    def test_save_load_sparse_ids(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "patterns.json")
+            table = PatternTable({5: 3, 2 ** 63: 10, 42: 7})
+            table.save(path)
+
+            loaded = PatternTable.load(path)
+            self.assertEqual(loaded.to_dict(), {5: 3, 42: 7, 2 ** 63: 10})
+            self.assertEqual(loaded.get(2 ** 63), 10)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_get_pattern_table(self):
+        table = PatternTable([3])
+        self.assertIsNone(get_pattern_table(None))
+        self.assertIs(get_pattern_table(table), table)
+        self.assertEqual(get_pattern_table([3, 4]).to_dict(), {3: 0, 4: 1})
+        self.assertEqual(get_pattern_table({3: 4}).to_dict(), {3: 4})
+
+
+class TestMovePatterns(unittest.TestCase):
+
+    def test_first_move(self):
+        gs = GameState(size=7)
+        nakade, response, non_response = get_move_patterns(gs, (3, 3))
+        self.assertIsNone(nakade)
+        self.assertIsNone(response)
+        self.assertIsNotNone(non_response)
+
+        # The same empty surroundings give the same pattern.
+        self.assertEqual(get_move_patterns(gs, (2, 2))[2], non_response)
+        self.assertNotEqual(get_move_patterns(gs, (0, 0))[2], non_response)
+
+    def test_response(self):
+        gs = GameState(size=7)
+        gs.do_move((3, 3))
+        self.assertIsNotNone(get_move_patterns(gs, (3, 5))[1])
+        self.assertIsNotNone(get_move_patterns(gs, (4, 4))[1])
+        self.assertIsNone(get_move_patterns(gs, (5, 5))[1])
+
+        # Symmetric moves are different patterns.
+        self.assertNotEqual(get_move_patterns(gs, (3, 5))[1], get_move_patterns(gs, (3, 1))[1])
+
+        gs.do_move(go.PASS)
+        self.assertIsNone(get_move_patterns(gs, (3, 5))[1])
+
+    def test_nakade(self):
+        gs = GameState(size=7)
+        for move in [(0, 1), (0, 0), (1, 0)]:
+            gs.do_move(move)
+        self.assertIsNotNone(get_move_patterns(gs, (0, 0))[0])
+        self.assertIsNone(get_move_patterns(gs, (1, 1))[0])
+
+        gs.push(go.PASS)
+        self.assertIsNone(get_move_patterns(gs, (0, 0))[0])
+        gs.pop()
+        self.assertIsNotNone(get_move_patterns(gs, (0, 0))[0])
+
+
+class TestPatternMiner(unittest.TestCase):
+
+    sgf_directory = os.path.join("tests", "test_data", "sgf")
+
+    def test_mine(self):
+        files = [os.path.join(self.sgf_directory, name)
+                 for name in sorted(os.listdir(self.sgf_directory))[:2]]
+        miner = PatternMiner()
+        miner.count_sgfs(files)
+        self.assertGreater(miner.n_moves, 0)
+
+        counts = miner.counts["non_response_3x3"]
+        self.assertEqual(sum(counts.values()), miner.n_moves)
+        table = miner.get_table("non_response_3x3", min_count=2, max_patterns=10)
+        self.assertEqual(len(table), min(10, sum(1 for c in counts.values() if c >= 2)))
+
+        # Ids are ordered from most to least frequent.
+        by_id = sorted(table.to_dict().items(), key=lambda item: item[1])
+        frequencies = [counts[pattern] for (pattern, pattern_id) in by_id]
+        self.assertEqual(frequencies, sorted(frequencies, reverse=True))
+        self.assertEqual(frequencies[0], max(counts.values()))
+
+    def test_run_pattern_miner(self):
+        directory = tempfile.mkdtemp()
+        try:
+            run_pattern_miner(["--directory", self.sgf_directory, "--outdir", directory,
+                               "--min-count", "2"])
+            paths = [os.path.join(directory, name + ".json") for name in PATTERN_TYPES]
+            for path in paths:
+                self.assertTrue(os.path.exists(path))
+            self.assertGreater(len(PatternTable.load(paths[2])), 0)
+
+            # The files can be passed to Preprocess directly.
+            pp = Preprocess(["nakade", "response_12d", "non_response_3x3"],
+                            dict_nakade=paths[0], dict_12d=paths[1], dict_3x3=paths[2])
+            gs = GameState()
+            gs.do_move((3, 3))
+            self.assertGreater(pp.state_to_tensor(gs)[0, 2].sum(), 0)
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 import numpy as np
-from AlphaGo.ai import ProbabilisticPolicyPlayer
+from AlphaGo.go import GameState
+from AlphaGo.ai import ProbabilisticPolicyPlayer, MCTSPlayer
 
 
 class TestProbabilisticPolicyPlayer(unittest.TestCase):
@@ -34,5 +35,55 @@ class TestProbabilisticPolicyPlayer(unittest.TestCase):
         self.assertFalse(any(np.isnan(player_high.apply_temperature(distribution))))
 
 
+class TestMCTSPlayerTimeControl(unittest.TestCase):
+
+    def setUp(self):
+        self.player = MCTSPlayer(None, None, None, time_margin=0.5)
+        self.gs = GameState(size=9)
+
+    def test_no_time_control(self):
+        self.assertIsNone(self.player.get_time_budget(self.gs))
+        # Byoyomi without stones means no time limit in GTP.
+        self.player.set_time_settings(600, 30, 0)
+        self.assertIsNone(self.player.get_time_budget(self.gs))
+
+    def test_main_time(self):
+        self.player.set_time_settings(100, 0, 0)
+        # 81 empty points, so at least 20 moves to play.
+        self.assertAlmostEqual(100 / 40.0 - 0.5, self.player.get_time_budget(self.gs))
+        self.player.set_time_left(20, 0)
+        self.assertAlmostEqual(20 / 40.0 - 0.5, self.player.get_time_budget(self.gs))
+        self.player.set_time_left(10, 0)
+        self.assertEqual(0, self.player.get_time_budget(self.gs))
+
+    def test_byoyomi(self):
+        self.player.set_time_settings(10, 30, 5)
+        # Byoyomi can be used while there is little main time left.
+        self.assertAlmostEqual(30 / 5.0 - 0.5, self.player.get_time_budget(self.gs))
+        self.player.set_time_left(12, 3)
+        self.assertAlmostEqual(12 / 3.0 - 0.5, self.player.get_time_budget(self.gs))
+
+    def test_no_time_left(self):
+        def uniform_policy(state):
+            moves = state.get_legal_moves(include_eyes=False)
+            return [(move, 1.0 / len(moves)) for move in moves]
+        player = MCTSPlayer(lambda state: 0.0, uniform_policy, None, lmbda=0, playout_depth=2)
+        # A budget of 10 / 20 - 0.5 = 0 seconds still plays a move.
+        player.set_time_settings(10, 0, 0)
+        self.assertEqual(0, player.get_time_budget(self.gs))
+        self.assertTrue(self.gs.is_legal(player.get_move(self.gs)))
+
+    def test_clock(self):
+        self.player.set_time_settings(10, 30, 2)
+        self.player._update_clock(4)
+        self.assertEqual((6, 0), (self.player.time_left, self.player.stones_left))
+        # The main time runs out, the rest comes from the first byoyomi period.
+        self.player._update_clock(8)
+        self.assertEqual((28, 1), (self.player.time_left, self.player.stones_left))
+        # Playing all stones of a period starts a new one.
+        self.player._update_clock(5)
+        self.assertEqual((30, 2), (self.player.time_left, self.player.stones_left))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -22,6 +22,24 @@ class TestCNNPolicy(unittest.TestCase):
         self.assertEqual(len(results), 2)  # one result per GameState
         self.assertEqual(len(results[0]), 361)  # each one has 361 (move,prob) pairs
 
+    def test_eval_state_indices(self):
+
+        policy = CNNPolicy(["board", "liberties", "sensibleness", "capture_size"])
+        gs = GameState()
+        gs.do_move((3, 3))
+        move_probs = dict(policy.eval_state(gs))
+
+        indices, probabilities = policy.eval_state_indices(gs)
+        self.assertEqual(len(indices), 360)
+        self.assertAlmostEqual(probabilities.sum(), 1.0, places=5)
+        for idx, prob in zip(indices, probabilities):
+            self.assertAlmostEqual(move_probs[divmod(int(idx), 19)], prob)
+
+        results = policy.batch_eval_state_indices([gs, GameState()])
+        self.assertTrue(np.array_equal(results[0][0], indices))
+        self.assertTrue(np.allclose(results[0][1], probabilities))
+        self.assertEqual(len(results[1][0]), 361)
+
     def test_output_size(self):
 
         policy19 = CNNPolicy(["board", "liberties", "sensibleness", "capture_size"], board=19)
@@ -3,7 +3,9 @@ import parseboard
 import numpy as np
 import AlphaGo.go as go
 from AlphaGo.go import GameState
-from AlphaGo.preprocessing.preprocessing import Preprocess
+from AlphaGo.go.game_state_batch import GameStateBatch
+from AlphaGo.preprocessing.preprocessing import Preprocess, FeatureTracker
+from AlphaGo.preprocessing.patterns import get_move_patterns
 
 
 def simple_board():
@@ -291,6 +293,47 @@ class TestPreprocessingFeatures(unittest.TestCase):
                 np.all(feature[:, :, i] == one_hot_liberties[:, :, i]),
                 "bad expectation: stones with %d liberties after move" % (i + 1))
 
+    def test_lookahead_random_positions(self):
+        # capture_size, self_atari_size and liberties_after must match actually playing each legal
+        # move, including merges of several groups and multiple captures.
+        rng = np.random.RandomState(0)
+        pp = Preprocess(["capture_size", "self_atari_size", "liberties_after"], size=7)
+
+        for _ in range(10):
+            gs = GameState(size=7)
+            for _ in range(80):
+                expected = np.zeros((24, 7, 7))
+                for (x, y) in gs.get_legal_moves():
+                    copy = gs.copy()
+                    captured_before = copy.get_captures_black() + copy.get_captures_white()
+                    copy.do_move((x, y))
+                    captured = copy.get_captures_black() + copy.get_captures_white() - \
+                        captured_before
+                    libs = copy.get_liberty()[x, y]
+
+                    expected[min(captured, 7), x, y] = 1
+                    if libs == 1:
+                        # Count only the group connected to (x, y) by flood fill.
+                        group = set([(x, y)])
+                        frontier = [(x, y)]
+                        while frontier:
+                            (i, j) = frontier.pop()
+                            for (ni, nj) in [(i - 1, j), (i + 1, j), (i, j - 1), (i, j + 1)]:
+                                if 0 <= ni < 7 and 0 <= nj < 7 and (ni, nj) not in group and \
+                                        copy.get_board()[ni, nj] == copy.get_board()[x, y]:
+                                    group.add((ni, nj))
+                                    frontier.append((ni, nj))
+                        expected[8 + min(len(group) - 1, 7), x, y] = 1
+                    expected[16 + min(libs - 1, 7), x, y] = 1
+
+                feature = pp.state_to_tensor(gs)[0]
+                self.assertTrue(np.all(feature == expected))
+
+                legal_moves = gs.get_legal_moves()
+                if len(legal_moves) == 0:
+                    break
+                gs.do_move(legal_moves[rng.randint(len(legal_moves))])
+
     def test_get_ladder_capture(self):
         gs, moves = parseboard.parse(". . . . . . .|"
                                      "B W a . . . .|"
@@ -412,6 +455,292 @@ class TestPreprocessingFeatures(unittest.TestCase):
 
         self.assertTrue(np.all(expectation == feature))
 
+    def test_constant_planes(self):
+        gs = simple_board()
+        pp = Preprocess(["zeros", "ones", "zeros", "color"], size=7)
+        feature = pp.state_to_tensor(gs)[0]
+
+        self.assertEqual(feature.shape, (4, 7, 7))
+        self.assertTrue(np.all(feature[0] == 0))
+        self.assertTrue(np.all(feature[1] == 1))
+        self.assertTrue(np.all(feature[2] == 0))
+        self.assertTrue(np.all(feature[3] == (gs.get_current_player() == go.BLACK)))
+
+
+def move_patterns(gs, moves):
+    """Lists of the nakade, response_12d and non_response_3x3 patterns of the given moves
+    """
+    patterns = zip(*[get_move_patterns(gs, move) for move in moves])
+    return [[pattern for pattern in patterns_of_type if pattern is not None]
+            for patterns_of_type in patterns]
+
+
+class TestPatternFeatures(unittest.TestCase):
+
+    def test_get_neighbor(self):
+        gs = capture_board()
+        gs.do_move((3, 2))  # B captures three white stones
+        pp = Preprocess(["neighbor"], size=7)
+        feature = pp.state_to_tensor(gs)[0]
+
+        expectation = np.zeros((2, 7, 7))
+        expectation[0, 3, 1] = expectation[0, 2, 2] = expectation[0, 4, 2] = 1
+        expectation[0, 3, 3] = 1
+        # The diagonal neighbors (4, 1) and (2, 3) are occupied.
+        expectation[1, 2, 1] = expectation[1, 4, 3] = 1
+        self.assertTrue(np.all(expectation == feature))
+
+        # No last move, or a pass
+        self.assertTrue(np.all(pp.state_to_tensor(GameState(size=7)) == 0))
+        gs.do_move(go.PASS)
+        self.assertTrue(np.all(pp.state_to_tensor(gs) == 0))
+
+    def test_get_nakade(self):
+        gs = capture_board()
+        gs.do_move((3, 2))  # B captures three white stones
+        captured = [(2, 1), (3, 1), (2, 2)]
+        nakade = move_patterns(gs, captured)[0]
+        self.assertEqual(len(nakade), 3)
+        self.assertEqual(move_patterns(gs, [(0, 0), (5, 2)])[0], [])
+
+        pp = Preprocess(["nakade"], size=7, dict_nakade=nakade[:1])
+        feature = pp.state_to_tensor(gs)[0, 0]
+        expectation = np.zeros((7, 7))
+        expectation[2, 1] = 1
+        self.assertTrue(np.all(expectation == feature))
+
+        pp = Preprocess(["nakade"], size=7, dict_nakade=nakade)
+        self.assertEqual(pp.state_to_tensor(gs).sum(), 3)
+
+        # Only the stones captured by the previous move are nakade locations.
+        gs.do_move((0, 0))
+        self.assertEqual(pp.state_to_tensor(gs).sum(), 0)
+
+    def test_nakade_after_pass_and_undo(self):
+        gs = capture_board()
+        gs.do_move((3, 2))
+        pp = Preprocess(["nakade"], size=7, dict_nakade=move_patterns(gs, [(2, 1)])[0])
+        self.assertEqual(pp.state_to_tensor(gs).sum(), 1)
+
+        gs.push(go.PASS)
+        self.assertEqual(pp.state_to_tensor(gs).sum(), 0)
+        gs.pop()
+        self.assertEqual(pp.state_to_tensor(gs).sum(), 1)
+
+        copy = gs.copy()
+        self.assertEqual(pp.state_to_tensor(copy).sum(), 1)
+
+    def test_get_response_12d(self):
+        gs = capture_board()
+        gs.do_move((3, 2))
+        response = move_patterns(gs, [(3, 1), (5, 2), (0, 0)])[1]
+        # (0, 0) is not in the 12d neighborhood of the last move.
+        self.assertEqual(len(response), 2)
+
+        for feature_name in ["response_12d", "response"]:
+            pp = Preprocess([feature_name], size=7, dict_12d=response)
+            feature = pp.state_to_tensor(gs)[0, 0]
+            expectation = np.zeros((7, 7))
+            expectation[3, 1] = expectation[5, 2] = 1
+            self.assertTrue(np.all(expectation == feature))
+
+        # The response of the same move to a different previous move is a different pattern.
+        gs.do_move((6, 6))
+        self.assertEqual(pp.state_to_tensor(gs).sum(), 0)
+
+    def test_get_non_response_3x3(self):
+        gs = simple_board()
+        legal_moves = gs.get_legal_moves()
+        non_response = move_patterns(gs, legal_moves[:5])[2]
+
+        pp = Preprocess(["non_response_3x3"], size=7, dict_3x3=non_response)
+        feature = pp.state_to_tensor(gs)[0, 0]
+        expectation = np.zeros((7, 7))
+        for move in legal_moves:
+            if get_move_patterns(gs, move)[2] in non_response:
+                expectation[move] = 1
+        self.assertTrue(np.all(expectation[tuple(zip(*legal_moves[:5]))] == 1))
+        self.assertTrue(np.all(expectation == feature))
+
+        # The player to move is part of the pattern.
+        gs.set_current_player(go.WHITE if gs.get_current_player() == go.BLACK else go.BLACK)
+        self.assertTrue(np.all(pp.state_to_tensor(gs)[0, 0][tuple(zip(*legal_moves[:5]))] == 0))
+
+    def test_get_pattern_ids(self):
+        gs = capture_board()
+        gs.do_move((3, 2))
+        nakade, response, non_response = move_patterns(gs, [(2, 1), (3, 1)])
+        pp = Preprocess(["nakade", "response_12d", "non_response_3x3"], size=7,
+                        dict_nakade=nakade, dict_12d={response[1]: 7},
+                        dict_3x3=non_response[::-1])
+
+        ids = pp.get_pattern_ids(gs)
+        self.assertEqual(ids.shape, (3, 7, 7))
+        self.assertEqual(ids.dtype, np.int32)
+        self.assertEqual((ids[0, 2, 1], ids[0, 3, 1]), (0, 1))
+        self.assertEqual(ids[1, 3, 1], 7)
+        self.assertEqual((ids[2, 2, 1], ids[2, 3, 1]), (1, 0))
+
+        tensor = pp.state_to_tensor(gs)[0]
+        self.assertTrue(np.all((ids >= 0) == (tensor == 1)))
+
+    def test_missing_pattern_table(self):
+        Preprocess(["neighbor"], size=7)
+        for feature_name in ["response", "nakade", "response_12d", "non_response_3x3"]:
+            with self.assertRaises(ValueError):
+                Preprocess([feature_name], size=7)
+
+    def test_tracker_and_batch(self):
+        random = np.random.RandomState(1)
+        gs = GameState(size=9)
+        moves = []
+        for i in range(120):
+            legal_moves = gs.get_legal_moves(include_eyes=False)
+            move = legal_moves[random.randint(len(legal_moves))] if legal_moves else go.PASS
+            moves.append((gs.copy(), move))
+            gs.do_move(move)
+
+        # Tables with the patterns of every other move.
+        patterns = [[], [], []]
+        for (state, move) in moves[::2]:
+            if move != go.PASS:
+                for table, pattern in zip(patterns, get_move_patterns(state, move)):
+                    if pattern is not None:
+                        table.append(pattern)
+
+        pp = Preprocess(["board", "neighbor", "nakade", "response_12d", "non_response_3x3",
+                         "capture_size"], size=9, dict_nakade=patterns[0],
+                        dict_12d=patterns[1], dict_3x3=patterns[2])
+        tracker = FeatureTracker(pp)
+        states = [state for (state, move) in moves]
+        expected = np.concatenate([pp.state_to_tensor(state) for state in states], axis=0)
+        self.assertGreater(expected[:, 6].sum(), 0)
+        self.assertTrue(np.all(pp.states_to_tensor(states) == expected))
+        for state, tensor in zip(states, expected):
+            self.assertTrue(np.all(tracker.state_to_tensor(state)[0] == tensor))
+
+
+class TestStatesToTensor(unittest.TestCase):
+
+    features = ["board", "turns_since", "liberties", "capture_size", "self_atari_size",
+                "liberties_after", "ladder_capture", "ladder_escape", "sensibleness", "ko"]
+
+    def setUp(self):
+        self.pp = Preprocess(self.features, size=7)
+        self.states = [GameState(size=7), simple_board(), self_atari_board()]
+
+    def expected(self, states):
+        return np.concatenate([self.pp.state_to_tensor(gs) for gs in states], axis=0)
+
+    def test_matches_state_to_tensor(self):
+        tensor = self.pp.states_to_tensor(self.states)
+        self.assertEqual(tensor.dtype, np.uint8)
+        self.assertTrue(np.all(tensor == self.expected(self.states)))
+
+    def test_repeated_state(self):
+        states = self.states + [self.states[1]]
+        self.assertTrue(np.all(self.pp.states_to_tensor(states) == self.expected(states)))
+
+    def test_out_buffer(self):
+        out = np.ones((3, self.pp.get_output_dimension(), 7, 7), dtype=np.uint8)
+        result = self.pp.states_to_tensor(self.states, out=out)
+        self.assertIs(result, out)
+        self.assertTrue(np.all(out == self.expected(self.states)))
+
+        # The buffer is overwritten completely when reused.
+        self.states[0].do_move((3, 3))
+        self.pp.states_to_tensor(self.states, out=out)
+        self.assertTrue(np.all(out == self.expected(self.states)))
+
+    def test_bad_out_buffer(self):
+        n_features = self.pp.get_output_dimension()
+        for out in [np.zeros((2, n_features, 7, 7), dtype=np.uint8),
+                    np.zeros((3, n_features, 7, 7), dtype=np.float32),
+                    np.zeros((3, 7, 7, n_features), dtype=np.uint8).transpose((0, 3, 1, 2))]:
+            with self.assertRaises(ValueError):
+                self.pp.states_to_tensor(self.states, out=out)
+
+    def test_bad_size(self):
+        with self.assertRaises(ValueError):
+            self.pp.states_to_tensor([GameState(size=9)])
+
+    def test_game_state_batch(self):
+        batch = GameStateBatch(2, size=7)
+        batch.do_moves([10, 20])
+        self.assertTrue(np.all(self.pp.states_to_tensor(batch) ==
+                               self.expected(batch.get_states())))
+
+
+class TestFeatureTracker(unittest.TestCase):
+
+    features = ["board", "ones", "turns_since", "liberties", "capture_size", "self_atari_size",
+                "liberties_after", "ladder_capture", "ladder_escape", "sensibleness", "legal",
+                "ko"]
+
+    def setUp(self):
+        self.pp = Preprocess(self.features, size=9)
+        self.tracker = FeatureTracker(self.pp)
+
+    def use_size(self, size):
+        self.pp = Preprocess(self.features, size=size)
+        self.tracker = FeatureTracker(self.pp)
+
+    def assertTracked(self, gs):
+        self.assertTrue(np.all(self.tracker.state_to_tensor(gs) == self.pp.state_to_tensor(gs)))
+
+    def test_random_game(self):
+        random = np.random.RandomState(0)
+        gs = GameState(size=9)
+        self.assertTracked(gs)
+        for i in range(150):
+            moves = gs.get_legal_moves(include_eyes=False)
+            gs.do_move(moves[random.randint(len(moves))] if moves else go.PASS)
+            self.assertTracked(gs)
+
+    def test_captures(self):
+        self.use_size(7)
+        gs = capture_board()
+        self.assertTracked(gs)
+        for move in [(3, 2), (4, 5), go.PASS, (2, 1), (3, 2)]:
+            gs.do_move(move)
+            self.assertTracked(gs)
+
+    def test_undo_and_unrelated_states(self):
+        self.use_size(7)
+        gs = simple_board()
+        for state in [gs, self_atari_board(), gs, capture_board()]:
+            self.assertTracked(state)
+
+        gs.push((3, 6))
+        self.assertTracked(gs)
+        gs.pop()
+        self.assertTracked(gs)
+
+    def test_update_is_local(self):
+        gs = GameState(size=9)
+        self.assertEqual(self.tracker.update(gs), 81)
+        self.assertEqual(self.tracker.update(gs), 0)
+
+        # Only the empty neighbors of a new stone are recomputed.
+        gs.do_move((4, 4))
+        self.assertEqual(self.tracker.update(gs), 4)
+        gs.do_move((0, 0))
+        self.assertEqual(self.tracker.update(gs), 2)
+
+        self.tracker.reset()
+        self.assertEqual(self.tracker.update(gs), 79)
+
+    def test_no_lookahead(self):
+        pp = Preprocess(["board", "liberties"], size=7)
+        tracker = FeatureTracker(pp)
+        gs = capture_board()
+        self.assertEqual(tracker.update(gs), 0)
+        self.assertTrue(np.all(tracker.state_to_tensor(gs) == pp.state_to_tensor(gs)))
+
+    def test_bad_size(self):
+        with self.assertRaises(ValueError):
+            self.tracker.update(GameState(size=7))
+
 
 if __name__ == '__main__':
     unittest.main()
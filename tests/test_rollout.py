@@ -0,0 +1,134 @@
+import unittest
+import numpy as np
+import AlphaGo.go as go
+from AlphaGo.go import GameState, BLACK, WHITE
+from AlphaGo.mcts import MCTS
+from AlphaGo.models.rollout import CNNRollout
+from AlphaGo.preprocessing.rollout_policy import LinearRolloutPolicy
+
+from test_mcts import dummy_policy, dummy_value
+
+FEATURES = ["board", "ones", "turns_since", "liberties", "capture_size", "self_atari_size",
+            "liberties_after", "sensibleness", "legal", "ko"]
+
+
+def random_rollout_network(size=9, seed=0):
+    """CNNRollout with random weights, large enough to make the distribution far from uniform
+    """
+    rollout = CNNRollout(FEATURES, board=size)
+    random = np.random.RandomState(seed)
+    rollout.model.set_weights([random.normal(0, 1, w.shape) for w in rollout.model.get_weights()])
+    return rollout
+
+
+def fighting_state():
+    """9x9 position with groups in atari, captures and self-atari moves available
+    """
+    gs = GameState(size=9)
+    for move in [(2, 2), (2, 3), (3, 3), (3, 2), (4, 2), (1, 2), (2, 1), (4, 4), (3, 1),
+                 (5, 5), (1, 3), (6, 6), (1, 4)]:
+        gs.do_move(move)
+    return gs
+
+
+class TestCNNRollout(unittest.TestCase):
+
+    def test_batch_eval_state(self):
+        rollout = random_rollout_network()
+        states = [GameState(size=9), fighting_state()]
+        results = rollout.batch_eval_state(states)
+        self.assertEqual(2, len(results))
+        for gs, result in zip(states, results):
+            expected = dict(rollout.eval_state(gs))
+            self.assertEqual(len(expected), len(result))
+            for move, prob in result:
+                self.assertAlmostEqual(expected[move], prob, places=5)
+
+
+class TestLinearRolloutPolicy(unittest.TestCase):
+
+    def test_matches_network(self):
+        rollout = random_rollout_network()
+        policy = rollout.to_linear_policy()
+
+        for gs in [GameState(size=9), fighting_state()]:
+            expected = dict(rollout.eval_state(gs, gs.get_legal_moves(include_eyes=False)))
+            actual = dict(policy.eval_state(gs))
+            self.assertEqual(set(expected.keys()), set(actual.keys()))
+            for move, prob in expected.items():
+                self.assertAlmostEqual(actual[move], prob, places=5)
+
+    def test_color_feature(self):
+        rollout = CNNRollout(["board", "color", "sensibleness"], board=9)
+        weights = rollout.model.get_weights()
+        kernel = np.zeros(weights[0].shape)
+        kernel.ravel()[3] = 1.0
+        location_bias = np.zeros(81)
+        location_bias[0] = 1.0
+        rollout.model.set_weights([kernel, np.zeros(1), location_bias])
+        policy = rollout.to_linear_policy()
+
+        # The color plane only changes the output for black, where it is added before the relu.
+        gs = GameState(size=9)
+        self.assertEqual(gs.get_current_player(), BLACK)
+        self.assertAlmostEqual(dict(policy.eval_state(gs))[(0, 0)], np.e / (np.e + 80))
+        gs.do_move((4, 4))
+        self.assertEqual(gs.get_current_player(), WHITE)
+        self.assertAlmostEqual(dict(policy.eval_state(gs))[(0, 0)], np.e / (np.e + 79))
+
+    def test_unsupported_feature(self):
+        with self.assertRaises(ValueError):
+            LinearRolloutPolicy(["board", "ladder_capture"], np.zeros(4), 0.0, np.zeros(81),
+                                size=9)
+        with self.assertRaises(ValueError):
+            LinearRolloutPolicy(["board"], np.zeros(4), 0.0, np.zeros(81), size=9)
+
+    def test_sampling_distribution(self):
+        rollout = random_rollout_network()
+        policy = rollout.to_linear_policy(seed=1)
+        gs = fighting_state()
+        expected = dict(policy.eval_state(gs))
+
+        counts = dict.fromkeys(expected, 0)
+        n_samples = 5000
+        for i in range(n_samples):
+            policy.run_rollout(gs, 1)
+            counts[gs.pop()] += 1
+
+        for move, prob in expected.items():
+            self.assertLess(abs(counts[move] / float(n_samples) - prob), 0.03)
+
+    def test_run_rollout(self):
+        policy = random_rollout_network().to_linear_policy(seed=2)
+        gs = GameState(size=9)
+
+        n_moves = policy.run_rollout(gs, 1000)
+        self.assertLess(n_moves, 1000)
+        self.assertEqual(len(gs.get_history()), n_moves)
+        self.assertTrue(gs.sanity_check_groups())
+
+        # The rollout ended with two passes, and all moves can be undone.
+        self.assertEqual(gs.pop(), go.PASS)
+        self.assertEqual(gs.pop(), go.PASS)
+        for i in range(n_moves - 2):
+            gs.pop()
+        self.assertEqual(gs.get_history(), [])
+        self.assertEqual(len(gs.get_legal_moves()), 81)
+
+    def test_rollout_limit(self):
+        policy = random_rollout_network().to_linear_policy(seed=3)
+        gs = GameState(size=9)
+        self.assertEqual(policy.run_rollout(gs, 10), 10)
+        self.assertEqual(len(gs.get_history()), 10)
+
+    def test_mcts(self):
+        policy = random_rollout_network().to_linear_policy(seed=4)
+        mcts = MCTS(dummy_value, dummy_policy, policy, lmbda=1.0, rollout_limit=200, n_playout=20)
+        gs = GameState(size=9)
+        move = mcts.get_move(gs)
+        self.assertTrue(gs.is_legal(move))
+        self.assertEqual(gs.get_history(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()